@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the catdb CLI.
+
+Runs the write commands (add / update / delete) and a single-record lookup under
+``python -X importtime`` and checks that
+- none of the heavy modules (pandas, numpy, matplotlib) are imported, and
+- the median wall time of each command stays below a threshold.
+
+Exits with status 1 if any check fails, so it can be used as a regression guard.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--max-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATDB = os.path.join(REPO_ROOT, "catdb.py")
+HEAVY_MODULES = ("pandas", "numpy", "matplotlib")
+
+
+def run_cli(db_file: str, *args: str) -> tuple[float, str]:
+    """
+    Runs catdb.py once under -X importtime.
+
+    Parameters:
+    - db_file (str): Path to the database file.
+    - args (str): Command line arguments passed to catdb.py.
+
+    Returns:
+    - tuple[float, str]: Wall time in milliseconds and the importtime report (stderr).
+    """
+    cmd = [sys.executable, "-X", "importtime", CATDB, "--db-file", db_file, *args]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO_ROOT)
+    elapsed = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed: {proc.stderr}")
+    return elapsed, proc.stderr
+
+
+def imported_modules(importtime_report: str) -> list[tuple[str, int, bool]]:
+    """
+    Parses a -X importtime report.
+
+    Parameters:
+    - importtime_report (str): stderr of a python -X importtime run.
+
+    Returns:
+    - list[tuple[str, int, bool]]: (module name, cumulative microseconds, is top level) for each imported module.
+    """
+    modules = []
+    for line in importtime_report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        # ネストしたインポートはモジュール名の前のインデントが深くなる
+        top_level = not name.startswith("  ")
+        modules.append((name.strip(), int(cumulative), top_level))
+    return modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="catdb CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Number of runs per command")
+    parser.add_argument("--max-ms", type=float, default=150.0, help="Maximum median wall time per command in ms")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "bench.db")
+        subprocess.run([sys.executable, CATDB, "--db-file", db_file, "init"], check=True,
+                       capture_output=True, cwd=REPO_ROOT)
+
+        commands = [
+            ("add", lambda i: ("add", f"2000-01-{i % 28 + 1:02d}", "4.5")),
+            ("update", lambda i: ("update", f"2000-01-{i % 28 + 1:02d}", "4.6")),
+            ("list --begin-date", lambda i: ("list", "--begin-date", f"2000-01-{i % 28 + 1:02d}")),
+            ("delete", lambda i: ("delete", f"2000-01-{i % 28 + 1:02d}")),
+        ]
+
+        print(f"{'command':<20} {'median ms':>10} {'max ms':>10} {'import ms':>10}  heavy modules")
+        for name, make_args in commands:
+            times = []
+            import_us = 0
+            heavy: set[str] = set()
+            for i in range(args.runs):
+                elapsed, report = run_cli(db_file, *make_args(i))
+                times.append(elapsed)
+                modules = imported_modules(report)
+                import_us = max(import_us, sum(us for _, us, top_level in modules if top_level))
+                heavy.update(mod.split(".")[0] for mod, _, _ in modules if mod.split(".")[0] in HEAVY_MODULES)
+
+            median = statistics.median(times)
+            print(f"{name:<20} {median:>10.1f} {max(times):>10.1f} {import_us / 1000:>10.1f}  {', '.join(sorted(heavy)) or '-'}")
+            if heavy:
+                print(f"  FAIL: {name} imported {', '.join(sorted(heavy))}")
+                failed = True
+            if median > args.max_ms:
+                print(f"  FAIL: {name} median {median:.1f} ms exceeds {args.max_ms:.1f} ms")
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
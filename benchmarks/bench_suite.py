@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for CatWeightDB and the catdb CLI.
+
+For each dataset size a synthetic database is generated (see synthetic.py) and every
+benchmark runs in a fresh worker process, so that peak RSS is measured per benchmark.
+Each benchmark records
+- throughput (operations or rows per second),
+- latency percentiles (p50 / p95 / p99 of the individual samples), and
+- peak RSS of the worker process (or of the CLI processes for cli_* benchmarks).
+
+Results are written to a JSON file. With --compare, results are checked against a
+baseline file and the script exits with status 1 if any benchmark regressed by more
+than --threshold.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000 10000 100000] [--cats 1] [--seed 0]
+                                     [--only NAME ...] [--output results.json]
+                                     [--compare baseline.json] [--threshold 0.2]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import synthetic
+from catdb.db.database import CatWeightDB
+from catdb.utils.utils import peak_rss_mb
+
+CATDB = os.path.join(REPO_ROOT, "catdb.py")
+
+# 1 回の計測に使う件数 (一括処理系)
+BATCH_ROWS = 10000
+
+
+class Context:
+    """State handed to each benchmark function."""
+
+    def __init__(self, db_file: str, cat: str, rows: int, repeat: int, cli_repeat: int, seed: int, work_dir: str) -> None:
+        self.db_file = db_file
+        self.cat = cat
+        self.rows = rows
+        self.repeat = repeat
+        self.cli_repeat = cli_repeat
+        self.rng = np.random.default_rng(seed)
+        self.work_dir = work_dir
+
+    def open(self) -> CatWeightDB:
+        db = CatWeightDB(self.db_file, cat=self.cat)
+        db.connect()
+        return db
+
+    def existing_dates(self, db: CatWeightDB, count: int) -> list[date]:
+        dates, _ = db.get_weight_arrays()
+        picked = self.rng.choice(dates, size=min(count, len(dates)), replace=False)
+        return [d.astype(object) for d in picked]
+
+
+Samples = list[tuple[float, int]]
+
+
+def timed(fn: Callable[[], int]) -> tuple[float, int]:
+    """Runs fn once and returns (seconds, number of items it processed)."""
+    start = time.perf_counter()
+    items = fn()
+    return time.perf_counter() - start, items
+
+
+# ---------------------------------------------------------------------------
+# CatWeightDB のメソッド
+# ---------------------------------------------------------------------------
+
+def bench_initialize_table(ctx: Context) -> Samples:
+    samples = []
+    for i in range(ctx.repeat):
+        db = CatWeightDB(os.path.join(ctx.work_dir, f"init_{i}.db"))
+        db.connect()
+        samples.append(timed(lambda: int(db.initialize_table())))
+        db.close()
+    return samples
+
+
+def bench_add_weight_record(ctx: Context) -> Samples:
+    db = ctx.open()
+    base = date(9000, 1, 1)
+    samples = [timed(lambda i=i: int(db.add_weight_record(base + timedelta(days=i), 4.5, None))) for i in range(ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_find_weight_record(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda d=d: int(db.find_weight_record(d) is not None)) for d in ctx.existing_dates(db, ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_get_weight_record(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda d=d: len(db.get_weight_record(d))) for d in ctx.existing_dates(db, ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_get_records_by_date_range(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda d=d: len(db.get_records_by_date_range(d, d + timedelta(days=30))))
+               for d in ctx.existing_dates(db, ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_get_all_records(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: len(db.get_all_records())) for _ in range(3)]
+    db.close()
+    return samples
+
+
+def bench_update_weight_record(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda d=d: int(db.update_weight_record(d, 4.2, "updated"))) for d in ctx.existing_dates(db, ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_upsert_weight_records(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = []
+    for i in range(3):
+        df = synthetic.generate_history(BATCH_ROWS, seed=1000 + i)
+        samples.append(timed(lambda: db.upsert_weight_records(df) and len(df)))
+    db.close()
+    return samples
+
+
+def bench_import_csv(ctx: Context) -> Samples:
+    csv_file = os.path.join(ctx.work_dir, "import.csv")
+    df = synthetic.generate_history(min(ctx.rows, synthetic.MAX_DAYS_PER_CAT // 2), seed=7)
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    df.to_csv(csv_file, index=False)
+    db = ctx.open()
+    samples = []
+    for i in range(3):
+        db.use_cat(f"import{i}")
+        samples.append(timed(lambda: db.import_csv(csv_file)))
+    db.close()
+    return samples
+
+
+def bench_delete_weight_record(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda d=d: int(db.delete_weight_record(d))) for d in ctx.existing_dates(db, ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_iter_records(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: sum(1 for _ in db.iter_records())) for _ in range(3)]
+    db.close()
+    return samples
+
+
+def bench_get_weight_arrays(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: len(db.get_weight_arrays()[0])) for _ in range(3)]
+    db.close()
+    return samples
+
+
+def bench_get_weight_series(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: len(db.get_weight_series())) for _ in range(3)]
+    db.close()
+    return samples
+
+
+def bench_search_notes(ctx: Context) -> Samples:
+    db = ctx.open()
+    words = [note.split()[0] for note in synthetic.NOTES]
+    samples = [timed(lambda w=words[i % len(words)]: len(db.search_notes(w))) for i in range(ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_get_stats(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: len(db.get_stats("month"))) for _ in range(ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_content_fingerprint(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: int(bool(db.content_fingerprint()))) for _ in range(ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_list_cats(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: len(db.list_cats())) for _ in range(ctx.repeat)]
+    db.close()
+    return samples
+
+
+def bench_apply_operations(ctx: Context) -> Samples:
+    db = ctx.open()
+    dates = ctx.existing_dates(db, BATCH_ROWS)
+    ops = [("update", None, d, 4.4, None) for d in dates]
+    ops += [("add", None, date(9100, 1, 1) + timedelta(days=i), 4.5, None) for i in range(BATCH_ROWS)]
+    ops += [("delete", None, d, None, None) for d in dates]
+    samples = [timed(lambda: sum(ok + failed for ok, failed in db.apply_operations(ops).values()))]
+    db.close()
+    return samples
+
+
+def bench_rebuild_rollups(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: db.rebuild_rollups()[1] and ctx.rows) for _ in range(3)]
+    db.close()
+    return samples
+
+
+def bench_check_rollups(ctx: Context) -> Samples:
+    db = ctx.open()
+    samples = [timed(lambda: len(db.check_rollups()) + ctx.rows) for _ in range(3)]
+    db.close()
+    return samples
+
+
+# ---------------------------------------------------------------------------
+# パイプライン
+# ---------------------------------------------------------------------------
+
+def bench_graph_pipeline(ctx: Context) -> Samples:
+    import contextlib
+    import io
+    from catdb.commands.graph import plot_weight_trends_by_years
+
+    db = ctx.open()
+    samples = []
+    for i in range(3):
+        def run() -> int:
+            df = db.get_all_records()
+            years = sorted(set(df["date"].dt.year))[-5:]
+            with contextlib.redirect_stdout(io.StringIO()):
+                plot_weight_trends_by_years(df, years, os.path.join(ctx.work_dir, f"graph_{i}.png"))
+            return len(df)
+        samples.append(timed(run))
+    db.close()
+    return samples
+
+
+def bench_analyze(ctx: Context) -> Samples:
+    from catdb.analytics import SeriesAnalyzer
+
+    db = ctx.open()
+    dates, weights = db.get_weight_arrays()
+    db.close()
+    analyzer = SeriesAnalyzer(window_days=30)
+    return [timed(lambda: len(analyzer.analyze(dates, weights)["ewma"])) for _ in range(5)]
+
+
+def bench_forecast(ctx: Context) -> Samples:
+    from catdb.forecast import MODELS, forecast_series
+
+    db = ctx.open()
+    series = list(db.iter_weight_series())
+    db.close()
+    return [timed(lambda: len(forecast_series(series, MODELS, horizon=90)) * len(series)) for _ in range(5)]
+
+
+def bench_fleet_summary(ctx: Context) -> Samples:
+    from catdb.fleet import CatWeightFleet
+
+    # 1 回目でメタデータを読み込み、以降はファイルを開いて集計する時間を計る
+    fleet = CatWeightFleet([ctx.db_file])
+    list(fleet.files())
+    return [timed(lambda: len(list(fleet.summary()))) for _ in range(5)]
+
+
+# ---------------------------------------------------------------------------
+# CLI (プロセスの起動からの end-to-end)
+# ---------------------------------------------------------------------------
+
+def _cli(ctx: Context, *args: str, items: int = 1) -> Samples:
+    samples = []
+    for i in range(ctx.cli_repeat):
+        cmd = [sys.executable, CATDB, "--db-file", ctx.db_file, "--cat", ctx.cat,
+               *[a.format(i=i, work_dir=ctx.work_dir) for a in args]]
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, cwd=ctx.work_dir)
+        samples.append((time.perf_counter() - start, items))
+    return samples
+
+
+def bench_cli_add(ctx: Context) -> Samples:
+    return _cli(ctx, "add", "9200-01-0{i}", "4.5")
+
+
+def bench_cli_list_date(ctx: Context) -> Samples:
+    return _cli(ctx, "list", "--begin-date", synthetic.START_DATE.astype(object).isoformat())
+
+
+def bench_cli_list(ctx: Context) -> Samples:
+    return _cli(ctx, "list", items=ctx.rows)
+
+
+def bench_cli_stats(ctx: Context) -> Samples:
+    return _cli(ctx, "stats", "--period", "year")
+
+
+def bench_cli_export(ctx: Context) -> Samples:
+    return _cli(ctx, "export", os.path.join("{work_dir}", "export_{i}.csv"), items=ctx.rows)
+
+
+def bench_cli_graph(ctx: Context) -> Samples:
+    return _cli(ctx, "graph", "--graph-file", os.path.join("{work_dir}", "graph_{i}.png"), items=ctx.rows)
+
+
+def bench_cli_analyze(ctx: Context) -> Samples:
+    return _cli(ctx, "analyze", "--anomalies-only", items=ctx.rows)
+
+
+# (関数, データベースを変更するか)
+BENCHMARKS: dict[str, tuple[Callable[[Context], Samples], bool]] = {
+    "initialize_table": (bench_initialize_table, False),
+    "add_weight_record": (bench_add_weight_record, True),
+    "find_weight_record": (bench_find_weight_record, False),
+    "get_weight_record": (bench_get_weight_record, False),
+    "get_records_by_date_range": (bench_get_records_by_date_range, False),
+    "get_all_records": (bench_get_all_records, False),
+    "update_weight_record": (bench_update_weight_record, True),
+    "upsert_weight_records": (bench_upsert_weight_records, True),
+    "import_csv": (bench_import_csv, True),
+    "delete_weight_record": (bench_delete_weight_record, True),
+    "iter_records": (bench_iter_records, False),
+    "get_weight_arrays": (bench_get_weight_arrays, False),
+    "get_weight_series": (bench_get_weight_series, False),
+    "search_notes": (bench_search_notes, False),
+    "get_stats": (bench_get_stats, False),
+    "content_fingerprint": (bench_content_fingerprint, False),
+    "list_cats": (bench_list_cats, False),
+    "apply_operations": (bench_apply_operations, True),
+    "rebuild_rollups": (bench_rebuild_rollups, True),
+    "check_rollups": (bench_check_rollups, False),
+    "graph_pipeline": (bench_graph_pipeline, False),
+    "analyze": (bench_analyze, False),
+    "forecast": (bench_forecast, False),
+    "fleet_summary": (bench_fleet_summary, False),
+    "cli_add": (bench_cli_add, True),
+    "cli_list_date": (bench_cli_list_date, False),
+    "cli_list": (bench_cli_list, False),
+    "cli_stats": (bench_cli_stats, False),
+    "cli_export": (bench_cli_export, False),
+    "cli_graph": (bench_cli_graph, False),
+    "cli_analyze": (bench_cli_analyze, False),
+}
+
+
+def run_benchmark(name: str, db_file: str, cat: str, rows: int, repeat: int, cli_repeat: int, seed: int) -> dict:
+    """
+    Runs one benchmark. Called in a fresh worker process.
+
+    Returns:
+    - dict: Throughput, latency percentiles and peak RSS of the benchmark.
+    """
+    fn, mutates = BENCHMARKS[name]
+    with tempfile.TemporaryDirectory() as work_dir:
+        if mutates:
+            # 変更する計測は元のデータベースのコピーに対して行う
+            copy = os.path.join(work_dir, "bench.db")
+            shutil.copyfile(db_file, copy)
+            db_file = copy
+        samples = fn(Context(db_file, cat, rows, repeat, cli_repeat, seed, work_dir))
+
+    seconds = np.array([s for s, _ in samples])
+    items = sum(n for _, n in samples)
+    if name.startswith("cli_"):
+        rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    else:
+        rss_mb = peak_rss_mb()
+    return {
+        "throughput": items / seconds.sum() if seconds.sum() > 0 else 0.0,
+        "p50_ms": float(np.percentile(seconds, 50) * 1000),
+        "p95_ms": float(np.percentile(seconds, 95) * 1000),
+        "p99_ms": float(np.percentile(seconds, 99) * 1000),
+        "samples": len(samples),
+        "peak_rss_mb": rss_mb,
+    }
+
+
+def prepare_database(work_dir: str, rows: int, cats: int, seed: int) -> tuple[str, str, int]:
+    """
+    Generates (or reuses) the synthetic database for one size.
+
+    Returns:
+    - tuple[str, str, int]: Database path, name of the benchmarked cat and its number of records.
+    """
+    db_file = os.path.join(work_dir, f"synthetic_{rows}_{cats}_{seed}.db")
+    if not os.path.exists(db_file):
+        tmp_file = db_file + ".tmp"
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        synthetic.populate(tmp_file, rows, cats, seed)
+        os.replace(tmp_file, db_file)
+    conn = sqlite3.connect(db_file)
+    cat, count = conn.execute("""
+        SELECT c.name, COUNT(*) FROM cats c JOIN cat_weight_records r ON r.cat_id = c.cat_id
+        GROUP BY c.cat_id ORDER BY c.name LIMIT 1
+    """).fetchone()
+    conn.close()
+    return db_file, cat, count
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares results with a baseline.
+
+    Returns:
+    - list[str]: Description of every regression beyond the threshold.
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if base["throughput"] > 0 and current["throughput"] < base["throughput"] * (1 - threshold):
+            regressions.append(f"{key}: throughput {current['throughput']:.1f}/s vs {base['throughput']:.1f}/s")
+        if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{key}: p95 {current['p95_ms']:.2f} ms vs {base['p95_ms']:.2f} ms")
+        if base.get("peak_rss_mb") and current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{key}: peak RSS {current['peak_rss_mb']:.1f} MB vs {base['peak_rss_mb']:.1f} MB")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="catdb benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Total numbers of records to benchmark (e.g. 1000 ... 10000000)")
+    parser.add_argument("--cats", type=int, default=1, help="Number of cats (raised automatically for large sizes)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic data")
+    parser.add_argument("--repeat", type=int, default=50, help="Samples per latency benchmark")
+    parser.add_argument("--cli-repeat", type=int, default=3, help="Runs per CLI benchmark")
+    parser.add_argument("--only", type=str, nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--work-dir", type=str, default=os.path.join(tempfile.gettempdir(), "catdb-bench"),
+                        help="Directory for the generated databases (reused between runs)")
+    parser.add_argument("--output", type=str, default="bench_results.json", help="JSON file to write the results to")
+    parser.add_argument("--compare", type=str, help="Baseline JSON file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression (default: 0.2)")
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    names = args.only or list(BENCHMARKS)
+    results: dict[str, dict] = {}
+
+    print(f"{'benchmark':<36} {'throughput/s':>14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+    for rows in args.sizes:
+        db_file, cat, cat_rows = prepare_database(args.work_dir, rows, args.cats, args.seed)
+        for name in names:
+            # 計測ごとに新しいプロセスを使い、ピーク RSS を個別に測る
+            with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+                result = pool.submit(run_benchmark, name, db_file, cat, cat_rows, args.repeat,
+                                     args.cli_repeat, args.seed).result()
+            key = f"{name}@{rows}"
+            results[key] = result
+            print(f"{key:<36} {result['throughput']:>14,.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                  f"{result['p99_ms']:>9.2f} {result['peak_rss_mb']:>8.1f}")
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cats": args.cats,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Load test for `catdb.py serve`.
+
+Starts the server on a free port (or uses --url), then runs a number of client threads
+with keep-alive connections for a fixed duration. Each client picks requests from a
+weighted mix of record ranges, single records, statistics and (optionally) writes.
+Prints the request rate, latency percentiles per request type and the server cache
+counters.
+
+Usage:
+    python benchmarks/load_test.py --db-file cat.db [--concurrency 32] [--duration 10]
+                                   [--write-ratio 0.01] [--cat NAME]
+    python benchmarks/load_test.py --url http://127.0.0.1:8080 ...
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATDB = os.path.join(REPO_ROOT, "catdb.py")
+
+
+def start_server(db_file: str, readers: int) -> tuple[subprocess.Popen, str]:
+    """Starts `catdb.py serve` on a free port and returns the process and its URL."""
+    proc = subprocess.Popen(
+        [sys.executable, CATDB, "--db-file", db_file, "serve", "--port", "0", "--readers", str(readers)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline()
+    if " on " not in line:
+        proc.kill()
+        raise RuntimeError(f"Server did not start: {line!r}")
+    return proc, line.rsplit(" on ", 1)[1].strip()
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str, body: object = None) -> int:
+    payload = None if body is None else json.dumps(body)
+    headers = {"Content-Type": "application/json"} if payload else {}
+    conn.request(method, path, body=payload, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def date_range(url: str, cat: str) -> tuple[date, date]:
+    """Returns the first and last period start of the cat's yearly statistics."""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port)
+    conn.request("GET", f"/stats?cat={cat}&period=year")
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+    if not stats:
+        today = date.today()
+        return today - timedelta(days=365), today
+    return date.fromisoformat(stats[0]["period_start"]), date.fromisoformat(stats[-1]["period_start"]) + timedelta(days=364)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test for catdb.py serve")
+    parser.add_argument("--db-file", type=str, help="Database to serve (starts a server on a free port)")
+    parser.add_argument("--url", type=str, help="URL of an already running server")
+    parser.add_argument("--cat", type=str, default="default", help="Cat to query")
+    parser.add_argument("--concurrency", type=int, default=32, help="Number of client threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--readers", type=int, default=8, help="Reader connections of the started server")
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="Fraction of requests that are writes")
+    parser.add_argument("--distinct-ranges", type=int, default=50,
+                        help="Number of distinct range queries (lower means more cache hits)")
+    args = parser.parse_args()
+    if not args.url and not args.db_file:
+        parser.error("--db-file or --url is required")
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(args.db_file, args.readers)
+    try:
+        first, last = date_range(url, args.cat)
+        span = max((last - first).days, 1)
+        # 範囲の問い合わせは有限個に絞り、キャッシュが効く状況を再現する
+        ranges = []
+        rng = random.Random(0)
+        for _ in range(args.distinct_ranges):
+            begin = first + timedelta(days=rng.randrange(span))
+            ranges.append((begin, begin + timedelta(days=rng.choice([7, 30, 90, 365]))))
+
+        latencies: dict[str, list[float]] = {}
+        errors: list[str] = []
+        lock = threading.Lock()
+        stop = time.monotonic() + args.duration
+
+        def client(seed: int) -> None:
+            rng = random.Random(seed)
+            parts = urlsplit(url)
+            conn = http.client.HTTPConnection(parts.hostname, parts.port)
+            local: dict[str, list[float]] = {}
+            while time.monotonic() < stop:
+                r = rng.random()
+                if r < args.write_ratio:
+                    kind = "write"
+                    day = first + timedelta(days=rng.randrange(span))
+                    method, path, body = "PUT", f"/records/{day}?cat={args.cat}", {"weight": round(rng.uniform(3, 6), 2)}
+                elif r < 0.5:
+                    kind = "range"
+                    begin, end = rng.choice(ranges)
+                    method, path, body = "GET", f"/records?cat={args.cat}&begin={begin}&end={end}", None
+                elif r < 0.8:
+                    kind = "record"
+                    day = first + timedelta(days=rng.randrange(span))
+                    method, path, body = "GET", f"/records/{day}?cat={args.cat}", None
+                else:
+                    kind = "stats"
+                    method, path, body = "GET", f"/stats?cat={args.cat}&period={rng.choice(['week', 'month', 'year'])}", None
+                start = time.perf_counter()
+                try:
+                    status = request(conn, method, path, body)
+                except (OSError, http.client.HTTPException) as e:
+                    with lock:
+                        errors.append(f"{kind}: {e}")
+                    conn.close()
+                    conn = http.client.HTTPConnection(parts.hostname, parts.port)
+                    continue
+                if status >= 500:
+                    with lock:
+                        errors.append(f"{kind}: HTTP {status}")
+                local.setdefault(kind, []).append(time.perf_counter() - start)
+            conn.close()
+            with lock:
+                for kind, values in local.items():
+                    latencies.setdefault(kind, []).extend(values)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(args.concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        total = sum(len(v) for v in latencies.values())
+        print(f"{total} requests in {elapsed:.1f} s: {total / elapsed:,.0f} req/s, "
+              f"{len(errors)} errors, concurrency {args.concurrency}")
+        print(f"{'request':<10} {'count':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for kind, values in sorted(latencies.items()):
+            q = statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+            print(f"{kind:<10} {len(values):>8} {q[49] * 1000:>8.2f} {q[94] * 1000:>8.2f} {q[98] * 1000:>8.2f}")
+        parts = urlsplit(url)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port)
+        conn.request("GET", "/cache")
+        print(f"Server cache: {conn.getresponse().read().decode()}")
+        conn.close()
+        for message in errors[:10]:
+            print(f"  error: {message}")
+        return 1 if errors else 0
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
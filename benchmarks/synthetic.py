@@ -0,0 +1,110 @@
+"""
+Seeded generator of synthetic cat weight histories for the benchmarks.
+
+Each cat gets a daily history starting at START_DATE with randomly skipped days and
+occasional multi-week gaps, a slow random walk with a yearly cycle, and sparse notes.
+Histories are capped at MAX_DAYS_PER_CAT days, so large row counts are spread over
+more cats. The same (rows, cats, seed) always produces the same data.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from catdb.db.database import CatWeightDB
+
+START_DATE = np.datetime64("1950-01-01")
+# 日付が 9999 年を超えないよう、1 匹あたりの日数に上限を設ける
+MAX_DAYS_PER_CAT = 20000
+NOTES = ["vet visit", "diet change", "medication", "new food", "after bath", "weighed at clinic"]
+
+
+def cats_for(rows: int, cats: int = 1) -> int:
+    """
+    Returns the number of cats needed so that no history exceeds MAX_DAYS_PER_CAT days.
+
+    Parameters:
+    - rows (int): Total number of records.
+    - cats (int): Requested number of cats.
+
+    Returns:
+    - int: Number of cats to generate.
+    """
+    # 欠測日の分を見込んで 0.8 を掛ける
+    return max(cats, -(-rows // int(MAX_DAYS_PER_CAT * 0.8)))
+
+
+def generate_history(rows: int, seed: int = 0, gap_rate: float = 0.05) -> pd.DataFrame:
+    """
+    Generates the weight history of one cat.
+
+    Parameters:
+    - rows (int): Number of records.
+    - seed (int): Random seed.
+    - gap_rate (float): Probability that a day is missing. Multi-week gaps are added on top.
+
+    Returns:
+    - pd.DataFrame: 'date' (datetime64), 'weight' (float) and 'notes' (object) columns in date order.
+    """
+    rng = np.random.default_rng(seed)
+    # 1 日あたりの間隔: 通常は 1 日、gap_rate の確率で数日、まれに数週間空く
+    steps = np.ones(rows, dtype=np.int64)
+    skipped = rng.random(rows) < gap_rate
+    steps[skipped] += rng.integers(1, 4, skipped.sum())
+    long_gaps = rng.random(rows) < 0.002
+    steps[long_gaps] += rng.integers(14, 60, long_gaps.sum())
+    days = np.cumsum(steps) - steps[0]
+    if days[-1] >= MAX_DAYS_PER_CAT:
+        # 上限を超える場合は間隔を詰める
+        days = np.arange(rows)
+    dates = START_DATE + days
+
+    base = rng.uniform(3.0, 6.0)
+    walk = np.cumsum(rng.normal(0.0, 0.01, rows))
+    season = 0.1 * np.sin(2 * np.pi * days / 365.25 + rng.uniform(0, 2 * np.pi))
+    noise = rng.normal(0.0, 0.03, rows)
+    weights = np.round(np.clip(base + walk + season + noise, 1.0, 12.0), 2)
+
+    notes = np.full(rows, None, dtype=object)
+    has_note = rng.random(rows) < 0.02
+    notes[has_note] = rng.choice(NOTES, has_note.sum())
+
+    return pd.DataFrame({"date": dates, "weight": weights, "notes": notes})
+
+
+def populate(db_file: str, rows: int, cats: int = 1, seed: int = 0) -> list[str]:
+    """
+    Creates a database filled with synthetic histories, spread evenly over the cats.
+
+    Parameters:
+    - db_file (str): Path to the database file to create.
+    - rows (int): Total number of records.
+    - cats (int): Number of cats (raised if needed, see cats_for).
+    - seed (int): Random seed.
+
+    Returns:
+    - list[str]: Names of the generated cats.
+    """
+    cats = cats_for(rows, cats)
+    names = [f"cat{i:05d}" for i in range(cats)]
+    with CatWeightDB(db_file) as db, tempfile.TemporaryDirectory() as tmp:
+        db.initialize_table()
+        for i, name in enumerate(names):
+            count = rows // cats + (1 if i < rows % cats else 0)
+            if count == 0:
+                continue
+            csv_file = os.path.join(tmp, f"{name}.csv")
+            df = generate_history(count, seed=seed * 100003 + i)
+            df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+            df.to_csv(csv_file, index=False)
+            db.use_cat(name)
+            # 使い捨ての新しいファイルなので、速い設定を明示して読み込む
+            db.import_csv(csv_file, journal_mode="MEMORY", synchronous="OFF")
+    return names
@@ -1,81 +1,450 @@
 #!/usr/bin/env python3
 
 import argparse
-from datetime import date
-from typing import Optional
-import pandas as pd
-from catdb.commands.add import add_weight_record
-from catdb.commands.update import update_weight_record
-from catdb.commands.delete import delete_weight_record
-from catdb.commands.get import print_weight_records
-from catdb.commands.graph import graph_weight_records
-from catdb.commands.initialize import initialize_database
+import os
+from catdb.db.database import DEFAULT_CAT
 from catdb.utils.utils import parse_date, get_database_file
 
+# コマンドの実装は各分岐の中でインポートする。
+# add / update / delete が pandas や matplotlib の読み込みを待たずに起動できるようにするため。
+
 def catdb_main() -> None:
     parser = argparse.ArgumentParser(description="Cat Weight Database CLI")
     parser.add_argument("--db-file", type=str, help="Path to the database file. Overrides CAT_DB environment variable.")
+    parser.add_argument("--wal", action="store_true", help="Switch the database to WAL journal mode for concurrent readers and writers")
+    parser.add_argument("--busy-timeout", type=float, help="Seconds to wait when the database is locked by another process", default=None)
+    parser.add_argument("--cat", type=str, help=f"Name of the cat (default: '{DEFAULT_CAT}')", default=DEFAULT_CAT)
+    parser.add_argument("--profile", action="store_true", help="Report SQL statements and phase timings of the command to STDERR")
+    parser.add_argument("--profile-format", type=str, choices=["table", "json"], default="table", help="Format of the --profile report")
+    parser.add_argument("--profile-file", type=str, help="Write the --profile report to this file instead of STDERR", default=None)
+
+    # --cat はサブコマンドの後ろにも書けるようにする (SUPPRESS で上の既定値を上書きしない)
+    cat_parser = argparse.ArgumentParser(add_help=False)
+    cat_parser.add_argument("--cat", type=str, help="Name of the cat", default=argparse.SUPPRESS)
 
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     # Init command
-    init_parser = subparsers.add_parser("init", help="Initialize the database")
+    init_parser = subparsers.add_parser("init", help="Initialize the database", parents=[cat_parser])
     init_parser.add_argument("--csv", type=str, help="Path to a CSV file to load initial data")
+    init_parser.add_argument("--chunk-size", type=int, help="Number of CSV rows loaded per batch", default=50000)
+    init_parser.add_argument("--journal-mode", type=str, default=None,
+                             help="SQLite journal mode used while loading the CSV (default: keep the current one). "
+                                  "MEMORY or OFF is faster, but a crash during the load can corrupt the whole database",
+                             choices=["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"])
+    init_parser.add_argument("--synchronous", type=str, default=None,
+                             help="SQLite synchronous level used while loading the CSV (default: keep the current one). "
+                                  "OFF is faster, but a power loss during the load can corrupt the whole database",
+                             choices=["OFF", "NORMAL", "FULL", "EXTRA"])
+    init_parser.add_argument("--schema-version", type=int, choices=[1, 2, 3], default=1,
+                             help="Storage format of a new database: 1 text dates, 2 integer dates, "
+                                  "3 integer dates and gram weights (default: 1)")
+
+    # Ingest command
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest many CSV export files in parallel", parents=[cat_parser])
+    ingest_parser.add_argument("files", type=str, nargs="+", help="CSV files or glob patterns (e.g. 'exports/*.csv')")
+    ingest_parser.add_argument("--workers", type=int, default=None,
+                               help="Number of parser processes (default: number of CPUs)")
 
     # Add command
-    add_parser = subparsers.add_parser("add", help="Add a new weight record")
+    add_parser = subparsers.add_parser("add", help="Add a new weight record", parents=[cat_parser])
     add_parser.add_argument("date", type=str, help="Date of the record in 'YYYY-MM-DD' format")
     add_parser.add_argument("weight", type=float, help="Weight of the cat in kg")
     add_parser.add_argument("--notes", type=str, help="Optional notes for the record", default=None)
 
     # Update command
-    update_parser = subparsers.add_parser("update", help="Update an existing weight record")
+    update_parser = subparsers.add_parser("update", help="Update an existing weight record", parents=[cat_parser])
     update_parser.add_argument("date", type=str, help="Date of the record in 'YYYY-MM-DD' format")
     update_parser.add_argument("weight", type=float, help="New weight of the cat in kg")
     update_parser.add_argument("--notes", type=str, help="New notes for the record", default=None)
 
     # Delete command
-    delete_parser = subparsers.add_parser("delete", help="Delete a weight record")
+    delete_parser = subparsers.add_parser("delete", help="Delete a weight record", parents=[cat_parser])
     delete_parser.add_argument("date", type=str, help="Date of the record to delete in 'YYYY-MM-DD' format")
 
     # List command
-    list_parser = subparsers.add_parser("list", help="List weight records")
+    list_parser = subparsers.add_parser("list", help="List weight records", parents=[cat_parser])
     list_parser.add_argument("--begin-date", type=str, help="Start date of the range in 'YYYY-MM-DD' format")
     list_parser.add_argument("--end-date", type=str, help="End date of the range in 'YYYY-MM-DD' format")
+    list_parser.add_argument("--limit", type=int, help="Print at most this many records (one page)", default=None)
+    list_parser.add_argument("--after", type=str, default=None,
+                             help="Start after this date in the listing order (the --after value printed for the next page)")
+    list_parser.add_argument("--order", type=str, choices=["oldest", "newest"], default="oldest",
+                             help="List the oldest or the newest records first (default: oldest)")
+    list_parser.add_argument("--format", type=str, choices=["table", "tsv", "json"], default="table",
+                             help="Output format (default: table)")
 
     # Graph command
-    graph_parser = subparsers.add_parser("graph", help="Graph weight records")
+    graph_parser = subparsers.add_parser("graph", help="Graph weight records", parents=[cat_parser])
     graph_parser.add_argument("--graph-file", type=str, help="Output graph file name", default=None)
+    graph_parser.add_argument("--cache-dir", type=str, default=os.environ.get("CAT_DB_CACHE"),
+                              help="Directory of the rendered graph cache. Defaults to CAT_DB_CACHE environment variable; caching is off if neither is set.")
+    graph_parser.add_argument("--cache-size", type=float, default=100.0, help="Maximum size of the graph cache in MB")
+    graph_parser.add_argument("--max-points", type=int, default=4000,
+                              help="Plot weekly/monthly/yearly means instead of daily values above this many points (default: 4000)")
+    graph_parser.add_argument("--all", dest="render_all", action="store_true",
+                              help="Render the overlay, full-history and per-year charts of every cat in parallel")
+    graph_parser.add_argument("databases", type=str, nargs="*",
+                              help="With --all: database files or glob patterns (default: the current database)")
+    graph_parser.add_argument("--output-dir", type=str, default="graphs", help="With --all: root directory of the charts")
+    graph_parser.add_argument("--workers", type=int, default=None,
+                              help="With --all: number of render processes (default: number of CPUs)")
+    graph_parser.add_argument("--charts", type=str, default="overlay,history,year",
+                              help="With --all: comma separated chart kinds (default: overlay,history,year)")
+    graph_parser.add_argument("--first-year", type=int, default=None, help="With --all: only use records from this year on")
+    graph_parser.add_argument("--last-year", type=int, default=None, help="With --all: only use records up to this year")
+    graph_parser.add_argument("--cache-stats", action="store_true", help="Show graph cache hit/miss counters instead of drawing")
+
+    # Forecast command
+    forecast_parser = subparsers.add_parser("forecast", help="Forecast the weight of the coming days", parents=[cat_parser])
+    forecast_parser.add_argument("databases", type=str, nargs="*",
+                                 help="Database files or glob patterns to forecast every cat of (default: the current database)")
+    forecast_parser.add_argument("--horizon", type=int, default=30, help="Number of days to forecast (default: 30)")
+    forecast_parser.add_argument("--models", type=str, default="linear,seasonal,damped",
+                                 help="Comma separated models (default: linear,seasonal,damped)")
+    forecast_parser.add_argument("--level", type=float, default=0.95,
+                                 help="Coverage of the prediction intervals (default: 0.95)")
+    forecast_parser.add_argument("--all-cats", action="store_true", help="Forecast every cat of the current database")
+    forecast_parser.add_argument("--force", action="store_true", help="Refit even if the records did not change")
+    forecast_parser.add_argument("--batch-size", type=int, default=500,
+                                 help="Number of series fitted together (default: 500)")
+
+    # Fleet command
+    fleet_parser = subparsers.add_parser("fleet", help="Query many database files (e.g. one per cat) in parallel")
+    fleet_parser.add_argument("query", type=str, choices=["records", "summary", "files"],
+                              help="records: the records in the range, summary: weight change per cat, files: cats per file")
+    fleet_parser.add_argument("databases", type=str, nargs="+", help="Directories, database files or glob patterns")
+    fleet_parser.add_argument("--begin-date", type=str, help="Start date of the range in 'YYYY-MM-DD' format")
+    fleet_parser.add_argument("--end-date", type=str, help="End date of the range in 'YYYY-MM-DD' format")
+    fleet_parser.add_argument("--days", type=int, default=None, help="Only the last this many days up to today")
+    fleet_parser.add_argument("--cats", type=str, default=None, help="Comma separated cat names (default: all cats)")
+    fleet_parser.add_argument("--min-change", type=float, default=None,
+                              help="summary: only cats whose weight changed by at least this many percent")
+    fleet_parser.add_argument("--max-change", type=float, default=None,
+                              help="summary: only cats whose weight changed by at most this many percent (e.g. -5)")
+    fleet_parser.add_argument("--format", type=str, choices=["tsv", "jsonl"], default="tsv",
+                              help="Output format (default: tsv)")
+    fleet_parser.add_argument("--workers", type=int, default=8, help="Number of files read at the same time (default: 8)")
+    fleet_parser.add_argument("--cache-dir", type=str, default=os.environ.get("CAT_DB_CACHE"),
+                              help="Directory of the file metadata cache. Defaults to CAT_DB_CACHE environment variable.")
+
+    # Stats command
+    stats_parser = subparsers.add_parser("stats", help="Show weekly/monthly/yearly weight statistics", parents=[cat_parser])
+    stats_parser.add_argument("--period", type=str, choices=["week", "month", "year"], default="month", help="Aggregation period")
+    stats_parser.add_argument("--begin-date", type=str, help="Start date of the range in 'YYYY-MM-DD' format")
+    stats_parser.add_argument("--end-date", type=str, help="End date of the range in 'YYYY-MM-DD' format")
+
+    # Rebuild-rollups command
+    rollups_parser = subparsers.add_parser("rebuild-rollups", help="Recompute the statistics rollups from the raw records")
+    rollups_parser.add_argument("--check-only", action="store_true", help="Only check the rollups against the raw records")
+
+    # Analyze command
+    analyze_parser = subparsers.add_parser("analyze", help="Moving averages, trend slope and anomaly flags", parents=[cat_parser])
+    analyze_parser.add_argument("--begin-date", type=str, help="Start date of the range in 'YYYY-MM-DD' format")
+    analyze_parser.add_argument("--end-date", type=str, help="End date of the range in 'YYYY-MM-DD' format")
+    analyze_parser.add_argument("--window", type=float, default=7.0, help="Trailing window in days (default: 7)")
+    analyze_parser.add_argument("--halflife", type=float, default=7.0, help="Half-life of the exponential smoothing in days (default: 7)")
+    analyze_parser.add_argument("--z-threshold", type=float, default=3.0, help="z-score above which a record is flagged (default: 3.0)")
+    analyze_parser.add_argument("--mad-threshold", type=float, default=3.5, help="Robust z-score above which a record is flagged (default: 3.5)")
+    analyze_parser.add_argument("--anomalies-only", action="store_true", help="Show only flagged records")
+    analyze_parser.add_argument("--all-cats", action="store_true", help="Analyze every cat and show a summary per cat")
+
+    # Export command
+    export_parser = subparsers.add_parser("export", help="Export weight records to CSV, JSON Lines or Parquet", parents=[cat_parser])
+    export_parser.add_argument("output_file", type=str, nargs="?", default="-", help="Output file (default: STDOUT)")
+    export_parser.add_argument("--format", type=str, choices=["csv", "jsonl", "parquet"], default=None,
+                               help="Output format (default: guessed from the file extension, csv for STDOUT)")
+    export_parser.add_argument("--begin-date", type=str, help="Start date of the range in 'YYYY-MM-DD' format")
+    export_parser.add_argument("--end-date", type=str, help="End date of the range in 'YYYY-MM-DD' format")
+    export_parser.add_argument("--chunk-size", type=int, default=10000, help="Number of records fetched and written at a time")
+
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Apply many add/update/delete operations from a file or STDIN", parents=[cat_parser])
+    batch_parser.add_argument("input_file", type=str, nargs="?", default="-", help="CSV or JSON Lines file (default: STDIN)")
+    batch_parser.add_argument("--format", type=str, choices=["csv", "jsonl"], default=None,
+                              help="Input format (default: guessed from the file extension, csv for STDIN)")
+    batch_parser.add_argument("--commit-every", type=int, default=0,
+                              help="Commit after this many operations (default: 0, one transaction)")
+
+    # Import-readings command
+    import_readings_parser = subparsers.add_parser("import-readings", parents=[cat_parser],
+                                                   help="Import timestamped readings (several per day) from a CSV file or STDIN")
+    import_readings_parser.add_argument("input_file", type=str, nargs="?", default="-",
+                                        help="CSV file with timestamp,weight[,device][,cat] columns (default: STDIN)")
+    import_readings_parser.add_argument("--daily", type=str, choices=["median", "last"], default="median",
+                                        help="How the daily record is derived from the readings of a day (default: median)")
+    import_readings_parser.add_argument("--batch-size", type=int, default=5000,
+                                        help="Maximum number of readings committed at a time (default: 5000)")
+    import_readings_parser.add_argument("--flush-interval", type=float, default=1.0,
+                                        help="Maximum seconds a reading waits before it is committed (default: 1.0)")
+
+    # Readings command
+    readings_parser = subparsers.add_parser("readings", help="List the timestamped readings", parents=[cat_parser])
+    readings_parser.add_argument("--begin-date", type=str, help="Start date of the range in 'YYYY-MM-DD' format")
+    readings_parser.add_argument("--end-date", type=str, help="End date of the range in 'YYYY-MM-DD' format")
+
+    # Derive-daily command
+    derive_parser = subparsers.add_parser("derive-daily", help="Recompute the daily records from the stored readings",
+                                          parents=[cat_parser])
+    derive_parser.add_argument("--daily", type=str, choices=["median", "last"], default="median",
+                               help="How the daily record is derived from the readings of a day (default: median)")
+    derive_parser.add_argument("--all-cats", action="store_true", help="Recompute the records of every cat")
+
+    # Cats command
+    subparsers.add_parser("cats", help="List the cats in the database")
+
+    # Fold command
+    fold_parser = subparsers.add_parser("fold", help="Fold other database files (e.g. one file per cat) into this database")
+    fold_parser.add_argument("src_files", type=str, nargs="+", help="Database files to fold in")
+    fold_parser.add_argument("--as", dest="fold_as", type=str, default=None,
+                             help="Cat name for the records of a single source file (default: source file name)")
+
+    # Migrate command
+    migrate_parser = subparsers.add_parser("migrate", help="Upgrade the database in place to a newer schema version")
+    migrate_parser.add_argument("--to-version", type=int, choices=[2, 3], default=3,
+                                help="Schema version to upgrade to (default: 3)")
+    migrate_parser.add_argument("--no-vacuum", dest="vacuum", action="store_false",
+                                help="Do not VACUUM the database after migrating")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Only show the versions that would be applied")
+
+    # Backup command
+    backup_parser = subparsers.add_parser("backup", help="Back up the database while it is in use")
+    backup_parser.add_argument("dest_file", type=str, nargs="?", default=None,
+                               help="Backup file (default: <database>-YYYYmmdd-HHMMSS.db next to the database)")
+    backup_parser.add_argument("--pages", type=int, default=256, help="Pages copied per step (default: 256)")
+    backup_parser.add_argument("--pause", type=float, default=0.01,
+                               help="Seconds to pause between steps so that writers can proceed (default: 0.01)")
+    backup_parser.add_argument("--compress", type=str, choices=["gz", "bz2", "xz"], default=None,
+                               help="Write a compressed tar archive with the database and a manifest")
+    backup_parser.add_argument("--no-verify", dest="verify", action="store_false",
+                               help="Skip the integrity check of the copy")
+    backup_parser.add_argument("--no-probe", dest="probe", action="store_false",
+                               help="Do not measure how long writers wait during the backup")
+
+    # Search command
+    search_parser = subparsers.add_parser("search", help="Full-text search in the notes", parents=[cat_parser])
+    search_parser.add_argument("query", type=str, help="Search query, e.g. 'vet', '\"diet change\"', 'medic*' or 'vet NOT vaccine'")
+    search_parser.add_argument("--begin-date", type=str, help="Start date of the range in 'YYYY-MM-DD' format")
+    search_parser.add_argument("--end-date", type=str, help="End date of the range in 'YYYY-MM-DD' format")
+    search_parser.add_argument("--limit", type=int, default=20, help="Maximum number of matches (default: 20)")
+    search_parser.add_argument("--all-cats", action="store_true", help="Search the notes of every cat")
+
+    # Rebuild-search-index command
+    index_parser = subparsers.add_parser("rebuild-search-index", help="Create or refill the full-text index over the notes")
+    index_parser.add_argument("--tokenizer", type=str, choices=["unicode61", "trigram"], default=None,
+                              help="Recreate the index with this tokenizer (trigram matches substrings, e.g. in Japanese notes)")
+
+    # Changes command
+    changes_parser = subparsers.add_parser("changes", help="Stream the changes to the records since a sequence number",
+                                           parents=[cat_parser])
+    changes_parser.add_argument("--since", type=int, default=0,
+                                help="Print the changes after this sequence number (default: 0, the whole log)")
+    changes_parser.add_argument("--limit", type=int, default=None, help="Print at most this many changes")
+    changes_parser.add_argument("--format", type=str, choices=["jsonl", "tsv"], default="jsonl",
+                                help="Output format (default: jsonl)")
+    changes_parser.add_argument("--only-cat", action="store_true", help="Only print the changes of the cat given by --cat")
+
+    # Compact-changes command
+    compact_parser = subparsers.add_parser("compact-changes", help="Remove superseded and old entries from the change log")
+    compact_parser.add_argument("--retain-days", type=float, default=None,
+                                help="Also remove changes older than this many days (default: keep them)")
+
+    # Serve command
+    serve_parser = subparsers.add_parser("serve", help="Serve the database over a local HTTP/JSON API")
+    serve_parser.add_argument("--host", type=str, help="Address to listen on", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, help="Port to listen on (0 picks a free port)", default=8080)
+    serve_parser.add_argument("--readers", type=int, help="Number of read-only connections kept open", default=8)
+    serve_parser.add_argument("--cache-entries", type=int, help="Maximum number of cached query results", default=1024)
+    serve_parser.add_argument("--verbose", action="store_true", help="Log every request to STDERR")
     
     args = parser.parse_args()
-    db_file = get_database_file(args.db_file)
+    if args.command in ("graph", "forecast", "fleet") and getattr(args, "render_all", True) and args.databases and not args.db_file:
+        # graph --all や forecast, fleet にデータベースを列挙した場合は --db-file / CAT_DB は要らない
+        db_file = ""
+    else:
+        db_file = get_database_file(args.db_file)
+    if args.wal or args.busy_timeout is not None:
+        from catdb.db.database import CatWeightDB
+        if args.wal:
+            CatWeightDB.default_wal = True
+        if args.busy_timeout is not None:
+            CatWeightDB.default_busy_timeout = args.busy_timeout
+
+    profiler = None
+    if args.profile or args.profile_file:
+        from catdb.profiling import Profiler
+        profiler = Profiler()
+        profiler.activate()
 
     try:
+        run_command(parser, args, db_file)
+    except ValueError as e:
+        print(f"Error: {e}")
+    finally:
+        if profiler is not None:
+            profiler.deactivate()
+            write_profile(profiler, args.profile_format, args.profile_file)
+
+
+def write_profile(profiler, fmt: str, profile_file: str | None) -> None:
+    """Writes the --profile report as a table or JSON to profile_file, or to STDERR."""
+    import sys
+    report = profiler.to_json() if fmt == "json" else profiler.format_table()
+    if profile_file:
+        with open(profile_file, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report, file=sys.stderr)
+
+
+def run_command(parser: argparse.ArgumentParser, args: argparse.Namespace, db_file: str) -> None:
+    from catdb.profiling import phase
+
+    with phase(args.command or "help"):
         # Process commands
         if args.command == "init":
-            initialize_database(db_file, csv_file=args.csv)
+            from catdb.commands.initialize import initialize_database
+            initialize_database(db_file, csv_file=args.csv, chunk_size=args.chunk_size,
+                                journal_mode=args.journal_mode, synchronous=args.synchronous, cat=args.cat,
+                                schema_version=args.schema_version)
+        elif args.command == "ingest":
+            from catdb.commands.ingest import ingest_weight_records
+            ingest_weight_records(db_file, args.files, workers=args.workers, cat=args.cat)
         elif args.command == "add":
+            from catdb.commands.add import add_weight_record
             record_date = parse_date(args.date)
-            add_weight_record(db_file, record_date, args.weight, args.notes)
+            add_weight_record(db_file, record_date, args.weight, args.notes, cat=args.cat)
         elif args.command == "update":
+            from catdb.commands.update import update_weight_record
             record_date = parse_date(args.date)
-            update_weight_record(db_file, record_date, args.weight, args.notes)
+            update_weight_record(db_file, record_date, args.weight, args.notes, cat=args.cat)
         elif args.command == "delete":
+            from catdb.commands.delete import delete_weight_record
             record_date = parse_date(args.date)
-            delete_weight_record(db_file, record_date)
+            delete_weight_record(db_file, record_date, cat=args.cat)
         elif args.command == "list":
+            from catdb.commands.get import print_weight_records
             begin_date = parse_date(args.begin_date) if args.begin_date else None
             end_date = parse_date(args.end_date) if args.end_date else None
-            print_weight_records(db_file, begin_date=begin_date, end_date=end_date)
+            after = parse_date(args.after) if args.after else None
+            print_weight_records(db_file, begin_date=begin_date, end_date=end_date, cat=args.cat, fmt=args.format,
+                                 limit=args.limit, after=after, newest_first=args.order == "newest")
         elif args.command == "graph":
-            graph_weight_records(db_file, args.graph_file)
+            from catdb.commands.graph import graph_weight_records
+            if args.render_all:
+                from catdb.commands.graph import graph_all
+                graph_all(args.databases or [db_file], args.output_dir, workers=args.workers,
+                          kinds=[kind.strip() for kind in args.charts.split(",") if kind.strip()],
+                          first_year=args.first_year, last_year=args.last_year)
+            elif args.databases:
+                raise ValueError("Database files can only be given with --all")
+            elif args.cache_stats:
+                from catdb.commands.graph import print_graph_cache_stats
+                if not args.cache_dir:
+                    raise ValueError("--cache-stats requires --cache-dir or CAT_DB_CACHE")
+                print_graph_cache_stats(args.cache_dir)
+            else:
+                graph_weight_records(db_file, args.graph_file, cat=args.cat,
+                                     cache_dir=args.cache_dir, cache_size_mb=args.cache_size,
+                                     max_points=args.max_points)
+        elif args.command == "forecast":
+            from catdb.commands.forecast import forecast_weights
+            forecast_weights(db_file, args.databases, horizon=args.horizon,
+                             models=[m.strip() for m in args.models.split(",") if m.strip()], level=args.level,
+                             cat=args.cat, all_cats=args.all_cats, force=args.force, batch_size=args.batch_size)
+        elif args.command == "fleet":
+            from datetime import date, timedelta
+            from catdb.commands.fleet import query_fleet
+            begin_date = parse_date(args.begin_date) if args.begin_date else None
+            end_date = parse_date(args.end_date) if args.end_date else None
+            if args.days is not None:
+                if begin_date is not None:
+                    raise ValueError("--days cannot be combined with --begin-date")
+                end_date = end_date or date.today()
+                begin_date = end_date - timedelta(days=args.days)
+            query_fleet(args.databases, args.query, begin_date=begin_date, end_date=end_date,
+                        cats=[c.strip() for c in args.cats.split(",") if c.strip()] if args.cats else None,
+                        min_change=args.min_change, max_change=args.max_change, fmt=args.format,
+                        workers=args.workers, cache_dir=args.cache_dir)
+        elif args.command == "stats":
+            from catdb.commands.stats import print_weight_stats
+            begin_date = parse_date(args.begin_date) if args.begin_date else None
+            end_date = parse_date(args.end_date) if args.end_date else None
+            print_weight_stats(db_file, args.period, begin_date=begin_date, end_date=end_date, cat=args.cat)
+        elif args.command == "rebuild-rollups":
+            from catdb.commands.rollups import rebuild_weight_rollups
+            rebuild_weight_rollups(db_file, check_only=args.check_only)
+        elif args.command == "analyze":
+            from catdb.commands.analyze import analyze_weight_records
+            begin_date = parse_date(args.begin_date) if args.begin_date else None
+            end_date = parse_date(args.end_date) if args.end_date else None
+            analyze_weight_records(db_file, begin_date=begin_date, end_date=end_date, window_days=args.window,
+                                   halflife_days=args.halflife, z_threshold=args.z_threshold,
+                                   mad_threshold=args.mad_threshold, anomalies_only=args.anomalies_only,
+                                   all_cats=args.all_cats, cat=args.cat)
+        elif args.command == "export":
+            from catdb.commands.export import export_weight_records
+            begin_date = parse_date(args.begin_date) if args.begin_date else None
+            end_date = parse_date(args.end_date) if args.end_date else None
+            export_weight_records(db_file, args.output_file, fmt=args.format, begin_date=begin_date,
+                                  end_date=end_date, chunk_size=args.chunk_size, cat=args.cat)
+        elif args.command == "batch":
+            from catdb.commands.batch import batch_weight_records
+            if batch_weight_records(db_file, args.input_file, fmt=args.format, commit_every=args.commit_every,
+                                    cat=args.cat):
+                # 不正な行があれば、残りの行を適用したうえで失敗として終了する
+                raise SystemExit(1)
+        elif args.command == "import-readings":
+            from catdb.commands.readings import import_readings
+            if import_readings(db_file, args.input_file, daily=args.daily, batch_size=args.batch_size,
+                               flush_interval=args.flush_interval, cat=args.cat):
+                # batch と同じく、不正な行があれば残りの行を保存したうえで失敗として終了する
+                raise SystemExit(1)
+        elif args.command == "readings":
+            from catdb.commands.readings import print_readings
+            begin_date = parse_date(args.begin_date) if args.begin_date else None
+            end_date = parse_date(args.end_date) if args.end_date else None
+            print_readings(db_file, begin_date=begin_date, end_date=end_date, cat=args.cat)
+        elif args.command == "derive-daily":
+            from catdb.commands.readings import derive_daily_records
+            derive_daily_records(db_file, daily=args.daily, cat=args.cat, all_cats=args.all_cats)
+        elif args.command == "cats":
+            from catdb.commands.cats import print_cats
+            print_cats(db_file)
+        elif args.command == "fold":
+            from catdb.commands.fold import fold_databases
+            fold_databases(db_file, args.src_files, cat=args.fold_as)
+        elif args.command == "migrate":
+            from catdb.commands.migrate import migrate_database
+            migrate_database(db_file, args.to_version, vacuum=args.vacuum, dry_run=args.dry_run)
+        elif args.command == "backup":
+            from catdb.commands.backup import backup_database
+            backup_database(db_file, args.dest_file, pages=args.pages, pause=args.pause,
+                            compression=args.compress, verify=args.verify, probe=args.probe)
+        elif args.command == "search":
+            from catdb.commands.search import search_notes
+            begin_date = parse_date(args.begin_date) if args.begin_date else None
+            end_date = parse_date(args.end_date) if args.end_date else None
+            search_notes(db_file, args.query, begin_date=begin_date, end_date=end_date, limit=args.limit,
+                         cat=args.cat, all_cats=args.all_cats)
+        elif args.command == "rebuild-search-index":
+            from catdb.commands.search import rebuild_search_index
+            rebuild_search_index(db_file, tokenizer=args.tokenizer)
+        elif args.command == "changes":
+            from catdb.commands.changes import print_changes
+            print_changes(db_file, since=args.since, limit=args.limit, fmt=args.format,
+                          cat=args.cat if args.only_cat else None)
+        elif args.command == "compact-changes":
+            from catdb.commands.changes import compact_changes
+            compact_changes(db_file, retain_days=args.retain_days)
+        elif args.command == "serve":
+            from catdb.commands.serve import serve_database
+            serve_database(db_file, host=args.host, port=args.port, readers=args.readers,
+                           cache_entries=args.cache_entries, verbose=args.verbose)
         else:
             parser.print_help()
             if db_file:
                 print(f"\nCurrent database:{db_file}\n")
 
-    except ValueError as e:
-        print(f"Error: {e}")
-
 if __name__ == "__main__":
     catdb_main()
@@ -8,15 +8,41 @@ Modules:
     - main: CLI entry point
     - commands: Command modules for add, display, update, delete functions
     - db: Database connection and schema management
+    - series: WeightSeries, an array-backed view of a cat's records
+    - fleet: CatWeightFleet, parallel queries across many database files
     - utils: Helper functions
 """
 
 # インポート
 from .db.database import CatWeightDB
+from .db.pool import ConnectionPool
+from .profiling import Profiler
 
 __all__ = [
     "CatWeightDB",
+    "ConnectionPool",
+    "AsyncCatWeightDB",
+    "CatWeightFleet",
+    "Profiler",
+    "WeightSeries",
 ]
 
+
+def __getattr__(name: str):
+    # asyncio の読み込みは重いので、使われたときに読み込む
+    if name == "AsyncCatWeightDB":
+        from .db.async_db import AsyncCatWeightDB
+        return AsyncCatWeightDB
+    # NumPy も同様に、WeightSeries を使うときだけ読み込む
+    if name == "WeightSeries":
+        from .series import WeightSeries
+        return WeightSeries
+    # スレッドプールも使うときだけ読み込む
+    if name == "CatWeightFleet":
+        from .fleet import CatWeightFleet
+        return CatWeightFleet
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # パッケージのバージョン情報 (必要に応じて変更)
 __version__ = "0.1.0"
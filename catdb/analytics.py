@@ -0,0 +1,213 @@
+"""
+catdb.analytics - Vectorized rolling analytics over weight series.
+
+All computations work on whole NumPy arrays (cumulative sums, binary search for the
+window boundaries, closed-form exponential smoothing), so the cost is linear in the
+length of the series and there are no per-record Python loops. Windows are defined
+in days, so irregularly spaced records are handled correctly.
+
+SeriesAnalyzer keeps its working arrays between calls, which avoids re-allocating
+them when many series are analyzed one after another.
+"""
+
+import math
+import numpy as np
+
+# 指数平滑で 1 つの区間に含める最大の減衰量 (exp(600) は float64 で表現できる)
+_MAX_DECAY = 600.0
+
+# MAD を標準偏差相当に換算する係数
+_MAD_SCALE = 0.6745
+
+
+def to_days(dates) -> np.ndarray:
+    """
+    Converts dates to float64 day numbers (days since 1970-01-01).
+
+    Parameters:
+    - dates: Array-like of datetime64 values, datetime.date objects or ISO date strings.
+
+    Returns:
+    - np.ndarray: Day numbers as float64.
+    """
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64).astype(np.float64)
+
+
+class SeriesAnalyzer:
+    """
+    Computes rolling statistics, exponential smoothing, rate of change, trend slope and
+    anomaly flags for weight series.
+
+    The arrays returned by analyze() are views into buffers owned by the analyzer and
+    are overwritten by the next call. Pass copy=True to keep them.
+    """
+
+    def __init__(self, window_days: float = 7.0, halflife_days: float = 7.0,
+                 z_threshold: float = 3.0, mad_threshold: float = 3.5) -> None:
+        """
+        Initializes the analyzer.
+
+        Parameters:
+        - window_days (float): Length of the trailing window in days for rolling statistics.
+        - halflife_days (float): Half-life in days of the exponential smoothing.
+        - z_threshold (float): |z| above which a record is flagged by the z-score test.
+        - mad_threshold (float): Robust |z| above which a record is flagged by the MAD test.
+        """
+        if window_days <= 0 or halflife_days <= 0:
+            raise ValueError("window_days and halflife_days must be positive")
+        self.window_days: float = window_days
+        self.halflife_days: float = halflife_days
+        self.z_threshold: float = z_threshold
+        self.mad_threshold: float = mad_threshold
+        self._buffers: dict[str, np.ndarray] = {}
+
+    def _buffer(self, name: str, n: int, dtype=np.float64) -> np.ndarray:
+        """Returns a view of length n of a reusable buffer, growing it when needed."""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape[0] < n or buf.dtype != np.dtype(dtype):
+            buf = np.empty(max(n, 2 * (buf.shape[0] if buf is not None else 0)), dtype=dtype)
+            self._buffers[name] = buf
+        return buf[:n]
+
+    def _cumsum(self, name: str, values: np.ndarray) -> np.ndarray:
+        """Returns [0, cumsum(values)] in a reusable buffer."""
+        out = self._buffer(name, values.shape[0] + 1)
+        out[0] = 0.0
+        np.cumsum(values, out=out[1:])
+        return out
+
+    def analyze(self, dates, weights, copy: bool = False) -> dict[str, np.ndarray]:
+        """
+        Analyzes one weight series. Records must be sorted by date.
+
+        Parameters:
+        - dates: Array-like of dates (datetime64, datetime.date or ISO strings).
+        - weights: Array-like of weights in kg.
+        - copy (bool): Return copies instead of views into the analyzer's buffers.
+
+        Returns:
+        - dict[str, np.ndarray]: Arrays with one value per record:
+          - 'rolling_mean', 'rolling_std': mean and sample standard deviation over the trailing window
+          - 'ewma': exponentially smoothed weight (half-life halflife_days)
+          - 'rate': rate of change in kg/day from the first record of the trailing window
+          - 'slope': least-squares trend slope in kg/day over the trailing window
+          - 'zscore': z-score against the records of the trailing window before the record
+          - 'z_anomaly', 'mad_anomaly': bool flags of the z-score and MAD tests
+          Values that cannot be computed (e.g. a single record in the window) are NaN.
+
+        Raises:
+        - ValueError: If dates and weights differ in length or dates are not sorted.
+        """
+        t = to_days(dates)
+        w = np.asarray(weights, dtype=np.float64)
+        n = t.shape[0]
+        if w.shape[0] != n:
+            raise ValueError("dates and weights must have the same length")
+        if n > 1 and np.any(t[1:] < t[:-1]):
+            raise ValueError("dates must be sorted")
+
+        result = {
+            name: self._buffer(name, n)
+            for name in ("rolling_mean", "rolling_std", "ewma", "rate", "slope", "zscore")
+        }
+        result["z_anomaly"] = self._buffer("z_anomaly", n, np.bool_)
+        result["mad_anomaly"] = self._buffer("mad_anomaly", n, np.bool_)
+        if n == 0:
+            return {k: v.copy() for k, v in result.items()} if copy else result
+
+        # 桁落ちを抑えるため、日付は先頭からの日数、体重は平均からの差で累積和を取る
+        t0 = t - t[0]
+        offset = w.mean()
+        wc = self._buffer("wc", n)
+        np.subtract(w, offset, out=wc)
+
+        cs_w = self._cumsum("cs_w", wc)
+        cs_ww = self._cumsum("cs_ww", wc * wc)
+        cs_t = self._cumsum("cs_t", t0)
+        cs_tt = self._cumsum("cs_tt", t0 * t0)
+        cs_tw = self._cumsum("cs_tw", t0 * wc)
+
+        # 窓 (t - window, t] に入る最初の記録の位置を二分探索で求める
+        idx = np.arange(n)
+        left = np.searchsorted(t, t - self.window_days, side="right")
+        count = (idx + 1 - left).astype(np.float64)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # 移動平均・標準偏差 (その記録を含む窓)
+            sum_w = cs_w[idx + 1] - cs_w[left]
+            sum_ww = cs_ww[idx + 1] - cs_ww[left]
+            np.add(sum_w / count, offset, out=result["rolling_mean"])
+            var = np.maximum(sum_ww - sum_w * sum_w / count, 0.0) / (count - 1)
+            np.sqrt(var, out=result["rolling_std"])
+            result["rolling_std"][count < 2] = np.nan
+
+            # 変化率: 窓の最初の記録からの kg/日
+            dt = t[idx] - t[left]
+            np.divide(w - w[left], dt, out=result["rate"])
+            result["rate"][dt == 0] = np.nan
+
+            # 最小二乗法による傾き
+            sum_t = cs_t[idx + 1] - cs_t[left]
+            sum_tt = cs_tt[idx + 1] - cs_tt[left]
+            sum_tw = cs_tw[idx + 1] - cs_tw[left]
+            denom = count * sum_tt - sum_t * sum_t
+            np.divide(count * sum_tw - sum_t * sum_w, denom, out=result["slope"])
+            result["slope"][(count < 2) | (np.abs(denom) < 1e-9)] = np.nan
+
+            # z スコア: その記録より前の窓内の記録に対する偏差
+            prev_count = count - 1
+            prev_sum = cs_w[idx] - cs_w[left]
+            prev_sq = cs_ww[idx] - cs_ww[left]
+            prev_mean = prev_sum / prev_count
+            prev_std = np.sqrt(np.maximum(prev_sq - prev_sum * prev_mean, 0.0) / (prev_count - 1))
+            np.divide(wc - prev_mean, prev_std, out=result["zscore"])
+            result["zscore"][(prev_count < 2) | (prev_std == 0)] = np.nan
+            np.greater(np.abs(result["zscore"]), self.z_threshold, out=result["z_anomaly"])
+
+            # MAD: 移動平均からの残差を中央値と MAD で頑健に標準化する
+            residual = w - result["rolling_mean"]
+            median = np.median(residual)
+            mad = np.median(np.abs(residual - median))
+            if mad > 0:
+                robust_z = _MAD_SCALE * (residual - median) / mad
+                np.greater(np.abs(robust_z), self.mad_threshold, out=result["mad_anomaly"])
+            else:
+                result["mad_anomaly"][:] = False
+
+        self._ewma(t, w, result["ewma"])
+
+        if copy:
+            return {k: v.copy() for k, v in result.items()}
+        return result
+
+    def _ewma(self, t: np.ndarray, w: np.ndarray, out: np.ndarray) -> None:
+        """
+        Exponential smoothing for irregularly spaced records, s_i = a_i w_i + (1 - a_i) s_{i-1}
+        with a_i = 1 - exp(-dt_i / tau).
+
+        The recurrence is solved in closed form, s_j = D_j (s_0 + sum_k a_k w_k / D_k) with
+        D_k = exp(-(t_k - t_0) / tau). The series is split into segments so that 1 / D_k stays
+        within float64 range; only the segments are iterated, not the records.
+        """
+        n = t.shape[0]
+        tau = self.halflife_days / math.log(2)
+        start = 0
+        previous = w[0]
+        while start < n:
+            end = int(np.searchsorted(t, t[start] + _MAX_DECAY * tau, side="right"))
+            end = max(end, start + 1)
+            rel = (t[start:end] - t[start]) / tau
+            decay = np.exp(-rel)
+            alpha = self._buffer("alpha", end - start)
+            if start == 0:
+                first = w[0]
+            else:
+                a0 = 1.0 - math.exp(-(t[start] - t[start - 1]) / tau)
+                first = a0 * w[start] + (1.0 - a0) * previous
+            alpha[0] = 0.0
+            np.subtract(1.0, np.exp(-np.diff(rel)), out=alpha[1:])
+            acc = self._buffer("acc", end - start)
+            np.cumsum(alpha * w[start:end] / decay, out=acc)
+            np.multiply(decay, acc + first, out=out[start:end])
+            previous = out[end - 1]
+            start = end
@@ -0,0 +1,282 @@
+"""
+catdb.cache - Caches for rendered graphs and query results.
+
+RenderCache is a size-bounded on-disk cache. Entries are files named after a key derived
+from the database content fingerprint and the plot parameters, so an unchanged database
+returns the previously rendered file. Eviction is least-recently-used, using the file
+modification time as the access time.
+
+ResultCache is an in-memory LRU cache for a long-running process (see catdb.server).
+Each entry records the cat and the range of record dates it was computed from, so a
+write invalidates only the entries that could have changed.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+STATS_FILE = "stats.json"
+
+
+class RenderCache:
+    """
+    LRU cache of rendered files (e.g. PNG graphs) stored in a directory.
+
+    Hit and miss counters are kept in memory for this instance and are also
+    accumulated in stats.json in the cache directory across processes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 100 * 1024 * 1024, suffix: str = ".png") -> None:
+        """
+        Initializes the cache, creating the directory if necessary.
+
+        Parameters:
+        - cache_dir (str): Directory holding the cached files.
+        - max_bytes (int): Maximum total size of the cached files. Oldest entries are evicted beyond it.
+        - suffix (str): File name suffix of the entries.
+        """
+        self.cache_dir: str = cache_dir
+        self.max_bytes: int = max_bytes
+        self.suffix: str = suffix
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(fingerprint: str, **params: Any) -> str:
+        """
+        Builds a cache key from a content fingerprint and rendering parameters.
+
+        Parameters:
+        - fingerprint (str): Fingerprint of the data (e.g. CatWeightDB.content_fingerprint()).
+        - params (Any): Rendering parameters. Must be JSON serializable.
+
+        Returns:
+        - str: Hex digest usable as a file name.
+        """
+        payload = json.dumps({"fingerprint": fingerprint, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def get(self, key: str, dest_file: str) -> bool:
+        """
+        Copies the cached entry for key to dest_file if it exists.
+
+        Parameters:
+        - key (str): Cache key.
+        - dest_file (str): Destination file path.
+
+        Returns:
+        - bool: True on a cache hit, False on a miss.
+        """
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, dest_file)
+            os.utime(path)  # LRU のため最終アクセス時刻として更新
+        except FileNotFoundError:
+            self.misses += 1
+            self._record(misses=1)
+            return False
+        self.hits += 1
+        self._record(hits=1)
+        return True
+
+    def put(self, key: str, src_file: str) -> None:
+        """
+        Stores a copy of src_file under key and evicts old entries beyond max_bytes.
+
+        Parameters:
+        - key (str): Cache key.
+        - src_file (str): Rendered file to store.
+        """
+        # 他のプロセスが書き込み途中のファイルを読まないよう、一時ファイルから置き換える
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(src_file, tmp_path)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Removes least recently used entries until the total size is within max_bytes.
+
+        Returns:
+        - int: Number of entries removed.
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            self.evictions += removed
+            self._record(evictions=removed)
+        return removed
+
+    def _record(self, **counts: int) -> None:
+        stats = self.stats()
+        for name, count in counts.items():
+            stats[name] = stats.get(name, 0) + count
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(stats, f)
+        os.replace(tmp_path, os.path.join(self.cache_dir, STATS_FILE))
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the counters accumulated in the cache directory.
+
+        Returns:
+        - dict[str, int]: 'hits', 'misses' and 'evictions' counts.
+        """
+        try:
+            with open(os.path.join(self.cache_dir, STATS_FILE)) as f:
+                stats = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            stats = {}
+        return {name: int(stats.get(name, 0)) for name in ("hits", "misses", "evictions")}
+
+
+class ResultCache:
+    """
+    Thread-safe in-memory LRU cache of query results with range-based invalidation.
+
+    Entries are stored with the cat they belong to (or None for results that depend on
+    every cat, e.g. the list of cats) and the inclusive range of record dates that can
+    affect them. invalidate() drops the entries of a cat whose range contains any of the
+    written dates.
+
+    To avoid caching a result computed from data that was changed while the query ran,
+    callers take a token() before querying and pass it to put(); the result is discarded
+    if an invalidation happened in between.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        """
+        Initializes the cache.
+
+        Parameters:
+        - max_entries (int): Maximum number of entries. The least recently used entry is evicted beyond it.
+        """
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, str | None, str | None, str | None]] = OrderedDict()
+        self._generation: int = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Returns the cached value for key, or None on a miss.
+
+        Parameters:
+        - key (Hashable): Cache key.
+
+        Returns:
+        - Any | None: The cached value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def token(self) -> int:
+        """Returns the current invalidation generation, to be passed to put()."""
+        return self._generation
+
+    def put(self, key: Hashable, value: Any, cat: str | None, first: str | None = None,
+            last: str | None = None, token: int | None = None) -> bool:
+        """
+        Stores a value.
+
+        Parameters:
+        - key (Hashable): Cache key.
+        - value (Any): Value to store.
+        - cat (str | None): Cat the value was computed for. None means it depends on all cats.
+        - first (str | None): First record date (ISO format) that affects the value. None means unbounded.
+        - last (str | None): Last record date (ISO format) that affects the value. None means unbounded.
+        - token (int | None): Value of token() taken before the value was computed.
+
+        Returns:
+        - bool: False if the value was discarded because of an invalidation since token.
+        """
+        with self._lock:
+            if token is not None and token != self._generation:
+                return False
+            self._entries[key] = (value, cat, first, last)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, cat: str, first: str, last: str | None = None) -> int:
+        """
+        Drops the entries affected by writes to the records of cat between first and last.
+
+        Parameters:
+        - cat (str): Name of the cat that was written.
+        - first (str): First written date (ISO format).
+        - last (str | None): Last written date (ISO format). None means the same as first.
+
+        Returns:
+        - int: Number of entries dropped.
+        """
+        last = last or first
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key, (_, entry_cat, entry_first, entry_last) in self._entries.items()
+                if (entry_cat is None or entry_cat == cat)
+                and (entry_first is None or entry_first <= last)
+                and (entry_last is None or entry_last >= first)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        """Drops all entries, e.g. after the database was changed by another process."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the counters of this cache.
+
+        Returns:
+        - dict[str, int]: 'entries', 'hits', 'misses', 'evictions' and 'invalidations' counts.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "invalidations": self.invalidations}
@@ -3,19 +3,28 @@ catdb.commands - Command modules for managing cat weight data
 
 This package provides individual modules for each CLI command,
 such as add, display, update, and delete, which manage cat weight records.
+
+Command functions are imported lazily on first access, so that importing
+a lightweight command (e.g. add) does not pull in pandas or matplotlib
+through the heavier ones (e.g. graph).
 """
 
-# 各コマンドのインポート
-from .add import add_weight_record
-from .get import print_weight_records
-from .update import update_weight_record
-from .delete import delete_weight_record
-from .graph import graph_weight_records
+from importlib import import_module
+from typing import Any
+
+# 公開するコマンド関数と、それを定義しているモジュールの対応
+_COMMANDS = {
+    "add_weight_record": ".add",
+    "print_weight_records": ".get",
+    "update_weight_record": ".update",
+    "delete_weight_record": ".delete",
+    "graph_weight_records": ".graph",
+}
+
+__all__ = list(_COMMANDS)
+
 
-__all__ = [
-    "add_weight_record",
-    "print_weight_records",
-    "update_weight_record",
-    "delete_weight_record",
-    "graph_weight_records",
-]
+def __getattr__(name: str) -> Any:
+    if name in _COMMANDS:
+        return getattr(import_module(_COMMANDS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
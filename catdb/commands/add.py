@@ -1,8 +1,8 @@
 from typing import Optional
 from datetime import date as DateType
-from catdb.db.database import CatWeightDB
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
 
-def add_weight_record(db_file: str, date: DateType, weight: float, notes: Optional[str] = None) -> None:
+def add_weight_record(db_file: str, date: DateType, weight: float, notes: Optional[str] = None, cat: str = DEFAULT_CAT) -> None:
     """
     Adds a new weight record to the database and prints the result to STDOUT.
 
@@ -11,16 +11,14 @@ def add_weight_record(db_file: str, date: DateType, weight: float, notes: Option
     - date (DateType): Date of the record as a datetime.date object.
     - weight (float): Weight of the cat in kg.
     - notes (Optional[str]): Optional notes for the record.
+    - cat (str): Name of the cat.
 
     Returns:
     - None
     """
-    db = CatWeightDB(db_file)
-    db.connect()
-    
-    # DatabaseConnection の関数も date を datetime.date 型で受け取る
-    success = db.add_weight_record(date, weight, notes)
-    db.close()
+    with CatWeightDB(db_file, cat=cat) as db:
+        # DatabaseConnection の関数も date を datetime.date 型で受け取る
+        success = db.add_weight_record(date, weight, notes)
     
     if success:
         print(f"Record added: {date}, {weight} kg, Notes: {notes}")
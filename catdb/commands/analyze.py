@@ -0,0 +1,67 @@
+import math
+from datetime import date
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+
+def _format(value: float, digits: int = 3) -> str:
+    return "-" if math.isnan(value) else f"{value:.{digits}f}"
+
+
+def analyze_weight_records(db_file: str, begin_date: date | None = None, end_date: date | None = None,
+                           window_days: float = 7.0, halflife_days: float = 7.0, z_threshold: float = 3.0,
+                           mad_threshold: float = 3.5, anomalies_only: bool = False, all_cats: bool = False,
+                           cat: str = DEFAULT_CAT) -> None:
+    """
+    Computes rolling analytics (moving average, exponential smoothing, trend slope and
+    anomaly flags) over weight records and prints them to STDOUT.
+
+    With all_cats, every cat in the database is analyzed with the same analyzer and one
+    summary line per cat is printed.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - begin_date (date | None): The start date of the range.
+    - end_date (date | None): The end date of the range.
+    - window_days (float): Length of the trailing window in days.
+    - halflife_days (float): Half-life in days of the exponential smoothing.
+    - z_threshold (float): |z| above which a record is flagged by the z-score test.
+    - mad_threshold (float): Robust |z| above which a record is flagged by the MAD test.
+    - anomalies_only (bool): Print only flagged records.
+    - all_cats (bool): Analyze every cat and print a summary per cat.
+    - cat (str): Name of the cat.
+
+    Returns:
+    - None
+    """
+    from catdb.analytics import SeriesAnalyzer
+
+    analyzer = SeriesAnalyzer(window_days=window_days, halflife_days=halflife_days,
+                              z_threshold=z_threshold, mad_threshold=mad_threshold)
+
+    with CatWeightDB(db_file, cat=cat) as db:
+        if all_cats:
+            print(f"{'cat':<16} {'records':>8} {'last':>8} {'ewma':>8} {'slope/wk':>9} {'anomalies':>9}")
+            for _, name, _ in db.list_cats():
+                db.use_cat(name)
+                dates, weights = db.get_weight_arrays(begin_date, end_date)
+                if len(dates) == 0:
+                    continue
+                result = analyzer.analyze(dates, weights)
+                anomalies = int((result["z_anomaly"] | result["mad_anomaly"]).sum())
+                print(f"{name:<16} {len(dates):>8} {weights[-1]:>8.3f} {result['ewma'][-1]:>8.3f} "
+                      f"{_format(result['slope'][-1] * 7):>9} {anomalies:>9}")
+            return
+
+        dates, weights = db.get_weight_arrays(begin_date, end_date)
+
+    if len(dates) == 0:
+        print("No records found.")
+        return
+
+    result = analyzer.analyze(dates, weights)
+    print(f"{'date':<10} {'weight':>7} {'mean':>7} {'ewma':>7} {'slope/wk':>9} {'z':>7}  flags")
+    for i in range(len(dates)):
+        flags = ("z " if result["z_anomaly"][i] else "") + ("mad" if result["mad_anomaly"][i] else "")
+        if anomalies_only and not flags:
+            continue
+        print(f"{str(dates[i]):<10} {weights[i]:>7.2f} {result['rolling_mean'][i]:>7.3f} {result['ewma'][i]:>7.3f} "
+              f"{_format(result['slope'][i] * 7):>9} {_format(result['zscore'][i], 2):>7}  {flags.strip()}")
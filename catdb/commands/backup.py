@@ -0,0 +1,54 @@
+import os
+from datetime import datetime
+from catdb.db.backup import DEFAULT_PROBE_INTERVAL
+from catdb.db.database import CatWeightDB
+
+
+def default_backup_file(db_file: str, compression: str | None) -> str:
+    """Returns '<database>-YYYYmmdd-HHMMSS.db' (or '.tar.<compression>') next to the database."""
+    stem = os.path.splitext(db_file)[0]
+    suffix = f".tar.{compression}" if compression else ".db"
+    return f"{stem}-{datetime.now():%Y%m%d-%H%M%S}{suffix}"
+
+
+def backup_database(db_file: str, dest_file: str | None = None, pages: int = 256, pause: float = 0.01,
+                    compression: str | None = None, verify: bool = True, probe: bool = True) -> None:
+    """
+    Backs up the database while other processes keep reading and writing it, and prints
+    the throughput, the time writers had to wait and the result of the integrity check.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - dest_file (str | None): Path of the backup. None uses a timestamped name next to the database.
+    - pages (int): Pages copied per step.
+    - pause (float): Seconds to pause between steps.
+    - compression (str | None): 'gz', 'bz2' or 'xz' to write a compressed tar archive with a manifest.
+    - verify (bool): Run PRAGMA integrity_check on the copy.
+    - probe (bool): Measure how long a writer has to wait while the backup runs.
+
+    Returns:
+    - None
+    """
+    if not os.path.exists(db_file):
+        raise ValueError(f"{db_file} does not exist")
+    dest_file = dest_file or default_backup_file(db_file, compression)
+    if os.path.abspath(dest_file) == os.path.abspath(db_file):
+        raise ValueError("The backup cannot overwrite the database itself")
+
+    with CatWeightDB(db_file) as db:
+        report = db.backup(dest_file, pages=pages, pause=pause, compression=compression, verify=verify,
+                           probe_interval=DEFAULT_PROBE_INTERVAL if probe else None)
+
+    mb = report.bytes / (1024 * 1024)
+    print(f"Backed up {db_file} to {dest_file}.")
+    print(f"Copied {report.pages} pages ({mb:.1f} MB) in {report.steps} steps and {report.copy_seconds:.2f} s "
+          f"({report.throughput / (1024 * 1024):.1f} MB/s excluding {report.pause_seconds:.2f} s of pauses), "
+          f"{report.restarts} restarts.")
+    if report.writer_probes:
+        print(f"Writer wait: max {report.writer_wait_max * 1000:.1f} ms, total {report.writer_wait_total * 1000:.1f} ms "
+              f"over {report.writer_probes} probes.")
+    if verify:
+        print(f"Integrity check: ok ({report.verify_seconds:.2f} s).")
+    if compression:
+        ratio = report.output_bytes / report.bytes if report.bytes else 1.0
+        print(f"Archive: {report.output_bytes / 1024:,.0f} KiB ({ratio:.0%} of the database) in {report.archive_seconds:.2f} s.")
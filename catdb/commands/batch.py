@@ -0,0 +1,127 @@
+import csv
+import json
+import math
+import sys
+from typing import Iterator, TextIO
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+from catdb.utils.utils import parse_date
+
+# 不正な行は最初のいくつかだけ表示する
+MAX_REPORTED_ERRORS = 10
+
+
+def _read_rows(stream: TextIO, fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    Reads raw operation rows from a CSV (with header) or JSON Lines stream.
+
+    A line that cannot be read is reported on its own and reading continues with the next line.
+
+    Parameters:
+    - stream (TextIO): Input stream.
+    - fmt (str): 'csv' or 'jsonl'.
+
+    Returns:
+    - Iterator[tuple[int, dict | None, str | None]]: (line number, row, error) tuples.
+      row is None and error describes the problem if the line could not be read.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield reader.line_num, None, f"invalid CSV: {e}"
+                continue
+            yield reader.line_num, row, None
+    else:
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            # 1 行ずつ解析する。例外をジェネレーターの外に出すと残りの行が読めなくなる
+            try:
+                yield line_num, json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield line_num, None, f"invalid JSON: {e}"
+
+
+def _parse_operations(stream: TextIO, fmt: str, errors: list[str]) -> Iterator[tuple]:
+    """
+    Converts raw rows into operation tuples for CatWeightDB.apply_operations.
+    Rows that cannot be parsed are skipped and described in errors.
+
+    Parameters:
+    - stream (TextIO): Input stream.
+    - fmt (str): 'csv' or 'jsonl'.
+    - errors (list[str]): Receives a message for each rejected row.
+
+    Returns:
+    - Iterator[tuple]: (op, cat, date, weight, notes) tuples.
+    """
+    for line_num, row, error in _read_rows(stream, fmt):
+        if error is not None:
+            errors.append(f"line {line_num}: {error}")
+            continue
+
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("expected an object")
+            op = (row.get("op") or "").strip().lower()
+            if op not in ("add", "update", "delete"):
+                raise ValueError(f"unknown operation '{op}'")
+            record_date = parse_date(str(row.get("date") or ""))
+            weight = None
+            if op != "delete":
+                if row.get("weight") in (None, ""):
+                    raise ValueError("weight is required")
+                weight = float(row["weight"])
+                # NaN は NULL として書き込まれ、NOT NULL 制約違反でバッチ全体が止まってしまう
+                if not (math.isfinite(weight) and weight > 0):
+                    raise ValueError(f"weight must be a positive number, got {row['weight']}")
+            yield (op, row.get("cat") or None, record_date, weight, row.get("notes") or None)
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append(f"line {line_num}: {e}")
+
+
+def batch_weight_records(db_file: str, input_file: str = "-", fmt: str | None = None,
+                         commit_every: int = 0, cat: str = DEFAULT_CAT) -> int:
+    """
+    Applies many add / update / delete operations read from a file or STDIN through
+    one connection, and prints a summary per operation type to STDOUT.
+
+    Input is either CSV with a header row or JSON Lines, with the fields
+    'op' (add, update or delete), 'date', 'weight', 'notes' and optionally 'cat'.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - input_file (str): Path to the input file, or '-' for STDIN.
+    - fmt (str | None): 'csv' or 'jsonl'. If None, guessed from the file extension (STDIN defaults to csv).
+    - commit_every (int): Commit after this many operations. 0 applies everything in one transaction.
+    - cat (str): Name of the cat for operations that do not specify one.
+
+    Returns:
+    - int: Number of rejected rows (rows that could not be parsed). The other rows are applied regardless.
+    """
+    if fmt is None:
+        fmt = "jsonl" if input_file.endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+    errors: list[str] = []
+    stream = sys.stdin if input_file == "-" else open(input_file, newline="", encoding="utf-8")
+    try:
+        with CatWeightDB(db_file, cat=cat) as db:
+            stats = db.apply_operations(_parse_operations(stream, fmt, errors), commit_every=commit_every)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    print(f"{'operation':<10} {'succeeded':>10} {'failed':>10}")
+    for op, (succeeded, failed) in stats.items():
+        print(f"{op:<10} {succeeded:>10} {failed:>10}")
+    if errors:
+        print(f"{'rejected':<10} {0:>10} {len(errors):>10}")
+        for message in errors[:MAX_REPORTED_ERRORS]:
+            print(f"  {message}")
+        if len(errors) > MAX_REPORTED_ERRORS:
+            print(f"  ... and {len(errors) - MAX_REPORTED_ERRORS} more")
+    return len(errors)
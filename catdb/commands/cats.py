@@ -0,0 +1,22 @@
+from catdb.db.database import CatWeightDB
+
+def print_cats(db_file: str) -> None:
+    """
+    Prints the cats registered in the database with their number of records.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+
+    Returns:
+    - None
+    """
+    with CatWeightDB(db_file) as db:
+        cats = db.list_cats()
+
+    if not cats:
+        print("No cats found.")
+        return
+
+    print(f"{'cat_id':>6}  {'records':>8}  name")
+    for cat_id, name, records in cats:
+        print(f"{cat_id:>6}  {records:>8}  {name}")
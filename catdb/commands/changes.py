@@ -0,0 +1,75 @@
+import json
+import sys
+from typing import TextIO
+from catdb.commands.get import _tsv_field
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+
+CHANGE_FORMATS = ("jsonl", "tsv")
+
+
+def print_changes(db_file: str, since: int = 0, limit: int | None = None, fmt: str = "jsonl",
+                  cat: str | None = None, stream: TextIO | None = None) -> None:
+    """
+    Streams the changes to the records after a sequence number, one per line, and prints
+    the sequence number to pass as --since next time to STDERR.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - since (int): Print the changes after this sequence number.
+    - limit (int | None): Maximum number of changes to print. None prints all.
+    - fmt (str): 'jsonl' or 'tsv'.
+    - cat (str | None): Only print the changes of this cat. None prints the changes of all cats.
+    - stream (TextIO | None): Output stream. None writes to STDOUT.
+
+    Returns:
+    - None
+
+    Raises:
+    - ValueError: If the format is unknown, limit is not positive, or the changes after since were removed.
+    """
+    if fmt not in CHANGE_FORMATS:
+        raise ValueError(f"Unknown changes format: {fmt}")
+    if limit is not None and limit <= 0:
+        raise ValueError("--limit must be a positive number")
+    stream = stream or sys.stdout
+
+    with CatWeightDB(db_file, cat=cat or DEFAULT_CAT) as db:
+        # 読み始める前の最新の番号。読み終えたら (他の猫の変更を含めて) ここまでは処理済みになる
+        latest = db.latest_change_seq()
+        last, count = since, 0
+        changes = db.iter_changes(since, limit=limit, all_cats=cat is None)
+        try:
+            if fmt == "tsv":
+                stream.write("seq\tcat\tdate\top\tweight\tnotes\tchanged_at\n")
+            for seq, name, record_date, op, weight, notes, changed_at in changes:
+                if fmt == "jsonl":
+                    stream.write(json.dumps({"seq": seq, "cat": name, "date": record_date.isoformat(), "op": op,
+                                             "weight": weight, "notes": notes, "changed_at": changed_at},
+                                            ensure_ascii=False) + "\n")
+                else:
+                    stream.write(f"{seq}\t{_tsv_field(name)}\t{record_date.isoformat()}\t{op}\t"
+                                 f"{'' if weight is None else weight}\t{_tsv_field(notes)}\t{changed_at}\n")
+                last, count = seq, count + 1
+        finally:
+            changes.close()
+
+    if limit is not None and count == limit:
+        print(f"{count} changes. More may follow. Next: --since {last}", file=sys.stderr)
+    else:
+        print(f"{count} changes. Next: --since {max(last, latest)}", file=sys.stderr)
+
+
+def compact_changes(db_file: str, retain_days: float | None = None) -> None:
+    """
+    Removes superseded changes from the change log, and with retain_days also old changes.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - retain_days (float | None): Keep the changes of the last this many days. None keeps them all.
+
+    Returns:
+    - None
+    """
+    with CatWeightDB(db_file) as db:
+        superseded, expired = db.compact_changes(retain_days)
+    print(f"Removed {superseded} superseded and {expired} expired changes.")
@@ -1,21 +1,20 @@
-from catdb.db.database import CatWeightDB
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
 from datetime import date as DateType
 
-def delete_weight_record(db_file: str, date: DateType) -> None:
+def delete_weight_record(db_file: str, date: DateType, cat: str = DEFAULT_CAT) -> None:
     """
     Deletes a weight record from the database by date and prints the result to STDOUT.
 
     Parameters:
     - db_file (str): Path to the SQLite3 database file.
     - date (DateType): Date of the record as a datetime.date object.
+    - cat (str): Name of the cat.
 
     Returns:
     - None
     """
-    db = CatWeightDB(db_file)
-    db.connect()
-    success = db.delete_weight_record(date)
-    db.close()
+    with CatWeightDB(db_file, cat=cat) as db:
+        success = db.delete_weight_record(date)
 
     if success:
         print(f"Record deleted for date: {date}")
@@ -0,0 +1,99 @@
+import csv
+import json
+import sys
+from datetime import date
+from typing import TextIO
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+
+def _write_csv(db: CatWeightDB, stream: TextIO, begin_date: date | None, end_date: date | None, chunk_size: int) -> int:
+    writer = csv.writer(stream)
+    writer.writerow(["date", "weight", "notes"])
+    count = 0
+    for chunk in db.iter_record_chunks(begin_date, end_date, chunk_size):
+        writer.writerows((d.isoformat(), w, n) for d, w, n in chunk)
+        count += len(chunk)
+    return count
+
+
+def _write_jsonl(db: CatWeightDB, stream: TextIO, begin_date: date | None, end_date: date | None, chunk_size: int) -> int:
+    count = 0
+    for chunk in db.iter_record_chunks(begin_date, end_date, chunk_size):
+        stream.writelines(
+            json.dumps({"date": d.isoformat(), "weight": w, "notes": n}, ensure_ascii=False) + "\n"
+            for d, w, n in chunk
+        )
+        count += len(chunk)
+    return count
+
+
+def _write_parquet(db: CatWeightDB, output_file: str, begin_date: date | None, end_date: date | None, chunk_size: int) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([("date", pa.date32()), ("weight", pa.float64()), ("notes", pa.string())])
+    count = 0
+    # チャンクごとに row group として書き出すので、メモリ使用量は chunk_size で決まる
+    with pq.ParquetWriter(output_file, schema) as writer:
+        for chunk in db.iter_record_chunks(begin_date, end_date, chunk_size):
+            dates, weights, notes = zip(*chunk)
+            writer.write_batch(pa.record_batch([list(dates), list(weights), list(notes)], schema=schema))
+            count += len(chunk)
+    return count
+
+
+def export_weight_records(db_file: str, output_file: str = "-", fmt: str | None = None,
+                          begin_date: date | None = None, end_date: date | None = None,
+                          chunk_size: int = 10000, cat: str = DEFAULT_CAT) -> None:
+    """
+    Streams weight records to a CSV, JSON Lines or Parquet file.
+
+    Records are read from the cursor in chunks and written incrementally, so memory use
+    does not depend on the number of records. The CSV output has the same columns as
+    the CSV accepted by 'init --csv'.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - output_file (str): Output file path, or '-' for STDOUT (CSV and JSON Lines only).
+    - fmt (str | None): 'csv', 'jsonl' or 'parquet'. If None, guessed from the file extension (default csv).
+    - begin_date (date | None): The start date of the range (inclusive).
+    - end_date (date | None): The end date of the range (inclusive).
+    - chunk_size (int): Number of records fetched and written at a time.
+    - cat (str): Name of the cat.
+
+    Returns:
+    - None
+
+    Raises:
+    - ValueError: If the format is unknown, or Parquet is written to STDOUT.
+    """
+    if fmt is None:
+        if output_file.endswith(".parquet"):
+            fmt = "parquet"
+        elif output_file.endswith((".jsonl", ".json", ".ndjson")):
+            fmt = "jsonl"
+        else:
+            fmt = "csv"
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    with CatWeightDB(db_file, cat=cat) as db:
+        if fmt == "parquet":
+            if output_file == "-":
+                raise ValueError("Parquet cannot be written to STDOUT")
+            count = _write_parquet(db, output_file, begin_date, end_date, chunk_size)
+        elif output_file == "-":
+            writer = _write_csv if fmt == "csv" else _write_jsonl
+            count = writer(db, sys.stdout, begin_date, end_date, chunk_size)
+        else:
+            writer = _write_csv if fmt == "csv" else _write_jsonl
+            with open(output_file, "w", newline="", encoding="utf-8") as stream:
+                count = writer(db, stream, begin_date, end_date, chunk_size)
+
+    if output_file != "-":
+        print(f"Exported {count} records to {output_file}.")
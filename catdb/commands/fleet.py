@@ -0,0 +1,110 @@
+import json
+import sys
+import time
+from datetime import date
+from typing import TextIO
+from catdb.commands.get import _tsv_field
+
+FLEET_QUERIES = ("records", "summary", "files")
+FLEET_FORMATS = ("tsv", "jsonl")
+
+
+def _change_percent(first: float, last: float) -> float:
+    return (last - first) / first * 100
+
+
+def query_fleet(patterns: list[str], query: str = "summary", begin_date: date | None = None,
+                end_date: date | None = None, cats: list[str] | None = None, min_change: float | None = None,
+                max_change: float | None = None, fmt: str = "tsv", workers: int = 8, cache_dir: str | None = None,
+                stream: TextIO | None = None) -> None:
+    """
+    Runs a query against many database files in parallel and streams the merged rows, one per
+    line, as the files finish. A summary of the files read and skipped is printed to STDERR.
+
+    - records: every record within the date range.
+    - summary: per cat the number of records, the first and last weight, min, max, mean and
+      the change from the first to the last weight in percent.
+    - files: the cats of every file with their first and last record date.
+
+    Parameters:
+    - patterns (list[str]): Directories (their *.db files), database files or glob patterns.
+    - query (str): 'records', 'summary' or 'files'.
+    - begin_date (date | None): The start date of the range (inclusive).
+    - end_date (date | None): The end date of the range (inclusive).
+    - cats (list[str] | None): Only these cats. None queries every cat.
+    - min_change (float | None): summary: only cats whose weight changed by at least this many percent.
+    - max_change (float | None): summary: only cats whose weight changed by at most this many percent
+      (e.g. -5 for the cats that lost 5% or more).
+    - fmt (str): 'tsv' or 'jsonl'.
+    - workers (int): Maximum number of files read at the same time.
+    - cache_dir (str | None): Directory of the file metadata cache. None keeps it in memory only.
+    - stream (TextIO | None): Output stream. None writes to STDOUT.
+
+    Returns:
+    - None
+
+    Raises:
+    - ValueError: If the query or format is unknown, or a pattern matches no files.
+    """
+    from catdb.fleet import CatWeightFleet
+
+    if query not in FLEET_QUERIES:
+        raise ValueError(f"Unknown fleet query: {query}")
+    if fmt not in FLEET_FORMATS:
+        raise ValueError(f"Unknown fleet format: {fmt}")
+    if (min_change is not None or max_change is not None) and query != "summary":
+        raise ValueError("--min-change and --max-change only apply to the summary query")
+    stream = stream or sys.stdout
+
+    fleet = CatWeightFleet(patterns, workers=workers, cache_dir=cache_dir)
+    start = time.perf_counter()
+    count = 0
+    if query == "records":
+        if fmt == "tsv":
+            stream.write("file\tcat\tdate\tweight\tnotes\n")
+        for path, cat, record_date, weight, notes in fleet.iter_records(begin_date, end_date, cats):
+            if fmt == "jsonl":
+                stream.write(json.dumps({"file": path, "cat": cat, "date": record_date.isoformat(),
+                                         "weight": weight, "notes": notes}, ensure_ascii=False) + "\n")
+            else:
+                stream.write(f"{_tsv_field(path)}\t{_tsv_field(cat)}\t{record_date.isoformat()}\t{weight}\t"
+                             f"{_tsv_field(notes)}\n")
+            count += 1
+    elif query == "summary":
+        if fmt == "tsv":
+            stream.write("file\tcat\trecords\tfirst_date\tfirst_weight\tlast_date\tlast_weight\tmin\tmax\tmean\tchange_pct\n")
+        for path, cat, records, first_date, first, last_date, last, low, high, mean in fleet.summary(begin_date, end_date, cats):
+            change = _change_percent(first, last)
+            if (min_change is not None and change < min_change) or (max_change is not None and change > max_change):
+                continue
+            if fmt == "jsonl":
+                stream.write(json.dumps({"file": path, "cat": cat, "records": records,
+                                         "first_date": first_date.isoformat(), "first_weight": first,
+                                         "last_date": last_date.isoformat(), "last_weight": last,
+                                         "min": low, "max": high, "mean": round(mean, 3),
+                                         "change_pct": round(change, 2)}, ensure_ascii=False) + "\n")
+            else:
+                stream.write(f"{_tsv_field(path)}\t{_tsv_field(cat)}\t{records}\t{first_date.isoformat()}\t{first}\t"
+                             f"{last_date.isoformat()}\t{last}\t{low}\t{high}\t{mean:.3f}\t{change:.2f}\n")
+            count += 1
+    else:
+        if fmt == "tsv":
+            stream.write("file\tcat\trecords\tfirst_date\tlast_date\n")
+        for path, meta in fleet.files():
+            for cat, first_date, last_date, records in meta:
+                if cats is not None and cat not in cats:
+                    continue
+                first_iso = first_date.isoformat() if first_date else None
+                last_iso = last_date.isoformat() if last_date else None
+                if fmt == "jsonl":
+                    stream.write(json.dumps({"file": path, "cat": cat, "records": records, "first_date": first_iso,
+                                             "last_date": last_iso}, ensure_ascii=False) + "\n")
+                else:
+                    stream.write(f"{_tsv_field(path)}\t{_tsv_field(cat)}\t{records}\t{first_iso or ''}\t{last_iso or ''}\n")
+                count += 1
+
+    for path, error in fleet.errors:
+        print(f"Could not read {path}: {error}", file=sys.stderr)
+    print(f"{count} rows from {len(fleet.paths)} files in {time.perf_counter() - start:.2f} s "
+          f"({fleet.files_queried} queried, {fleet.files_skipped} skipped, {fleet.files_scanned} rescanned, "
+          f"{len(fleet.errors)} failed).", file=sys.stderr)
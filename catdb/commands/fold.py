@@ -0,0 +1,38 @@
+import os
+from catdb.db.database import CatWeightDB
+
+def fold_databases(db_file: str, src_files: list[str], cat: str | None = None) -> None:
+    """
+    Folds other database files (typically one file per cat) into a single database
+    and prints the result to STDOUT.
+
+    Records of a single-cat source file are stored under the name given by cat, or
+    under the file name without its extension when cat is None. Multi-cat source files
+    keep their cat names.
+
+    Parameters:
+    - db_file (str): Path to the destination SQLite3 database file.
+    - src_files (list[str]): Paths to the source database files.
+    - cat (str | None): Cat name for the records. Only allowed with a single source file.
+
+    Returns:
+    - None
+
+    Raises:
+    - ValueError: If cat is given together with several source files.
+    """
+    if cat is not None and len(src_files) > 1:
+        raise ValueError("--as can only be used with a single source file")
+
+    with CatWeightDB(db_file) as db:
+        db.initialize_table()
+        for src_file in src_files:
+            if os.path.abspath(src_file) == os.path.abspath(db_file):
+                print(f"Skipped {src_file}: same file as the destination.")
+                continue
+            try:
+                rows = db.fold_database(src_file, cat=cat)
+            except ValueError as e:
+                print(f"Skipped {src_file}: {e}")
+                continue
+            print(f"Folded {rows} records from {src_file}.")
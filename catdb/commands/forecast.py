@@ -0,0 +1,55 @@
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+
+# 1 匹の予測を表示するときの間隔 (日)
+PRINT_EVERY_DAYS = 7
+
+
+def forecast_weights(db_file: str, db_files: list[str] | None = None, horizon: int = 30,
+                     models: list[str] | None = None, level: float = 0.95, cat: str = DEFAULT_CAT,
+                     all_cats: bool = False, force: bool = False, batch_size: int = 500) -> None:
+    """
+    Refits the weight forecasts of the cats whose records changed since the last run,
+    stores them in the forecasts table, and prints a summary to STDOUT. For a single cat,
+    the forecast is printed as well.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file (used if db_files is empty).
+    - db_files (list[str] | None): Database files or glob patterns; every cat of each is forecast.
+    - horizon (int): Number of days to forecast after the last record of each cat.
+    - models (list[str] | None): Models to fit ('linear', 'seasonal', 'damped'). None fits all.
+    - level (float): Coverage of the prediction intervals (e.g. 0.95).
+    - cat (str): Name of the cat (without all_cats and db_files).
+    - all_cats (bool): Forecast every cat of db_file.
+    - force (bool): Refit even if the records did not change.
+    - batch_size (int): Number of series fitted together in one array.
+
+    Returns:
+    - None
+    """
+    from catdb.commands.ingest import expand_paths
+    from catdb.forecast import MODELS, refresh_forecasts
+
+    models = models or list(MODELS)
+    paths = expand_paths(db_files) if db_files else [db_file]
+    cats = None if db_files or all_cats else [cat]
+    run = refresh_forecasts([lambda path=path: CatWeightDB(path) for path in paths], models, horizon, level,
+                            cats=cats, force=force, batch_size=batch_size)
+    print(f"Refitted {run.fitted} forecasts of {run.series} series ({', '.join(models)}) in {run.fit_seconds:.2f} s "
+          f"(read {run.load_seconds:.2f} s, write {run.save_seconds:.2f} s); {run.skipped} unchanged.")
+    if cats is None:
+        return
+
+    with CatWeightDB(db_file, cat=cat) as db:
+        rows = db.get_forecasts()
+    if not rows:
+        print(f"Too few records to forecast {cat}.")
+        return
+    table: dict = {}
+    for _, model, day, weight, lower, upper in rows:
+        table.setdefault(day, {})[model] = f"{weight:.3f} ({lower:.3f}-{upper:.3f})"
+    shown = [model for model in models if any(model in cells for cells in table.values())]
+    days = sorted(table)
+    print(f"\n{'date':<10}  " + "  ".join(f"{model:<21}" for model in shown))
+    for i, day in enumerate(days):
+        if (i + 1) % PRINT_EVERY_DAYS == 0 or i == len(days) - 1:
+            print(f"{day.isoformat():<10}  " + "  ".join(f"{table[day].get(model, '-'):<21}" for model in shown))
@@ -1,47 +1,127 @@
+import json
+import sys
 from datetime import date
-from catdb.db.database import CatWeightDB
-import pandas as pd
+from itertools import chain, islice
+from typing import Iterable, Iterator, TextIO
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
 
-def print_weight_records(db_file: str, begin_date: date | None = None, end_date: date | None = None) -> None:
+LIST_FORMATS = ("table", "tsv", "json")
+
+Row = tuple[date, float, str | None]
+
+
+def _write_table(rows: Iterable[Row], stream: TextIO) -> int:
+    # 列幅を固定しておけば、全件を読み込まずに 1 行ずつ書き出せる
+    stream.write(f"{'date':<10}  {'weight':>6}  notes\n")
+    count = 0
+    for record_date, weight, notes in rows:
+        stream.write(f"{record_date.isoformat():<10}  {weight:>6}  {'' if notes is None else notes}\n")
+        count += 1
+    return count
+
+
+def _tsv_field(value: str | None) -> str:
+    if value is None:
+        return ""
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _write_tsv(rows: Iterable[Row], stream: TextIO) -> int:
+    stream.write("date\tweight\tnotes\n")
+    count = 0
+    for record_date, weight, notes in rows:
+        stream.write(f"{record_date.isoformat()}\t{weight}\t{_tsv_field(notes)}\n")
+        count += 1
+    return count
+
+
+def _write_json(rows: Iterable[Row], stream: TextIO) -> int:
+    # 配列を 1 要素ずつ書き出す
+    count = 0
+    for record_date, weight, notes in rows:
+        stream.write("[\n  " if count == 0 else ",\n  ")
+        stream.write(json.dumps({"date": record_date.isoformat(), "weight": weight, "notes": notes}, ensure_ascii=False))
+        count += 1
+    stream.write("[]\n" if count == 0 else "\n]\n")
+    return count
+
+
+_WRITERS = {"table": _write_table, "tsv": _write_tsv, "json": _write_json}
+
+
+def print_weight_records(db_file: str, begin_date: date | None = None, end_date: date | None = None,
+                         cat: str = DEFAULT_CAT, fmt: str = "table", limit: int | None = None,
+                         after: date | None = None, newest_first: bool = False,
+                         stream: TextIO | None = None) -> None:
     """
     Retrieves and prints weight record(s) from the database based on specified date criteria.
     - If both dates are None, retrieves all records.
-    - If begin_date is specified and end_date is None, retrieves a specific record.
+    - If begin_date is specified and end_date is None, retrieves a specific record
+      (unless limit or after is given, in which case begin_date is a lower bound).
     - If both dates are specified, retrieves records within the date range.
 
+    Rows are written straight from the cursor without loading pandas. With limit, the
+    records are paged by keyset: when more records follow, the --after value of the next
+    page is printed to STDERR.
+
     Parameters:
     - db_file (str): Path to the SQLite3 database file.
     - begin_date (date | None): The start date of the range or specific date of the record.
     - end_date (date | None): The end date of the range.
+    - cat (str): Name of the cat.
+    - fmt (str): 'table', 'tsv' or 'json'.
+    - limit (int | None): Maximum number of records to print. None prints all.
+    - after (date | None): Only records after this date in the listing order (before it when newest_first).
+    - newest_first (bool): List the newest records first.
+    - stream (TextIO | None): Output stream. None writes to STDOUT.
 
     Returns:
     - None
+
+    Raises:
+    - ValueError: If the format is unknown or limit is not positive.
     """
-    db = CatWeightDB(db_file)
-    db.connect()
-    
-    if begin_date is None and end_date is None:
-        # Retrieve all records
-        records = db.get_all_records()
-        if not records.empty:
-            print(records)
-        else:
-            print("No records found.")
-    
-    elif begin_date is not None and end_date is None:
-        # Retrieve a specific record
-        record = db.get_weight_record(begin_date)
-        if not record.empty:
-            print(record)
-        else:
-            print(f"No record found for date {begin_date}.")
-    
-    elif begin_date is not None and end_date is not None:
-        # Retrieve records within the date range
-        records = db.get_records_by_date_range(begin_date, end_date)
-        if not records.empty:
-            print(records)
-        else:
-            print(f"No records found between {begin_date} and {end_date}.")
-    
-    db.close()
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown list format: {fmt}")
+    if limit is not None and limit <= 0:
+        raise ValueError("--limit must be a positive number")
+    stream = stream or sys.stdout
+    write = _WRITERS[fmt]
+
+    with CatWeightDB(db_file, cat=cat) as db:
+        if begin_date is not None and end_date is None and limit is None and after is None:
+            # Retrieve a specific record (sqlite3 only, no pandas)
+            record = db.find_weight_record(begin_date)
+            if record is None and fmt == "table":
+                print(f"No record found for date {begin_date}.", file=stream)
+            else:
+                write([record] if record is not None else [], stream)
+            return
+
+        # 次のページがあるか判定するため 1 件余分に読む
+        records = db.iter_records(begin_date, end_date, after=after,
+                                  limit=None if limit is None else limit + 1, newest_first=newest_first)
+        try:
+            shown = records if limit is None else islice(records, limit)
+            first = next(shown, None)
+            if first is None and fmt == "table":
+                if begin_date is not None and end_date is not None:
+                    print(f"No records found between {begin_date} and {end_date}.", file=stream)
+                else:
+                    print("No records found.", file=stream)
+                return
+
+            last: list[Row] = []
+            count = write(_remember_last(chain([first], shown) if first is not None else [], last), stream)
+            if limit is not None and count == limit and next(records, None) is not None:
+                print(f"More records follow. Next page: --after {last[0][0].isoformat()}", file=sys.stderr)
+        finally:
+            # 読み残したカーソルは接続を閉じる前に閉じる
+            records.close()
+
+
+def _remember_last(rows: Iterable[Row], last: list[Row]) -> Iterator[Row]:
+    """Passes rows through, keeping the most recent one in last[0]."""
+    for row in rows:
+        last[:] = [row]
+        yield row
@@ -1,8 +1,118 @@
+from __future__ import annotations
+
 from datetime import datetime
 from datetime import date
-from catdb.db.database import CatWeightDB
-import pandas as pd
-import matplotlib.pyplot as plt
+from typing import TYPE_CHECKING
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+from catdb.profiling import phase
+
+# pandas と matplotlib は描画するときだけ読み込む (キャッシュがヒットした場合は不要)
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# 1 枚のグラフに描く点の上限の既定値。超える場合は週・月・年の平均に間引く
+DEFAULT_MAX_POINTS = 4000
+
+# 1 年あたりのバケット数の目安
+_BUCKETS_PER_YEAR = {"week": 53, "month": 12, "year": 1}
+
+# 年ごとの (年初からの日数, 体重) の列
+YearLines = dict[int, tuple[list[int], list[float]]]
+
+
+def choose_bucket(record_count: int, years: list[int], max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """
+    Returns the finest bucket of CatWeightDB.get_aggregated that keeps a graph within the point budget.
+
+    Parameters:
+    - record_count (int): Number of records in the graphed range.
+    - years (list[int]): Years in the graph.
+    - max_points (int): Maximum number of points.
+
+    Returns:
+    - str: 'day' if the records fit, otherwise 'week', 'month' or 'year'.
+    """
+    if record_count <= max_points:
+        return "day"
+    for bucket, per_year in _BUCKETS_PER_YEAR.items():
+        if len(years) * per_year <= max_points:
+            return bucket
+    return "year"
+
+
+def fetch_year_lines(db: CatWeightDB, years: list[int],
+                     max_points: int = DEFAULT_MAX_POINTS) -> tuple[YearLines, str]:
+    """
+    Reads the weights of the given years for plot_year_lines, aggregated in SQLite to
+    daily values or, above the point budget, to weekly / monthly / yearly means.
+
+    Parameters:
+    - db (CatWeightDB): Open database.
+    - years (list[int]): Years to read.
+    - max_points (int): Maximum number of points in the graph.
+
+    Returns:
+    - tuple[YearLines, str]: The lines per year and the bucket used.
+    """
+    if not years:
+        return {}, "day"
+    begin, end = date(min(years), 1, 1), date(max(years), 12, 31)
+    # 件数は年ごとの集計テーブルから求めるので、記録を読まずにバケットを決められる
+    record_count = sum(count for start, count, *_ in db.get_stats("year", begin, end) if start.year in years)
+    bucket = choose_bucket(record_count, years, max_points)
+
+    wanted = set(years)
+    lines: YearLines = {}
+    for start, mean in db.get_aggregated(begin, end, bucket, ["mean"]):
+        # 年をまたぐ週は、範囲の最初の週だけ年初に寄せる
+        start = max(start, begin)
+        if start.year not in wanted:
+            continue
+        days, weights = lines.setdefault(start.year, ([], []))
+        days.append(start.timetuple().tm_yday)
+        weights.append(mean)
+    return lines, bucket
+
+
+def plot_year_lines(lines: YearLines, years: list[int], graph_file: str, bucket: str = "day") -> None:
+    """
+    Plots one line per year against the day of the year and saves the graph as PNG.
+
+    Parameters:
+    - lines (YearLines): (days of year, weights) per year.
+    - years (list[int]): Years to plot, in legend order.
+    - graph_file (str): Output file.
+    - bucket (str): Bucket the values were aggregated to (shown in the title unless 'day').
+
+    Returns:
+    - None
+    """
+    with phase("import_matplotlib"):
+        import matplotlib.pyplot as plt
+
+    with phase("plot"):
+        plt.figure(figsize=(12, 6))
+
+        for year in years:
+            if year not in lines:
+                print(f"No data available for the year {year}.")
+                continue
+            days, weights = lines[year]
+            plt.plot(days, weights, marker='o', linestyle='-', label=str(year))
+
+        # Labels and title
+        plt.xlabel('Day of Year')
+        plt.ylabel('Weight (kg)')
+        plt.title('Cat Weight Trends by Year' if bucket == "day" else f'Cat Weight Trends by Year ({bucket}ly mean)')
+        plt.legend(title="Year")
+        plt.grid()
+        plt.tight_layout()
+
+    with phase("savefig"):
+        plt.savefig(graph_file, format='png')
+    print(f"Graph saved to {graph_file}")
+    plt.close()
 
 
 def plot_weight_trends_by_years(df: pd.DataFrame, years: list[int], graph_file: str) -> None:
@@ -16,52 +126,46 @@ def plot_weight_trends_by_years(df: pd.DataFrame, years: list[int], graph_file:
     Returns:
     - None
     """
+    with phase("import_pandas"):
+        import pandas as pd
+
     # Ensure 'date' column is in datetime format
-    df['date'] = pd.to_datetime(df['date'])
-
-    plt.figure(figsize=(12, 6))
-    
-    for year in years:
-        # Filter data for the specific year
-        df_year = df[df['date'].dt.year == year]
-        
-        if df_year.empty:
-            print(f"No data available for the year {year}.")
-            continue
+    dates = pd.to_datetime(df['date'])
 
-        # Extract day of year for plotting purposes to align across years
-        df_year = df_year.copy()  # Avoid SettingWithCopyWarning
-        df_year['day_of_year'] = df_year['date'].dt.dayofyear
+    # 年ごとに絞り込み直さず、1 回の groupby で年に分ける
+    wanted = set(years)
+    lines: YearLines = {}
+    for year, group in df['weight'].groupby(dates.dt.year.to_numpy()):
+        if year in wanted:
+            lines[int(year)] = (dates[group.index].dt.dayofyear.tolist(), group.tolist())
+    plot_year_lines(lines, years, graph_file)
 
-        # Plot the data for the year
-        plt.plot(df_year['day_of_year'], df_year['weight'], marker='o', linestyle='-', label=str(year))
 
-    # Labels and title
-    plt.xlabel('Day of Year')
-    plt.ylabel('Weight (kg)')
-    plt.title('Cat Weight Trends by Year')
-    plt.legend(title="Year")
-    plt.grid()
-    plt.tight_layout()
+def graph_weight_records(db_file: str, graph_file: str | None = None, cat: str = DEFAULT_CAT,
+                         cache_dir: str | None = None, cache_size_mb: float = 100.0,
+                         max_points: int = DEFAULT_MAX_POINTS) -> None:
+    """
+    Generates a graph of cat weight records over multiple years.
 
-    plt.savefig(graph_file, format='png')
-    print(f"Graph saved to {graph_file}")
-    plt.close()
+    The values are aggregated in SQLite (CatWeightDB.get_aggregated): daily while the
+    records fit in max_points, otherwise weekly, monthly or yearly means.
 
+    With cache_dir, rendered graphs are cached on disk keyed on the database content
+    fingerprint and the plot parameters, and an unchanged database is answered by
+    copying the cached PNG without querying the records or rendering.
 
-def graph_weight_records(db_file: str, graph_file: str | None = None) -> None:
-    """
-    Generates a graph of cat weight records over multiple years.
     Parameters:
     - db_file (str): Path to the database file.
     - graph_file (str | None): Output graph file name. If None, a default name will be used.    
+    - cat (str): Name of the cat.
+    - cache_dir (str | None): Directory of the render cache. None disables caching.
+    - cache_size_mb (float): Maximum size of the render cache in MB.
+    - max_points (int): Maximum number of points before the values are downsampled.
     Returns:
     - None
     """
-    db = CatWeightDB(db_file)
-    db.connect()    
-    df = db.get_all_records()
-
+    if max_points <= 0:
+        raise ValueError("--max-points must be a positive number")
     # If no graph file is specified, use a default name.
     # Default name is 'cat_weight_YYYYMMDD_HHMM.png'.
     if graph_file is None:
@@ -71,6 +175,98 @@ def graph_weight_records(db_file: str, graph_file: str | None = None) -> None:
     # years_sice_2021は2021年から今年までのリスト。今年を現在日時に基づいて更新
     current_year = date.today().year
     years_since_2021 = list(range(2021, current_year + 1))
-    plot_weight_trends_by_years(df, years_since_2021, graph_file)
 
-    db.close()
+    with CatWeightDB(db_file, cat=cat) as db:
+        cache = None
+        if cache_dir is not None:
+            from catdb.cache import RenderCache
+            cache = RenderCache(cache_dir, max_bytes=int(cache_size_mb * 1024 * 1024))
+            key = RenderCache.make_key(db.content_fingerprint(), plot="trends_by_years", years=years_since_2021,
+                                       max_points=max_points)
+            if cache.get(key, graph_file):
+                print(f"Graph saved to {graph_file} (cached)")
+                return
+        with phase("fetch"):
+            lines, bucket = fetch_year_lines(db, years_since_2021, max_points)
+
+    with phase("render"):
+        plot_year_lines(lines, years_since_2021, graph_file, bucket)
+    if cache is not None:
+        cache.put(key, graph_file)
+
+
+def graph_all(db_files: list[str], output_dir: str = "graphs", workers: int | None = None,
+              kinds: list[str] | None = None, first_year: int | None = None, last_year: int | None = None) -> None:
+    """
+    Renders the overlay, full-history and per-year charts of every cat in the given
+    databases in a process pool, and prints the render time of each chart to STDOUT.
+
+    Each database is read once; all of its charts are drawn from that read.
+
+    Parameters:
+    - db_files (list[str]): Database files or glob patterns.
+    - output_dir (str): Root directory of the charts (<output_dir>/<database>/<cat>/<chart>.png).
+    - workers (int | None): Number of render processes. None uses the number of CPUs.
+    - kinds (list[str] | None): Chart kinds ('overlay', 'history', 'year'). None renders all.
+    - first_year (int | None): Only use records from this year on.
+    - last_year (int | None): Only use records up to this year.
+
+    Returns:
+    - None
+    """
+    import glob
+    import time
+    from catdb.commands.ingest import expand_paths
+    from catdb.render import CHART_KINDS, ChartResult, render_all
+
+    # 存在しないファイル名もそのまま渡し、読めなかったデータベースとして他と同じく報告する
+    paths = list(dict.fromkeys(path for pattern in db_files
+                               for path in (expand_paths([pattern]) if glob.has_magic(pattern) else [pattern])))
+
+    def fetched(db_file: str, charts: int, seconds: float) -> None:
+        print(f"Read {db_file} in {seconds * 1000:.1f} ms: {charts} charts")
+
+    unreadable: list[str] = []
+
+    def unreadable_db(db_file: str, error: str) -> None:
+        unreadable.append(db_file)
+        print(f"Could not read {db_file}: {error}")
+
+    def rendered(result: ChartResult) -> None:
+        chart = result.kind if result.year is None else f"{result.kind} {result.year}"
+        if result.error is not None:
+            print(f"  {result.cat:<16} {chart:<12} failed: {result.error}")
+            return
+        print(f"  {result.cat:<16} {chart:<12} {result.points:>7} points {result.render_seconds * 1000:>8.1f} ms  {result.path}")
+
+    start = time.perf_counter()
+    results = render_all(paths, output_dir, workers=workers, kinds=kinds or CHART_KINDS, first_year=first_year,
+                         last_year=last_year, on_fetch=fetched, on_chart=rendered, on_error=unreadable_db)
+    elapsed = time.perf_counter() - start
+
+    failed = sum(result.error is not None for result in results)
+    render_seconds = sum(result.render_seconds for result in results)
+    print(f"Rendered {len(results) - failed} charts from {len(paths) - len(unreadable)} databases in {elapsed:.2f} s "
+          f"({render_seconds:.2f} s of rendering); {failed} failed, {len(unreadable)} databases could not be read.")
+
+
+def print_graph_cache_stats(cache_dir: str) -> None:
+    """
+    Prints the hit / miss / eviction counters and the size of a render cache to STDOUT.
+
+    Parameters:
+    - cache_dir (str): Directory of the render cache.
+
+    Returns:
+    - None
+    """
+    import os
+    from catdb.cache import RenderCache
+
+    stats = RenderCache(cache_dir).stats()
+    entries = [e for e in os.scandir(cache_dir) if e.is_file() and e.name.endswith(".png")]
+    lookups = stats["hits"] + stats["misses"]
+    ratio = stats["hits"] / lookups * 100 if lookups else 0.0
+    print(f"Cache directory: {cache_dir}")
+    print(f"Entries: {len(entries)} ({sum(e.stat().st_size for e in entries) / (1024 * 1024):.1f} MB)")
+    print(f"Hits: {stats['hits']}  Misses: {stats['misses']}  Hit ratio: {ratio:.1f}%  Evictions: {stats['evictions']}")
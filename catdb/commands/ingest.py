@@ -0,0 +1,80 @@
+import glob
+import os
+import time
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+
+
+def expand_paths(patterns: list[str]) -> list[str]:
+    """
+    Expands glob patterns (for shells that do not) and removes duplicates, keeping the order.
+
+    Parameters:
+    - patterns (list[str]): File names or glob patterns.
+
+    Returns:
+    - list[str]: Matching file names.
+
+    Raises:
+    - ValueError: If a pattern matches nothing.
+    """
+    paths: list[str] = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        matches = [path for path in matches if os.path.isfile(path)]
+        if not matches:
+            raise ValueError(f"No files match {pattern}")
+        paths.extend(matches)
+    return list(dict.fromkeys(paths))
+
+
+def ingest_weight_records(db_file: str, patterns: list[str], workers: int | None = None,
+                          cat: str = DEFAULT_CAT) -> None:
+    """
+    Ingests many CSV export files (e.g. from different scales) into the database and
+    prints the throughput and rejected rows of each file to STDOUT.
+
+    The date format and delimiter of each file are detected from a sample of the file.
+    Files are parsed in parallel in worker processes and written by a single writer in
+    one transaction.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - patterns (list[str]): File names or glob patterns of the CSV files.
+    - workers (int | None): Number of parser processes. None uses the number of CPUs.
+    - cat (str): Name of the cat whose records are loaded.
+
+    Returns:
+    - None
+    """
+    from catdb.ingest import MAX_REJECTED_MESSAGES, ParsedFile, ingest_files
+
+    paths = expand_paths(patterns)
+    width = min(max(len(path) for path in paths), 40)
+    print(f"{'file':<{width}} {'format':<10} {'rows':>9} {'rejected':>9} {'parse s':>8} {'write s':>8} {'rows/s':>10}")
+
+    def report(result: ParsedFile) -> None:
+        name = result.path if len(result.path) <= width else "..." + result.path[-(width - 3):]
+        if result.error is not None:
+            print(f"{name:<{width}} skipped: {result.error}")
+            return
+        seconds = result.parse_seconds + result.write_seconds
+        rate = result.rows / seconds if seconds > 0 else float(result.rows)
+        print(f"{name:<{width}} {result.date_format:<10} {result.rows:>9} {result.rejected:>9} "
+              f"{result.parse_seconds:>8.3f} {result.write_seconds:>8.3f} {rate:>10,.0f}")
+        for message in result.messages:
+            print(f"    {message}")
+        if result.rejected > len(result.messages):
+            print(f"    ... and {result.rejected - len(result.messages)} more rejected rows")
+
+    start = time.perf_counter()
+    with CatWeightDB(db_file, cat=cat) as db:
+        db.initialize_table()
+        results = ingest_files(db, paths, workers=workers, on_file=report)
+    elapsed = time.perf_counter() - start
+
+    rows = sum(result.rows for result in results)
+    rejected = sum(result.rejected for result in results)
+    skipped = sum(result.error is not None for result in results)
+    rate = rows / elapsed if elapsed > 0 else float(rows)
+    print(f"Ingested {rows} rows from {len(results) - skipped} files in {elapsed:.2f} s ({rate:,.0f} rows/sec); "
+          f"{rejected} rows rejected, {skipped} files skipped.")
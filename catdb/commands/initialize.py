@@ -1,48 +1,58 @@
-import pandas as pd
-from catdb.db.database import CatWeightDB
+import time
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+from catdb.utils.utils import peak_rss_mb
 
-def initialize_database(db_file: str, csv_file: str | None = None) -> None:
+def initialize_database(db_file: str, csv_file: str | None = None, chunk_size: int = 50000,
+                        journal_mode: str | None = None, synchronous: str | None = None, cat: str = DEFAULT_CAT,
+                        schema_version: int = 1) -> None:
     """
     Initializes the database by creating the necessary tables if they do not already exist.
     Optionally, loads initial data from a specified CSV file.
 
+    The CSV file is streamed in chunks and written in a single transaction, and the
+    load throughput (rows/sec) and peak memory are printed when it finishes.
+
     Parameters:
     - db_file (str): Path to the SQLite3 database file.
     - csv_file (str | None): Path to a CSV file to load initial data. CSV should have 'date', 'weight', and 'notes' columns.
+    - chunk_size (int): Number of CSV rows read and written per batch.
+    - journal_mode (str | None): SQLite journal mode used while loading the CSV. None keeps the current one.
+    - synchronous (str | None): SQLite synchronous level used while loading the CSV. None keeps the current one.
+    - cat (str): Name of the cat whose records are loaded.
+    - schema_version (int): Storage format of a newly created database (see catdb.db.storage).
 
     Returns:
     - None
     """
-    db = CatWeightDB(db_file)
-    
-    # If a CSV file is provided, attempt to load it and insert data
-    if csv_file:
-        try:
-            # Load CSV data into a DataFrame
-            df = pd.read_csv(csv_file)
-            
-            # Ensure 'date' column is in datetime format, then convert to date objects
-            df['date'] = pd.to_datetime(df['date']).dt.date
-
-            # Establish database connection and create table if not already existing
-            db.connect()
-            table_created = db.initialize_table()
-
-            # Insert records into the database using upsert
-            db.upsert_weight_records(df)
-            print(f"Database initialized. Table 'cat_weight_records' created in {db_file} and data loaded from {csv_file}.")
+    with CatWeightDB(db_file, cat=cat) as db:
+        # If a CSV file is provided, attempt to load it and insert data
+        if csv_file:
+            try:
+                # Create table if not already existing
+                table_created = db.initialize_table(schema_version)
+
+                # Stream the CSV into the database using batched upserts
+                start = time.perf_counter()
+                rows = db.import_csv(csv_file, chunk_size=chunk_size,
+                                     journal_mode=journal_mode, synchronous=synchronous)
+                elapsed = time.perf_counter() - start
+                print(f"Database initialized. Table 'cat_weight_records' created in {db_file} and data loaded from {csv_file}.")
+                rate = rows / elapsed if elapsed > 0 else float(rows)
+                print(f"Wrote {rows} rows in {elapsed:.2f} s ({rate:,.0f} rows/sec), peak memory {peak_rss_mb():.1f} MB.")
+
+            except Exception as e:
+                print(f"Error loading CSV file: {e}. Initialization aborted.")
+                return  # The load runs in one transaction, so nothing is written if it fails
 
-        except Exception as e:
-            print(f"Error loading CSV file: {e}. Initialization aborted.")
-            return  # Exit without creating a table if CSV loading fails
-
-    else:
-        # Only create the table if no CSV file is provided
-        db.connect()
-        table_created = db.initialize_table()
-        if table_created:
-            print(f"Database initialized. Table 'cat_weight_records' created in {db_file}.")
         else:
-            print("Table 'cat_weight_records' already exists.")
-
-    db.close()
+            # Only create the table if no CSV file is provided
+            if db.is_legacy_schema():
+                # 単一猫時代のデータベースはその場で複数猫のスキーマに変換する
+                rows = db.upgrade_legacy_table()
+                print(f"Upgraded {db_file} to the multi-cat schema. {rows} records assigned to cat '{cat}'.")
+                return
+            table_created = db.initialize_table(schema_version)
+            if table_created:
+                print(f"Database initialized. Table 'cat_weight_records' created in {db_file}.")
+            else:
+                print("Table 'cat_weight_records' already exists.")
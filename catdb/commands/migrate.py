@@ -0,0 +1,58 @@
+import os
+import time
+from catdb.db.database import CatWeightDB
+from catdb.db.storage import STORAGES, get_schema_version
+
+
+def _describe(version: int) -> str:
+    storage = STORAGES[version]
+    dates = "integer day dates" if storage.integer_dates else "ISO text dates"
+    weights = "integer gram weights" if storage.fixed_point_weights else "REAL kg weights"
+    return f"{dates}, {weights}"
+
+
+def migrate_database(db_file: str, target_version: int, vacuum: bool = True, dry_run: bool = False) -> None:
+    """
+    Upgrades the database in place to a newer schema version (storage format) and prints
+    the applied versions, the time taken and the file size before and after to STDOUT.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - target_version (int): Schema version to upgrade to.
+    - vacuum (bool): VACUUM the database afterwards so that the freed pages are returned to the file system.
+    - dry_run (bool): Only print the versions that would be applied.
+
+    Returns:
+    - None
+    """
+    if not os.path.exists(db_file):
+        raise ValueError(f"{db_file} does not exist")
+
+    size_before = os.path.getsize(db_file)
+    with CatWeightDB(db_file) as db:
+        current = get_schema_version(db.conn)
+        if dry_run:
+            from catdb.db.migrations import pending_migrations
+            versions = pending_migrations(db.conn, target_version)
+            print(f"{db_file} is at schema version {current} ({_describe(current)}).")
+            for version in versions:
+                print(f"Would apply version {version}: {_describe(version)}")
+            if not versions:
+                print("Nothing to migrate.")
+            return
+
+        start = time.perf_counter()
+        applied = db.migrate(target_version)
+        migrated = time.perf_counter() - start
+        if not applied:
+            print(f"{db_file} is already at schema version {current}. Nothing to migrate.")
+            return
+        if vacuum:
+            db.conn.execute("VACUUM")
+        elapsed = time.perf_counter() - start
+
+    size_after = os.path.getsize(db_file)
+    print(f"Migrated {db_file} from schema version {current} to {applied[-1]} ({_describe(applied[-1])}).")
+    vacuum_note = f", {elapsed - migrated:.2f} s vacuum" if vacuum else ""
+    print(f"Applied versions {', '.join(map(str, applied))} in {migrated:.2f} s{vacuum_note}.")
+    print(f"File size: {size_before / 1024:,.0f} KiB -> {size_after / 1024:,.0f} KiB.")
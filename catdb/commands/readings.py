@@ -0,0 +1,121 @@
+import csv
+import sys
+import time
+from datetime import date, datetime, timezone
+from catdb.commands.batch import MAX_REPORTED_ERRORS
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+from catdb.db.readings import ReadingBuffer
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """
+    Parses an ISO 8601 timestamp ('2024-05-01T07:30:12', with or without a UTC offset)
+    or a Unix time in seconds.
+    """
+    value = value.strip()
+    try:
+        return datetime.fromtimestamp(float(value), timezone.utc)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def import_readings(db_file: str, input_file: str = "-", daily: str = "median", batch_size: int = 5000,
+                    flush_interval: float = 1.0, cat: str = DEFAULT_CAT) -> int:
+    """
+    Streams timestamped readings from a CSV file or STDIN into the database through a
+    write buffer, derives the daily records of the days they fall on, and prints a summary
+    to STDOUT.
+
+    Input is CSV with a header row and the fields 'timestamp' (ISO 8601 or Unix seconds),
+    'weight' (kg), and optionally 'device' and 'cat'. Readings are committed in batches of
+    batch_size or every flush_interval seconds, whichever comes first, so readings piped
+    from a live source become visible while the import is running.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - input_file (str): Path to the input file, or '-' for STDIN.
+    - daily (str): How the daily records are derived: 'median' or 'last'.
+    - batch_size (int): Maximum number of readings committed at a time.
+    - flush_interval (float): Maximum seconds a reading waits before it is committed.
+    - cat (str): Name of the cat for readings that do not specify one.
+
+    Returns:
+    - int: Number of rejected rows (rows that could not be parsed). The other rows are stored regardless.
+    """
+    if batch_size <= 0 or flush_interval <= 0:
+        raise ValueError("--batch-size and --flush-interval must be positive")
+    # 読み取りのテーブルが無ければ作る
+    with CatWeightDB(db_file, cat=cat) as db:
+        db.initialize_table()
+
+    errors: list[str] = []
+    stream = sys.stdin if input_file == "-" else open(input_file, newline="", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        with ReadingBuffer(db_file, cat=cat, max_rows=batch_size, max_delay=flush_interval, daily=daily) as buffer:
+            reader = csv.DictReader(stream)
+            for row in reader:
+                try:
+                    if not row.get("timestamp") or not row.get("weight"):
+                        raise ValueError("timestamp and weight are required")
+                    buffer.add(_parse_timestamp(row["timestamp"]), float(row["weight"]),
+                               row.get("device") or None, row.get("cat") or None)
+                except (ValueError, TypeError, OverflowError) as e:
+                    errors.append(f"line {reader.line_num}: {e}")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    elapsed = time.perf_counter() - start
+
+    rate = buffer.readings_written / elapsed if elapsed > 0 else 0.0
+    print(f"Stored {buffer.readings_written} readings in {buffer.flushes} batches "
+          f"({rate:,.0f} readings/s, {buffer.flush_seconds:.2f} s writing).")
+    print(f"Derived {buffer.days_derived} daily records ({daily}).")
+    if errors:
+        print(f"Rejected {len(errors)} rows:")
+        for message in errors[:MAX_REPORTED_ERRORS]:
+            print(f"  {message}")
+        if len(errors) > MAX_REPORTED_ERRORS:
+            print(f"  ... and {len(errors) - MAX_REPORTED_ERRORS} more")
+    return len(errors)
+
+
+def print_readings(db_file: str, begin_date: date | None = None, end_date: date | None = None,
+                   cat: str = DEFAULT_CAT) -> None:
+    """
+    Prints the timestamped readings of a cat to STDOUT, oldest first.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - begin_date (date | None): First day. None means no lower bound.
+    - end_date (date | None): Last day. None means no upper bound.
+    - cat (str): Name of the cat.
+
+    Returns:
+    - None
+    """
+    with CatWeightDB(db_file, cat=cat) as db:
+        rows = db.get_readings(begin_date, end_date)
+    if not rows:
+        print("No readings found.")
+        return
+    for timestamp, device, weight in rows:
+        print(f"{timestamp.isoformat(sep=' ', timespec='seconds')}  {weight:>7}  {device}")
+
+
+def derive_daily_records(db_file: str, daily: str = "median", cat: str = DEFAULT_CAT, all_cats: bool = False) -> None:
+    """
+    Recomputes the daily records from the stored readings.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - daily (str): 'median' or 'last'.
+    - cat (str): Name of the cat.
+    - all_cats (bool): Recompute the records of every cat with readings.
+
+    Returns:
+    - None
+    """
+    with CatWeightDB(db_file, cat=cat) as db:
+        days = db.derive_daily_records(daily, all_cats=all_cats)
+    print(f"Derived {days} daily records ({daily}).")
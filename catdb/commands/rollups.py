@@ -0,0 +1,32 @@
+from catdb.db.database import CatWeightDB
+
+def rebuild_weight_rollups(db_file: str, check_only: bool = False) -> None:
+    """
+    Checks the weekly / monthly / yearly rollup tables against the raw records and,
+    unless check_only is set, recomputes them from scratch. Prints the result to STDOUT.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - check_only (bool): Only report rollups that do not match the raw records.
+
+    Returns:
+    - None
+    """
+    with CatWeightDB(db_file) as db:
+        if check_only:
+            mismatches = db.check_rollups()
+        else:
+            mismatches, rows = db.rebuild_rollups()
+
+    for cat_id, period, period_start in mismatches[:10]:
+        print(f"Out of sync: cat_id={cat_id} {period} starting {period_start}")
+    if len(mismatches) > 10:
+        print(f"... and {len(mismatches) - 10} more")
+
+    if check_only:
+        if mismatches:
+            print(f"{len(mismatches)} rollups do not match the raw records. Run 'catdb.py rebuild-rollups' to fix them.")
+        else:
+            print("All rollups match the raw records.")
+    else:
+        print(f"Rebuilt {rows} rollups ({len(mismatches)} were out of sync).")
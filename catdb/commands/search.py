@@ -0,0 +1,55 @@
+import time
+from datetime import date
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+
+
+def search_notes(db_file: str, query: str, begin_date: date | None = None, end_date: date | None = None,
+                 limit: int | None = 20, cat: str = DEFAULT_CAT, all_cats: bool = False) -> None:
+    """
+    Searches the notes of the records with the full-text index and prints the matches,
+    best first, with their weights to STDOUT.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - query (str): FTS5 query (words, "phrases", prefix*, AND / OR / NOT).
+    - begin_date (date | None): Only records on or after this date.
+    - end_date (date | None): Only records on or before this date.
+    - limit (int | None): Maximum number of matches. None prints all.
+    - cat (str): Name of the cat.
+    - all_cats (bool): Search the records of every cat.
+
+    Returns:
+    - None
+    """
+    if limit is not None and limit <= 0:
+        raise ValueError("--limit must be a positive number")
+    with CatWeightDB(db_file, cat=cat) as db:
+        start = time.perf_counter()
+        matches = db.search_notes(query, begin_date, end_date, limit=limit, all_cats=all_cats)
+        elapsed = time.perf_counter() - start
+
+    if not matches:
+        print(f"No notes match {query!r}.")
+        return
+    for name, record_date, weight, notes, score in matches:
+        prefix = f"{name:<12}  " if all_cats else ""
+        print(f"{prefix}{record_date.isoformat()}  {weight:>6}  {score:>6.2f}  {notes}")
+    print(f"{len(matches)} matches in {elapsed * 1000:.1f} ms.")
+
+
+def rebuild_search_index(db_file: str, tokenizer: str | None = None) -> None:
+    """
+    Creates or refills the full-text index over the notes from the records.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - tokenizer (str | None): 'unicode61' or 'trigram' to recreate the index with that tokenizer.
+
+    Returns:
+    - None
+    """
+    with CatWeightDB(db_file) as db:
+        start = time.perf_counter()
+        rows = db.rebuild_notes_index(tokenizer)
+        elapsed = time.perf_counter() - start
+    print(f"Indexed the notes of {rows} records in {elapsed:.2f} s.")
@@ -0,0 +1,19 @@
+def serve_database(db_file: str, host: str = "127.0.0.1", port: int = 8080, readers: int = 8,
+                   cache_entries: int = 1024, verbose: bool = False) -> None:
+    """
+    Serves the database over a local HTTP/JSON API until interrupted (see catdb.server).
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - host (str): Address to listen on.
+    - port (int): Port to listen on. 0 picks a free port.
+    - readers (int): Number of read-only connections kept open.
+    - cache_entries (int): Maximum number of cached query results.
+    - verbose (bool): Log every request to STDERR.
+
+    Returns:
+    - None
+    """
+    from catdb.server import serve
+
+    serve(db_file, host=host, port=port, readers=readers, cache_entries=cache_entries, verbose=verbose)
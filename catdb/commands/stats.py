@@ -0,0 +1,46 @@
+from datetime import date
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
+from catdb.db.rollups import mean_and_std
+
+def _format(value: float | None) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def print_weight_stats(db_file: str, period: str = "month", begin_date: date | None = None,
+                       end_date: date | None = None, cat: str = DEFAULT_CAT) -> None:
+    """
+    Prints weekly, monthly or yearly weight statistics and a total line to STDOUT.
+
+    The statistics come from the rollup tables, so the cost does not depend on the
+    number of records.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - period (str): 'week', 'month' or 'year'.
+    - begin_date (date | None): Only periods starting on or after this date.
+    - end_date (date | None): Only periods starting on or before this date.
+    - cat (str): Name of the cat.
+
+    Returns:
+    - None
+    """
+    with CatWeightDB(db_file, cat=cat) as db:
+        stats = db.get_stats(period, begin_date, end_date)
+
+    if not stats:
+        print("No records found.")
+        return
+
+    print(f"{period + ' start':<12} {'count':>7} {'min':>8} {'max':>8} {'mean':>8} {'std':>8}")
+    for start, count, min_weight, max_weight, mean, std in stats:
+        print(f"{start.isoformat():<12} {count:>7} {_format(min_weight):>8} {_format(max_weight):>8} {_format(mean):>8} {_format(std):>8}")
+
+    # 合計行も各期間の件数・合計・二乗和から求める
+    count = sum(row[1] for row in stats)
+    total = sum(row[1] * row[4] for row in stats)
+    total_sq = sum(
+        (row[5] ** 2 * (row[1] - 1) if row[5] is not None else 0.0) + row[1] * row[4] ** 2
+        for row in stats
+    )
+    mean, std = mean_and_std(count, total, total_sq)
+    print(f"{'total':<12} {count:>7} {_format(min(r[2] for r in stats)):>8} {_format(max(r[3] for r in stats)):>8} {_format(mean):>8} {_format(std):>8}")
@@ -1,8 +1,8 @@
 from datetime import date
 from typing import Optional
-from catdb.db.database import CatWeightDB
+from catdb.db.database import CatWeightDB, DEFAULT_CAT
 
-def update_weight_record(db_file: str, date: date, weight: float, notes: Optional[str] = None) -> None:
+def update_weight_record(db_file: str, date: date, weight: float, notes: Optional[str] = None, cat: str = DEFAULT_CAT) -> None:
     """
     Updates an existing weight record in the database and prints the result to STDOUT.
 
@@ -11,14 +11,13 @@ def update_weight_record(db_file: str, date: date, weight: float, notes: Optiona
     - date (date): Date of the record as a datetime.date object.
     - weight (float): New weight of the cat in kg.
     - notes (Optional[str]): New notes for the record.
+    - cat (str): Name of the cat.
 
     Returns:
     - None
     """
-    db = CatWeightDB(db_file)
-    db.connect()
-    success = db.update_weight_record(date, weight, notes)
-    db.close()
+    with CatWeightDB(db_file, cat=cat) as db:
+        success = db.update_weight_record(date, weight, notes)
 
     if success:
         print(f"Record updated: {date}, {weight} kg, Notes: {notes}")
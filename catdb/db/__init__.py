@@ -6,11 +6,26 @@ cat weight records using SQLite3.
 
 Modules:
     - database.py: Contains the DatabaseConnection class for managing SQLite3 interactions
+    - pool.py: Contains the ConnectionPool class for sharing connections between threads
+    - storage.py: Storage formats (date and weight types) of each schema version
+    - migrations.py: In-place upgrades between schema versions
+    - async_db.py: Contains the AsyncCatWeightDB class for use from asyncio code
 """
 
 # データベース接続クラスのインポート
 from .database import CatWeightDB
+from .pool import ConnectionPool
 
 __all__ = [
-    "CatWeightDB"
+    "CatWeightDB",
+    "ConnectionPool",
+    "AsyncCatWeightDB",
 ]
+
+
+def __getattr__(name: str):
+    # asyncio の読み込みは重いので、CLI の起動時には読み込まない
+    if name == "AsyncCatWeightDB":
+        from .async_db import AsyncCatWeightDB
+        return AsyncCatWeightDB
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
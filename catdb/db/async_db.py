@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import TYPE_CHECKING, Any, Iterable
+from catdb.db.database import BATCH_SQL, CatWeightDB, DEFAULT_CAT, UPSERT_SQL, _records_to_rows
+from catdb.db.pool import ConnectionPool
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from catdb.series import WeightSeries
+
+# 他の書き込みと 1 つのトランザクションにまとめられる操作
+_COALESCED = ("add", "update", "delete", "upsert")
+
+# 書き込みスレッドを止める合図
+_STOP = object()
+
+
+class AsyncCatWeightDB:
+    """
+    asyncio front end for CatWeightDB that never blocks the event loop.
+
+    Reads run on a small pool of reader threads, each with its own read-only connection.
+    Writes are queued to a single writer thread. Small writes (add, update, delete and
+    upsert) that are waiting in the queue are applied together in one transaction, each
+    inside its own savepoint so that a failing write does not affect the others. Other
+    writes (import_csv, apply_operations, ...) run alone between those transactions.
+
+    At most max_pending writes can be queued; further writers wait until the writer
+    thread has caught up.
+
+    Example:
+        async with AsyncCatWeightDB("cat.db") as db:
+            await asyncio.gather(*(db.add_weight_record(d, 4.5) for d in dates))
+            df = await db.get_records_by_date_range(begin, end)
+    """
+
+    def __init__(self, db_file: str = "cat_data.db", cat: str = DEFAULT_CAT, readers: int = 4,
+                 max_pending: int = 1000, max_batch: int = 500, batch_delay: float = 0.0,
+                 wal: bool = True, busy_timeout: float = 5.0) -> None:
+        """
+        Initializes the instance. Threads and connections are started on first use.
+
+        Parameters:
+        - db_file (str): Path to the SQLite3 database file.
+        - cat (str): Name of the cat whose records the methods read and write.
+        - readers (int): Number of reader threads (and read-only connections).
+        - max_pending (int): Maximum number of queued writes before writers have to wait.
+        - max_batch (int): Maximum number of small writes committed in one transaction.
+        - batch_delay (float): Seconds the writer waits for more writes before committing a batch.
+          0 only groups the writes that are already queued.
+        - wal (bool): Switch the database to WAL journal mode so that reads do not wait for writes.
+        - busy_timeout (float): Seconds to wait for locks held by other processes.
+        """
+        if max_pending < 1 or max_batch < 1:
+            raise ValueError("max_pending and max_batch must be at least 1")
+        self.db_file: str = db_file
+        self.cat: str = cat
+        self.max_pending: int = max_pending
+        self.max_batch: int = max_batch
+        self.batch_delay: float = batch_delay
+        self.writes: int = 0
+        self.transactions: int = 0
+
+        self._pool = ConnectionPool(db_file, readers=readers, wal=wal, busy_timeout=busy_timeout)
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="catdb-reader")
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._writer: threading.Thread | None = None
+        self._cat_ids: dict[str, int] = {}
+        self._closed: bool = False
+
+    def use_cat(self, cat: str) -> None:
+        """
+        Switches the cat that subsequent calls read and write.
+
+        Parameters:
+        - cat (str): Name of the cat.
+        """
+        self.cat = cat
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        if self._closed:
+            raise RuntimeError("AsyncCatWeightDB is closed")
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._writer = threading.Thread(target=self._writer_main, name="catdb-writer", daemon=True)
+            self._writer.start()
+        return self._loop
+
+    async def _read(self, method: str, *args: Any) -> Any:
+        loop = self._start()
+        cat = self.cat
+
+        def call() -> Any:
+            with self._pool.reader(cat) as db:
+                return getattr(db, method)(*args)
+
+        return await loop.run_in_executor(self._readers, call)
+
+    async def _write(self, op: str, *args: Any) -> Any:
+        loop = self._start()
+        # キューが一杯なら書き込みスレッドが追いつくまで待つ (背圧)
+        await self._slots.acquire()
+        future = loop.create_future()
+        self._queue.put((op, self.cat, args, future))
+        return await future
+
+    # ------------------------------------------------------------------
+    # 書き込みスレッド
+    # ------------------------------------------------------------------
+
+    def _settle(self, future: asyncio.Future, value: Any = None, error: BaseException | None = None) -> None:
+        """Hands a result from the writer thread to the event loop and frees the queue slot."""
+        def settle() -> None:
+            self._slots.release()
+            if future.cancelled():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+        try:
+            self._loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            pass  # イベントループが既に閉じている
+
+    def _writer_main(self) -> None:
+        carry = None
+        try:
+            with self._pool.writer(self.cat) as db:
+                while True:
+                    item = carry if carry is not None else self._queue.get()
+                    carry = None
+                    if item is _STOP:
+                        break
+                    if item[0] not in _COALESCED:
+                        self._run_alone(db, item)
+                        continue
+
+                    # 待っている小さな書き込みをまとめて 1 つのトランザクションにする
+                    batch = [item]
+                    deadline = time.monotonic() + self.batch_delay
+                    while len(batch) < self.max_batch:
+                        try:
+                            timeout = deadline - time.monotonic()
+                            following = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if following is _STOP or following[0] not in _COALESCED:
+                            carry = following
+                            break
+                        batch.append(following)
+                    self._run_batch(db, batch)
+        except BaseException as e:
+            # 接続を開けなかった場合などは、待っている書き込みをすべて失敗させる
+            if carry is not None and carry is not _STOP:
+                self._settle(carry[3], error=e)
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    self._settle(item[3], error=e)
+
+    def _cat_id(self, db: CatWeightDB, cat: str, create: bool) -> int | None:
+        cat_id = self._cat_ids.get(cat)
+        if cat_id is None:
+            cat_id, inserted = db._lookup_cat_id(cat, create)
+            # 同じトランザクションで登録した猫はロールバックされる可能性があるのでキャッシュしない
+            if cat_id is not None and not inserted:
+                self._cat_ids[cat] = cat_id
+        return cat_id
+
+    def _apply(self, db: CatWeightDB, op: str, cat: str, args: tuple) -> Any:
+        conn = db.conn
+        storage = db.storage
+        if op == "add":
+            record_date, weight, notes = args
+            return conn.execute(BATCH_SQL["add"], (self._cat_id(db, cat, True), storage.encode_date(record_date),
+                                                   storage.encode_weight(weight), notes)).rowcount > 0
+        if op == "update":
+            record_date, weight, notes = args
+            return conn.execute(BATCH_SQL["update"], (storage.encode_weight(weight), notes, self._cat_id(db, cat, False),
+                                                      storage.encode_date(record_date))).rowcount > 0
+        if op == "delete":
+            (record_date,) = args
+            return conn.execute(BATCH_SQL["delete"], (self._cat_id(db, cat, False),
+                                                      storage.encode_date(record_date))).rowcount > 0
+        (records,) = args
+        conn.executemany(UPSERT_SQL, _records_to_rows(records, self._cat_id(db, cat, True), storage))
+        return True
+
+    def _run_batch(self, db: CatWeightDB, batch: list[tuple]) -> None:
+        conn = db.conn
+        results = []
+        try:
+            conn.execute("BEGIN")
+            for op, cat, args, future in batch:
+                # 1 件の失敗が同じトランザクションの他の書き込みに影響しないようにする
+                conn.execute("SAVEPOINT write")
+                try:
+                    value = self._apply(db, op, cat, args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    results.append((future, None, e))
+                else:
+                    conn.execute("RELEASE write")
+                    results.append((future, value, None))
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self._cat_ids.clear()
+            results = [(future, None, e) for _, _, _, future in batch]
+        self.writes += len(batch)
+        self.transactions += 1
+        for future, value, error in results:
+            self._settle(future, value, error)
+
+    def _run_alone(self, db: CatWeightDB, item: tuple) -> None:
+        op, cat, args, future = item
+        try:
+            db.use_cat(cat)
+            value = getattr(db, op)(*args)
+        except Exception as e:
+            if db.conn.in_transaction:
+                db.conn.rollback()
+            self._settle(future, error=e)
+        else:
+            self._settle(future, value)
+        self.writes += 1
+        self.transactions += 1
+
+    # ------------------------------------------------------------------
+    # 書き込み
+    # ------------------------------------------------------------------
+
+    async def initialize_table(self) -> bool:
+        """Coroutine version of CatWeightDB.initialize_table."""
+        return await self._write("initialize_table")
+
+    async def add_weight_record(self, date: date, weight: float, notes: str | None = None) -> bool:
+        """
+        Adds a new weight record.
+
+        Parameters:
+        - date (date): Date of the record.
+        - weight (float): Weight of the cat in kg.
+        - notes (str | None): Optional notes for the record.
+
+        Returns:
+        - bool: True if the record was added, False if a record for the date already exists.
+        """
+        return await self._write("add", date, weight, notes)
+
+    async def update_weight_record(self, date: date, weight: float, notes: str | None = None) -> bool:
+        """
+        Updates an existing weight record.
+
+        Returns:
+        - bool: True if the record was updated, False if it does not exist.
+        """
+        return await self._write("update", date, weight, notes)
+
+    async def delete_weight_record(self, date: date) -> bool:
+        """
+        Deletes a weight record by date.
+
+        Returns:
+        - bool: True if the record was deleted, False if it does not exist.
+        """
+        return await self._write("delete", date)
+
+    async def upsert_weight_records(self, records: pd.DataFrame) -> bool:
+        """Coroutine version of CatWeightDB.upsert_weight_records."""
+        return await self._write("upsert", records)
+
+    async def import_csv(self, csv_file: str, chunk_size: int = 50000) -> int:
+        """Coroutine version of CatWeightDB.import_csv."""
+        return await self._write("import_csv", csv_file, chunk_size)
+
+    async def apply_operations(self, operations: Iterable[tuple[str, str | None, date, float | None, str | None]],
+                               commit_every: int = 0) -> dict[str, list[int]]:
+        """Coroutine version of CatWeightDB.apply_operations."""
+        return await self._write("apply_operations", list(operations), commit_every)
+
+    async def fold_database(self, src_file: str, cat: str | None = None) -> int:
+        """Coroutine version of CatWeightDB.fold_database."""
+        return await self._write("fold_database", src_file, cat)
+
+    async def rebuild_rollups(self) -> tuple[list[tuple[int, str, str]], int]:
+        """Coroutine version of CatWeightDB.rebuild_rollups."""
+        return await self._write("rebuild_rollups")
+
+    # ------------------------------------------------------------------
+    # 読み出し
+    # ------------------------------------------------------------------
+
+    async def get_weight_record(self, date: date) -> pd.DataFrame:
+        """Coroutine version of CatWeightDB.get_weight_record."""
+        return await self._read("get_weight_record", date)
+
+    async def find_weight_record(self, date: date) -> tuple[date, float, str | None] | None:
+        """Coroutine version of CatWeightDB.find_weight_record."""
+        return await self._read("find_weight_record", date)
+
+    async def get_all_records(self) -> pd.DataFrame:
+        """Coroutine version of CatWeightDB.get_all_records."""
+        return await self._read("get_all_records")
+
+    async def get_records_by_date_range(self, begin_date: date, end_date: date) -> pd.DataFrame:
+        """Coroutine version of CatWeightDB.get_records_by_date_range."""
+        return await self._read("get_records_by_date_range", begin_date, end_date)
+
+    async def get_weight_arrays(self, begin_date: date | None = None,
+                                end_date: date | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Coroutine version of CatWeightDB.get_weight_arrays."""
+        return await self._read("get_weight_arrays", begin_date, end_date)
+
+    async def get_weight_series(self, begin_date: date | None = None, end_date: date | None = None,
+                                notes: bool = False) -> WeightSeries:
+        """
+        Coroutine version of CatWeightDB.get_weight_series.
+
+        The reader connection is returned to the pool when the call completes, so notes
+        cannot be loaded on first access later; pass notes=True to read them with the series.
+        """
+        return await self._read("get_weight_series", begin_date, end_date, notes)
+
+    async def get_stats(self, period: str = "month", begin_date: date | None = None,
+                        end_date: date | None = None) -> list[tuple[date, int, float, float, float, float | None]]:
+        """Coroutine version of CatWeightDB.get_stats."""
+        return await self._read("get_stats", period, begin_date, end_date)
+
+    async def get_aggregated(self, begin_date: date | None = None, end_date: date | None = None,
+                             bucket: str = "day", stats: Iterable[str] = ("mean",)) -> list[tuple]:
+        """Coroutine version of CatWeightDB.get_aggregated."""
+        return await self._read("get_aggregated", begin_date, end_date, bucket, tuple(stats))
+
+    async def content_fingerprint(self) -> str:
+        """Coroutine version of CatWeightDB.content_fingerprint."""
+        return await self._read("content_fingerprint")
+
+    async def list_cats(self) -> list[tuple[int, str, int]]:
+        """Coroutine version of CatWeightDB.list_cats."""
+        return await self._read("list_cats")
+
+    async def check_rollups(self) -> list[tuple[int, str, str]]:
+        """Coroutine version of CatWeightDB.check_rollups."""
+        return await self._read("check_rollups")
+
+    async def search_notes(self, query: str, begin_date: date | None = None, end_date: date | None = None,
+                           limit: int | None = 20, all_cats: bool = False) -> list[tuple[str, date, float, str, float]]:
+        """Coroutine version of CatWeightDB.search_notes."""
+        return await self._read("search_notes", query, begin_date, end_date, limit, all_cats)
+
+    async def get_changes(self, since: int = 0, limit: int | None = None,
+                          all_cats: bool = True) -> list[tuple[int, str, date, str, float | None, str | None, str]]:
+        """Coroutine version of CatWeightDB.get_changes."""
+        return await self._read("get_changes", since, limit, all_cats)
+
+    async def latest_change_seq(self) -> int:
+        """Coroutine version of CatWeightDB.latest_change_seq."""
+        return await self._read("latest_change_seq")
+
+    # ------------------------------------------------------------------
+
+    async def close(self) -> None:
+        """Waits for the queued writes to finish and closes the threads and connections."""
+        if self._closed:
+            return
+        self._closed = True
+        loop = asyncio.get_running_loop()
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            await loop.run_in_executor(None, self._writer.join)
+        await loop.run_in_executor(None, self._readers.shutdown)
+        self._pool.close()
+
+    async def __aenter__(self) -> "AsyncCatWeightDB":
+        self._start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
@@ -0,0 +1,259 @@
+"""
+Online backups of a catdb database.
+
+online_backup() copies a live database with SQLite's online backup API a few pages
+at a time. No lock is held between steps, and the copy pauses between steps so that
+writers (e.g. cron jobs calling 'add') get the database in between. If another
+connection writes to the database during the copy, SQLite restarts the copy so that
+the result is always a consistent snapshot; the number of restarts is reported.
+
+While the copy runs, a probe connection periodically takes and releases the write
+lock and records how long it had to wait. This measures the delay the backup imposes
+on writers (in WAL mode writers never wait for the backup).
+
+The copy is written next to the destination and renamed into place only after it
+passed PRAGMA integrity_check, optionally packed into a compressed tar archive
+together with a manifest (source, time, size, SHA-256 of the database file).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlite3 import Connection
+from catdb.db.storage import get_schema_version
+
+ARCHIVE_COMPRESSIONS = ("gz", "bz2", "xz")
+
+# 書き込み待ちを測るプローブの既定の間隔 (秒)
+DEFAULT_PROBE_INTERVAL = 0.1
+
+
+class BackupReport:
+    """Statistics of one backup."""
+
+    __slots__ = ("dest_file", "pages", "bytes", "steps", "restarts", "copy_seconds", "pause_seconds",
+                 "verify_seconds", "archive_seconds", "output_bytes", "integrity", "writer_probes",
+                 "writer_wait_total", "writer_wait_max")
+
+    def __init__(self, dest_file: str) -> None:
+        self.dest_file: str = dest_file
+        self.pages: int = 0
+        self.bytes: int = 0
+        self.steps: int = 0
+        self.restarts: int = 0
+        self.copy_seconds: float = 0.0
+        self.pause_seconds: float = 0.0
+        self.verify_seconds: float = 0.0
+        self.archive_seconds: float = 0.0
+        self.output_bytes: int = 0
+        self.integrity: list[str] = []
+        self.writer_probes: int = 0
+        self.writer_wait_total: float = 0.0
+        self.writer_wait_max: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes copied per second of copying (pauses excluded)."""
+        active = self.copy_seconds - self.pause_seconds
+        return self.bytes / active if active > 0 else float(self.bytes)
+
+
+class _WriterProbe(threading.Thread):
+    """Takes and releases the write lock of a database periodically, timing each wait."""
+
+    def __init__(self, db_file: str, interval: float, timeout: float) -> None:
+        super().__init__(name="catdb-backup-probe", daemon=True)
+        self.db_file = db_file
+        self.interval = interval
+        self.timeout = timeout
+        self.waits: list[float] = []
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        conn = sqlite3.connect(self.db_file, timeout=self.timeout, isolation_level=None)
+        try:
+            while not self._done.wait(self.interval):
+                start = time.perf_counter()
+                try:
+                    # ロールバックジャーナルでは EXCLUSIVE の取得はコミット時の書き込みと同じく読み手を待つ
+                    conn.execute("BEGIN EXCLUSIVE")
+                    conn.execute("ROLLBACK")
+                except sqlite3.OperationalError:
+                    pass
+                self.waits.append(time.perf_counter() - start)
+        finally:
+            conn.close()
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+def _copy(src: Connection, dest_file: str, pages: int, pause: float, report: BackupReport) -> None:
+    """Copies src into dest_file step by step, pausing between steps."""
+    last_remaining: list[int] = []
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        report.steps += 1
+        report.pages = total
+        # 残りが増えたら他の接続の書き込みで最初からやり直している
+        if last_remaining and remaining > last_remaining[0]:
+            report.restarts += 1
+        last_remaining[:] = [remaining]
+        if remaining and pause > 0:
+            # ステップの間はロックを持っていないので、ここで書き込み側に譲る
+            time.sleep(pause)
+            report.pause_seconds += pause
+
+    dest = sqlite3.connect(dest_file)
+    try:
+        start = time.perf_counter()
+        src.backup(dest, pages=pages, progress=progress, sleep=max(pause, 0.01))
+        report.copy_seconds = time.perf_counter() - start
+        report.pages = dest.execute("PRAGMA page_count").fetchone()[0]
+        report.bytes = report.pages * dest.execute("PRAGMA page_size").fetchone()[0]
+        # バックアップは元の journal_mode を引き継ぐ。単独のファイルとして扱えるよう戻す
+        dest.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        dest.close()
+
+
+def verify_database(db_file: str) -> list[str]:
+    """
+    Runs PRAGMA integrity_check on a database file.
+
+    Parameters:
+    - db_file (str): Path to the database file.
+
+    Returns:
+    - list[str]: The problems found. Empty if the database is intact.
+    """
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    return [] if rows == ["ok"] else rows
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_archive(db_copy: str, archive_file: str, compression: str, manifest: dict) -> None:
+    """Packs the database copy and a manifest into a compressed tar archive."""
+    name = manifest["database"]
+    manifest["sha256"] = _file_sha256(db_copy)
+    data = json.dumps(manifest, indent=2).encode()
+    with tarfile.open(archive_file, f"w:{compression}") as tar:
+        tar.add(db_copy, arcname=name)
+        info = tarfile.TarInfo("manifest.json")
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+
+    # 書き込んだアーカイブを読み戻して、中身が壊れていないことを確かめる
+    with tarfile.open(archive_file, f"r:{compression}") as tar:
+        member = tar.extractfile(name)
+        digest = hashlib.sha256()
+        for block in iter(lambda: member.read(1 << 20), b""):
+            digest.update(block)
+    if digest.hexdigest() != manifest["sha256"]:
+        raise ValueError(f"Archive {archive_file} does not match the database copy")
+
+
+def online_backup(src: Connection, src_file: str, dest_file: str, pages: int = 256, pause: float = 0.01,
+                  compression: str | None = None, verify: bool = True,
+                  probe_interval: float | None = DEFAULT_PROBE_INTERVAL) -> BackupReport:
+    """
+    Backs up a live database without blocking writers for the whole copy.
+
+    Parameters:
+    - src (Connection): Open connection to the database to back up.
+    - src_file (str): Path of that database (used by the writer probe and the manifest).
+    - dest_file (str): Path of the backup (a database file, or a tar archive with compression).
+    - pages (int): Pages copied per step. Smaller steps hold the read lock for shorter periods.
+    - pause (float): Seconds to pause between steps.
+    - compression (str | None): 'gz', 'bz2' or 'xz' to write a compressed tar archive. None writes a database file.
+    - verify (bool): Run PRAGMA integrity_check on the copy before it is renamed into place.
+    - probe_interval (float | None): Seconds between writer probes. None disables the probe.
+
+    Returns:
+    - BackupReport: Statistics of the backup.
+
+    Raises:
+    - ValueError: If the compression is unknown, pages is not positive, or the copy fails the integrity check.
+    """
+    if compression is not None and compression not in ARCHIVE_COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if pages <= 0:
+        raise ValueError("pages must be a positive number")
+
+    report = BackupReport(dest_file)
+    dest_dir = os.path.dirname(os.path.abspath(dest_file))
+    fd, copy_file = tempfile.mkstemp(prefix=".catdb-backup-", suffix=".db", dir=dest_dir)
+    os.close(fd)
+    probe = None
+    if probe_interval is not None and src_file != ":memory:":
+        probe = _WriterProbe(src_file, probe_interval, timeout=60.0)
+        probe.start()
+    try:
+        try:
+            _copy(src, copy_file, pages, pause, report)
+        finally:
+            if probe is not None:
+                probe.stop()
+                report.writer_probes = len(probe.waits)
+                report.writer_wait_total = sum(probe.waits)
+                report.writer_wait_max = max(probe.waits, default=0.0)
+
+        if verify:
+            start = time.perf_counter()
+            report.integrity = verify_database(copy_file)
+            report.verify_seconds = time.perf_counter() - start
+            if report.integrity:
+                raise ValueError(f"Backup failed the integrity check: {'; '.join(report.integrity[:5])}")
+
+        if compression is None:
+            if os.path.exists(src_file):
+                shutil.copymode(src_file, copy_file)
+            os.replace(copy_file, dest_file)
+        else:
+            start = time.perf_counter()
+            fd, archive_tmp = tempfile.mkstemp(prefix=".catdb-backup-", suffix=".tar", dir=dest_dir)
+            os.close(fd)
+            try:
+                manifest = {
+                    "database": os.path.basename(src_file) or "catdb.db",
+                    "source": os.path.abspath(src_file),
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "schema_version": get_schema_version(src),
+                    "pages": report.pages,
+                    "bytes": report.bytes,
+                    "integrity_check": "ok" if verify else "skipped",
+                }
+                _write_archive(copy_file, archive_tmp, compression, manifest)
+                os.replace(archive_tmp, dest_file)
+            finally:
+                if os.path.exists(archive_tmp):
+                    os.remove(archive_tmp)
+            report.archive_seconds = time.perf_counter() - start
+        report.output_bytes = os.path.getsize(dest_file)
+    finally:
+        if os.path.exists(copy_file):
+            os.remove(copy_file)
+    return report
@@ -0,0 +1,173 @@
+"""
+Change log of cat_weight_records for incremental consumers.
+
+record_changes gets one row per insert, update and delete of a record, written by
+triggers in the same transaction as the change itself. Rows are numbered by an
+AUTOINCREMENT sequence, so sequence numbers only grow and are never reused, even after
+old rows are removed. A consumer remembers the last sequence number it has seen and
+asks for the rows after it.
+
+Like the rollups, the log stores ISO dates and weights in kg whatever the storage
+format of the records (see storage.py), so its contents do not change with migrations.
+
+compact() keeps the log bounded: only the latest change of each (cat, date) is needed
+to reproduce the current state, and changes older than a retention period can be
+dropped. The sequence number up to which rows were dropped by retention is kept in
+record_changes_state; consumers that are further behind must read the full table again.
+"""
+
+from sqlite3 import Connection
+from catdb.db.storage import Storage, storage_for
+
+CREATE_CHANGES_SQL = """
+    CREATE TABLE IF NOT EXISTS record_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        cat_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        op TEXT NOT NULL,
+        weight REAL,
+        notes TEXT,
+        changed_at TEXT NOT NULL
+    )
+"""
+
+CREATE_STATE_SQL = """
+    CREATE TABLE IF NOT EXISTS record_changes_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        pruned_through INTEGER NOT NULL
+    )
+"""
+
+TRIGGERS = ("record_changes_insert", "record_changes_update", "record_changes_delete")
+
+OPS = ("insert", "update", "delete")
+
+# 変更時刻 (UTC、ミリ秒まで)
+_NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+
+def _log_sql(op: str, row: str, storage: Storage, where: str = "") -> str:
+    """Returns the statement that logs a change of row (NEW or OLD)."""
+    weight = "NULL" if op == "delete" else storage.weight_sql(f"{row}.weight")
+    notes = "NULL" if op == "delete" else f"{row}.notes"
+    return f"""
+        INSERT INTO record_changes (cat_id, date, op, weight, notes, changed_at)
+        SELECT {row}.cat_id, {storage.iso_date_sql(f"{row}.date")}, '{op}', {weight}, {notes}, {_NOW_SQL}
+        {where};
+    """
+
+
+def create_changelog(conn: Connection, storage: Storage | None = None) -> bool:
+    """
+    Creates the change log tables and triggers if they do not exist. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the multi-cat schema.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+
+    Returns:
+    - bool: True if the log was created, False if it already existed.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='record_changes'"
+    ).fetchone() is not None
+    conn.execute(CREATE_CHANGES_SQL)
+    conn.execute(CREATE_STATE_SQL)
+    create_triggers(conn, storage)
+    return not exists
+
+
+def create_triggers(conn: Connection, storage: Storage | None = None) -> None:
+    """
+    Creates the triggers that write record_changes, if they do not exist.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the change log.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+    """
+    storage = storage or storage_for(conn)
+    key_changed = "(OLD.cat_id IS NOT NEW.cat_id OR OLD.date IS NOT NEW.date)"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS record_changes_insert AFTER INSERT ON cat_weight_records
+        BEGIN {_log_sql("insert", "NEW", storage)} END
+    """)
+    # 内容が変わらない upsert は記録しない。主キーが変わった場合は削除と追加として記録する
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS record_changes_update AFTER UPDATE ON cat_weight_records
+        WHEN {key_changed} OR OLD.weight IS NOT NEW.weight OR OLD.notes IS NOT NEW.notes
+        BEGIN
+            {_log_sql("delete", "OLD", storage, f"WHERE {key_changed}")}
+            {_log_sql("insert", "NEW", storage, f"WHERE {key_changed}")}
+            {_log_sql("update", "NEW", storage, f"WHERE NOT {key_changed}")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS record_changes_delete AFTER DELETE ON cat_weight_records
+        BEGIN {_log_sql("delete", "OLD", storage)} END
+    """)
+
+
+def drop_triggers(conn: Connection) -> None:
+    """
+    Drops the change log triggers (e.g. before the records table is rebuilt by a migration).
+
+    Parameters:
+    - conn (Connection): Connection to a database with the change log.
+    """
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def pruned_through(conn: Connection) -> int:
+    """
+    Returns the sequence number up to which changes were dropped by retention (0 if none).
+
+    Parameters:
+    - conn (Connection): Connection to a database with the change log.
+    """
+    row = conn.execute("SELECT pruned_through FROM record_changes_state WHERE id = 1").fetchone()
+    return row[0] if row is not None else 0
+
+
+def latest_seq(conn: Connection) -> int:
+    """
+    Returns the sequence number of the latest change (0 if there has been none).
+
+    Parameters:
+    - conn (Connection): Connection to a database with the change log.
+    """
+    # 行を消しても sqlite_sequence には最後に払い出した番号が残る
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'record_changes'").fetchone()
+    return row[0] if row is not None else 0
+
+
+def compact(conn: Connection, retain_before: str | None = None) -> tuple[int, int]:
+    """
+    Removes changes that are no longer needed. Does not commit.
+
+    Superseded changes (every change of a (cat, date) except the latest) are always
+    removed; applying the remaining changes in order still yields the current state.
+    With retain_before, the latest changes older than that time are removed as well,
+    and the highest removed sequence number is recorded as pruned_through.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the change log.
+    - retain_before (str | None): ISO 8601 UTC time ('YYYY-MM-DDTHH:MM:SS'); changes before it are dropped.
+
+    Returns:
+    - tuple[int, int]: Number of superseded changes and of expired changes removed.
+    """
+    superseded = conn.execute("""
+        DELETE FROM record_changes
+        WHERE seq NOT IN (SELECT MAX(seq) FROM record_changes GROUP BY cat_id, date)
+    """).rowcount
+    expired = 0
+    if retain_before is not None:
+        last = conn.execute("SELECT MAX(seq) FROM record_changes WHERE changed_at < ?", (retain_before,)).fetchone()[0]
+        if last is not None:
+            expired = conn.execute("DELETE FROM record_changes WHERE seq <= ?", (last,)).rowcount
+            conn.execute("""
+                INSERT INTO record_changes_state (id, pruned_through) VALUES (1, ?)
+                ON CONFLICT(id) DO UPDATE SET pruned_through = max(pruned_through, excluded.pruned_through)
+            """, (last,))
+    return superseded, expired
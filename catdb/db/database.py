@@ -1,8 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import os
 import sqlite3
+from contextlib import AbstractContextManager, nullcontext
 from sqlite3 import Connection
-from typing import List
-from datetime import date
-import pandas as pd
+from typing import TYPE_CHECKING, Iterable, Iterator, List
+from datetime import date, datetime
+from datetime import date as DateType
+from catdb.db import changelog, migrations, notes_index, readings, rollups, versions
+from catdb.db.storage import LATEST_VERSION, STORAGES, Storage, set_schema_version, storage_for
+from catdb.profiling import Profiler, active_profiler, profiled_connect
+
+# pandas は読み出し系のメソッドでのみ必要なので、各メソッド内で遅延インポートする。
+# add / update / delete などの書き込み処理は標準ライブラリの sqlite3 だけで完結する。
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from catdb.db.backup import BackupReport
+    from catdb.series import WeightSeries
+
+# 猫を指定しなかった場合に使う名前。単一猫時代のデータベースもこの名前で取り込む。
+DEFAULT_CAT = "default"
+
+CREATE_CATS_SQL = """
+    CREATE TABLE IF NOT EXISTS cats (
+        cat_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+"""
+
+# (cat_id, date) の複合主キーを持つ WITHOUT ROWID テーブル。
+# 行そのものが主キーの B-tree に格納されるため、主キーが weight / notes まで含む
+# カバリングインデックスとして働き、猫ごとの日付範囲の検索は 1 本の B-tree の範囲走査で済む。
+# 日付・体重の型はスキーマバージョンで決まる (storage.py)。これはバージョン 1 の形式。
+CREATE_RECORDS_SQL = STORAGES[1].records_table_sql()
+
+# バッチ処理 (apply_operations) で操作の種類ごとに executemany する SQL。
+# add は既存の記録を上書きしないよう DO NOTHING とし、rowcount で成否を数える。
+BATCH_SQL = {
+    "add": """
+        INSERT INTO cat_weight_records (cat_id, date, weight, notes)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(cat_id, date) DO NOTHING
+    """,
+    "update": "UPDATE cat_weight_records SET weight = ?, notes = ? WHERE cat_id = ? AND date = ?",
+    "delete": "DELETE FROM cat_weight_records WHERE cat_id = ? AND date = ?",
+}
+
+# get_aggregated のバケットと統計量
+AGGREGATE_BUCKETS = ("day",) + rollups.PERIODS
+AGGREGATE_STATS = ("count", "min", "max", "mean", "std", "sum")
+
+# 内容の変わらない行は書き換えない。rowcount は実際に追加・変更した行の数になる
+UPSERT_SQL = """
+    INSERT INTO cat_weight_records (cat_id, date, weight, notes)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(cat_id, date) DO UPDATE SET
+        weight = excluded.weight,
+        notes = excluded.notes
+    WHERE weight IS NOT excluded.weight OR notes IS NOT excluded.notes
+"""
+
+
+def _records_to_rows(records: pd.DataFrame, cat_id: int,
+                     storage: Storage = STORAGES[1]) -> Iterator[tuple[int, str | int, float | int, str | None]]:
+    """
+    Converts a DataFrame of records into parameter tuples for executemany.
+
+    Dates and weights are converted column-wise rather than row by row.
+
+    Parameters:
+    - records (pd.DataFrame): DataFrame with 'date', 'weight' and optional 'notes' columns.
+    - cat_id (int): ID of the cat the records belong to.
+    - storage (Storage): Storage format of the target database.
+
+    Returns:
+    - Iterator[tuple[int, str | int, float | int, str | None]]: (cat_id, date, weight, notes) tuples
+      with dates and weights in the storage format.
+
+    Raises:
+    - ValueError: If a date is missing or cannot be parsed.
+    """
+    import pandas as pd
+
+    dates = pd.to_datetime(records["date"])
+    if dates.isna().any():
+        raise ValueError("Records must not have missing dates")
+    weights = records["weight"].astype(float)
+    if "notes" in records.columns:
+        notes = records["notes"].astype(object).where(records["notes"].notna(), None)
+    else:
+        notes = [None] * len(records)
+    return zip([cat_id] * len(records), storage.encode_datetime64(dates.to_numpy()),
+               storage.encode_weights(weights.to_numpy()), list(notes))
+
+
+def open_connection(db_file: str, wal: bool = False, busy_timeout: float = 5.0,
+                    check_same_thread: bool = True, profiler: Profiler | None = None) -> Connection:
+    """
+    Opens an SQLite3 connection configured for catdb.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - wal (bool): Switch the database to WAL journal mode (persistent in the file).
+    - busy_timeout (float): Seconds to wait for locks held by other connections.
+    - check_same_thread (bool): Passed to sqlite3.connect. Set to False for pooled connections.
+    - profiler (Profiler | None): Record the statements of the connection in this profiler.
+
+    Returns:
+    - Connection: The opened connection.
+    """
+    if profiler is not None:
+        conn = profiled_connect(profiler, db_file, timeout=busy_timeout, check_same_thread=check_same_thread)
+    else:
+        conn = sqlite3.connect(db_file, timeout=busy_timeout, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA foreign_keys = 1")
+    if wal:
+        conn.execute("PRAGMA journal_mode = WAL")
+        # WAL ではコミット毎の fsync を省いてもデータベースが壊れることはない
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
 
 class CatWeightDB:
     """
@@ -10,34 +129,116 @@ class CatWeightDB:
     related to cat weight records.
     """
 
-    def __init__(self, db_file: str = "cat_data.db") -> None:
+    # CLI の --wal / --busy-timeout で上書きされる既定値
+    default_wal: bool = False
+    default_busy_timeout: float = 5.0
+
+    def __init__(self, db_file: str = "cat_data.db", wal: bool | None = None,
+                 busy_timeout: float | None = None, cat: str = DEFAULT_CAT,
+                 profiler: Profiler | None = None) -> None:
         """
         Initializes a connection to the SQLite3 database.
 
         Parameters:
         - db_file (str): Path to the SQLite3 database file.
+        - cat (str): Name of the cat whose records the methods read and write.
+        - wal (bool | None): Switch the database to WAL journal mode on connect. None uses CatWeightDB.default_wal.
+        - busy_timeout (float | None): Seconds to wait for a lock held by another connection before
+          raising "database is locked". None uses CatWeightDB.default_busy_timeout.
+        - profiler (Profiler | None): Record SQL statements and phases in this profiler.
+          None uses the active profiler (see catdb.profiling), if any.
         """
         self.db_file: str = db_file
         self.conn: Connection | None = None
+        self.wal: bool = self.default_wal if wal is None else wal
+        self.busy_timeout: float = self.default_busy_timeout if busy_timeout is None else busy_timeout
+        self.cat: str = cat
+        self._cat_id: int | None = None
+        self._borrowed: bool = False
+        self._storage: Storage | None = None
+        self.profiler: Profiler | None = profiler if profiler is not None else active_profiler()
+
+    @classmethod
+    def from_connection(cls, conn: Connection, db_file: str, cat: str = DEFAULT_CAT) -> "CatWeightDB":
+        """
+        Wraps an already open connection, e.g. one handed out by a ConnectionPool.
+
+        close() on the returned object detaches the connection without closing it.
+
+        Parameters:
+        - conn (Connection): An open SQLite3 connection.
+        - db_file (str): Path of the database file the connection points to.
+        - cat (str): Name of the cat whose records the methods read and write.
+
+        Returns:
+        - CatWeightDB: Instance bound to the given connection.
+        """
+        db = cls(db_file, cat=cat)
+        db.conn = conn
+        db._borrowed = True
+        return db
 
     def connect(self) -> None:
         """Establishes a connection to the SQLite3 database."""
-        self.conn = sqlite3.connect(self.db_file)
-        self.conn.execute("PRAGMA foreign_keys = 1")
+        self.conn = open_connection(self.db_file, wal=self.wal, busy_timeout=self.busy_timeout,
+                                    profiler=self.profiler)
+
+    @property
+    def storage(self) -> Storage:
+        """Storage format of the records (date and weight types), read once from the schema version."""
+        if self._storage is None:
+            self._storage = storage_for(self.conn)
+        return self._storage
+
+    def phase(self, name: str) -> AbstractContextManager:
+        """
+        Times a phase (wall and CPU time) with the instance's profiler. A no-op without one.
+
+        Parameters:
+        - name (str): Name of the phase.
+
+        Returns:
+        - AbstractContextManager: Context manager around the phase.
+        """
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(name)
 
     def close(self) -> None:
         """Closes the database connection if it is open."""
         if self.conn:
-            self.conn.close()
+            if not self._borrowed:
+                self.conn.close()
             self.conn = None
+            self._storage = None
+
+    def __enter__(self) -> "CatWeightDB":
+        if self.conn is None:
+            self.connect()
+        return self
 
-    def initialize_table(self) -> bool:
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def initialize_table(self, schema_version: int = 1) -> bool:
         """
-        Initializes the cat_weight_records table if it does not exist.
+        Initializes the cats and cat_weight_records tables if they do not exist.
+
+        A cat_weight_records table from a single-cat database (keyed by date only) is
+        upgraded in place, and its records are assigned to the current cat.
+
+        Parameters:
+        - schema_version (int): Schema version (storage format) of a newly created table.
+          Existing tables keep their version; use migrate() to upgrade them.
 
         Returns:
         - bool: True if the table was created, False if it already existed.
+
+        Raises:
+        - ValueError: If schema_version is unknown.
         """
+        if schema_version not in STORAGES:
+            raise ValueError(f"Unknown schema version: {schema_version} (latest is {LATEST_VERSION})")
         if self.conn != None:
             cursor = self.conn.cursor()
         else:
@@ -51,17 +252,263 @@ class CatWeightDB:
 
         # テーブルが存在しない場合にのみ作成
         if not table_exists:
+            storage = STORAGES[schema_version]
             with self.conn:
-                self.conn.execute("""
-                    CREATE TABLE IF NOT EXISTS cat_weight_records (
-                        date TEXT PRIMARY KEY,
-                        weight REAL NOT NULL,
-                        notes TEXT
-                    )
-                """)
+                self.conn.execute(CREATE_CATS_SQL)
+                self.conn.execute(storage.records_table_sql())
+                set_schema_version(self.conn, schema_version)
+                rollups.create_rollups(self.conn, storage)
+                changelog.create_changelog(self.conn, storage)
+                notes_index.create_notes_index(self.conn, storage)
+                readings.create_readings(self.conn)
+                versions.create_versions(self.conn)
+            self._storage = storage
             return True  # テーブルを新規作成した場合に True を返す
+
+        if self.is_legacy_schema():
+            self.upgrade_legacy_table()
+        # 集計テーブルや変更履歴、全文検索の索引、読み取り、版数のテーブルが無い既存のデータベースには作成する (集計と索引は既存の記録から作る)
+        with self.conn:
+            rollups.create_rollups(self.conn, self.storage)
+            changelog.create_changelog(self.conn, self.storage)
+            notes_index.create_notes_index(self.conn, self.storage)
+            readings.create_readings(self.conn)
+            versions.create_versions(self.conn)
         return False  # すでにテーブルが存在する場合に False を返す
 
+    def is_legacy_schema(self, schema: str = "main") -> bool:
+        """
+        Checks whether cat_weight_records uses the single-cat layout (no cat_id column).
+
+        Parameters:
+        - schema (str): Schema name of the database to inspect (e.g. an ATTACHed database).
+
+        Returns:
+        - bool: True if the table exists and has no cat_id column.
+        """
+        if self.conn == None:
+            return False
+        columns = [row[1] for row in self.conn.execute(f"PRAGMA {schema}.table_info(cat_weight_records)")]
+        return bool(columns) and "cat_id" not in columns
+
+    def upgrade_legacy_table(self) -> int:
+        """
+        Upgrades a single-cat cat_weight_records table in place to the multi-cat layout.
+        The existing records are assigned to the current cat.
+
+        Returns:
+        - int: Number of records carried over.
+        """
+        if self.conn == None:
+            return 0
+
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute(CREATE_CATS_SQL)
+            self.conn.execute("ALTER TABLE cat_weight_records RENAME TO cat_weight_records_legacy")
+            self.conn.execute(CREATE_RECORDS_SQL)
+            cat_id = self._resolve_cat_id(create=True)
+            cursor = self.conn.execute("""
+                INSERT INTO cat_weight_records (cat_id, date, weight, notes)
+                SELECT ?, date, weight, notes FROM cat_weight_records_legacy
+            """, (cat_id,))
+            self.conn.execute("DROP TABLE cat_weight_records_legacy")
+            rollups.create_rollups(self.conn, STORAGES[1])
+            changelog.create_changelog(self.conn, STORAGES[1])
+            notes_index.create_notes_index(self.conn, STORAGES[1])
+            readings.create_readings(self.conn)
+            versions.create_versions(self.conn)
+        self._storage = None
+        return cursor.rowcount
+
+    def migrate(self, target_version: int = LATEST_VERSION) -> list[int]:
+        """
+        Upgrades the database in place to a newer schema version (storage format).
+
+        The records are converted inside SQLite, so memory use does not grow with the
+        number of records. The file keeps its size until it is vacuumed.
+
+        Parameters:
+        - target_version (int): Schema version to upgrade to.
+
+        Returns:
+        - list[int]: The versions that were applied. Empty if the database was up to date.
+
+        Raises:
+        - ValueError: If the version is unknown or older than the current one, or if the
+          database still uses the single-cat layout.
+        """
+        if self.conn == None:
+            return []
+        if self.is_legacy_schema():
+            raise ValueError(f"{self.db_file} uses the single-cat layout. Run 'catdb.py init' to upgrade it.")
+        applied = migrations.migrate(self.conn, target_version)
+        self._storage = None
+        return applied
+
+    def backup(self, dest_file: str, pages: int = 256, pause: float = 0.01, compression: str | None = None,
+               verify: bool = True, probe_interval: float | None = None) -> BackupReport:
+        """
+        Copies the database to dest_file with SQLite's online backup API while it stays
+        usable by other connections. See catdb.db.backup.online_backup.
+
+        Parameters:
+        - dest_file (str): Path of the backup (a database file, or a tar archive with compression).
+        - pages (int): Pages copied per step.
+        - pause (float): Seconds to pause between steps so that writers can get the database.
+        - compression (str | None): 'gz', 'bz2' or 'xz' to write a compressed tar archive with a manifest.
+        - verify (bool): Run PRAGMA integrity_check on the copy before it is renamed into place.
+        - probe_interval (float | None): Measure the writer wait with a probe at this interval. None disables it.
+
+        Returns:
+        - BackupReport: Statistics of the backup.
+        """
+        from catdb.db.backup import online_backup
+
+        if self.conn == None:
+            raise ValueError("The database is not open")
+        with self.phase("backup"):
+            return online_backup(self.conn, self.db_file, dest_file, pages=pages, pause=pause,
+                                 compression=compression, verify=verify, probe_interval=probe_interval)
+
+    def _resolve_cat_id(self, create: bool = False) -> int | None:
+        """
+        Looks up the cat_id of the current cat, optionally registering the cat.
+
+        Parameters:
+        - create (bool): Insert the cat into the cats table if it is not registered yet.
+
+        Returns:
+        - int | None: The cat_id, or None if the cat is not registered and create is False.
+        """
+        if self._cat_id is not None:
+            return self._cat_id
+        cat_id, inserted = self._lookup_cat_id(self.cat, create)
+        # 今回のトランザクションで登録した猫はロールバックされる可能性があるのでキャッシュしない
+        if not inserted:
+            self._cat_id = cat_id
+        return cat_id
+
+    def _lookup_cat_id(self, cat: str, create: bool = False) -> tuple[int | None, bool]:
+        """
+        Looks up the cat_id of a cat by name, optionally registering the cat.
+
+        Parameters:
+        - cat (str): Name of the cat.
+        - create (bool): Insert the cat into the cats table if it is not registered yet.
+
+        Returns:
+        - tuple[int | None, bool]: The cat_id (None if not registered), and whether the cat was inserted by this call.
+        """
+        if self.conn == None:
+            return None, False
+        try:
+            inserted = False
+            if create:
+                inserted = self.conn.execute("INSERT OR IGNORE INTO cats (name) VALUES (?)", (cat,)).rowcount > 0
+            row = self.conn.execute("SELECT cat_id FROM cats WHERE name = ?", (cat,)).fetchone()
+        except sqlite3.OperationalError:
+            if self.is_legacy_schema():
+                raise ValueError(f"{self.db_file} uses the single-cat layout. Run 'catdb.py init' to upgrade it.")
+            raise
+        return (row[0] if row is not None else None), inserted
+
+    def use_cat(self, cat: str) -> None:
+        """
+        Switches the cat that subsequent calls read and write.
+
+        Parameters:
+        - cat (str): Name of the cat.
+        """
+        self.cat = cat
+        self._cat_id = None
+
+    def list_cats(self) -> list[tuple[int, str, int]]:
+        """
+        Lists the registered cats.
+
+        Returns:
+        - list[tuple[int, str, int]]: (cat_id, name, number of records) for each cat, ordered by name.
+        """
+        if self.conn == None:
+            return []
+        return self.conn.execute("""
+            SELECT c.cat_id, c.name,
+                   (SELECT COUNT(*) FROM cat_weight_records r WHERE r.cat_id = c.cat_id)
+            FROM cats c
+            ORDER BY c.name
+        """).fetchall()
+
+    def fold_database(self, src_file: str, cat: str | None = None) -> int:
+        """
+        Copies the records of another database file into this database.
+
+        A single-cat source is stored under the given cat name, or under the source file
+        name without its extension. For a multi-cat source every cat is copied under its
+        own name, unless cat is given, in which case only that cat is copied. Existing
+        records with the same cat and date are overwritten.
+
+        Parameters:
+        - src_file (str): Path to the source database file.
+        - cat (str | None): Cat name to use (single-cat source) or to select (multi-cat source).
+
+        Returns:
+        - int: Number of records copied.
+
+        Raises:
+        - ValueError: If the source has no cat_weight_records table.
+        """
+        if self.conn == None:
+            return 0
+
+        # ATTACH はトランザクション外でしか実行できない
+        self.conn.execute("ATTACH DATABASE ? AS src", (src_file,))
+        try:
+            has_table = self.conn.execute(
+                "SELECT 1 FROM src.sqlite_master WHERE type='table' AND name='cat_weight_records'"
+            ).fetchone() is not None
+            if not has_table:
+                raise ValueError(f"{src_file} has no cat_weight_records table")
+
+            # 形式の異なるデータベース同士でも SQL の式で変換しながら複写する
+            legacy = self.is_legacy_schema("src")
+            src_storage = STORAGES[1] if legacy else storage_for(self.conn, "src")
+            date_expr = self.storage.date_from_sql("r.date", src_storage)
+            weight_expr = self.storage.weight_from_sql("r.weight", src_storage)
+            with self.conn:
+                if legacy:
+                    cat = cat or os.path.splitext(os.path.basename(src_file))[0]
+                    self.conn.execute("INSERT OR IGNORE INTO cats (name) VALUES (?)", (cat,))
+                    cursor = self.conn.execute(f"""
+                        INSERT INTO cat_weight_records (cat_id, date, weight, notes)
+                        SELECT (SELECT cat_id FROM main.cats WHERE name = ?), {date_expr}, {weight_expr}, r.notes
+                        FROM src.cat_weight_records r WHERE true
+                        ON CONFLICT(cat_id, date) DO UPDATE SET
+                            weight = excluded.weight,
+                            notes = excluded.notes
+                    """, (cat,))
+                else:
+                    self.conn.execute("""
+                        INSERT OR IGNORE INTO cats (name)
+                        SELECT name FROM src.cats WHERE ? IS NULL OR name = ?
+                    """, (cat, cat))
+                    cursor = self.conn.execute(f"""
+                        INSERT INTO cat_weight_records (cat_id, date, weight, notes)
+                        SELECT m.cat_id, {date_expr}, {weight_expr}, r.notes
+                        FROM src.cat_weight_records r
+                        JOIN src.cats s ON s.cat_id = r.cat_id
+                        JOIN main.cats m ON m.name = s.name
+                        WHERE ? IS NULL OR s.name = ?
+                        ON CONFLICT(cat_id, date) DO UPDATE SET
+                            weight = excluded.weight,
+                            notes = excluded.notes
+                    """, (cat, cat))
+                copied = cursor.rowcount
+        finally:
+            self.conn.execute("DETACH DATABASE src")
+        self._cat_id = None
+        return copied
+
     def add_weight_record(self, date: date, weight: float, notes: str | None = None) -> bool:
         """
         Adds a new weight record to the database.
@@ -80,8 +527,9 @@ class CatWeightDB:
         try:
             with self.conn:
                 self.conn.execute(
-                    "INSERT INTO cat_weight_records (date, weight, notes) VALUES (?, ?, ?)",
-                    (date.isoformat(), weight, notes)
+                    "INSERT INTO cat_weight_records (cat_id, date, weight, notes) VALUES (?, ?, ?, ?)",
+                    (self._resolve_cat_id(create=True), self.storage.encode_date(date),
+                     self.storage.encode_weight(weight), notes)
                 )
             return True
         except sqlite3.IntegrityError:
@@ -97,11 +545,54 @@ class CatWeightDB:
         Returns:
         - pd.DataFrame: DataFrame with columns 'date', 'weight', 'notes' where 'date' is pandas.Timestamp.
         """
-        query = "SELECT date, weight, notes FROM cat_weight_records WHERE date = ?"
-        df = pd.read_sql_query(query, self.conn, params=[date.isoformat()])
-        df['date'] = pd.to_datetime(df['date'])  # Convert date column to pandas.Timestamp
+        query = f"SELECT {self._record_columns()} FROM cat_weight_records WHERE cat_id = ? AND date = ?"
+        return self._read_records_frame(query, [self._resolve_cat_id(), self.storage.encode_date(date)])
+
+    def _record_columns(self) -> str:
+        """Returns the select list of (date, weight, notes) with the weight in kg."""
+        return f"date, {self.storage.weight_sql('weight')} AS weight, notes"
+
+    def _read_records_frame(self, query: str, params: list) -> pd.DataFrame:
+        """
+        Runs a query selecting _record_columns() and returns the result as a DataFrame.
+
+        Integer dates are converted to datetime64 directly; ISO dates are parsed.
+        """
+        import pandas as pd
+
+        with self.phase("read_sql"):
+            df = pd.read_sql_query(query, self.conn, params=params)
+        with self.phase("to_datetime"):
+            if self.storage.integer_dates:
+                df['date'] = self.storage.to_datetime64(df['date'].to_numpy())
+            else:
+                df['date'] = pd.to_datetime(df['date'])  # Convert date column to pandas.Timestamp
         return df
 
+    def find_weight_record(self, date: date) -> tuple[date, float, str | None] | None:
+        """
+        Retrieves a weight record by date using only the sqlite3 module.
+
+        This is the lightweight counterpart of get_weight_record for callers that do
+        not need a DataFrame.
+
+        Parameters:
+        - date (date): Date of the record as a datetime.date object.
+
+        Returns:
+        - tuple[date, float, str | None] | None: (date, weight, notes) of the record, or None if not found.
+        """
+        if self.conn == None:
+            return None
+
+        row = self.conn.execute(
+            f"SELECT {self._record_columns()} FROM cat_weight_records WHERE cat_id = ? AND date = ?",
+            (self._resolve_cat_id(), self.storage.encode_date(date))
+        ).fetchone()
+        if row is None:
+            return None
+        return (self.storage.decode_date(row[0]), row[1], row[2])
+
     def get_all_records(self) -> pd.DataFrame:
         """
         Retrieves all weight records from the database and returns them as a pandas DataFrame.
@@ -109,10 +600,8 @@ class CatWeightDB:
         Returns:
         - pd.DataFrame: DataFrame containing all records with columns 'date', 'weight', 'notes' where 'date' is pandas.Timestamp.
         """
-        query = "SELECT date, weight, notes FROM cat_weight_records ORDER BY date"
-        df = pd.read_sql_query(query, self.conn)
-        df['date'] = pd.to_datetime(df['date'])  # Convert date column to pandas.Timestamp
-        return df
+        query = f"SELECT {self._record_columns()} FROM cat_weight_records WHERE cat_id = ? ORDER BY date"
+        return self._read_records_frame(query, [self._resolve_cat_id()])
 
     def get_records_by_date_range(self, begin_date: date, end_date: date) -> pd.DataFrame:
         """
@@ -125,15 +614,629 @@ class CatWeightDB:
         Returns:
         - pd.DataFrame: DataFrame containing records within the date range with columns 'date', 'weight', 'notes' where 'date' is pandas.Timestamp.
         """
-        query = """
-            SELECT date, weight, notes 
+        query = f"""
+            SELECT {self._record_columns()}
             FROM cat_weight_records 
-            WHERE date BETWEEN ? AND ? 
+            WHERE cat_id = ? AND date BETWEEN ? AND ? 
             ORDER BY date
         """
-        df = pd.read_sql_query(query, self.conn, params=[begin_date.isoformat(), end_date.isoformat()])
-        df['date'] = pd.to_datetime(df['date'])  # Convert date column to pandas.Timestamp
-        return df
+        return self._read_records_frame(query, [self._resolve_cat_id(), self.storage.encode_date(begin_date),
+                                                self.storage.encode_date(end_date)])
+
+    def get_stats(self, period: str = "month", begin_date: date | None = None,
+                  end_date: date | None = None) -> list[tuple[date, int, float, float, float, float | None]]:
+        """
+        Returns per-period weight statistics from the rollup tables, without reading the raw records.
+
+        Parameters:
+        - period (str): 'week', 'month' or 'year'.
+        - begin_date (date | None): Only periods starting on or after this date.
+        - end_date (date | None): Only periods starting on or before this date.
+
+        Returns:
+        - list[tuple[date, int, float, float, float, float | None]]:
+          (period start, count, min, max, mean, sample standard deviation) for each period in date order.
+          The standard deviation is None for periods with a single record.
+
+        Raises:
+        - ValueError: If period is unknown.
+        """
+        if period not in rollups.PERIODS:
+            raise ValueError(f"Unknown period: {period}")
+        if self.conn == None:
+            return []
+
+        query = """
+            SELECT period_start, count, min_weight, max_weight, sum_weight, sum_sq_weight
+            FROM weight_rollups
+            WHERE cat_id = ? AND period = ?
+        """
+        params: list = [self._resolve_cat_id(), period]
+        if begin_date is not None:
+            query += " AND period_start >= ?"
+            params.append(begin_date.isoformat())
+        if end_date is not None:
+            query += " AND period_start <= ?"
+            params.append(end_date.isoformat())
+        query += " ORDER BY period_start"
+
+        stats = []
+        for start, count, min_weight, max_weight, total, total_sq in self.conn.execute(query, params):
+            stats.append((DateType.fromisoformat(start), count, min_weight, max_weight)
+                         + rollups.mean_and_std(count, total, total_sq))
+        return stats
+
+    def get_aggregated(self, begin_date: date | None = None, end_date: date | None = None, bucket: str = "day",
+                       stats: Iterable[str] = ("mean",)) -> list[tuple]:
+        """
+        Aggregates the current cat's weights per day, week, month or year inside SQLite
+        and returns only the aggregated rows.
+
+        Unlike get_stats, the range applies to the records, so the first and last buckets
+        only cover the records within the range. The range is a primary key range scan.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range (inclusive). None means no lower bound.
+        - end_date (date | None): The end date of the range (inclusive). None means no upper bound.
+        - bucket (str): 'day', 'week' (starting on Monday), 'month' or 'year'.
+        - stats (Iterable[str]): Statistics to compute, in the order they are returned:
+          'count', 'min', 'max', 'mean', 'std' (sample standard deviation, None for a single record) and 'sum'.
+
+        Returns:
+        - list[tuple]: (bucket start, *stats) for each bucket with records, in date order.
+
+        Raises:
+        - ValueError: If the bucket or a statistic is unknown.
+        """
+        stats = list(stats)
+        if bucket not in AGGREGATE_BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket}")
+        unknown = [name for name in stats if name not in AGGREGATE_STATS]
+        if unknown:
+            raise ValueError(f"Unknown statistic: {', '.join(unknown)}")
+        if self.conn == None:
+            return []
+
+        storage = self.storage
+        weight = storage.weight_sql("weight")
+        if bucket == "day":
+            # 1 日 1 件なので、主キーの順に読むだけで集計用のソートは要らない
+            start, group = storage.iso_date_sql("date"), "date"
+        else:
+            start = rollups.PERIOD_START_SQL[bucket].format(d=storage.date_sql("date"))
+            group = start
+        query = f"""
+            SELECT {start}, COUNT(*), MIN({weight}), MAX({weight}), SUM({weight}), SUM({weight} * {weight})
+            FROM cat_weight_records
+            WHERE cat_id = ?
+        """
+        params: list = [self._resolve_cat_id()]
+        if begin_date is not None:
+            query += " AND date >= ?"
+            params.append(storage.encode_date(begin_date))
+        if end_date is not None:
+            query += " AND date <= ?"
+            params.append(storage.encode_date(end_date))
+        query += f" GROUP BY {group} ORDER BY {group}"
+
+        rows = []
+        with self.phase("aggregate"):
+            for period_start, count, min_weight, max_weight, total, total_sq in self.conn.execute(query, params):
+                values = {"count": count, "min": min_weight, "max": max_weight, "sum": total}
+                if "mean" in stats or "std" in stats:
+                    values["mean"], values["std"] = rollups.mean_and_std(count, total, total_sq)
+                rows.append((DateType.fromisoformat(period_start),) + tuple(values[name] for name in stats))
+        return rows
+
+    def content_fingerprint(self) -> str:
+        """
+        Returns a fingerprint of the current cat's dates and weights, e.g. for cache keys.
+
+        The fingerprint combines the cat's content version, which triggers bump on every
+        write, with its yearly rollups (see versions.py), so computing it does not read the
+        raw records. It changes whenever a record of the cat is added, deleted, or its date
+        or weight changes.
+
+        Returns:
+        - str: Hex digest identifying the current content.
+        """
+        if self.conn == None:
+            return ""
+        cat_id = self._resolve_cat_id()
+        digest = versions.fingerprints(self.conn, cat_id).get(cat_id, "") if cat_id is not None else ""
+        return hashlib.sha256(repr((self.db_file, cat_id, digest)).encode()).hexdigest()
+
+    def rebuild_rollups(self) -> tuple[list[tuple[int, str, str]], int]:
+        """
+        Recomputes the rollup tables from scratch, creating them if necessary.
+
+        Returns:
+        - tuple[list[tuple[int, str, str]], int]: The (cat_id, period, period_start) keys that were out of sync
+          with the raw records before the rebuild, and the number of rollup rows written.
+        """
+        if self.conn == None:
+            return [], 0
+        with self.conn:
+            if rollups.create_rollups(self.conn, self.storage):
+                return [], self.conn.execute("SELECT COUNT(*) FROM weight_rollups").fetchone()[0]
+            mismatches = rollups.check_rollups(self.conn, self.storage)
+            return mismatches, rollups.rebuild_rollups(self.conn, storage=self.storage)
+
+    def check_rollups(self) -> list[tuple[int, str, str]]:
+        """
+        Checks the rollup tables against the raw records.
+
+        Returns:
+        - list[tuple[int, str, str]]: (cat_id, period, period_start) of every rollup that does not match.
+        """
+        if self.conn == None:
+            return []
+        return rollups.check_rollups(self.conn, self.storage)
+
+    def search_notes(self, query: str, begin_date: date | None = None, end_date: date | None = None,
+                     limit: int | None = 20, all_cats: bool = False) -> list[tuple[str, date, float, str, float]]:
+        """
+        Searches the notes with the full-text index and returns the best matches first.
+
+        Parameters:
+        - query (str): FTS5 query, e.g. 'vet', 'vet AND vaccine', '"diet change"' or 'medic*'.
+        - begin_date (date | None): Only records on or after this date.
+        - end_date (date | None): Only records on or before this date.
+        - limit (int | None): Maximum number of matches. None returns all.
+        - all_cats (bool): Search the records of every cat instead of the current cat.
+
+        Returns:
+        - list[tuple[str, date, float, str, float]]: (cat, date, weight, notes, score) tuples
+          ordered by relevance (BM25; higher scores are better matches).
+
+        Raises:
+        - ValueError: If the database has no notes index or the query is not valid FTS5 syntax.
+        """
+        if self.conn == None:
+            return []
+        if not notes_index.index_exists(self.conn):
+            raise ValueError(f"{self.db_file} has no notes index. Run 'catdb.py rebuild-search-index' to create it.")
+
+        storage = self.storage
+        query_sql = f"""
+            SELECT c.name, r.date, {storage.weight_sql("r.weight")}, r.notes, -notes_fts.rank
+            FROM notes_fts
+            JOIN cat_weight_records r
+                ON r.cat_id = {notes_index.cat_id_sql("notes_fts.rowid")} AND r.date = {notes_index.stored_date_sql("notes_fts.rowid", storage)}
+            JOIN cats c ON c.cat_id = r.cat_id
+            WHERE notes_fts MATCH ?
+        """
+        params: list = [query]
+        if not all_cats:
+            cat_id = self._resolve_cat_id()
+            if cat_id is None:
+                return []
+            # 猫と日付の範囲は rowid の範囲になるので、索引を読む段階で絞り込める
+            query_sql += " AND notes_fts.rowid BETWEEN ? AND ?"
+            params.extend(notes_index.key_range(cat_id, begin_date, end_date))
+        else:
+            if begin_date is not None:
+                query_sql += " AND r.date >= ?"
+                params.append(storage.encode_date(begin_date))
+            if end_date is not None:
+                query_sql += " AND r.date <= ?"
+                params.append(storage.encode_date(end_date))
+        query_sql += " ORDER BY notes_fts.rank"
+        if limit is not None:
+            query_sql += " LIMIT ?"
+            params.append(limit)
+
+        try:
+            with self.phase("search"):
+                rows = self.conn.execute(query_sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            if "fts5" in str(e) or "syntax error" in str(e):
+                raise ValueError(f"Invalid search query {query!r}: {e}")
+            raise
+        return [(name, storage.decode_date(day), weight, notes, score) for name, day, weight, notes, score in rows]
+
+    def rebuild_notes_index(self, tokenizer: str | None = None) -> int:
+        """
+        Creates the full-text index over the notes if it is missing and refills it from the records.
+
+        Parameters:
+        - tokenizer (str | None): 'unicode61' or 'trigram'. If given, the index is recreated with
+          this tokenizer. None keeps the current one ('unicode61' for a new index).
+
+        Returns:
+        - int: Number of indexed records.
+
+        Raises:
+        - ValueError: If the tokenizer is unknown or SQLite was built without FTS5.
+        """
+        if self.conn == None:
+            return 0
+        with self.conn:
+            # 索引の削除と作り直しを 1 つのトランザクションにする (bulk_upsert を参照)
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            if tokenizer is not None:
+                notes_index.drop_notes_index(self.conn)
+            if notes_index.create_notes_index(self.conn, self.storage, tokenizer or "unicode61"):
+                # 作成時に記録から索引を作っている
+                return self.conn.execute("SELECT COUNT(*) FROM notes_fts").fetchone()[0]
+            if not notes_index.index_exists(self.conn):
+                raise ValueError("This SQLite build does not support FTS5")
+            return notes_index.rebuild_notes_index(self.conn, self.storage)
+
+    def iter_changes(self, since: int = 0, limit: int | None = None, all_cats: bool = True,
+                     chunk_size: int = 1000) -> Iterator[tuple[int, str, date, str, float | None, str | None, str]]:
+        """
+        Streams the changes to the records after a sequence number, in order.
+
+        Applying the changes in order to a copy of the records (upsert for 'insert' and
+        'update', delete for 'delete') brings the copy up to date. Remember the sequence
+        number of the last change and pass it as since next time.
+
+        Parameters:
+        - since (int): Return the changes with a higher sequence number. 0 returns the whole log.
+        - limit (int | None): Maximum number of changes. None means no limit.
+        - all_cats (bool): Include the changes of every cat. False only returns the current cat's.
+        - chunk_size (int): Number of rows fetched from the cursor at a time.
+
+        Returns:
+        - Iterator[tuple[int, str, date, str, float | None, str | None, str]]:
+          (seq, cat, date, op, weight, notes, changed_at) tuples. op is 'insert', 'update' or 'delete';
+          weight and notes are None for deletes. changed_at is an ISO 8601 UTC time.
+
+        Raises:
+        - ValueError: If the database has no change log, or changes after since were removed by retention.
+        """
+        if self.conn == None:
+            return
+        try:
+            pruned = changelog.pruned_through(self.conn)
+        except sqlite3.OperationalError:
+            raise ValueError(f"{self.db_file} has no change log. Run 'catdb.py init' to create it.")
+        if since < pruned:
+            raise ValueError(f"Changes up to seq {pruned} were removed by retention. Read the full table "
+                             f"and continue from seq {changelog.latest_seq(self.conn)}.")
+
+        query = """
+            SELECT ch.seq, c.name, ch.date, ch.op, ch.weight, ch.notes, ch.changed_at
+            FROM record_changes ch LEFT JOIN cats c ON c.cat_id = ch.cat_id
+            WHERE ch.seq > ?
+        """
+        params: list = [since]
+        if not all_cats:
+            query += " AND ch.cat_id = ?"
+            params.append(self._resolve_cat_id())
+        query += " ORDER BY ch.seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        cursor = self.conn.execute(query, params)
+        try:
+            while rows := cursor.fetchmany(chunk_size):
+                for seq, cat, day, op, weight, notes, changed_at in rows:
+                    yield seq, cat, DateType.fromisoformat(day), op, weight, notes, changed_at
+        finally:
+            cursor.close()
+
+    def get_changes(self, since: int = 0, limit: int | None = None,
+                    all_cats: bool = True) -> list[tuple[int, str, date, str, float | None, str | None, str]]:
+        """
+        Returns the changes after a sequence number as a list. See iter_changes.
+        """
+        return list(self.iter_changes(since, limit, all_cats))
+
+    def latest_change_seq(self) -> int:
+        """
+        Returns the sequence number of the latest change (0 if there has been none).
+
+        Returns:
+        - int: The sequence number. A consumer that has read the full table can continue from it.
+        """
+        if self.conn == None:
+            return 0
+        return changelog.latest_seq(self.conn)
+
+    def compact_changes(self, retain_days: float | None = None) -> tuple[int, int]:
+        """
+        Shrinks the change log: superseded changes are removed, and with retain_days
+        also changes older than that.
+
+        Parameters:
+        - retain_days (float | None): Keep changes from the last this many days. None keeps them all
+          (only superseded changes are removed).
+
+        Returns:
+        - tuple[int, int]: Number of superseded changes and of expired changes removed.
+        """
+        if self.conn == None:
+            return 0, 0
+        retain_before = None
+        if retain_days is not None:
+            retain_before = self.conn.execute(
+                "SELECT strftime('%Y-%m-%dT%H:%M:%fZ', 'now', ?)", (f"-{retain_days} days",)
+            ).fetchone()[0]
+        with self.conn:
+            return changelog.compact(self.conn, retain_before)
+
+    def update_forecasts(self, models: Iterable[str] | None = None, horizon: int = 30, level: float = 0.95,
+                         all_cats: bool = True, force: bool = False) -> tuple[int, int]:
+        """
+        Refits the weight forecasts of the cats whose records changed since their last fit
+        and stores them in the forecasts table. See catdb.forecast for the models.
+
+        Parameters:
+        - models (Iterable[str] | None): Models to fit ('linear', 'seasonal', 'damped'). None fits all.
+        - horizon (int): Number of days to forecast after the last record of each cat.
+        - level (float): Coverage of the prediction intervals (e.g. 0.95).
+        - all_cats (bool): Forecast every cat instead of only the current cat.
+        - force (bool): Refit even if the records did not change.
+
+        Returns:
+        - tuple[int, int]: Number of (cat, model) forecasts refitted and skipped as unchanged.
+
+        Raises:
+        - ValueError: If a model is unknown, horizon is not positive or level is not within (0, 1).
+        """
+        from catdb.forecast import MODELS, refresh_forecasts
+
+        if self.conn == None:
+            return 0, 0
+        run = refresh_forecasts([lambda: nullcontext(self)], models or MODELS, horizon, level,
+                                cats=None if all_cats else [self.cat], force=force)
+        return run.fitted, run.skipped
+
+    def get_forecasts(self, model: str | None = None,
+                      all_cats: bool = False) -> list[tuple[str, str, date, float, float, float]]:
+        """
+        Returns the stored weight forecasts (see update_forecasts).
+
+        Parameters:
+        - model (str | None): Only this model. None returns every model.
+        - all_cats (bool): Return the forecasts of every cat instead of the current cat.
+
+        Returns:
+        - list[tuple[str, str, date, float, float, float]]: (cat, model, date, weight, lower, upper)
+          tuples ordered by cat, model and date. Weights are in kg.
+        """
+        if self.conn == None:
+            return []
+        query = """
+            SELECT c.name, f.model, f.date, f.weight, f.lower, f.upper
+            FROM forecasts f JOIN cats c ON c.cat_id = f.cat_id
+            WHERE 1 = 1
+        """
+        params: list = []
+        if not all_cats:
+            query += " AND f.cat_id = ?"
+            params.append(self._resolve_cat_id())
+        if model is not None:
+            query += " AND f.model = ?"
+            params.append(model)
+        query += " ORDER BY c.name, f.model, f.date"
+        try:
+            rows = self.conn.execute(query, params).fetchall()
+        except sqlite3.OperationalError:
+            # まだ一度も予測していないデータベース
+            return []
+        return [(name, m, DateType.fromisoformat(day), weight, lower, upper)
+                for name, m, day, weight, lower, upper in rows]
+
+    def get_weight_arrays(self, begin_date: date | None = None,
+                          end_date: date | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Retrieves dates and weights as NumPy arrays, without building a DataFrame.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range (inclusive). None means no lower bound.
+        - end_date (date | None): The end date of the range (inclusive). None means no upper bound.
+
+        Returns:
+        - tuple[np.ndarray, np.ndarray]: Dates as datetime64[D] and weights as float64, in date order.
+        """
+        import numpy as np
+
+        if self.conn == None:
+            return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.float64)
+
+        query = f"SELECT date, {self.storage.weight_sql('weight')} FROM cat_weight_records WHERE cat_id = ?"
+        params: list = [self._resolve_cat_id()]
+        if begin_date is not None:
+            query += " AND date >= ?"
+            params.append(self.storage.encode_date(begin_date))
+        if end_date is not None:
+            query += " AND date <= ?"
+            params.append(self.storage.encode_date(end_date))
+        query += " ORDER BY date"
+
+        with self.phase("fetch"):
+            rows = self.conn.execute(query, params).fetchall()
+        with self.phase("to_numpy"):
+            dates = self.storage.to_datetime64([row[0] for row in rows])
+            weights = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        return dates, weights
+
+    def get_weight_series(self, begin_date: date | None = None, end_date: date | None = None,
+                          notes: bool = False, chunk_size: int = 10000) -> WeightSeries:
+        """
+        Retrieves the current cat's records as a WeightSeries, filled from the cursor in
+        chunks without building a DataFrame.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range (inclusive). None means no lower bound.
+        - end_date (date | None): The end date of the range (inclusive). None means no upper bound.
+        - notes (bool): Load the notes now. Otherwise they are loaded on first access,
+          which requires the database to be still open.
+        - chunk_size (int): Number of rows fetched from the cursor at a time.
+
+        Returns:
+        - WeightSeries: Dates and weights in date order.
+        """
+        return self._read_series(self._resolve_cat_id(), self.cat, begin_date, end_date, notes, chunk_size)
+
+    def iter_weight_series(self, begin_date: date | None = None, end_date: date | None = None,
+                           notes: bool = False, chunk_size: int = 10000,
+                           cats: Iterable[str] | None = None) -> Iterator[WeightSeries]:
+        """
+        Retrieves the records of every cat as one WeightSeries per cat, ordered by cat name.
+
+        Each cat is read with its own primary key range scan, and only one cat's arrays
+        are built at a time.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range (inclusive). None means no lower bound.
+        - end_date (date | None): The end date of the range (inclusive). None means no upper bound.
+        - notes (bool): Load the notes now instead of on first access.
+        - chunk_size (int): Number of rows fetched from the cursor at a time.
+        - cats (Iterable[str] | None): Only read these cats. None reads every cat.
+
+        Returns:
+        - Iterator[WeightSeries]: One series per cat (cat set to the cat's name).
+        """
+        if self.conn == None:
+            return
+        wanted = set(cats) if cats is not None else None
+        for cat_id, name in self.conn.execute("SELECT cat_id, name FROM cats ORDER BY name").fetchall():
+            if wanted is None or name in wanted:
+                yield self._read_series(cat_id, name, begin_date, end_date, notes, chunk_size)
+
+    def _read_series(self, cat_id: int | None, cat: str, begin_date: date | None, end_date: date | None,
+                     notes: bool, chunk_size: int) -> WeightSeries:
+        """Reads one cat's dates and weights chunk by chunk into a WeightSeries."""
+        import numpy as np
+        from catdb.series import WeightSeries
+
+        if self.conn == None:
+            return WeightSeries.concatenate([], cat=cat)
+        storage = self.storage
+        query = f"SELECT date, {storage.weight_sql('weight')} FROM cat_weight_records WHERE cat_id = ?"
+        params: list = [cat_id]
+        if begin_date is not None:
+            query += " AND date >= ?"
+            params.append(storage.encode_date(begin_date))
+        if end_date is not None:
+            query += " AND date <= ?"
+            params.append(storage.encode_date(end_date))
+        query += " ORDER BY date"
+
+        parts = []
+        with self.phase("fetch_series"):
+            cursor = self.conn.execute(query, params)
+            try:
+                while rows := cursor.fetchmany(chunk_size):
+                    dates = storage.to_datetime64([row[0] for row in rows])
+                    weights = np.fromiter((row[1] for row in rows), dtype=np.float32, count=len(rows))
+                    parts.append((dates, weights))
+            finally:
+                cursor.close()
+
+        series = WeightSeries.concatenate(parts, cat=cat, notes_loader=lambda dates: self._load_notes(cat_id, dates))
+        if notes:
+            series.notes
+        return series
+
+    def _load_notes(self, cat_id: int | None, dates: np.ndarray) -> np.ndarray:
+        """
+        Returns the notes of a cat's records on the given (sorted) dates as an object array.
+        Only records that have notes are read.
+
+        Raises:
+        - ValueError: If the database has been closed.
+        """
+        import numpy as np
+
+        notes = np.full(len(dates), None, dtype=object)
+        if not len(dates):
+            return notes
+        if self.conn == None:
+            raise ValueError("Cannot load notes: the database is closed. Request them with notes=True.")
+        storage = self.storage
+        rows = self.conn.execute(
+            "SELECT date, notes FROM cat_weight_records "
+            "WHERE cat_id = ? AND date BETWEEN ? AND ? AND notes IS NOT NULL ORDER BY date",
+            (cat_id, storage.encode_date(dates[0].item()), storage.encode_date(dates[-1].item()))
+        ).fetchall()
+        if rows:
+            found = storage.to_datetime64([row[0] for row in rows])
+            positions = np.searchsorted(dates, found)
+            # 範囲内でもこの系列に含まれない日付 (部分的な切り出し) は捨てる
+            inside = positions < len(dates)
+            inside[inside] = dates[positions[inside]] == found[inside]
+            notes[positions[inside]] = np.array([row[1] for row in rows], dtype=object)[inside]
+        return notes
+
+    def iter_record_chunks(self, begin_date: date | None = None, end_date: date | None = None,
+                           chunk_size: int = 1000, after: date | None = None, limit: int | None = None,
+                           newest_first: bool = False) -> Iterator[list[tuple[date, float, str | None]]]:
+        """
+        Streams records in date order as lists of at most chunk_size rows, using fetchmany.
+        Only one chunk is held in memory at a time.
+
+        after and limit page through the records by keyset: the next page starts after the
+        last date of the previous one. This is a seek on the primary key, so every page
+        costs the same no matter how deep it is.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range (inclusive). None means no lower bound.
+        - end_date (date | None): The end date of the range (inclusive). None means no upper bound.
+        - chunk_size (int): Number of rows fetched from the cursor at a time.
+        - after (date | None): Only records that come after this date in the listing order
+          (later dates, or earlier dates when newest_first). The date itself is excluded.
+        - limit (int | None): Maximum number of records. None means no limit.
+        - newest_first (bool): List the newest records first.
+
+        Returns:
+        - Iterator[list[tuple[date, float, str | None]]]: Chunks of (date, weight, notes) tuples.
+        """
+        if self.conn == None:
+            return
+
+        query = f"SELECT {self._record_columns()} FROM cat_weight_records WHERE cat_id = ?"
+        params: list = [self._resolve_cat_id()]
+        if begin_date is not None:
+            query += " AND date >= ?"
+            params.append(self.storage.encode_date(begin_date))
+        if end_date is not None:
+            query += " AND date <= ?"
+            params.append(self.storage.encode_date(end_date))
+        if after is not None:
+            query += " AND date < ?" if newest_first else " AND date > ?"
+            params.append(self.storage.encode_date(after))
+        query += " ORDER BY date DESC" if newest_first else " ORDER BY date"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        decode_date = self.storage.decode_date
+        cursor = self.conn.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [(decode_date(d), w, n) for d, w, n in rows]
+        finally:
+            cursor.close()
+
+    def iter_records(self, begin_date: date | None = None, end_date: date | None = None,
+                     chunk_size: int = 1000, after: date | None = None, limit: int | None = None,
+                     newest_first: bool = False) -> Iterator[tuple[date, float, str | None]]:
+        """
+        Streams records one by one in date order without materializing the whole result.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range (inclusive). None means no lower bound.
+        - end_date (date | None): The end date of the range (inclusive). None means no upper bound.
+        - chunk_size (int): Number of rows fetched from the cursor at a time.
+        - after (date | None): Only records after this date in the listing order (see iter_record_chunks).
+        - limit (int | None): Maximum number of records. None means no limit.
+        - newest_first (bool): List the newest records first.
+
+        Returns:
+        - Iterator[tuple[date, float, str | None]]: (date, weight, notes) tuples.
+        """
+        for chunk in self.iter_record_chunks(begin_date, end_date, chunk_size, after, limit, newest_first):
+            yield from chunk
 
     def update_weight_record(self, date: date, weight: float, notes: str | None = None) -> bool:
         """
@@ -152,8 +1255,8 @@ class CatWeightDB:
         
         with self.conn:
             cursor = self.conn.execute(
-                "UPDATE cat_weight_records SET weight = ?, notes = ? WHERE date = ?",
-                (weight, notes, date.isoformat())
+                "UPDATE cat_weight_records SET weight = ?, notes = ? WHERE cat_id = ? AND date = ?",
+                (self.storage.encode_weight(weight), notes, self._resolve_cat_id(), self.storage.encode_date(date))
             )
             return cursor.rowcount > 0
 
@@ -166,21 +1269,290 @@ class CatWeightDB:
 
         Notes:
         - Uses SQLite3 UPSERT feature (INSERT OR REPLACE) to perform the operation.
+        - Columns are converted as a whole and written with a single executemany call.
         """
         if self.conn == None:
             return False
 
         with self.conn:
-            for _, record in records.iterrows():
-                self.conn.execute("""
-                    INSERT INTO cat_weight_records (date, weight, notes)
-                    VALUES (?, ?, ?)
-                    ON CONFLICT(date) DO UPDATE SET
-                        weight = excluded.weight,
-                        notes = excluded.notes
-                """, (record['date'].isoformat(), record['weight'], record['notes']))
+            cat_id = self._resolve_cat_id(create=True)
+            with self.phase("convert"):
+                rows = _records_to_rows(records, cat_id, self.storage)
+            with self.phase("upsert"):
+                self.conn.executemany(UPSERT_SQL, rows)
         return True
 
+    def import_csv(self, csv_file: str, chunk_size: int = 50000,
+                   journal_mode: str | None = None, synchronous: str | None = None) -> int:
+        """
+        Streams a CSV file into the database in chunks using batched upserts.
+
+        The whole load runs in a single transaction. The rollup triggers are suspended
+        during the load and the cat's rollups are rebuilt at the end. By default the load
+        keeps the database's journal mode and synchronous level. Faster settings such as
+        MEMORY / OFF must be asked for explicitly: they are applied for the duration of the
+        load and restored afterwards, but a crash during the load can then corrupt the
+        whole file, including the records that were there before.
+
+        Parameters:
+        - csv_file (str): Path to a CSV file with 'date', 'weight' and optional 'notes' columns.
+        - chunk_size (int): Number of rows read and written per batch.
+        - journal_mode (str | None): SQLite journal mode used during the load (e.g. MEMORY, WAL, DELETE).
+          None keeps the current one.
+        - synchronous (str | None): SQLite synchronous level used during the load (OFF, NORMAL, FULL).
+          None keeps the current one.
+
+        Returns:
+        - int: Number of rows written (added or changed). Rows identical to the stored record are not counted.
+
+        Raises:
+        - ValueError: If the CSV file lacks the 'date' or 'weight' column, or a date or weight is invalid.
+        """
+        if self.conn == None:
+            return 0
+
+        saved_journal_mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        saved_synchronous = self.conn.execute("PRAGMA synchronous").fetchone()[0]
+        if journal_mode is not None:
+            self.conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        if synchronous is not None:
+            self.conn.execute(f"PRAGMA synchronous = {synchronous}")
+
+        import pandas as pd
+
+        def chunks() -> Iterator[pd.DataFrame]:
+            for chunk in pd.read_csv(csv_file, chunksize=chunk_size, dtype={"date": str}):
+                if "date" not in chunk.columns or "weight" not in chunk.columns:
+                    raise ValueError("CSV file must have 'date' and 'weight' columns")
+                yield chunk
+
+        try:
+            return self.bulk_upsert(chunks())
+        finally:
+            if journal_mode is not None:
+                self.conn.execute(f"PRAGMA journal_mode = {saved_journal_mode}")
+            if synchronous is not None:
+                self.conn.execute(f"PRAGMA synchronous = {saved_synchronous}")
+
+    def bulk_upsert(self, batches: Iterable[pd.DataFrame]) -> int:
+        """
+        Upserts many batches of records of the current cat in a single transaction.
+
+        The rollup triggers are suspended while the batches are written and the cat's
+        rollups are rebuilt at the end, which is much faster than maintaining them row
+        by row. If a batch (or the iterable) raises, nothing is written.
+
+        Parameters:
+        - batches (Iterable[pd.DataFrame]): DataFrames with 'date', 'weight' and optional 'notes' columns.
+
+        Returns:
+        - int: Number of rows written (added or changed). Rows identical to the stored record are not counted.
+        """
+        if self.conn == None:
+            return 0
+
+        storage = self.storage
+        total = 0
+        with self.conn:
+            # トリガーの削除もトランザクションに含める。sqlite3 は DML の前にしか BEGIN を発行しないため、
+            # 猫の cat_id がキャッシュ済みだと DROP TRIGGER が自動コミットされ、失敗時にトリガーが消えたままになる
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            cat_id = self._resolve_cat_id(create=True)
+            # 行ごとに集計トリガーを動かすより、読み込み後にこの猫の集計を作り直す方が速い (版数も最後に 1 回だけ上げる)
+            rollups.drop_triggers(self.conn)
+            has_versions = versions.versions_exist(self.conn)
+            versions.drop_triggers(self.conn)
+            with self.phase("load"):
+                for batch in batches:
+                    total += self.conn.executemany(UPSERT_SQL, _records_to_rows(batch, cat_id, storage)).rowcount
+            with self.phase("rebuild_rollups"):
+                rollups.rebuild_rollups(self.conn, cat_id, storage)
+                rollups.create_triggers(self.conn, storage)
+                if has_versions:
+                    versions.bump(self.conn, cat_id)
+                    versions.create_triggers(self.conn)
+        return total
+
+    def apply_operations(self, operations: Iterable[tuple[str, str | None, date, float | None, str | None]],
+                         commit_every: int = 0, batch_size: int = 1000) -> dict[str, list[int]]:
+        """
+        Applies a stream of add / update / delete operations through this connection.
+
+        Consecutive operations of the same type are written together with executemany.
+        Without commit_every, everything is applied in a single transaction.
+
+        Parameters:
+        - operations (Iterable[tuple]): (op, cat, date, weight, notes) tuples. op is 'add', 'update' or 'delete';
+          cat None means the current cat; weight and notes are ignored for 'delete'.
+        - commit_every (int): Commit after this many operations. 0 commits once at the end.
+        - batch_size (int): Maximum number of operations passed to one executemany call.
+
+        Returns:
+        - dict[str, list[int]]: [succeeded, failed] counts for each operation type.
+          add fails if the record exists, update and delete fail if it does not.
+
+        Raises:
+        - ValueError: If an operation type is unknown.
+        """
+        stats: dict[str, list[int]] = {op: [0, 0] for op in BATCH_SQL}
+        if self.conn == None:
+            return stats
+
+        encode_date, encode_weight = self.storage.encode_date, self.storage.encode_weight
+        cat_ids: dict[str, int | None] = {}
+        pending_op: str | None = None
+        pending: list[tuple] = []
+        since_commit = 0
+
+        def cat_id_for(cat: str | None, create: bool) -> int | None:
+            name = cat or self.cat
+            cat_id = cat_ids.get(name)
+            # 未登録の猫は add が来たときに登録する
+            if cat_id is None and (create or name not in cat_ids):
+                cat_id = self._lookup_cat_id(name, create)[0]
+                cat_ids[name] = cat_id
+            return cat_id
+
+        def flush() -> None:
+            if pending:
+                cursor = self.conn.executemany(BATCH_SQL[pending_op], pending)
+                stats[pending_op][0] += cursor.rowcount
+                stats[pending_op][1] += len(pending) - cursor.rowcount
+                pending.clear()
+
+        try:
+            for op, cat, record_date, weight, notes in operations:
+                if op not in BATCH_SQL:
+                    raise ValueError(f"Unknown operation: {op}")
+                if op != pending_op or len(pending) >= batch_size:
+                    flush()
+                    pending_op = op
+                if op == "add":
+                    pending.append((cat_id_for(cat, True), encode_date(record_date), encode_weight(weight), notes))
+                elif op == "update":
+                    pending.append((encode_weight(weight), notes, cat_id_for(cat, False), encode_date(record_date)))
+                else:
+                    pending.append((cat_id_for(cat, False), encode_date(record_date)))
+
+                since_commit += 1
+                if commit_every and since_commit >= commit_every:
+                    flush()
+                    self.conn.commit()
+                    since_commit = 0
+            flush()
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return stats
+
+    def add_readings(self, new_readings: Iterable[tuple[str | None, datetime, float, str | None]],
+                     daily: str = "median") -> tuple[int, int]:
+        """
+        Stores timestamped readings and derives the daily records of the days they fall on,
+        in a single transaction.
+
+        The daily record of a day is the median (or the last) of all its readings, including
+        the ones stored before. Notes of existing daily records are kept. A reading with the
+        same cat, timestamp and device as a stored one replaces it.
+
+        Parameters:
+        - new_readings (Iterable[tuple]): (cat, timestamp, weight, device) tuples. cat None means the
+          current cat; naive timestamps are local time; weight is in kg; device may be None.
+        - daily (str): How the daily records are derived: 'median' or 'last'.
+
+        Returns:
+        - tuple[int, int]: Number of readings stored and of daily records written.
+
+        Raises:
+        - ValueError: If daily is unknown, a reading is invalid, or the database has no readings table.
+        """
+        if daily not in readings.DAILY_METHODS:
+            raise ValueError(f"Unknown daily method: {daily}")
+        if self.conn == None:
+            return 0, 0
+        if not readings.readings_exist(self.conn):
+            raise ValueError(f"{self.db_file} has no readings table. Run 'catdb.py init' to create it.")
+
+        storage = self.storage
+        cat_ids: dict[str, int] = {}
+        rows: list[tuple[int, int, int, str, float]] = []
+        touched: dict[int, set[int]] = {}
+        with self.conn:
+            for cat, timestamp, weight, device in new_readings:
+                name = cat or self.cat
+                cat_id = cat_ids.get(name)
+                if cat_id is None:
+                    cat_id = cat_ids[name] = self._lookup_cat_id(name, create=True)[0]
+                day, ts, device, weight = readings.encode_reading(timestamp, weight, device)
+                rows.append((cat_id, day, ts, device, weight))
+                touched.setdefault(cat_id, set()).add(day)
+            with self.phase("load"):
+                self.conn.executemany(readings.UPSERT_READING_SQL, rows)
+            # 読み取りのあった日だけ日ごとの記録を求め直す
+            with self.phase("derive_daily"):
+                days = sum(readings.derive_daily(self.conn, storage, cat_id, cat_days, daily)
+                           for cat_id, cat_days in touched.items())
+        return len(rows), days
+
+    def get_readings(self, begin_date: date | None = None,
+                     end_date: date | None = None) -> list[tuple[datetime, str, float]]:
+        """
+        Returns the current cat's readings within a date range, oldest first.
+
+        Parameters:
+        - begin_date (date | None): First day (local date). None means no lower bound.
+        - end_date (date | None): Last day (local date). None means no upper bound.
+
+        Returns:
+        - list[tuple[datetime, str, float]]: (timestamp, device, weight) tuples. Timestamps are naive local
+          times; device is '' if unknown.
+        """
+        if self.conn == None:
+            return []
+        cat_id = self._resolve_cat_id()
+        if cat_id is None or not readings.readings_exist(self.conn):
+            return []
+        days = STORAGES[2]
+        query = "SELECT ts, device, weight FROM weight_readings WHERE cat_id = ?"
+        params: list = [cat_id]
+        if begin_date is not None:
+            query += " AND day >= ?"
+            params.append(days.encode_date(begin_date))
+        if end_date is not None:
+            query += " AND day <= ?"
+            params.append(days.encode_date(end_date))
+        query += " ORDER BY day, ts, device"
+        return [(readings.decode_timestamp(ts), device, weight)
+                for ts, device, weight in self.conn.execute(query, params)]
+
+    def derive_daily_records(self, daily: str = "median", all_cats: bool = False) -> int:
+        """
+        Recomputes the daily records from all stored readings, e.g. after switching between
+        median and last. Days without readings are left as they are.
+
+        Parameters:
+        - daily (str): 'median' or 'last'.
+        - all_cats (bool): Recompute the records of every cat instead of the current cat.
+
+        Returns:
+        - int: Number of daily records written.
+
+        Raises:
+        - ValueError: If daily is unknown or the database has no readings table.
+        """
+        if self.conn == None:
+            return 0
+        if not readings.readings_exist(self.conn):
+            raise ValueError(f"{self.db_file} has no readings table. Run 'catdb.py init' to create it.")
+        if all_cats:
+            cat_ids = [row[0] for row in self.conn.execute("SELECT DISTINCT cat_id FROM weight_readings")]
+        else:
+            cat_id = self._resolve_cat_id()
+            cat_ids = [cat_id] if cat_id is not None else []
+        with self.conn, self.phase("derive_daily"):
+            return sum(readings.derive_daily(self.conn, self.storage, cat_id, None, daily) for cat_id in cat_ids)
 
     def delete_weight_record(self, date: date) -> bool:
         """
@@ -195,6 +1567,9 @@ class CatWeightDB:
         if self.conn == None:
             return False
         with self.conn:
-            cursor = self.conn.execute("DELETE FROM cat_weight_records WHERE date = ?", (date.isoformat(),))
+            cursor = self.conn.execute(
+                "DELETE FROM cat_weight_records WHERE cat_id = ? AND date = ?",
+                (self._resolve_cat_id(), self.storage.encode_date(date))
+            )
             return cursor.rowcount > 0
         
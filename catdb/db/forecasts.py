@@ -0,0 +1,121 @@
+"""
+Stored weight forecasts.
+
+forecasts holds one row per cat, model and forecast day with the projected weight and
+the bounds of its prediction interval. forecast_runs records, per cat and model, the
+fingerprint of the records the forecast was fitted to and the settings it was made
+with, so that a later run only refits the cats whose records (or the settings) changed.
+
+The fingerprint is the one CatWeightDB.content_fingerprint is built from (see
+versions.fingerprints), so checking thousands of cats does not read their records.
+
+Like the rollups, forecasts hold ISO dates and weights in kg whatever the storage format
+of the records (see storage.py).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from sqlite3 import Connection
+from typing import Iterable
+
+CREATE_FORECASTS_SQL = """
+    CREATE TABLE IF NOT EXISTS forecasts (
+        cat_id INTEGER NOT NULL REFERENCES cats(cat_id) ON DELETE CASCADE,
+        model TEXT NOT NULL,
+        date TEXT NOT NULL,
+        weight REAL NOT NULL,
+        lower REAL NOT NULL,
+        upper REAL NOT NULL,
+        PRIMARY KEY (cat_id, model, date)
+    ) WITHOUT ROWID
+"""
+
+CREATE_RUNS_SQL = """
+    CREATE TABLE IF NOT EXISTS forecast_runs (
+        cat_id INTEGER NOT NULL REFERENCES cats(cat_id) ON DELETE CASCADE,
+        model TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        settings TEXT NOT NULL,
+        last_date TEXT NOT NULL,
+        observations INTEGER NOT NULL,
+        residual_std REAL,
+        fitted_at TEXT NOT NULL,
+        PRIMARY KEY (cat_id, model)
+    ) WITHOUT ROWID
+"""
+
+
+def create_forecasts(conn: Connection) -> None:
+    """
+    Creates the forecasts and forecast_runs tables if they do not exist. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the multi-cat schema.
+    """
+    conn.execute(CREATE_FORECASTS_SQL)
+    conn.execute(CREATE_RUNS_SQL)
+
+
+def fitted_runs(conn: Connection) -> dict[tuple[int, str], tuple[str, str]]:
+    """
+    Returns the fingerprint and settings of the stored forecast of every cat and model.
+
+    Parameters:
+    - conn (Connection): Connection to the database.
+
+    Returns:
+    - dict[tuple[int, str], tuple[str, str]]: (fingerprint, settings) per (cat_id, model).
+      Empty if no forecasts were stored yet.
+    """
+    try:
+        rows = conn.execute("SELECT cat_id, model, fingerprint, settings FROM forecast_runs").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {(cat_id, model): (fingerprint, settings) for cat_id, model, fingerprint, settings in rows}
+
+
+def save_forecast(conn: Connection, cat_id: int, model: str, fingerprint: str, settings: str, last_date: str,
+                  observations: int, residual_std: float | None,
+                  rows: Iterable[tuple[str, float, float, float]]) -> int:
+    """
+    Replaces the stored forecast of a cat and model. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the forecasts tables.
+    - cat_id (int): The cat.
+    - model (str): Name of the model.
+    - fingerprint (str): Fingerprint of the records the forecast was fitted to.
+    - settings (str): Settings the forecast was made with.
+    - last_date (str): ISO date of the last record used.
+    - observations (int): Number of records used for the fit.
+    - residual_std (float | None): Standard deviation of the fit residuals in kg.
+    - rows (Iterable[tuple[str, float, float, float]]): (ISO date, weight, lower, upper) per forecast day.
+      Empty if the cat has too few records for the model; the run is still recorded so that the
+      cat is not refitted until its records change.
+
+    Returns:
+    - int: Number of forecast days stored.
+    """
+    rows = [(cat_id, model, day, weight, lower, upper) for day, weight, lower, upper in rows]
+    conn.execute("DELETE FROM forecasts WHERE cat_id = ? AND model = ?", (cat_id, model))
+    conn.executemany("INSERT INTO forecasts (cat_id, model, date, weight, lower, upper) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("""
+        INSERT OR REPLACE INTO forecast_runs
+            (cat_id, model, fingerprint, settings, last_date, observations, residual_std, fitted_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+    """, (cat_id, model, fingerprint, settings, last_date, observations, residual_std))
+    return len(rows)
+
+
+def forget_forecast(conn: Connection, cat_id: int, model: str) -> None:
+    """
+    Removes the stored forecast of a cat and model (e.g. after all its records were deleted). Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the forecasts tables.
+    - cat_id (int): The cat.
+    - model (str): Name of the model.
+    """
+    conn.execute("DELETE FROM forecasts WHERE cat_id = ? AND model = ?", (cat_id, model))
+    conn.execute("DELETE FROM forecast_runs WHERE cat_id = ? AND model = ?", (cat_id, model))
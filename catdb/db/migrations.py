@@ -0,0 +1,125 @@
+"""
+Schema migrations of catdb databases.
+
+MIGRATIONS maps each schema version to the step that upgrades a database from the
+previous version. migrate() applies the missing steps in order inside one transaction
+and records each applied version in the schema_version table, so an interrupted
+migration leaves the database at its original version.
+
+The record format changes (see storage.py) are applied by copying cat_weight_records
+into a new table with INSERT ... SELECT, converting the columns with SQL expressions.
+The rows never pass through Python, so the memory use does not depend on the size of
+the database.
+"""
+
+from sqlite3 import Connection
+from typing import Callable
+from catdb.db import changelog, notes_index, rollups
+from catdb.db.storage import LATEST_VERSION, STORAGES, Storage, get_schema_version, set_schema_version
+
+
+def _rewrite_records(conn: Connection, source: Storage, target: Storage) -> None:
+    """
+    Rewrites cat_weight_records from the source storage format to the target format.
+
+    Indexes and triggers on the table are recreated afterwards; the rollup, change log and
+    notes index triggers are generated for the new format and the rollups are recomputed
+    from the converted records. The copy is not recorded in the change log, and the notes
+    index stays valid because its keys do not depend on the format.
+    """
+    # DROP TABLE で消えるインデックスとトリガーを控えておく (集計・変更履歴・全文検索のトリガーは作り直す)
+    generated = ({f"weight_rollups_{event}" for event in ("insert", "delete", "update")}
+                 | set(changelog.TRIGGERS) | set(notes_index.TRIGGERS))
+    dependents = [
+        sql for name, sql in conn.execute("""
+            SELECT name, sql FROM sqlite_master
+            WHERE tbl_name = 'cat_weight_records' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+            ORDER BY type, name
+        """)
+        if name not in generated
+    ]
+    conn.execute("DROP TABLE IF EXISTS cat_weight_records_new")
+    conn.execute(target.records_table_sql("cat_weight_records_new"))
+    conn.execute(f"""
+        INSERT INTO cat_weight_records_new (cat_id, date, weight, notes)
+        SELECT cat_id, {target.date_from_sql("date", source)}, {target.weight_from_sql("weight", source)}, notes
+        FROM cat_weight_records
+        ORDER BY cat_id, date
+    """)
+    conn.execute("DROP TABLE cat_weight_records")
+    conn.execute("ALTER TABLE cat_weight_records_new RENAME TO cat_weight_records")
+    for sql in dependents:
+        conn.execute(sql)
+    rollups.create_rollups(conn, target)
+    rollups.rebuild_rollups(conn, storage=target)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='record_changes'").fetchone():
+        changelog.create_triggers(conn, target)
+    if notes_index.index_exists(conn):
+        notes_index.create_triggers(conn, target)
+
+
+def _upgrade_to_2(conn: Connection) -> None:
+    """Stores dates as days since 1970-01-01 instead of ISO text."""
+    _rewrite_records(conn, STORAGES[1], STORAGES[2])
+
+
+def _upgrade_to_3(conn: Connection) -> None:
+    """Stores weights as integer grams instead of REAL kilograms."""
+    _rewrite_records(conn, STORAGES[2], STORAGES[3])
+
+
+MIGRATIONS: dict[int, Callable[[Connection], None]] = {
+    2: _upgrade_to_2,
+    3: _upgrade_to_3,
+}
+
+
+def pending_migrations(conn: Connection, target: int = LATEST_VERSION) -> list[int]:
+    """
+    Returns the versions that migrate() would apply.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the multi-cat schema.
+    - target (int): Schema version to upgrade to.
+
+    Returns:
+    - list[int]: Versions in the order they would be applied. Empty if the database is up to date.
+
+    Raises:
+    - ValueError: If target is unknown or older than the current version.
+    """
+    if target not in STORAGES:
+        raise ValueError(f"Unknown schema version: {target} (latest is {LATEST_VERSION})")
+    current = get_schema_version(conn)
+    if target < current:
+        raise ValueError(f"Database is at schema version {current}; downgrading to {target} is not supported")
+    return list(range(current + 1, target + 1))
+
+
+def migrate(conn: Connection, target: int = LATEST_VERSION) -> list[int]:
+    """
+    Upgrades a database in place to the target schema version.
+
+    All steps run in a single transaction, which is committed at the end.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the multi-cat schema.
+    - target (int): Schema version to upgrade to.
+
+    Returns:
+    - list[int]: The versions that were applied.
+
+    Raises:
+    - ValueError: If target is unknown or older than the current version.
+    """
+    versions = pending_migrations(conn, target)
+    if not versions:
+        return []
+    with conn:
+        conn.execute("BEGIN")
+        # 旧形式のデータベースにも適用済みのバージョンを残す
+        set_schema_version(conn, versions[0] - 1)
+        for version in versions:
+            MIGRATIONS[version](conn)
+            set_schema_version(conn, version)
+    return versions
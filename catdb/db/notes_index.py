@@ -0,0 +1,173 @@
+"""
+Full-text index over the notes of the records.
+
+notes_fts is an FTS5 table with one row per record that has notes. cat_weight_records
+is a WITHOUT ROWID table, so the FTS rowid is derived from the primary key instead:
+
+    rowid = cat_id * 2**24 + (days since 1970-01-01 + 2**23)
+
+This keeps the index independent of the storage format (see storage.py), lets the
+triggers update or delete the entry of a record by rowid, and turns a date range of one
+cat into a rowid range that FTS5 applies while reading the index.
+
+Triggers on cat_weight_records keep the index in sync with every insert, update, upsert
+and delete, in the same transaction as the change.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from datetime import date
+from sqlite3 import Connection
+from catdb.db.storage import STORAGES, Storage, storage_for
+
+TRIGGERS = ("notes_fts_insert", "notes_fts_update", "notes_fts_delete")
+
+# unicode61 は空白と記号で区切る。分かち書きしない日本語のメモには trigram を使う
+TOKENIZERS = ("unicode61", "trigram")
+
+_DAY_BITS = 24
+_DAY_OFFSET = 1 << (_DAY_BITS - 1)
+
+# rowid の日付部分を求めるときに使う、日数で日付を保存する形式
+_DAYS = STORAGES[2]
+
+
+def row_key(cat_id: int, day: date) -> int:
+    """Returns the notes_fts rowid of a record."""
+    return (cat_id << _DAY_BITS) + _DAYS.encode_date(day) + _DAY_OFFSET
+
+
+def _key_sql(row: str, storage: Storage) -> str:
+    """Returns an expression of the notes_fts rowid of row (NEW, OLD or a table alias)."""
+    return f"(({row}.cat_id << {_DAY_BITS}) + {_DAYS.date_from_sql(f'{row}.date', storage)} + {_DAY_OFFSET})"
+
+
+def cat_id_sql(key: str) -> str:
+    """Returns an expression converting a notes_fts rowid to the cat_id of its record."""
+    return f"({key} >> {_DAY_BITS})"
+
+
+def stored_date_sql(key: str, storage: Storage) -> str:
+    """Returns an expression converting a notes_fts rowid to the stored date of its record."""
+    days = f"(({key} & {(1 << _DAY_BITS) - 1}) - {_DAY_OFFSET})"
+    return storage.date_from_sql(days, _DAYS)
+
+
+def index_exists(conn: Connection) -> bool:
+    """Returns True if the database has the notes index."""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='notes_fts'").fetchone() is not None
+
+
+def create_notes_index(conn: Connection, storage: Storage | None = None, tokenizer: str = "unicode61") -> bool:
+    """
+    Creates the notes index and its triggers if they do not exist. A newly created index
+    is filled from the existing records. Does not commit.
+
+    If SQLite was built without FTS5, nothing is created.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the multi-cat schema.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+    - tokenizer (str): 'unicode61' or 'trigram' (substring matches, e.g. for Japanese notes).
+
+    Returns:
+    - bool: True if the index was created, False if it already existed or FTS5 is not available.
+
+    Raises:
+    - ValueError: If the tokenizer is unknown.
+    """
+    if tokenizer not in TOKENIZERS:
+        raise ValueError(f"Unknown tokenizer: {tokenizer}")
+    storage = storage or storage_for(conn)
+    if index_exists(conn):
+        create_triggers(conn, storage)
+        return False
+    options = "unicode61 remove_diacritics 2" if tokenizer == "unicode61" else tokenizer
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE notes_fts USING fts5(notes, tokenize = '{options}')")
+    except sqlite3.OperationalError as e:
+        if "no such module" in str(e):
+            return False
+        raise
+    create_triggers(conn, storage)
+    rebuild_notes_index(conn, storage)
+    return True
+
+
+def create_triggers(conn: Connection, storage: Storage | None = None) -> None:
+    """
+    Creates the triggers that keep notes_fts in sync with the records, if they do not exist.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the notes index.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+    """
+    storage = storage or storage_for(conn)
+    has_notes = "{row}.notes IS NOT NULL AND {row}.notes <> ''"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON cat_weight_records
+        WHEN {has_notes.format(row="NEW")}
+        BEGIN
+            INSERT OR REPLACE INTO notes_fts (rowid, notes) VALUES ({_key_sql("NEW", storage)}, NEW.notes);
+        END
+    """)
+    # 体重だけの更新では索引に触れない
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF cat_id, date, notes ON cat_weight_records
+        WHEN OLD.notes IS NOT NEW.notes OR OLD.cat_id IS NOT NEW.cat_id OR OLD.date IS NOT NEW.date
+        BEGIN
+            DELETE FROM notes_fts WHERE rowid = {_key_sql("OLD", storage)};
+            INSERT OR REPLACE INTO notes_fts (rowid, notes)
+            SELECT {_key_sql("NEW", storage)}, NEW.notes WHERE {has_notes.format(row="NEW")};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON cat_weight_records
+        WHEN {has_notes.format(row="OLD")}
+        BEGIN
+            DELETE FROM notes_fts WHERE rowid = {_key_sql("OLD", storage)};
+        END
+    """)
+
+
+def drop_notes_index(conn: Connection) -> None:
+    """
+    Drops the notes index and its triggers. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to the database.
+    """
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute("DROP TABLE IF EXISTS notes_fts")
+
+
+def rebuild_notes_index(conn: Connection, storage: Storage | None = None) -> int:
+    """
+    Refills the notes index from the records and merges its segments. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the notes index.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+
+    Returns:
+    - int: Number of indexed records.
+    """
+    storage = storage or storage_for(conn)
+    conn.execute("DELETE FROM notes_fts")
+    rows = conn.execute(f"""
+        INSERT INTO notes_fts (rowid, notes)
+        SELECT {_key_sql("r", storage)}, r.notes FROM cat_weight_records r
+        WHERE r.notes IS NOT NULL AND r.notes <> ''
+    """).rowcount
+    # 一括投入でできた複数のセグメントを 1 つにまとめ、検索時に読む B-tree を減らす
+    conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')")
+    return rows
+
+
+def key_range(cat_id: int, begin_date: date | None, end_date: date | None) -> tuple[int, int]:
+    """Returns the notes_fts rowid range covering one cat's records within a date range."""
+    low = row_key(cat_id, begin_date) if begin_date is not None else cat_id << _DAY_BITS
+    high = row_key(cat_id, end_date) if end_date is not None else ((cat_id + 1) << _DAY_BITS) - 1
+    return low, high
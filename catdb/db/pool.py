@@ -0,0 +1,136 @@
+import queue
+import threading
+from contextlib import contextmanager
+from sqlite3 import Connection
+from typing import Iterator
+from catdb.db.database import CatWeightDB, DEFAULT_CAT, open_connection
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite3 connections for long-running callers.
+
+    SQLite allows only one writer at a time, so the pool keeps a single writer
+    connection guarded by a lock, and up to `readers` read-only connections that
+    are handed out to concurrent readers. WAL mode is enabled by default so that
+    readers are not blocked by the writer.
+
+    Example:
+        with ConnectionPool("cat.db", readers=4) as pool:
+            with pool.writer() as db:
+                db.add_weight_record(date(2024, 11, 16), 4.5)
+            with pool.reader() as db:
+                df = db.get_all_records()
+    """
+
+    def __init__(self, db_file: str, readers: int = 4, wal: bool = True, busy_timeout: float = 5.0) -> None:
+        """
+        Initializes the pool. Connections are opened lazily on first use.
+
+        Parameters:
+        - db_file (str): Path to the SQLite3 database file.
+        - readers (int): Maximum number of reader connections.
+        - wal (bool): Switch the database to WAL journal mode.
+        - busy_timeout (float): Seconds to wait for locks held by other processes.
+        """
+        if readers < 1:
+            raise ValueError("readers must be at least 1")
+        self.db_file: str = db_file
+        self.wal: bool = wal
+        self.busy_timeout: float = busy_timeout
+        self.max_readers: int = readers
+
+        self._writer_conn: Connection | None = None
+        self._writer_lock = threading.Lock()
+        self._idle_readers: queue.LifoQueue[Connection] = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(readers)
+        self._all_readers: list[Connection] = []
+        self._readers_lock = threading.Lock()
+        self._closed: bool = False
+
+    def _open(self) -> Connection:
+        return open_connection(self.db_file, wal=self.wal, busy_timeout=self.busy_timeout,
+                               check_same_thread=False)
+
+    @contextmanager
+    def writer(self, cat: str = DEFAULT_CAT) -> Iterator[CatWeightDB]:
+        """
+        Borrows the writer connection. Only one thread holds it at a time.
+
+        Parameters:
+        - cat (str): Name of the cat the returned instance reads and writes.
+
+        Yields:
+        - CatWeightDB: Instance bound to the writer connection.
+        """
+        with self._writer_lock:
+            if self._closed:
+                raise RuntimeError("ConnectionPool is closed")
+            if self._writer_conn is None:
+                self._writer_conn = self._open()
+            db = CatWeightDB.from_connection(self._writer_conn, self.db_file, cat=cat)
+            try:
+                yield db
+            finally:
+                # 途中で例外が出てもトランザクションを持ち越さない
+                if self._writer_conn.in_transaction:
+                    self._writer_conn.rollback()
+                db.close()
+
+    @contextmanager
+    def reader(self, cat: str = DEFAULT_CAT, timeout: float | None = None) -> Iterator[CatWeightDB]:
+        """
+        Borrows a read-only connection, blocking while all readers are in use.
+
+        Parameters:
+        - cat (str): Name of the cat the returned instance reads.
+        - timeout (float | None): Seconds to wait for a free reader. None waits forever.
+
+        Yields:
+        - CatWeightDB: Instance bound to a reader connection.
+
+        Raises:
+        - TimeoutError: If no reader became free within the timeout.
+        """
+        # Lock と違い、Semaphore では負の timeout は即座にタイムアウトする。待ち続けるには None を渡す
+        if not self._reader_slots.acquire(timeout=timeout):
+            raise TimeoutError("No reader connection available")
+        try:
+            if self._closed:
+                raise RuntimeError("ConnectionPool is closed")
+            try:
+                conn = self._idle_readers.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+                conn.execute("PRAGMA query_only = 1")
+                with self._readers_lock:
+                    self._all_readers.append(conn)
+            db = CatWeightDB.from_connection(conn, self.db_file, cat=cat)
+            try:
+                yield db
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                db.close()
+                self._idle_readers.put(conn)
+        finally:
+            self._reader_slots.release()
+
+    def close(self) -> None:
+        """Closes all pooled connections."""
+        self._closed = True
+        with self._writer_lock:
+            if self._writer_conn is not None:
+                self._writer_conn.close()
+                self._writer_conn = None
+        with self._readers_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+        while not self._idle_readers.empty():
+            self._idle_readers.get_nowait()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,354 @@
+"""
+Raw weight readings with sub-daily timestamps.
+
+weight_readings keeps every reading a scale or sensor reports, keyed by cat, local day,
+timestamp and source device:
+
+    cat_id, day (days since 1970-01-01 of the local date), ts (ms since the epoch, UTC),
+    device ('' if unknown), weight (kg)
+
+The day is part of the key so that all readings of a cat and day are one primary key
+range. cat_weight_records stays the daily view: after readings are written, the value
+of each affected day is derived from its readings (the median or the last reading) and
+upserted into cat_weight_records, so the rollups, the change log and every command that
+reads the daily records keep working. Notes of the daily records are left untouched.
+
+Like the rollups, the readings hold kg and format-independent dates, whatever the
+storage format of the records (see storage.py).
+
+ReadingBuffer accepts readings from any thread at high rates and writes them in batches
+from a single writer thread, when enough readings are pending or the oldest pending
+reading has waited long enough.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from datetime import datetime
+from sqlite3 import Connection
+from typing import Iterable
+from catdb.db.storage import STORAGES, Storage
+
+CREATE_READINGS_SQL = """
+    CREATE TABLE IF NOT EXISTS weight_readings (
+        cat_id INTEGER NOT NULL REFERENCES cats(cat_id) ON DELETE CASCADE,
+        day INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        device TEXT NOT NULL DEFAULT '',
+        weight REAL NOT NULL,
+        PRIMARY KEY (cat_id, day, ts, device)
+    ) WITHOUT ROWID
+"""
+
+# 同じ猫・時刻・機器の読み取りは送り直しとみなして上書きする
+UPSERT_READING_SQL = """
+    INSERT INTO weight_readings (cat_id, day, ts, device, weight)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(cat_id, day, ts, device) DO UPDATE SET weight = excluded.weight
+"""
+
+DAILY_METHODS = ("median", "last")
+
+# day 列は日数で日付を保存する形式と同じ
+_DAYS = STORAGES[2]
+
+# 日ごとの値を求める SQL。{where} に猫と日の条件が入る
+_DAILY_SQL = {
+    # 件数が偶数の日は中央の 2 つの平均
+    "median": """
+        SELECT day, round(AVG(weight), 3) AS weight FROM (
+            SELECT day, weight,
+                   ROW_NUMBER() OVER (PARTITION BY day ORDER BY weight) AS n,
+                   COUNT(*) OVER (PARTITION BY day) AS total
+            FROM weight_readings WHERE {where}
+        )
+        WHERE n IN ((total + 1) / 2, (total + 2) / 2)
+        GROUP BY day
+    """,
+    "last": """
+        SELECT day, weight FROM (
+            SELECT day, weight, ROW_NUMBER() OVER (PARTITION BY day ORDER BY ts DESC, device DESC) AS n
+            FROM weight_readings WHERE {where}
+        )
+        WHERE n = 1
+    """,
+}
+
+
+def create_readings(conn: Connection) -> None:
+    """
+    Creates the weight_readings table if it does not exist. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the multi-cat schema.
+    """
+    conn.execute(CREATE_READINGS_SQL)
+
+
+def readings_exist(conn: Connection) -> bool:
+    """Returns True if the database has the weight_readings table."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='weight_readings'"
+    ).fetchone() is not None
+
+
+def encode_reading(timestamp: datetime, weight: float, device: str | None = None) -> tuple[int, int, str, float]:
+    """
+    Converts a reading to the stored values.
+
+    A naive timestamp is local time. The day of an aware timestamp is its date in the
+    local time zone.
+
+    Parameters:
+    - timestamp (datetime): Time of the reading.
+    - weight (float): Weight in kg.
+    - device (str | None): Source device.
+
+    Returns:
+    - tuple[int, int, str, float]: (day, ts, device, weight).
+
+    Raises:
+    - ValueError: If the timestamp is not a datetime or the weight is not a positive finite number.
+    """
+    if not isinstance(timestamp, datetime):
+        raise ValueError(f"Invalid reading timestamp: {timestamp!r}")
+    if not (math.isfinite(weight) and weight > 0):
+        raise ValueError(f"Invalid reading weight: {weight!r}")
+    local = timestamp.astimezone() if timestamp.tzinfo is not None else timestamp
+    return _DAYS.encode_date(local.date()), round(timestamp.timestamp() * 1000), device or "", float(weight)
+
+
+def decode_timestamp(ts: int) -> datetime:
+    """Converts a stored timestamp to a naive local datetime."""
+    return datetime.fromtimestamp(ts / 1000)
+
+
+def derive_daily(conn: Connection, storage: Storage, cat_id: int, days: Iterable[int] | None = None,
+                 method: str = "median") -> int:
+    """
+    Derives the daily records of a cat from its readings and upserts them into
+    cat_weight_records. Existing notes are kept. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with readings.
+    - storage (Storage): Storage format of the records.
+    - cat_id (int): The cat.
+    - days (Iterable[int] | None): Days (as stored in weight_readings) to derive. None derives every day with readings.
+    - method (str): 'median' or 'last'.
+
+    Returns:
+    - int: Number of daily records written.
+
+    Raises:
+    - ValueError: If the method is unknown.
+    """
+    if method not in DAILY_METHODS:
+        raise ValueError(f"Unknown daily method: {method}")
+    where = "cat_id = ?"
+    params: list = [cat_id]
+    if days is not None:
+        where += " AND day IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(sorted(days)))
+    return conn.execute(f"""
+        INSERT INTO cat_weight_records (cat_id, date, weight, notes)
+        SELECT ?, {storage.date_from_sql("d.day", _DAYS)}, {storage.from_kg_sql("d.weight")}, NULL
+        FROM ({_DAILY_SQL[method].format(where=where)}) d
+        WHERE true
+        ON CONFLICT(cat_id, date) DO UPDATE SET weight = excluded.weight
+    """, [cat_id] + params).rowcount
+
+
+class ReadingBuffer:
+    """
+    Write buffer for high-frequency readings.
+
+    add() only appends the reading to an in-memory list and returns. A writer thread with
+    its own connection writes the pending readings in one transaction (together with the
+    derived daily records) when max_rows readings are pending or the oldest one has been
+    pending for max_delay seconds. If the writer falls behind by more than max_pending
+    readings, add() waits.
+
+    If a batch cannot be written, its readings are dropped and the error is raised by the
+    next call to add(), flush() or close().
+
+    Example:
+        with ReadingBuffer("cat.db", cat="tama") as buffer:
+            for timestamp, weight, device in sensor_stream():
+                buffer.add(timestamp, weight, device)
+    """
+
+    def __init__(self, db_file: str, cat: str | None = None, max_rows: int = 5000, max_delay: float = 1.0,
+                 daily: str = "median", max_pending: int | None = None, wal: bool = True,
+                 busy_timeout: float = 5.0) -> None:
+        """
+        Starts the writer thread.
+
+        Parameters:
+        - db_file (str): Path to the SQLite3 database file (initialized with 'catdb.py init').
+        - cat (str | None): Default cat of the readings. None uses CatWeightDB's default cat.
+        - max_rows (int): Write when this many readings are pending.
+        - max_delay (float): Write when the oldest pending reading has waited this many seconds.
+        - daily (str): How the daily records are derived: 'median' or 'last'.
+        - max_pending (int | None): Readings that may be pending before add() waits. None means 4 * max_rows.
+        - wal (bool): Switch the database to WAL journal mode so that readers are not blocked.
+        - busy_timeout (float): Seconds to wait for locks held by other processes.
+
+        Raises:
+        - ValueError: If daily is unknown or max_rows / max_delay are not positive.
+        """
+        from catdb.db.database import DEFAULT_CAT
+
+        if daily not in DAILY_METHODS:
+            raise ValueError(f"Unknown daily method: {daily}")
+        if max_rows <= 0 or max_delay <= 0:
+            raise ValueError("max_rows and max_delay must be positive")
+        self.db_file = db_file
+        self.cat = cat or DEFAULT_CAT
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.daily = daily
+        self.max_pending = max_pending or max_rows * 4
+        self.wal = wal
+        self.busy_timeout = busy_timeout
+
+        # 統計
+        self.flushes: int = 0
+        self.readings_written: int = 0
+        self.days_derived: int = 0
+        self.flush_seconds: float = 0.0
+
+        self._pending: list[tuple[str, datetime, float, str | None]] = []
+        self._oldest: float = 0.0
+        self._added: int = 0
+        self._done: int = 0
+        self._flush_requested = False
+        self._closing = False
+        self._error: BaseException | None = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="catdb-readings", daemon=True)
+        self._thread.start()
+
+    def add(self, timestamp: datetime, weight: float, device: str | None = None, cat: str | None = None) -> None:
+        """
+        Queues one reading. Thread-safe.
+
+        Parameters:
+        - timestamp (datetime): Time of the reading (naive timestamps are local time).
+        - weight (float): Weight in kg.
+        - device (str | None): Source device.
+        - cat (str | None): Cat of the reading. None uses the buffer's cat.
+
+        Raises:
+        - ValueError: If the reading is invalid or the buffer is closed.
+        - Exception: The error of a previous batch that could not be written.
+        """
+        encode_reading(timestamp, weight, device)
+        with self._cond:
+            self._raise_error()
+            if self._closing:
+                raise ValueError("The reading buffer is closed")
+            # 書き込みが追いつくまで待つ (背圧)
+            while len(self._pending) >= self.max_pending and self._error is None:
+                self._cond.wait()
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((cat or self.cat, timestamp, weight, device))
+            self._added += 1
+            if len(self._pending) == 1 or len(self._pending) >= self.max_rows:
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """
+        Writes all readings added so far and waits until they are committed.
+
+        Raises:
+        - Exception: The error of a batch that could not be written.
+        """
+        with self._cond:
+            target = self._added
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._done < target and self._thread.is_alive():
+                self._cond.wait()
+            self._raise_error()
+
+    def close(self) -> None:
+        """
+        Writes the pending readings and stops the writer thread.
+
+        Raises:
+        - Exception: The error of a batch that could not be written.
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _next_batch(self) -> tuple[list[tuple[str, datetime, float, str | None]], bool]:
+        """Waits until a batch is due and takes it. Returns the batch and whether the buffer is closing."""
+        with self._cond:
+            while not (self._closing or self._flush_requested or len(self._pending) >= self.max_rows):
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                remaining = self._oldest + self.max_delay - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending, []
+            self._flush_requested = False
+            self._cond.notify_all()
+            return batch, self._closing
+
+    def _run(self) -> None:
+        from catdb.db.database import CatWeightDB
+
+        db = CatWeightDB(self.db_file, wal=self.wal, busy_timeout=self.busy_timeout, cat=self.cat)
+        try:
+            db.connect()
+        except BaseException as e:
+            with self._cond:
+                self._error = e
+                self._closing = True
+                self._cond.notify_all()
+            return
+        try:
+            while True:
+                batch, closing = self._next_batch()
+                if batch:
+                    start = time.perf_counter()
+                    try:
+                        written, days = db.add_readings(batch, daily=self.daily)
+                        self.readings_written += written
+                        self.days_derived += days
+                        self.flushes += 1
+                    except Exception as e:
+                        with self._cond:
+                            self._error = RuntimeError(f"{len(batch)} readings could not be written: {e}")
+                            self._error.__cause__ = e
+                    self.flush_seconds += time.perf_counter() - start
+                with self._cond:
+                    self._done += len(batch)
+                    self._cond.notify_all()
+                if closing:
+                    with self._cond:
+                        if not self._pending:
+                            break
+        finally:
+            db.close()
+
+    def __enter__(self) -> "ReadingBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
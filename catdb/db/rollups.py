@@ -0,0 +1,234 @@
+"""
+Rollup tables with per-cat weekly / monthly / yearly statistics.
+
+weight_rollups holds count, min, max, sum and sum of squares of the weights for each
+cat and period. Triggers on cat_weight_records keep it up to date on every insert,
+update, upsert and delete, so statistics can be answered without reading the raw records.
+
+Rollups always hold weights in kg and ISO period start dates, whatever the storage
+format of the records (see storage.py); the trigger and aggregate SQL is generated for
+the format of the database.
+"""
+
+import math
+from sqlite3 import Connection
+from catdb.db.storage import Storage, storage_for
+
+PERIODS = ("week", "month", "year")
+
+# 期間の初日を求める SQL 式 ({d} に日付の列を埋め込む)。週は月曜始まり。
+PERIOD_START_SQL = {
+    "week": "date({d}, 'weekday 0', '-6 days')",
+    "month": "date({d}, 'start of month')",
+    "year": "date({d}, 'start of year')",
+}
+
+# 期間の初日から翌期間の初日までの差
+PERIOD_LENGTH = {
+    "week": "+7 days",
+    "month": "+1 month",
+    "year": "+1 year",
+}
+
+CREATE_ROLLUPS_SQL = """
+    CREATE TABLE IF NOT EXISTS weight_rollups (
+        cat_id INTEGER NOT NULL REFERENCES cats(cat_id) ON DELETE CASCADE,
+        period TEXT NOT NULL,
+        period_start TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        min_weight REAL,
+        max_weight REAL,
+        sum_weight REAL NOT NULL,
+        sum_sq_weight REAL NOT NULL,
+        PRIMARY KEY (cat_id, period, period_start)
+    ) WITHOUT ROWID
+"""
+
+# 比較時に許容する浮動小数点の誤差 (合計値は加減算を繰り返すため)
+TOLERANCE = 1e-6
+
+
+def _add_sql(period: str, row: str, storage: Storage) -> str:
+    """Returns the statement that adds the weight of row (NEW) to its rollup."""
+    start = PERIOD_START_SQL[period].format(d=storage.date_sql(f"{row}.date"))
+    weight = storage.weight_sql(f"{row}.weight")
+    return f"""
+        INSERT INTO weight_rollups (cat_id, period, period_start, count, min_weight, max_weight, sum_weight, sum_sq_weight)
+        VALUES ({row}.cat_id, '{period}', {start}, 1, {weight}, {weight}, {weight}, {weight} * {weight})
+        ON CONFLICT(cat_id, period, period_start) DO UPDATE SET
+            count = count + 1,
+            min_weight = min(min_weight, excluded.min_weight),
+            max_weight = max(max_weight, excluded.max_weight),
+            sum_weight = sum_weight + excluded.sum_weight,
+            sum_sq_weight = sum_sq_weight + excluded.sum_sq_weight;
+    """
+
+
+def _remove_sql(period: str, row: str, storage: Storage) -> str:
+    """Returns the statements that remove the weight of row (OLD) from its rollup."""
+    start = PERIOD_START_SQL[period].format(d=storage.date_sql(f"{row}.date"))
+    weight = storage.weight_sql(f"{row}.weight")
+    key = f"cat_id = {row}.cat_id AND period = '{period}' AND period_start = {start}"
+    # 最小値・最大値は差し引けないので、消えた値が端だった場合だけ期間内の記録から引き直す
+    bucket = (f"FROM cat_weight_records WHERE cat_id = {row}.cat_id "
+              f"AND date >= {storage.from_iso_date_sql(start)} "
+              f"AND date < {storage.from_iso_date_sql(f'date({start}, {PERIOD_LENGTH[period]!r})')}")
+    return f"""
+        UPDATE weight_rollups SET
+            count = count - 1,
+            sum_weight = sum_weight - {weight},
+            sum_sq_weight = sum_sq_weight - {weight} * {weight}
+        WHERE {key};
+        DELETE FROM weight_rollups WHERE {key} AND count <= 0;
+        UPDATE weight_rollups SET
+            min_weight = (SELECT MIN({storage.weight_sql("weight")}) {bucket}),
+            max_weight = (SELECT MAX({storage.weight_sql("weight")}) {bucket})
+        WHERE {key} AND ({weight} <= min_weight OR {weight} >= max_weight);
+    """
+
+
+def create_rollups(conn: Connection, storage: Storage | None = None) -> bool:
+    """
+    Creates the weight_rollups table and its triggers if they do not exist.
+    A newly created table is filled from the existing records.
+
+    The functions in this module do not commit; callers run them inside a transaction.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the multi-cat schema.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+
+    Returns:
+    - bool: True if the table was created, False if it already existed.
+    """
+    storage = storage or storage_for(conn)
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='weight_rollups'"
+    ).fetchone() is not None
+
+    conn.execute(CREATE_ROLLUPS_SQL)
+    create_triggers(conn, storage)
+    if not exists:
+        rebuild_rollups(conn, storage=storage)
+    return not exists
+
+
+def create_triggers(conn: Connection, storage: Storage | None = None) -> None:
+    """
+    Creates the triggers that keep weight_rollups up to date, if they do not exist.
+
+    Parameters:
+    - conn (Connection): Connection to a database with rollups.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+    """
+    storage = storage or storage_for(conn)
+    insert_body = "".join(_add_sql(p, "NEW", storage) for p in PERIODS)
+    delete_body = "".join(_remove_sql(p, "OLD", storage) for p in PERIODS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS weight_rollups_insert AFTER INSERT ON cat_weight_records
+        BEGIN {insert_body} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS weight_rollups_delete AFTER DELETE ON cat_weight_records
+        BEGIN {delete_body} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS weight_rollups_update AFTER UPDATE OF cat_id, date, weight ON cat_weight_records
+        BEGIN {delete_body} {insert_body} END
+    """)
+
+
+def drop_triggers(conn: Connection) -> None:
+    """
+    Drops the rollup triggers, e.g. for a bulk load that rebuilds the rollups afterwards.
+
+    Parameters:
+    - conn (Connection): Connection to a database with rollups.
+    """
+    for name in ("weight_rollups_insert", "weight_rollups_delete", "weight_rollups_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def mean_and_std(count: int, total: float, total_sq: float) -> tuple[float, float | None]:
+    """
+    Computes the mean and sample standard deviation from a count, sum and sum of squares.
+
+    Returns:
+    - tuple[float, float | None]: Mean and standard deviation (None if count is 1).
+    """
+    mean = total / count
+    if count < 2:
+        return mean, None
+    variance = max(0.0, (total_sq - total * total / count) / (count - 1))
+    return mean, math.sqrt(variance)
+
+
+def _aggregate_sql(period: str, storage: Storage, cat_id: int | None = None) -> str:
+    """Returns a query computing the rollup rows of one period type from the raw records."""
+    start = PERIOD_START_SQL[period].format(d=storage.date_sql("date"))
+    weight = storage.weight_sql("weight")
+    where = "" if cat_id is None else f"WHERE cat_id = {int(cat_id)}"
+    return f"""
+        SELECT cat_id, '{period}', {start}, COUNT(*), MIN({weight}), MAX({weight}), SUM({weight}), SUM({weight} * {weight})
+        FROM cat_weight_records
+        {where}
+        GROUP BY cat_id, {start}
+    """
+
+
+def rebuild_rollups(conn: Connection, cat_id: int | None = None, storage: Storage | None = None) -> int:
+    """
+    Recomputes the rollups from the raw records.
+
+    Parameters:
+    - conn (Connection): Connection to a database with rollups.
+    - cat_id (int | None): Only rebuild the rollups of this cat. None rebuilds all cats.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+
+    Returns:
+    - int: Number of rollup rows written.
+    """
+    storage = storage or storage_for(conn)
+    if cat_id is None:
+        conn.execute("DELETE FROM weight_rollups")
+    else:
+        conn.execute("DELETE FROM weight_rollups WHERE cat_id = ?", (cat_id,))
+    rows = 0
+    for period in PERIODS:
+        rows += conn.execute(f"""
+            INSERT INTO weight_rollups (cat_id, period, period_start, count, min_weight, max_weight, sum_weight, sum_sq_weight)
+            {_aggregate_sql(period, storage, cat_id)}
+        """).rowcount
+    return rows
+
+
+def check_rollups(conn: Connection, storage: Storage | None = None) -> list[tuple[int, str, str]]:
+    """
+    Compares the maintained rollups with values computed from the raw records.
+
+    Parameters:
+    - conn (Connection): Connection to a database with rollups.
+    - storage (Storage | None): Storage format of the records. None reads it from the database.
+
+    Returns:
+    - list[tuple[int, str, str]]: (cat_id, period, period_start) of every rollup that is missing,
+      stale or does not match the raw records. Empty if everything is consistent.
+    """
+    storage = storage or storage_for(conn)
+    mismatches = []
+    for period in PERIODS:
+        expected = {row[:3]: row[3:] for row in conn.execute(_aggregate_sql(period, storage))}
+        actual = {
+            row[:3]: row[3:]
+            for row in conn.execute("""
+                SELECT cat_id, period, period_start, count, min_weight, max_weight, sum_weight, sum_sq_weight
+                FROM weight_rollups WHERE period = ?
+            """, (period,))
+        }
+        for key in sorted(expected.keys() | actual.keys()):
+            e, a = expected.get(key), actual.get(key)
+            if e is None or a is None or e[0] != a[0] or any(
+                abs(x - y) > TOLERANCE * max(1.0, abs(x)) for x, y in zip(e[1:], a[1:])
+            ):
+                mismatches.append(key)
+    return mismatches
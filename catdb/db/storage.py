@@ -0,0 +1,220 @@
+"""
+Storage formats of cat_weight_records for each schema version.
+
+    version 1: date TEXT ('YYYY-MM-DD'), weight REAL (kg)
+    version 2: date INTEGER (days since 1970-01-01), weight REAL (kg)
+    version 3: date INTEGER (days since 1970-01-01), weight INTEGER (grams)
+
+A Storage object converts dates and weights between Python and the stored values, and
+provides the SQL expressions that the rollup triggers and migrations need to work with
+either format. Integer dates are 8 bytes or less per row instead of 10 and compare as
+integers, and they convert to datetime64 without parsing strings.
+
+The version of a database is kept in the schema_version table. Databases without the
+table predate it and use version 1.
+"""
+
+from __future__ import annotations
+
+import math
+import sqlite3
+from datetime import date
+from sqlite3 import Connection
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CREATE_SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        applied_at TEXT NOT NULL
+    )
+"""
+
+# 1970-01-01 の序数 (date.toordinal) とユリウス日
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_EPOCH_JULIAN_DAY = 2440587.5
+
+# 固定小数点で保存する体重の倍率 (kg -> g)
+WEIGHT_SCALE = 1000
+
+
+class Storage:
+    """Conversions between Python values and the values stored by one schema version."""
+
+    def __init__(self, version: int, integer_dates: bool, fixed_point_weights: bool) -> None:
+        self.version: int = version
+        self.integer_dates: bool = integer_dates
+        self.fixed_point_weights: bool = fixed_point_weights
+
+    def records_table_sql(self, name: str = "cat_weight_records") -> str:
+        """Returns the CREATE TABLE statement of the records table in this format."""
+        return f"""
+            CREATE TABLE IF NOT EXISTS {name} (
+                cat_id INTEGER NOT NULL REFERENCES cats(cat_id) ON DELETE CASCADE,
+                date {"INTEGER" if self.integer_dates else "TEXT"} NOT NULL,
+                weight {"INTEGER" if self.fixed_point_weights else "REAL"} NOT NULL,
+                notes TEXT,
+                PRIMARY KEY (cat_id, date)
+            ) WITHOUT ROWID
+        """
+
+    # ------------------------------------------------------------------
+    # Python 側の変換
+    # ------------------------------------------------------------------
+
+    def encode_date(self, value: date) -> Any:
+        """Converts a date to the stored value."""
+        if self.integer_dates:
+            return value.toordinal() - _EPOCH_ORDINAL
+        return value.isoformat()
+
+    def decode_date(self, value: Any) -> date:
+        """Converts a stored value to a date."""
+        if self.integer_dates:
+            return date.fromordinal(value + _EPOCH_ORDINAL)
+        return date.fromisoformat(value)
+
+    def encode_weight(self, value: float | None) -> Any:
+        """Converts a weight in kg to the stored value. Raises ValueError if it is NaN or infinite."""
+        if value is not None and not math.isfinite(value):
+            raise ValueError(f"Weight must be a finite number: {value}")
+        if self.fixed_point_weights and value is not None:
+            return round(value * WEIGHT_SCALE)
+        return value
+
+    def to_datetime64(self, values: Any) -> np.ndarray:
+        """
+        Converts a sequence of stored dates to a datetime64[D] array.
+
+        Integer dates are reinterpreted as day numbers without any parsing.
+        """
+        import numpy as np
+
+        if self.integer_dates:
+            return np.asarray(values, dtype=np.int64).astype("datetime64[D]")
+        return np.asarray(values, dtype="datetime64[D]")
+
+    def encode_datetime64(self, values: np.ndarray) -> list:
+        """Converts a datetime64 array to a list of stored dates (column-wise)."""
+        import numpy as np
+
+        days = np.asarray(values).astype("datetime64[D]")
+        if self.integer_dates:
+            return days.astype(np.int64).tolist()
+        return np.datetime_as_string(days, unit="D").tolist()
+
+    def encode_weights(self, values: np.ndarray) -> list:
+        """
+        Converts an array of weights in kg to a list of stored weights (column-wise).
+
+        Raises ValueError if a weight is missing (NaN) or infinite.
+        """
+        import numpy as np
+
+        weights = np.asarray(values, dtype=np.float64)
+        # NaN や無限大はグラム単位の整数にすると INT64_MIN になり、エラーにならずに保存されてしまう
+        if not np.isfinite(weights).all():
+            raise ValueError("Weights must be finite numbers (missing or NaN weights are not allowed)")
+        if self.fixed_point_weights:
+            return np.rint(weights * WEIGHT_SCALE).astype(np.int64).tolist()
+        return weights.tolist()
+
+    # ------------------------------------------------------------------
+    # SQL 式
+    # ------------------------------------------------------------------
+
+    def date_sql(self, column: str) -> str:
+        """Returns an expression of the stored date usable as a time value of SQLite's date functions."""
+        if self.integer_dates:
+            return f"({column} + {_EPOCH_JULIAN_DAY})"
+        return column
+
+    def iso_date_sql(self, column: str) -> str:
+        """Returns an expression converting the stored date to 'YYYY-MM-DD' text."""
+        if self.integer_dates:
+            return f"date({column} + {_EPOCH_JULIAN_DAY})"
+        return column
+
+    def from_iso_date_sql(self, expr: str) -> str:
+        """Returns an expression converting 'YYYY-MM-DD' text to the stored date."""
+        if self.integer_dates:
+            return f"CAST(julianday({expr}) - {_EPOCH_JULIAN_DAY} AS INTEGER)"
+        return expr
+
+    def weight_sql(self, column: str) -> str:
+        """Returns an expression converting the stored weight to kg (REAL)."""
+        if self.fixed_point_weights:
+            return f"({column} / {WEIGHT_SCALE}.0)"
+        return column
+
+    def from_kg_sql(self, expr: str) -> str:
+        """Returns an expression converting a weight in kg to the stored weight."""
+        if self.fixed_point_weights:
+            return f"CAST(round(({expr}) * {WEIGHT_SCALE}) AS INTEGER)"
+        return expr
+
+    def date_from_sql(self, column: str, source: Storage) -> str:
+        """Returns an expression converting a date column stored by source to this format."""
+        if source.integer_dates == self.integer_dates:
+            return column
+        return self.from_iso_date_sql(source.iso_date_sql(column))
+
+    def weight_from_sql(self, column: str, source: Storage) -> str:
+        """Returns an expression converting a weight column stored by source to this format."""
+        if source.fixed_point_weights == self.fixed_point_weights:
+            return column
+        return self.from_kg_sql(source.weight_sql(column))
+
+
+STORAGES: dict[int, Storage] = {
+    1: Storage(1, integer_dates=False, fixed_point_weights=False),
+    2: Storage(2, integer_dates=True, fixed_point_weights=False),
+    3: Storage(3, integer_dates=True, fixed_point_weights=True),
+}
+
+LATEST_VERSION = max(STORAGES)
+
+
+def get_schema_version(conn: Connection, schema: str = "main") -> int:
+    """
+    Returns the schema version of a database.
+
+    Parameters:
+    - conn (Connection): Connection to the database.
+    - schema (str): Schema name of the database to inspect (e.g. an ATTACHed database).
+
+    Returns:
+    - int: The version. 1 for databases without a schema_version table.
+    """
+    try:
+        row = conn.execute(f"SELECT MAX(version) FROM {schema}.schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 1
+    return row[0] or 1
+
+
+def storage_for(conn: Connection, schema: str = "main") -> Storage:
+    """
+    Returns the storage format of a database.
+
+    Raises:
+    - ValueError: If the database was written by a newer version of catdb.
+    """
+    version = get_schema_version(conn, schema)
+    if version not in STORAGES:
+        raise ValueError(f"Unsupported schema version {version} (this catdb supports up to {LATEST_VERSION})")
+    return STORAGES[version]
+
+
+def set_schema_version(conn: Connection, version: int) -> None:
+    """
+    Records a schema version as applied. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to the database.
+    - version (int): The version.
+    """
+    conn.execute(CREATE_SCHEMA_VERSION_SQL)
+    conn.execute("INSERT OR REPLACE INTO schema_version (version, applied_at) VALUES (?, datetime('now'))", (version,))
@@ -0,0 +1,141 @@
+"""
+Per-cat content versions of cat_weight_records.
+
+cat_versions holds a counter per cat that triggers bump in the same transaction as
+every insert and delete of a record, and every update that changes its cat, date or
+weight. fingerprints() combines the counter with the yearly rollups, so the fingerprint
+of a cat changes with every such write, including ones that leave the yearly
+aggregates unchanged (e.g. two weights swapped between dates), and computing it does
+not read the records.
+
+The counter is format-independent, so it survives migrations (see migrations.py) and
+needs no rewrite. Bulk loads suspend the triggers like the rollup triggers and bump
+the loaded cat once.
+"""
+
+import hashlib
+import sqlite3
+from sqlite3 import Connection
+
+CREATE_VERSIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS cat_versions (
+        cat_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+"""
+
+TRIGGERS = ("cat_versions_insert", "cat_versions_update", "cat_versions_delete")
+
+_BUMP_SQL = """
+    INSERT INTO cat_versions (cat_id, version) VALUES ({cat_id}, 1)
+    ON CONFLICT(cat_id) DO UPDATE SET version = version + 1;
+"""
+
+
+def create_versions(conn: Connection) -> bool:
+    """
+    Creates the cat_versions table and its triggers if they do not exist. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with the multi-cat schema.
+
+    Returns:
+    - bool: True if the table was created, False if it already existed.
+    """
+    exists = versions_exist(conn)
+    conn.execute(CREATE_VERSIONS_SQL)
+    if not exists:
+        # 既存の猫は版数 1 から始める
+        conn.execute("INSERT OR IGNORE INTO cat_versions (cat_id, version) SELECT cat_id, 1 FROM cats")
+    create_triggers(conn)
+    return not exists
+
+
+def versions_exist(conn: Connection) -> bool:
+    """Returns True if the database has the cat_versions table."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='cat_versions'"
+    ).fetchone() is not None
+
+
+def create_triggers(conn: Connection) -> None:
+    """
+    Creates the triggers that bump cat_versions, if they do not exist.
+
+    Parameters:
+    - conn (Connection): Connection to a database with cat_versions.
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS cat_versions_insert AFTER INSERT ON cat_weight_records
+        BEGIN {_BUMP_SQL.format(cat_id="NEW.cat_id")} END
+    """)
+    # 内容が変わらない upsert (メモだけの更新を含む) では版数を上げない
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS cat_versions_update AFTER UPDATE ON cat_weight_records
+        WHEN OLD.cat_id IS NOT NEW.cat_id OR OLD.date IS NOT NEW.date OR OLD.weight IS NOT NEW.weight
+        BEGIN
+            {_BUMP_SQL.format(cat_id="NEW.cat_id")}
+            UPDATE cat_versions SET version = version + 1 WHERE cat_id = OLD.cat_id AND OLD.cat_id IS NOT NEW.cat_id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS cat_versions_delete AFTER DELETE ON cat_weight_records
+        BEGIN {_BUMP_SQL.format(cat_id="OLD.cat_id")} END
+    """)
+
+
+def drop_triggers(conn: Connection) -> None:
+    """
+    Drops the version triggers, e.g. for a bulk load that bumps the version once afterwards.
+
+    Parameters:
+    - conn (Connection): Connection to a database with cat_versions.
+    """
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def bump(conn: Connection, cat_id: int) -> None:
+    """
+    Bumps the version of a cat. Does not commit.
+
+    Parameters:
+    - conn (Connection): Connection to a database with cat_versions.
+    - cat_id (int): The cat.
+    """
+    conn.execute(_BUMP_SQL.format(cat_id="?"), (cat_id,))
+
+
+def fingerprints(conn: Connection, cat_id: int | None = None) -> dict[int, str]:
+    """
+    Returns a fingerprint of the records of every cat that has records.
+
+    Parameters:
+    - conn (Connection): Connection to the database.
+    - cat_id (int | None): Only this cat. None returns every cat.
+
+    Returns:
+    - dict[int, str]: Hex digest per cat_id. It changes whenever a record of the cat is
+      added or deleted, or its date or weight changes.
+    """
+    where, params = ("AND r.cat_id = ?", [cat_id]) if cat_id is not None else ("", [])
+    try:
+        rows = conn.execute(f"""
+            SELECT r.cat_id, v.version, r.period_start, r.count, r.min_weight, r.max_weight, r.sum_weight, r.sum_sq_weight
+            FROM weight_rollups r LEFT JOIN cat_versions v ON v.cat_id = r.cat_id
+            WHERE r.period = 'year' AND r.count > 0 {where}
+            ORDER BY r.cat_id, r.period_start
+        """, params).fetchall()
+    except sqlite3.OperationalError:
+        # 版数や集計のテーブルが無い古いデータベースでは、記録そのものから求める
+        rows = conn.execute(f"""
+            SELECT cat_id, date, weight FROM cat_weight_records r
+            WHERE 1 = 1 {where} ORDER BY cat_id, date
+        """, params).fetchall()
+    digests: dict = {}
+    for row in rows:
+        digest = digests.get(row[0])
+        if digest is None:
+            digest = digests[row[0]] = hashlib.sha256()
+        digest.update(repr(row[1:]).encode())
+    return {cat: digest.hexdigest() for cat, digest in digests.items()}
@@ -0,0 +1,370 @@
+"""
+catdb.fleet - Queries across many database files.
+
+CatWeightFleet runs the same query against every database file of a directory or glob
+(e.g. one file per cat) and streams the merged results. Files are opened read-only and
+queried in a thread pool with a bounded number of files in flight; SQLite releases the
+GIL while it reads, so the files are read in parallel.
+
+For every file the fleet keeps its cats with their first and last record date and
+number of records, keyed on the modification time and size of the file (and of its WAL
+file). A query with a date range or a set of cats skips the files that cannot match
+without opening them. With a cache directory the metadata is kept in a JSON file, so it
+carries over between processes.
+
+Single-cat files (cat_weight_records without a cat_id column) are read as one cat named
+after the file, like 'fold' does.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import sqlite3
+import tempfile
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import date
+from typing import Any, Callable, Iterable, Iterator
+
+from catdb.db.database import CatWeightDB
+from catdb.db.storage import STORAGES, Storage
+
+METADATA_FILE = "fleet-metadata.json"
+
+# ファイルと WAL ファイルの mtime とサイズ。どれかが変われば記録が変わった可能性がある
+FileKey = tuple[int, int, int, int]
+
+# 猫の名前、最初と最後の記録の日付、記録の件数
+CatMeta = tuple[str, date | None, date | None, int]
+
+# 猫ごとの問い合わせ: (接続, 保存形式, 猫の名前 (単一猫のファイルでは None), 開始日, 終了日) -> 結果
+Query = Callable[[sqlite3.Connection, Storage, str | None, date | None, date | None], Any]
+
+
+def fleet_paths(patterns: Iterable[str]) -> list[str]:
+    """
+    Expands directories (their *.db files), glob patterns and file names to database files.
+
+    Parameters:
+    - patterns (Iterable[str]): Directories, file names or glob patterns.
+
+    Returns:
+    - list[str]: Database files without duplicates, in the given order.
+
+    Raises:
+    - ValueError: If a pattern matches nothing.
+    """
+    from catdb.commands.ingest import expand_paths
+
+    expanded: list[str] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files = sorted(glob.glob(os.path.join(glob.escape(pattern), "*.db")))
+            if not files:
+                raise ValueError(f"No database files in {pattern}")
+            expanded.extend(files)
+        else:
+            expanded.extend(expand_paths([pattern]))
+    return list(dict.fromkeys(expanded))
+
+
+def _file_key(path: str) -> FileKey:
+    stat = os.stat(path)
+    try:
+        wal = os.stat(path + "-wal")
+        # 読み取り専用で開くと空の WAL ファイルが残ることがある。空なら無いのと同じ
+        wal_key = (wal.st_mtime_ns, wal.st_size) if wal.st_size else (0, 0)
+    except FileNotFoundError:
+        wal_key = (0, 0)
+    return stat.st_mtime_ns, stat.st_size, *wal_key
+
+
+def _where(cat: str | None, storage: Storage, begin_date: date | None, end_date: date | None) -> tuple[str, list]:
+    """Returns the WHERE clause selecting one cat's records within a date range."""
+    where = "cat_id = (SELECT cat_id FROM cats WHERE name = ?)" if cat is not None else "1 = 1"
+    params: list = [cat] if cat is not None else []
+    if begin_date is not None:
+        where += " AND date >= ?"
+        params.append(storage.encode_date(begin_date))
+    if end_date is not None:
+        where += " AND date <= ?"
+        params.append(storage.encode_date(end_date))
+    return where, params
+
+
+def _scan(conn: sqlite3.Connection, storage: Storage, legacy: bool, path: str) -> list[CatMeta]:
+    """Reads the cats of a file with their first and last record date and number of records."""
+    if legacy:
+        cats = [(os.path.splitext(os.path.basename(path))[0], None)]
+    else:
+        cats = [(name, name) for (name,) in conn.execute("SELECT name FROM cats ORDER BY name")]
+    meta = []
+    for name, cat in cats:
+        where, params = _where(cat, storage, None, None)
+        # 最初と最後の日付は主キーの両端を読むだけで求まる
+        first = conn.execute(f"SELECT date FROM cat_weight_records WHERE {where} ORDER BY date LIMIT 1", params).fetchone()
+        last = conn.execute(f"SELECT date FROM cat_weight_records WHERE {where} ORDER BY date DESC LIMIT 1", params).fetchone()
+        count = conn.execute(f"SELECT COUNT(*) FROM cat_weight_records WHERE {where}", params).fetchone()[0]
+        meta.append((name, storage.decode_date(first[0]) if first else None,
+                     storage.decode_date(last[0]) if last else None, count))
+    return meta
+
+
+def _matching(meta: list[CatMeta], cats: set[str] | None, begin_date: date | None, end_date: date | None) -> list[str]:
+    """Returns the cats of a file that may have records within the date range."""
+    return [name for name, first, last, count in meta
+            if count and (cats is None or name in cats)
+            and (begin_date is None or last >= begin_date) and (end_date is None or first <= end_date)]
+
+
+def _query_file(path: str, key: FileKey, meta: list[CatMeta] | None, query: Query | None, cats: set[str] | None,
+                begin_date: date | None, end_date: date | None) -> tuple[str, FileKey, list[CatMeta] | None, list, str | None]:
+    """
+    Runs a query for the matching cats of one file. Runs in a worker thread.
+
+    Returns the path, its key, its (possibly refreshed) metadata, (cat, result) pairs,
+    and the error message if the file could not be read.
+    """
+    try:
+        conn = sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        return path, key, None, [], str(e)
+    try:
+        db = CatWeightDB.from_connection(conn, path)
+        legacy = db.is_legacy_schema()
+        storage = STORAGES[1] if legacy else db.storage
+        if meta is None:
+            meta = _scan(conn, storage, legacy, path)
+        if query is None:
+            return path, key, meta, [], None
+        results = [(name, query(conn, storage, None if legacy else name, begin_date, end_date))
+                   for name in _matching(meta, cats, begin_date, end_date)]
+        return path, key, meta, results, None
+    except (sqlite3.Error, ValueError) as e:
+        return path, key, None, [], str(e)
+    finally:
+        conn.close()
+
+
+def _records(conn: sqlite3.Connection, storage: Storage, cat: str | None, begin_date: date | None,
+             end_date: date | None) -> list[tuple[date, float, str | None]]:
+    where, params = _where(cat, storage, begin_date, end_date)
+    decode_date = storage.decode_date
+    rows = conn.execute(f"""
+        SELECT date, {storage.weight_sql("weight")}, notes FROM cat_weight_records WHERE {where} ORDER BY date
+    """, params).fetchall()
+    return [(decode_date(day), weight, notes) for day, weight, notes in rows]
+
+
+def _summary(conn: sqlite3.Connection, storage: Storage, cat: str | None, begin_date: date | None,
+             end_date: date | None) -> tuple | None:
+    where, params = _where(cat, storage, begin_date, end_date)
+    weight = storage.weight_sql("weight")
+    count, low, high, mean = conn.execute(
+        f"SELECT COUNT(*), MIN({weight}), MAX({weight}), AVG({weight}) FROM cat_weight_records WHERE {where}", params
+    ).fetchone()
+    if not count:
+        return None
+    first = conn.execute(f"SELECT date, {weight} FROM cat_weight_records WHERE {where} ORDER BY date LIMIT 1",
+                         params).fetchone()
+    last = conn.execute(f"SELECT date, {weight} FROM cat_weight_records WHERE {where} ORDER BY date DESC LIMIT 1",
+                        params).fetchone()
+    return (count, storage.decode_date(first[0]), first[1], storage.decode_date(last[0]), last[1],
+            low, high, mean)
+
+
+class CatWeightFleet:
+    """
+    Read-only queries across many database files, fanned out to a thread pool.
+
+    Results are streamed as the files finish: the rows of one file and cat come together
+    (in date order for records), and files come in the order they complete.
+
+    Example:
+        fleet = CatWeightFleet(["cats/"], cache_dir="~/.cache/catdb")
+        for path, cat, count, first_date, first, last_date, last, low, high, mean in fleet.summary(begin):
+            if (last - first) / first < -0.05:
+                print(cat, path)
+    """
+
+    def __init__(self, patterns: Iterable[str], workers: int = 8, cache_dir: str | None = None) -> None:
+        """
+        Parameters:
+        - patterns (Iterable[str]): Directories (all *.db files in them), database files or glob patterns.
+        - workers (int): Maximum number of files read at the same time.
+        - cache_dir (str | None): Directory of the metadata cache file. None keeps the metadata in memory only.
+
+        Raises:
+        - ValueError: If a pattern matches no files or workers is not positive.
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.paths: list[str] = fleet_paths(patterns)
+        self.workers: int = workers
+        self.cache_file: str | None = os.path.join(os.path.expanduser(cache_dir), METADATA_FILE) if cache_dir else None
+        # 絶対パスごとのメタデータ
+        self._metadata: dict[str, tuple[FileKey, list[CatMeta]]] = self._load_metadata()
+        self._metadata_changed: bool = False
+
+        # 直前の問い合わせの統計
+        self.files_queried: int = 0
+        self.files_skipped: int = 0
+        self.files_scanned: int = 0
+        self.errors: list[tuple[str, str]] = []
+
+    def _load_metadata(self) -> dict[str, tuple[FileKey, list[CatMeta]]]:
+        if self.cache_file is None:
+            return {}
+        try:
+            with open(self.cache_file) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        metadata = {}
+        for path, entry in entries.items():
+            try:
+                metadata[path] = (tuple(entry["key"]), [
+                    (name, date.fromisoformat(first) if first else None, date.fromisoformat(last) if last else None, count)
+                    for name, first, last, count in entry["cats"]
+                ])
+            except (KeyError, TypeError, ValueError):
+                continue
+        return metadata
+
+    def save_metadata(self) -> None:
+        """Writes the metadata cache file, if there is one and the metadata changed."""
+        if self.cache_file is None or not self._metadata_changed:
+            return
+        entries = {
+            path: {"key": list(key), "cats": [[name, first and first.isoformat(), last and last.isoformat(), count]
+                                              for name, first, last, count in meta]}
+            for path, (key, meta) in self._metadata.items() if os.path.exists(path)
+        }
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_file), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.cache_file)
+        self._metadata_changed = False
+
+    def _fan_out(self, query: Query | None, cats: Iterable[str] | None, begin_date: date | None,
+                 end_date: date | None) -> Iterator[tuple[str, list]]:
+        """
+        Runs a query against every file that may match and yields (path, [(cat, result)]) as files finish.
+        Without a query, only the metadata of new and changed files is read.
+        """
+        cats = set(cats) if cats is not None else None
+        self.files_queried = self.files_skipped = self.files_scanned = 0
+        self.errors = []
+
+        tasks = []
+        for path in self.paths:
+            try:
+                key = _file_key(path)
+            except OSError as e:
+                self.errors.append((path, str(e)))
+                continue
+            cached = self._metadata.get(os.path.abspath(path))
+            meta = cached[1] if cached is not None and cached[0] == key else None
+            # 変わっていないファイルは、範囲や猫が合わなければ開かずに飛ばす
+            if meta is not None and (query is None or not _matching(meta, cats, begin_date, end_date)):
+                self.files_skipped += 1
+                continue
+            tasks.append((path, key, meta))
+
+        try:
+            for path, key, meta, results, error in self._run(tasks, query, cats, begin_date, end_date):
+                if error is not None:
+                    self.errors.append((path, error))
+                    continue
+                if self._metadata.get(os.path.abspath(path), (None,))[0] != key:
+                    self._metadata[os.path.abspath(path)] = (key, meta)
+                    self._metadata_changed = True
+                    self.files_scanned += 1
+                if results:
+                    self.files_queried += 1
+                    yield path, results
+                elif query is not None:
+                    self.files_skipped += 1
+        finally:
+            self.save_metadata()
+
+    def _run(self, tasks: list[tuple], query: Query | None, cats: set[str] | None, begin_date: date | None,
+             end_date: date | None) -> Iterator[tuple]:
+        """Runs the file tasks in the thread pool, yielding their outcomes as they complete."""
+        if self.workers == 1:
+            for task in tasks:
+                yield _query_file(*task, query, cats, begin_date, end_date)
+            return
+
+        pending = iter(tasks)
+        in_flight: set[Future] = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="catdb-fleet") as pool:
+            # 結果を抱えたまま溜め込みすぎないよう、同時に処理するファイルの数を抑える
+            for task in pending:
+                in_flight.add(pool.submit(_query_file, *task, query, cats, begin_date, end_date))
+                if len(in_flight) >= self.workers * 2:
+                    break
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                    task = next(pending, None)
+                    if task is not None:
+                        in_flight.add(pool.submit(_query_file, *task, query, cats, begin_date, end_date))
+
+    def files(self) -> Iterator[tuple[str, list[CatMeta]]]:
+        """
+        Returns the cats of every file with their first and last record date and number of records.
+
+        Only new and changed files are opened; the others are answered from the metadata cache.
+
+        Returns:
+        - Iterator[tuple[str, list[CatMeta]]]: (path, [(cat, first date, last date, records)]) per readable
+          file, in the order of the paths.
+        """
+        for _ in self._fan_out(None, None, None, None):
+            pass
+        failed = {path for path, _ in self.errors}
+        for path in self.paths:
+            if path not in failed and os.path.abspath(path) in self._metadata:
+                yield path, self._metadata[os.path.abspath(path)][1]
+
+    def iter_records(self, begin_date: date | None = None, end_date: date | None = None,
+                     cats: Iterable[str] | None = None) -> Iterator[tuple[str, str, date, float, str | None]]:
+        """
+        Streams the records within a date range from every file.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range (inclusive). None means no lower bound.
+        - end_date (date | None): The end date of the range (inclusive). None means no upper bound.
+        - cats (Iterable[str] | None): Only these cats. None returns every cat.
+
+        Returns:
+        - Iterator[tuple[str, str, date, float, str | None]]: (path, cat, date, weight, notes) tuples.
+        """
+        for path, results in self._fan_out(_records, cats, begin_date, end_date):
+            for cat, rows in results:
+                for record_date, weight, notes in rows:
+                    yield path, cat, record_date, weight, notes
+
+    def summary(self, begin_date: date | None = None, end_date: date | None = None,
+                cats: Iterable[str] | None = None) -> Iterator[tuple[str, str, int, date, float, date, float, float, float, float]]:
+        """
+        Summarizes the records of every cat within a date range.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range (inclusive). None means no lower bound.
+        - end_date (date | None): The end date of the range (inclusive). None means no upper bound.
+        - cats (Iterable[str] | None): Only these cats. None summarizes every cat.
+
+        Returns:
+        - Iterator[tuple]: (path, cat, records, first date, first weight, last date, last weight,
+          min, max, mean) per cat with records in the range. Weights are in kg.
+        """
+        for path, results in self._fan_out(_summary, cats, begin_date, end_date):
+            for cat, row in results:
+                if row is not None:
+                    yield (path, cat, *row)
@@ -0,0 +1,400 @@
+"""
+catdb.forecast - Batched weight forecasts for many series.
+
+The series (e.g. every cat of every database) are packed into one padded array per
+batch: one row per series on a daily grid that ends at the series' last record, with
+NaN for days without a record. Each model is fitted to all rows at once with array
+operations, so the cost grows with the number of batches, not with the number of
+series:
+
+- linear: least-squares line through the last LINEAR_DAYS days
+- seasonal: trend plus a yearly cycle (harmonics of the position in the year, the same
+  cycle as the year-over-year overlay of 'graph') fitted to the last SEASONAL_DAYS days;
+  the normal equations of all series are solved as one stacked matrix problem
+- damped: damped-trend exponential smoothing over the last DAMPED_DAYS days; the
+  recursion steps through the days, updating every series at once
+
+Prediction intervals assume normal errors with the spread of the fit residuals.
+
+refresh_forecasts() stores the forecasts in the forecasts table of each database and
+skips the cats whose records and settings did not change since their last fit.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import AbstractContextManager
+from datetime import date
+from statistics import NormalDist
+from typing import Callable, Iterable, Sequence
+
+import numpy as np
+
+from catdb.db import forecasts as store, versions
+from catdb.db.database import CatWeightDB
+from catdb.series import WeightSeries
+
+MODELS = ("linear", "seasonal", "damped")
+
+LINEAR_DAYS = 90
+
+# 年周期は 3 年分の記録から推定する
+SEASONAL_DAYS = 3 * 365 + 1
+SEASONAL_HARMONICS = 2
+# 年周期を推定するのに必要な記録の期間 (日)
+SEASONAL_MIN_SPAN = 365
+
+DAMPED_DAYS = 365
+DAMPED_ALPHA = 0.2
+DAMPED_BETA = 0.02
+DAMPED_PHI = 0.98
+
+_YEAR_DAYS = 365.2425
+
+# モデルごとに使う記録の期間 (最後の記録までの日数)
+_WINDOWS = {"linear": LINEAR_DAYS, "seasonal": SEASONAL_DAYS, "damped": DAMPED_DAYS}
+
+
+class ForecastResult:
+    """Forecasts of one model for a batch of series. Row i belongs to the i-th series."""
+
+    __slots__ = ("model", "start", "mean", "lower", "upper", "residual_std", "observations", "valid")
+
+    def __init__(self, model: str, count: int, horizon: int) -> None:
+        self.model: str = model
+        # 予測の初日 (各系列の最後の記録の翌日)
+        self.start: np.ndarray = np.zeros(count, dtype="datetime64[D]")
+        self.mean: np.ndarray = np.full((count, horizon), np.nan)
+        self.lower: np.ndarray = np.full((count, horizon), np.nan)
+        self.upper: np.ndarray = np.full((count, horizon), np.nan)
+        self.residual_std: np.ndarray = np.full(count, np.nan)
+        self.observations: np.ndarray = np.zeros(count, dtype=np.int64)
+        # 記録が足りずに当てはめられなかった系列は False
+        self.valid: np.ndarray = np.zeros(count, dtype=bool)
+
+    def dates(self, i: int) -> np.ndarray:
+        """Returns the forecast days of the i-th series as datetime64[D]."""
+        return self.start[i] + np.arange(self.mean.shape[1])
+
+
+def pack_series(series: Sequence[WeightSeries], days: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Packs the last days days of each series into a padded array.
+
+    Parameters:
+    - series (Sequence[WeightSeries]): The series.
+    - days (int): Length of the daily grid.
+
+    Returns:
+    - tuple[np.ndarray, np.ndarray]: Weights of shape (len(series), days), where column
+      days - 1 is the last record of each series and days without a record are NaN, and the
+      last record date of each series as day numbers (days since 1970-01-01).
+    """
+    values = np.full((len(series), days), np.nan)
+    last = np.zeros(len(series), dtype=np.int64)
+    for i, s in enumerate(series):
+        if not len(s):
+            continue
+        day = s.dates.astype(np.int64)
+        last[i] = day[-1]
+        first = int(np.searchsorted(day, day[-1] - days + 1))
+        values[i, day[first:] - (day[-1] - days + 1)] = s.weights[first:]
+    return values, last
+
+
+def _z(level: float) -> float:
+    return NormalDist().inv_cdf(0.5 + level / 2)
+
+
+def fit_linear(values: np.ndarray, horizon: int, level: float, out: ForecastResult, rows: slice) -> None:
+    """Fits a least-squares line to the last LINEAR_DAYS columns of every row."""
+    y = values[:, -LINEAR_DAYS:]
+    mask = ~np.isnan(y)
+    t = np.arange(1 - y.shape[1], 1, dtype=np.float64)
+    n = mask.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_mean = np.where(mask, t, 0.0).sum(axis=1) / n
+        y_mean = np.where(mask, y, 0.0).sum(axis=1) / n
+        dt = np.where(mask, t - t_mean[:, None], 0.0)
+        dy = np.where(mask, y - y_mean[:, None], 0.0)
+        sxx = (dt * dt).sum(axis=1)
+        slope = (dt * dy).sum(axis=1) / sxx
+        intercept = y_mean - slope * t_mean
+        residual = np.where(mask, y - intercept[:, None] - slope[:, None] * t, 0.0)
+        s = np.sqrt((residual * residual).sum(axis=1) / (n - 2))
+
+        h = np.arange(1, horizon + 1, dtype=np.float64)
+        mean = intercept[:, None] + slope[:, None] * h
+        spread = _z(level) * s[:, None] * np.sqrt(1 + 1 / n[:, None] + (h - t_mean[:, None]) ** 2 / sxx[:, None])
+    _store(out, rows, mean, spread, s, n, (n >= 3) & (sxx > 0))
+
+
+def _seasonal_design(offset: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """Returns the design matrix [1, trend, sin/cos of the yearly harmonics] with a trailing axis of terms."""
+    terms = [np.ones_like(day, dtype=np.float64), offset / _YEAR_DAYS]
+    for k in range(1, SEASONAL_HARMONICS + 1):
+        angle = (2 * np.pi * k / _YEAR_DAYS) * day
+        terms.extend((np.sin(angle), np.cos(angle)))
+    return np.stack(terms, axis=-1)
+
+
+def fit_seasonal(values: np.ndarray, last: np.ndarray, horizon: int, level: float,
+                 out: ForecastResult, rows: slice) -> None:
+    """Fits trend plus yearly harmonics to the last SEASONAL_DAYS columns of every row."""
+    y = values[:, -SEASONAL_DAYS:]
+    mask = ~np.isnan(y)
+    n = mask.sum(axis=1)
+    offset = np.arange(1 - y.shape[1], 1, dtype=np.float64)
+    x = _seasonal_design(np.broadcast_to(offset, y.shape), last[:, None] + offset)
+    xm = x * mask[..., None]
+    # 全系列の正規方程式をまとめて解く (記録が 1 年に満たない系列でも特異にならないよう擬似逆行列を使う)
+    inverse = np.linalg.pinv(np.einsum("slp,slq->spq", xm, x))
+    beta = np.einsum("spq,sq->sp", inverse, np.einsum("slp,sl->sp", xm, np.where(mask, y, 0.0)))
+    residual = np.where(mask, y - np.einsum("slp,sp->sl", x, beta), 0.0)
+    terms = x.shape[-1]
+
+    h = np.arange(1, horizon + 1, dtype=np.float64)
+    future = _seasonal_design(np.broadcast_to(h, (len(y), horizon)), last[:, None] + h)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s = np.sqrt((residual * residual).sum(axis=1) / (n - terms))
+        mean = np.einsum("shp,sp->sh", future, beta)
+        leverage = np.einsum("shp,spq,shq->sh", future, inverse, future)
+        spread = _z(level) * s[:, None] * np.sqrt(1 + np.maximum(leverage, 0.0))
+
+    observed = np.where(mask, np.arange(y.shape[1]), -1)
+    first = np.where(mask, np.arange(y.shape[1]), y.shape[1]).min(axis=1)
+    span = observed.max(axis=1) - first
+    _store(out, rows, mean, spread, s, n, (n >= 4 * terms) & (span >= SEASONAL_MIN_SPAN))
+
+
+def fit_damped(values: np.ndarray, horizon: int, level: float, out: ForecastResult, rows: slice) -> None:
+    """Runs damped-trend exponential smoothing over the last DAMPED_DAYS columns of every row."""
+    y = values[:, -DAMPED_DAYS:]
+    count = len(y)
+    state_level = np.zeros(count)
+    trend = np.zeros(count)
+    started = np.zeros(count, dtype=bool)
+    sse = np.zeros(count)
+    errors = np.zeros(count, dtype=np.int64)
+    # 日ごとに全系列を同時に更新する。記録の無い日は予測値をそのまま次の状態にする
+    for j in range(y.shape[1]):
+        observed = ~np.isnan(y[:, j])
+        predicted = state_level + DAMPED_PHI * trend
+        update = observed & started
+        error = np.where(update, y[:, j] - predicted, 0.0)
+        sse += error * error
+        errors += update
+        state_level = np.where(started, predicted + DAMPED_ALPHA * error, np.where(observed, y[:, j], 0.0))
+        trend = np.where(started, DAMPED_PHI * trend + DAMPED_BETA * error, 0.0)
+        started |= observed
+
+    # h 日後の予測: level + (phi + ... + phi^h) * trend
+    phi_sum = np.cumsum(DAMPED_PHI ** np.arange(1, horizon + 1))
+    mean = state_level[:, None] + trend[:, None] * phi_sum
+    # 分散: sigma^2 (1 + sum_{j<h} (alpha + beta * phi_sum_j)^2)
+    c = (DAMPED_ALPHA + DAMPED_BETA * phi_sum[:-1]) ** 2
+    growth = np.concatenate(([1.0], 1 + np.cumsum(c)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s = np.sqrt(sse / (errors - 2))
+        spread = _z(level) * s[:, None] * np.sqrt(growth)
+    n = errors + started
+    _store(out, rows, mean, spread, s, n, errors >= 3)
+
+
+def _store(out: ForecastResult, rows: slice, mean: np.ndarray, spread: np.ndarray, s: np.ndarray,
+           n: np.ndarray, valid: np.ndarray) -> None:
+    out.mean[rows] = mean
+    out.lower[rows] = mean - spread
+    out.upper[rows] = mean + spread
+    out.residual_std[rows] = s
+    out.observations[rows] = n
+    out.valid[rows] = valid & np.isfinite(mean).all(axis=1) & np.isfinite(spread).all(axis=1)
+
+
+def _check(models: Iterable[str], horizon: int, level: float) -> list[str]:
+    models = list(dict.fromkeys(models))
+    unknown = [model for model in models if model not in MODELS]
+    if unknown:
+        raise ValueError(f"Unknown forecast model: {', '.join(unknown)}")
+    if not models:
+        raise ValueError("No forecast model given")
+    if horizon <= 0:
+        raise ValueError("horizon must be a positive number of days")
+    if not 0 < level < 1:
+        raise ValueError("level must be between 0 and 1")
+    return models
+
+
+def forecast_series(series: Sequence[WeightSeries], models: Iterable[str] = MODELS, horizon: int = 30,
+                    level: float = 0.95, batch_size: int = 500) -> dict[str, ForecastResult]:
+    """
+    Forecasts many series with each model, a batch of series at a time.
+
+    Parameters:
+    - series (Sequence[WeightSeries]): The series (records in date order).
+    - models (Iterable[str]): Models to fit ('linear', 'seasonal', 'damped').
+    - horizon (int): Number of days to forecast after the last record of each series.
+    - level (float): Coverage of the prediction intervals (e.g. 0.95).
+    - batch_size (int): Number of series packed into one array (bounds the memory use).
+
+    Returns:
+    - dict[str, ForecastResult]: Forecasts per model. Series with too few records for a model
+      are marked invalid in its result.
+
+    Raises:
+    - ValueError: If a model is unknown, horizon is not positive or level is not within (0, 1).
+    """
+    models = _check(models, horizon, level)
+    days = max(_WINDOWS[model] for model in models)
+    results = {model: ForecastResult(model, len(series), horizon) for model in models}
+    for begin in range(0, len(series), batch_size):
+        rows = slice(begin, min(begin + batch_size, len(series)))
+        values, last = pack_series(series[rows], days)
+        for model in models:
+            results[model].start[rows] = (last + 1).astype("datetime64[D]")
+            if model == "linear":
+                fit_linear(values, horizon, level, results[model], rows)
+            elif model == "seasonal":
+                fit_seasonal(values, last, horizon, level, results[model], rows)
+            else:
+                fit_damped(values, horizon, level, results[model], rows)
+    return results
+
+
+def model_settings(model: str, horizon: int, level: float) -> str:
+    """Returns the settings of a model as stored with its forecasts; a change causes a refit."""
+    params = {
+        "linear": f"days={LINEAR_DAYS}",
+        "seasonal": f"days={SEASONAL_DAYS} harmonics={SEASONAL_HARMONICS}",
+        "damped": f"days={DAMPED_DAYS} alpha={DAMPED_ALPHA} beta={DAMPED_BETA} phi={DAMPED_PHI}",
+    }[model]
+    return f"horizon={horizon} level={level} {params}"
+
+
+class ForecastRun:
+    """Summary of refresh_forecasts."""
+
+    __slots__ = ("series", "fitted", "skipped", "load_seconds", "fit_seconds", "save_seconds")
+
+    def __init__(self) -> None:
+        # 当てはめた系列の数と、記録が変わっていないため飛ばした (猫, モデル) の数
+        self.series: int = 0
+        self.fitted: int = 0
+        self.skipped: int = 0
+        self.load_seconds: float = 0.0
+        self.fit_seconds: float = 0.0
+        self.save_seconds: float = 0.0
+
+
+def _collect(db: CatWeightDB, models: list[str], horizon: int, level: float, cats: set[str] | None,
+             force: bool, run: ForecastRun) -> tuple[list[tuple[int, str, list[str]]], list[WeightSeries], list]:
+    """
+    Finds the cats of a database that need a refit and reads their records.
+
+    Returns (cat_id, fingerprint, models) per stale cat, their series in the same order,
+    and the stored (cat_id, model) forecasts of cats that no longer have records.
+    """
+    conn = db.conn
+    prints = versions.fingerprints(conn)
+    runs = store.fitted_runs(conn)
+    names = dict(conn.execute("SELECT cat_id, name FROM cats").fetchall())
+
+    stale: dict[str, tuple[int, str, list[str]]] = {}
+    for cat_id, fingerprint in prints.items():
+        name = names.get(cat_id)
+        if name is None or (cats is not None and name not in cats):
+            continue
+        todo = [model for model in models
+                if force or runs.get((cat_id, model)) != (fingerprint, model_settings(model, horizon, level))]
+        run.skipped += len(models) - len(todo)
+        if todo:
+            stale[name] = (cat_id, fingerprint, todo)
+    orphaned = [key for key in runs if key[0] not in prints and (cats is None or names.get(key[0]) in cats)]
+    if not stale:
+        return [], [], orphaned
+
+    # 当てはめに使うのは最後の記録から最も長い窓の分だけなので、それより前は読まない
+    storage = db.storage
+    last_dates = [storage.decode_date(conn.execute("SELECT MAX(date) FROM cat_weight_records WHERE cat_id = ?",
+                                                   (cat_id,)).fetchone()[0]) for cat_id, _, _ in stale.values()]
+    begin = date.fromordinal(min(last_dates).toordinal() - max(_WINDOWS[model] for model in models))
+    series = list(db.iter_weight_series(begin_date=begin, cats=stale.keys()))
+    return [stale[s.cat] for s in series], series, orphaned
+
+
+def _save(db: CatWeightDB, cats: list[tuple[int, str, list[str]]], offset: int, results: dict[str, ForecastResult],
+          horizon: int, level: float, orphaned: list, run: ForecastRun) -> None:
+    """Writes the forecasts of one database's stale cats, which start at row offset of the results, in one transaction."""
+    with db.conn:
+        store.create_forecasts(db.conn)
+        for cat_id, model in orphaned:
+            store.forget_forecast(db.conn, cat_id, model)
+        for i, (cat_id, fingerprint, models) in enumerate(cats, start=offset):
+            for model in models:
+                result = results[model]
+                rows = []
+                if result.valid[i]:
+                    days = [str(day) for day in result.dates(i)]
+                    rows = zip(days, np.round(result.mean[i], 3).tolist(), np.round(result.lower[i], 3).tolist(),
+                               np.round(result.upper[i], 3).tolist())
+                residual_std = float(result.residual_std[i]) if result.valid[i] else None
+                store.save_forecast(db.conn, cat_id, model, fingerprint, model_settings(model, horizon, level),
+                                    str(result.start[i] - 1), int(result.observations[i]), residual_std, rows)
+                run.fitted += 1
+
+
+def refresh_forecasts(databases: Sequence[Callable[[], AbstractContextManager[CatWeightDB]]],
+                      models: Iterable[str] = MODELS, horizon: int = 30, level: float = 0.95,
+                      cats: Iterable[str] | None = None, force: bool = False,
+                      batch_size: int = 500) -> ForecastRun:
+    """
+    Refits the forecasts of the cats whose records changed since their last fit, in all
+    databases together, and stores them in the forecasts table of each database.
+
+    The stale series of every database are read first and fitted in one batched pass;
+    then the forecasts are written back, one transaction per database.
+
+    Parameters:
+    - databases (Sequence[Callable[[], AbstractContextManager[CatWeightDB]]]): Functions that open a
+      database, e.g. lambda: CatWeightDB(path). Each is called twice (read, then write).
+    - models (Iterable[str]): Models to fit.
+    - horizon (int): Number of days to forecast after the last record of each cat.
+    - level (float): Coverage of the prediction intervals.
+    - cats (Iterable[str] | None): Only forecast these cats. None forecasts every cat.
+    - force (bool): Refit every cat even if its records did not change.
+    - batch_size (int): Number of series packed into one array.
+
+    Returns:
+    - ForecastRun: Counts and timings.
+
+    Raises:
+    - ValueError: If a model is unknown, horizon is not positive or level is not within (0, 1).
+    """
+    models = _check(models, horizon, level)
+    cats = set(cats) if cats is not None else None
+    run = ForecastRun()
+
+    start = time.perf_counter()
+    collected = []
+    series: list[WeightSeries] = []
+    for open_db in databases:
+        with open_db() as db:
+            with db.phase("forecast_load"):
+                stale, db_series, orphaned = _collect(db, models, horizon, level, cats, force, run)
+        collected.append((open_db, stale, len(series), orphaned))
+        series.extend(db_series)
+    run.series = len(series)
+    run.load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = forecast_series(series, models, horizon, level, batch_size) if series else {}
+    run.fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for open_db, stale, offset, orphaned in collected:
+        if stale or orphaned:
+            with open_db() as db:
+                with db.phase("forecast_save"):
+                    _save(db, stale, offset, results, horizon, level, orphaned, run)
+    run.save_seconds = time.perf_counter() - start
+    return run
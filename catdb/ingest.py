@@ -0,0 +1,208 @@
+"""
+Parallel ingest of many CSV export files.
+
+Each file is parsed in a worker process: the delimiter and the date format are detected
+once from a sample of the file, and the columns are then converted with vectorized
+pandas operations using that single format. Rows with a date that does not match, or a
+missing or non-positive weight, are rejected and reported instead of aborting the file.
+
+The parsed files are sent back to the main process, where a single writer upserts
+them through one connection in one transaction (see CatWeightDB.bulk_upsert). At most
+a few files per worker are parsed ahead of the writer, so memory use is bounded by the
+size of the largest files rather than by the number of files.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+from catdb.db.database import CatWeightDB
+from catdb.utils.utils import DATE_FORMATS, detect_date_format
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 各ベンダーの書き出し形式。曖昧な書式は月/日の順を優先する
+INGEST_DATE_FORMATS = DATE_FORMATS + ("%d/%m/%Y", "%d.%m.%Y", "%Y.%m.%d", "%Y%m%d", "%d-%m-%Y")
+
+# 書式の判定に使う行数
+SAMPLE_ROWS = 200
+
+# 1 ファイルごとに保持する却下理由の数
+MAX_REJECTED_MESSAGES = 10
+
+
+class ParsedFile:
+    """Result of parsing one input file: the valid records and what was rejected."""
+
+    __slots__ = ("path", "records", "rows", "rejected", "messages", "date_format", "delimiter",
+                 "parse_seconds", "write_seconds", "error")
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.records: pd.DataFrame | None = None
+        self.rows: int = 0
+        self.rejected: int = 0
+        self.messages: list[str] = []
+        self.date_format: str | None = None
+        self.delimiter: str = ","
+        self.parse_seconds: float = 0.0
+        self.write_seconds: float = 0.0
+        self.error: str | None = None
+
+
+def _sniff(path: str) -> tuple[str, list[str]]:
+    """Reads the header and the first rows of a file and returns its delimiter and sample dates."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        head = [line for _, line in zip(range(SAMPLE_ROWS + 1), f)]
+    try:
+        delimiter = csv.Sniffer().sniff("".join(head[:20]), delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ","
+    reader = csv.reader(head, delimiter=delimiter)
+    header = [name.strip().lower() for name in next(reader, [])]
+    if "date" not in header:
+        return delimiter, []
+    column = header.index("date")
+    return delimiter, [row[column] for row in reader if len(row) > column]
+
+
+def parse_file(path: str) -> ParsedFile:
+    """
+    Parses and validates one CSV file with 'date', 'weight' and optional 'notes' columns.
+    Runs in a worker process.
+
+    Column names are matched case-insensitively. A decimal comma is accepted in the
+    weights of files that are not comma separated.
+
+    Parameters:
+    - path (str): Path to the file.
+
+    Returns:
+    - ParsedFile: The valid records (date as datetime64, weight in kg, notes) and the rejected rows.
+      error is set if the file could not be read at all.
+    """
+    import pandas as pd
+
+    result = ParsedFile(path)
+    start = time.perf_counter()
+    try:
+        result.delimiter, samples = _sniff(path)
+        result.date_format = detect_date_format(samples, INGEST_DATE_FORMATS)
+        if result.date_format is None:
+            # 不正な値が混じっていても、サンプルの大半が一致する書式を使う
+            result.date_format = _majority_format(samples)
+        if result.date_format is None:
+            raise ValueError("no 'date' column or unrecognized date format")
+
+        df = pd.read_csv(path, sep=result.delimiter, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+        df.columns = [str(name).strip().lower() for name in df.columns]
+        if "weight" not in df.columns:
+            raise ValueError("no 'weight' column")
+
+        dates = pd.to_datetime(df["date"].str.strip(), format=result.date_format, errors="coerce")
+        weight_text = df["weight"].str.strip()
+        if result.delimiter != ",":
+            weight_text = weight_text.str.replace(",", ".", regex=False)
+        weights = pd.to_numeric(weight_text, errors="coerce")
+        notes = df["notes"].where(df["notes"] != "", None) if "notes" in df.columns else None
+
+        bad_date = dates.isna()
+        bad_weight = ~bad_date & ~(weights > 0)
+        rejected = bad_date | bad_weight
+        result.rows = int((~rejected).sum())
+        result.rejected = int(rejected.sum())
+        # 行番号はヘッダーを 1 行目として数える
+        for index in rejected[rejected].index[:MAX_REJECTED_MESSAGES]:
+            if bad_date[index]:
+                reason = f"date {df['date'][index]!r} does not match {result.date_format}"
+            else:
+                reason = f"invalid weight {df['weight'][index]!r}"
+            result.messages.append(f"line {index + 2}: {reason}")
+
+        valid = ~rejected
+        result.records = pd.DataFrame({
+            "date": dates[valid].to_numpy(),
+            "weight": weights[valid].to_numpy(dtype=float),
+            "notes": notes[valid].to_numpy() if notes is not None else None,
+        })
+    except (OSError, ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        result.error = str(e)
+    result.parse_seconds = time.perf_counter() - start
+    return result
+
+
+def _majority_format(samples: list[str]) -> str | None:
+    """Returns the format that parses the most samples (at least half), or None."""
+    best, best_count = None, 0
+    for fmt in INGEST_DATE_FORMATS:
+        count = sum(detect_date_format([value], (fmt,)) is not None for value in samples)
+        if count > best_count:
+            best, best_count = fmt, count
+    return best if best_count * 2 >= len(samples) > 0 else None
+
+
+def _parse_files(paths: list[str], workers: int) -> Iterator[ParsedFile]:
+    """
+    Parses files in a process pool and yields the results as they complete.
+    Only a bounded number of files are submitted ahead of the consumer.
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield parse_file(path)
+        return
+
+    pending = iter(paths)
+    in_flight: set[Future] = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in pending:
+            in_flight.add(pool.submit(parse_file, path))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                path = next(pending, None)
+                if path is not None:
+                    in_flight.add(pool.submit(parse_file, path))
+
+
+def ingest_files(db: CatWeightDB, paths: Iterable[str], workers: int | None = None,
+                 on_file: Callable[[ParsedFile], None] | None = None) -> list[ParsedFile]:
+    """
+    Parses files in parallel and upserts their records into the current cat of db.
+
+    All files are written in a single transaction; rows rejected by validation are
+    skipped, and a file that cannot be read is reported and skipped.
+
+    Parameters:
+    - db (CatWeightDB): Open database. Records are written to its current cat.
+    - paths (Iterable[str]): Files to ingest.
+    - workers (int | None): Number of parser processes. None uses the number of CPUs.
+    - on_file (Callable[[ParsedFile], None] | None): Called after each file has been written (or skipped).
+
+    Returns:
+    - list[ParsedFile]: Results in completion order, without the parsed records.
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    results: list[ParsedFile] = []
+
+    def batches() -> Iterator[pd.DataFrame]:
+        for result in _parse_files(paths, workers):
+            if result.error is None and result.rows:
+                start = time.perf_counter()
+                yield result.records
+                # 次の要求までの時間がこのファイルの書き込み時間
+                result.write_seconds = time.perf_counter() - start
+            result.records = None
+            results.append(result)
+            if on_file is not None:
+                on_file(result)
+
+    db.bulk_upsert(batches())
+    return results
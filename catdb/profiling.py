@@ -0,0 +1,392 @@
+"""
+catdb.profiling - SQL tracing and phase timing.
+
+A Profiler collects two kinds of records:
+- statements: each SQL statement executed on a profiled connection, with its wall time
+  (execution plus fetching the rows) and the number of rows returned or changed, and
+- phases: named sections of a pipeline (e.g. 'read_sql', 'to_datetime', 'render') with
+  their wall and CPU time. Phases nest; a phase started inside another one is recorded
+  with the path of its parents.
+
+Statements are captured by opening the connection with ProfiledConnection, whose cursors
+time execute and fetch calls, together with sqlite3's trace callback. The trace callback
+also fires for the statements SQLite runs on behalf of a call (one per executemany row,
+one per trigger statement, the implicit BEGIN), which are counted as 'steps' of the call,
+and catches statements issued outside of cursors.
+
+Profiling is off unless a Profiler is passed to CatWeightDB or activated with
+`with Profiler() as profiler:`. Without one, connections are plain sqlite3 connections
+and phase() returns a shared no-op context manager, so the disabled cost is one
+attribute lookup per phase.
+
+Example:
+    with Profiler() as profiler, CatWeightDB("cat.db") as db:
+        df = db.get_all_records()
+    print(profiler.format_table())
+"""
+
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterator
+
+# 無効時に phase() が返す共有の何もしないコンテキストマネージャ
+_NULL_PHASE = nullcontext()
+
+# with Profiler() で有効化されたプロファイラ
+_active: "Profiler | None" = None
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class StatementRecord:
+    """One execution of an SQL statement on a profiled connection."""
+
+    __slots__ = ("sql", "seconds", "rows", "steps", "phase")
+
+    def __init__(self, sql: str, phase: str | None) -> None:
+        self.sql: str = sql
+        self.seconds: float | None = 0.0
+        self.rows: int = 0
+        self.steps: int = 0
+        self.phase: str | None = phase
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"sql": self.sql, "ms": None if self.seconds is None else self.seconds * 1000,
+                "rows": self.rows, "steps": self.steps, "phase": self.phase}
+
+
+class PhaseRecord:
+    """One timed phase of a pipeline."""
+
+    __slots__ = ("name", "path", "depth", "start", "wall", "cpu")
+
+    def __init__(self, name: str, path: str, depth: int, start: float) -> None:
+        self.name: str = name
+        self.path: str = path
+        self.depth: int = depth
+        self.start: float = start
+        self.wall: float = 0.0
+        self.cpu: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"name": self.name, "path": self.path, "depth": self.depth,
+                "start_ms": self.start * 1000, "wall_ms": self.wall * 1000, "cpu_ms": self.cpu * 1000}
+
+
+class Profiler:
+    """
+    Collects SQL statement and phase timings.
+
+    Hooks registered with add_hook() are called with ('statement', StatementRecord) when a
+    statement has been executed (its fetched rows are added to the record later), and
+    with ('phase', PhaseRecord) when a phase ends.
+    """
+
+    def __init__(self) -> None:
+        self.statements: list[StatementRecord] = []
+        self.phases: list[PhaseRecord] = []
+        self._hooks: list[Callable[[str, Any], None]] = []
+        self._stack: list[PhaseRecord] = []
+        self._origin: float = time.perf_counter()
+        self._previous: "Profiler | None" = None
+
+    def add_hook(self, hook: Callable[[str, Any], None]) -> None:
+        """
+        Registers a callback for every finished statement and phase.
+
+        Parameters:
+        - hook (Callable[[str, Any], None]): Called with ('statement', StatementRecord) or ('phase', PhaseRecord).
+        """
+        self._hooks.append(hook)
+
+    def _emit(self, kind: str, record: Any) -> None:
+        for hook in self._hooks:
+            hook(kind, record)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[PhaseRecord]:
+        """
+        Times a phase of a pipeline (wall and CPU time).
+
+        Parameters:
+        - name (str): Name of the phase.
+
+        Yields:
+        - PhaseRecord: The record, filled in when the phase ends.
+        """
+        path = f"{self._stack[-1].path}/{name}" if self._stack else name
+        record = PhaseRecord(name, path, len(self._stack), time.perf_counter() - self._origin)
+        self.phases.append(record)
+        self._stack.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - wall
+            record.cpu = time.process_time() - cpu
+            self._stack.pop()
+            self._emit("phase", record)
+
+    def _new_statement(self, sql: str) -> StatementRecord:
+        record = StatementRecord(_WHITESPACE.sub(" ", sql).strip(), self._stack[-1].path if self._stack else None)
+        self.statements.append(record)
+        return record
+
+    def summary(self) -> list[dict[str, Any]]:
+        """
+        Aggregates the statements by SQL text.
+
+        Returns:
+        - list[dict[str, Any]]: One entry per distinct statement with 'sql', 'calls', 'steps', 'rows',
+          'total_ms' and 'max_ms', ordered by total time (descending).
+        """
+        groups: dict[str, dict[str, Any]] = {}
+        for record in self.statements:
+            group = groups.setdefault(record.sql, {"sql": record.sql, "calls": 0, "steps": 0, "rows": 0,
+                                                   "total_ms": 0.0, "max_ms": 0.0})
+            group["calls"] += 1
+            group["steps"] += record.steps
+            group["rows"] += record.rows
+            if record.seconds is not None:
+                ms = record.seconds * 1000
+                group["total_ms"] += ms
+                group["max_ms"] = max(group["max_ms"], ms)
+        return sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns the collected records in a JSON-serializable form.
+
+        Returns:
+        - dict[str, Any]: 'phases' (in start order), 'statements' (aggregated, see summary())
+          and 'sql_total_ms'.
+        """
+        summary = self.summary()
+        return {
+            "phases": [p.to_dict() for p in self.phases],
+            "statements": summary,
+            "sql_total_ms": sum(s["total_ms"] for s in summary),
+        }
+
+    def to_json(self) -> str:
+        """Returns to_dict() as a JSON string."""
+        return json.dumps(self.to_dict(), indent=2)
+
+    def format_table(self, sql_width: int = 70) -> str:
+        """
+        Formats the phases and the aggregated statements as human-readable tables.
+
+        Parameters:
+        - sql_width (int): Statements longer than this are truncated.
+
+        Returns:
+        - str: The tables.
+        """
+        lines = [f"{'phase':<40} {'wall ms':>10} {'cpu ms':>10}"]
+        for p in self.phases:
+            lines.append(f"{'  ' * p.depth + p.name:<40} {p.wall * 1000:>10.2f} {p.cpu * 1000:>10.2f}")
+        summary = self.summary()
+        lines.append("")
+        lines.append(f"{'sql':<{sql_width}} {'calls':>6} {'steps':>7} {'rows':>9} {'total ms':>10} {'max ms':>9}")
+        for s in summary:
+            sql = s["sql"] if len(s["sql"]) <= sql_width else s["sql"][:sql_width - 3] + "..."
+            lines.append(f"{sql:<{sql_width}} {s['calls']:>6} {s['steps']:>7} {s['rows']:>9} "
+                         f"{s['total_ms']:>10.2f} {s['max_ms']:>9.2f}")
+        lines.append(f"SQL total: {sum(s['total_ms'] for s in summary):.2f} ms")
+        return "\n".join(lines)
+
+    def activate(self) -> None:
+        """Makes this profiler the one used by phase() and by CatWeightDB instances created without a profiler."""
+        global _active
+        self._previous, _active = _active, self
+
+    def deactivate(self) -> None:
+        """Restores the profiler that was active before activate()."""
+        global _active
+        _active, self._previous = self._previous, None
+
+    def __enter__(self) -> "Profiler":
+        self.activate()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.deactivate()
+
+
+def active_profiler() -> Profiler | None:
+    """Returns the active profiler, or None if profiling is off."""
+    return _active
+
+
+def phase(name: str):
+    """
+    Times a phase with the active profiler. A no-op when profiling is off.
+
+    Parameters:
+    - name (str): Name of the phase.
+
+    Returns:
+    - A context manager.
+    """
+    profiler = _active
+    return profiler.phase(name) if profiler is not None else _NULL_PHASE
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that reports execute and fetch times and row counts to the connection's profiler."""
+
+    _record: StatementRecord | None = None
+
+    def _run(self, sql: str, call: Callable[[], Any]) -> "ProfiledCursor":
+        conn: ProfiledConnection = self.connection
+        record = conn.profiler._new_statement(sql)
+        previous, conn._current = conn._current, record
+        start = time.perf_counter()
+        try:
+            call()
+        finally:
+            record.seconds += time.perf_counter() - start
+            conn._current = previous
+        # 書き込みは変更行数、読み出しは fetch した行数を数える
+        if self.description is None:
+            record.rows = max(self.rowcount, 0)
+        self._record = record
+        conn.profiler._emit("statement", record)
+        return self
+
+    def execute(self, sql: str, parameters: Any = (), /) -> "ProfiledCursor":
+        return self._run(sql, lambda: super(ProfiledCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql: str, seq_of_parameters: Any, /) -> "ProfiledCursor":
+        return self._run(sql, lambda: super(ProfiledCursor, self).executemany(sql, seq_of_parameters))
+
+    def executescript(self, sql_script: str, /) -> "ProfiledCursor":
+        return self._run(sql_script, lambda: super(ProfiledCursor, self).executescript(sql_script))
+
+    def _fetched(self, start: float, rows: int) -> None:
+        record = self._record
+        if record is not None:
+            record.seconds += time.perf_counter() - start
+            record.rows += rows
+
+    def fetchone(self) -> Any:
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list:
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self) -> list:
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __next__(self) -> Any:
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0)
+            raise
+        self._fetched(start, 1)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that records its statements in a Profiler.
+    Open it with profiled_connect() (or sqlite3.connect(..., factory=ProfiledConnection) and attach()).
+    """
+
+    profiler: Profiler
+    _current: StatementRecord | None = None
+
+    def attach(self, profiler: Profiler) -> None:
+        """
+        Starts recording the statements of this connection in profiler.
+
+        Parameters:
+        - profiler (Profiler): The profiler to report to.
+        """
+        self.profiler = profiler
+        self.set_trace_callback(self._trace)
+
+    def _trace(self, sql: str) -> None:
+        record = self._current
+        if record is not None:
+            record.steps += 1
+        else:
+            # カーソルを経由しない文 (暗黙の COMMIT など) は時間を測れないので件数だけ残す
+            record = self.profiler._new_statement(sql)
+            record.seconds = None
+            record.steps = 1
+            self.profiler._emit("statement", record)
+
+    def cursor(self, factory: type = ProfiledCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters: Any = (), /) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any, /) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str, /) -> sqlite3.Cursor:
+        return self.cursor().executescript(sql_script)
+
+    def _timed(self, sql: str, call: Callable[[], Any]) -> Any:
+        record = self.profiler._new_statement(sql)
+        previous, self._current = self._current, record
+        start = time.perf_counter()
+        try:
+            return call()
+        finally:
+            record.seconds += time.perf_counter() - start
+            self._current = previous
+            self.profiler._emit("statement", record)
+
+    def commit(self) -> None:
+        if self.in_transaction:
+            self._timed("COMMIT", super().commit)
+
+    def rollback(self) -> None:
+        if self.in_transaction:
+            self._timed("ROLLBACK", super().rollback)
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        # with conn: のコミット / ロールバックも計測する
+        if exc_type is None:
+            try:
+                self.commit()
+            except BaseException:
+                self.rollback()
+                raise
+        else:
+            self.rollback()
+        return False
+
+
+def profiled_connect(profiler: Profiler, database: str, **kwargs: Any) -> ProfiledConnection:
+    """
+    Opens an sqlite3 connection whose statements are recorded in profiler.
+
+    Parameters:
+    - profiler (Profiler): The profiler to report to.
+    - database (str): Path to the database file.
+    - **kwargs: Further arguments for sqlite3.connect.
+
+    Returns:
+    - ProfiledConnection: The opened connection.
+    """
+    conn = sqlite3.connect(database, factory=ProfiledConnection, **kwargs)
+    conn.attach(profiler)
+    return conn
@@ -0,0 +1,275 @@
+"""
+Batch rendering of graph sets for many cats and databases.
+
+Charts are drawn with matplotlib's object-oriented API (a Figure per chart, saved
+through the Agg canvas) instead of pyplot, which keeps global state and is not
+thread-safe. The render jobs only carry NumPy arrays, so they are fanned out to a
+process pool; every worker renders independent figures.
+
+The records of each database are fetched once, one WeightSeries per cat, and all
+charts of that database are derived from those arrays:
+- overlay: one line per year against the day of the year (like 'graph')
+- history: the full history of the cat
+- year: one chart per year with records
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+from catdb.db.database import CatWeightDB
+
+CHART_KINDS = ("overlay", "history", "year")
+
+
+class ChartJob:
+    """One chart to render: the arrays it is drawn from and where it is saved."""
+
+    __slots__ = ("kind", "db_file", "cat", "year", "dates", "weights", "path")
+
+    def __init__(self, kind: str, db_file: str, cat: str, dates: np.ndarray, weights: np.ndarray,
+                 path: str, year: int | None = None) -> None:
+        self.kind: str = kind
+        self.db_file: str = db_file
+        self.cat: str = cat
+        self.year: int | None = year
+        self.dates: np.ndarray = dates
+        self.weights: np.ndarray = weights
+        self.path: str = path
+
+
+class ChartResult:
+    """Outcome of one render job."""
+
+    __slots__ = ("kind", "db_file", "cat", "year", "path", "points", "render_seconds", "error")
+
+    def __init__(self, job: ChartJob) -> None:
+        self.kind: str = job.kind
+        self.db_file: str = job.db_file
+        self.cat: str = job.cat
+        self.year: int | None = job.year
+        self.path: str = job.path
+        self.points: int = len(job.dates)
+        self.render_seconds: float = 0.0
+        self.error: str | None = None
+
+
+def _file_name(name: str) -> str:
+    """Makes a cat or database name safe to use as a file name."""
+    return re.sub(r"[^\w.-]", "_", name) or "_"
+
+
+def _years(dates: np.ndarray) -> np.ndarray:
+    return dates.astype("datetime64[Y]").astype(int) + 1970
+
+
+def _draw_overlay(ax, job: ChartJob) -> None:
+    years = _years(job.dates)
+    # 日付順なので、年の境目で区切れば年ごとの配列になる
+    bounds = np.flatnonzero(np.diff(years)) + 1
+    for dates, weights in zip(np.split(job.dates, bounds), np.split(job.weights, bounds)):
+        day_of_year = (dates - dates.astype("datetime64[Y]")).astype(int) + 1
+        ax.plot(day_of_year, weights, marker='o', markersize=3, linestyle='-', label=str(_years(dates[:1])[0]))
+    ax.set_xlabel('Day of Year')
+    ax.set_title(f'Cat Weight Trends by Year ({job.cat})')
+    # 年が多い場合は凡例を複数列にして、グラフに収まるようにする
+    ax.legend(title="Year", ncols=(len(bounds) + 15) // 15, fontsize='small' if len(bounds) >= 15 else None)
+
+
+def _draw_history(ax, job: ChartJob) -> None:
+    ax.plot(job.dates, job.weights, linestyle='-', linewidth=1)
+    ax.set_xlabel('Date')
+    ax.set_title(f'Cat Weight History ({job.cat})')
+
+
+def _draw_year(ax, job: ChartJob) -> None:
+    ax.plot(job.dates, job.weights, marker='o', linestyle='-', color='b')
+    ax.set_xlabel('Date')
+    ax.set_title(f'Cat Weight Over Time in {job.year} ({job.cat})')
+    ax.tick_params(axis='x', labelrotation=45)
+
+
+_DRAW = {"overlay": _draw_overlay, "history": _draw_history, "year": _draw_year}
+
+
+def _load_matplotlib() -> None:
+    """Imports matplotlib in a worker before the first job arrives."""
+    import matplotlib.figure  # noqa: F401
+
+
+def render_chart(job: ChartJob) -> ChartResult:
+    """
+    Renders one chart to a PNG file. Runs in a worker process.
+
+    Parameters:
+    - job (ChartJob): The chart to render.
+
+    Returns:
+    - ChartResult: The render time, or the error if the chart could not be written.
+    """
+    # 読み込み時間は描画時間に含めない (ワーカーでは起動時に読み込み済み)
+    from matplotlib.figure import Figure
+
+    result = ChartResult(job)
+    start = time.perf_counter()
+    try:
+        fig = Figure(figsize=(12, 6))
+        ax = fig.add_subplot()
+        _DRAW[job.kind](ax, job)
+        ax.set_ylabel('Weight (kg)')
+        ax.grid()
+        fig.tight_layout()
+        os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+        # Figure.savefig は pyplot を介さず Agg で描画する
+        fig.savefig(job.path, format='png')
+    except (OSError, ValueError) as e:
+        result.error = str(e)
+    result.render_seconds = time.perf_counter() - start
+    return result
+
+
+def _check_kinds(kinds: Iterable[str]) -> list[str]:
+    kinds = list(kinds)
+    unknown = [kind for kind in kinds if kind not in CHART_KINDS]
+    if unknown:
+        raise ValueError(f"Unknown chart kind: {', '.join(unknown)}")
+    return kinds
+
+
+def chart_jobs(db_file: str, output_dir: str, kinds: Iterable[str] = CHART_KINDS,
+               first_year: int | None = None, last_year: int | None = None) -> tuple[list[ChartJob], float]:
+    """
+    Reads every cat of a database once and returns the chart jobs derived from it.
+
+    Charts are saved as <output_dir>/<database>/<cat>/overlay.png, history.png and year-YYYY.png.
+
+    Parameters:
+    - db_file (str): Path to the database file.
+    - output_dir (str): Root directory of the charts.
+    - kinds (Iterable[str]): Chart kinds to render ('overlay', 'history', 'year').
+    - first_year (int | None): Only use records from this year on. None means no lower bound.
+    - last_year (int | None): Only use records up to this year. None means no upper bound.
+
+    Returns:
+    - tuple[list[ChartJob], float]: The jobs and the seconds spent reading the database.
+
+    Raises:
+    - ValueError: If a chart kind is unknown.
+    - FileNotFoundError: If the database file does not exist.
+    - sqlite3.Error: If the file is not a catdb database.
+    """
+    from datetime import date
+
+    kinds = _check_kinds(kinds)
+    # sqlite3.connect は存在しないファイルを空のデータベースとして作ってしまう
+    if not os.path.isfile(db_file):
+        raise FileNotFoundError(f"Database file not found: {db_file}")
+    begin = date(first_year, 1, 1) if first_year is not None else None
+    end = date(last_year, 12, 31) if last_year is not None else None
+    db_dir = os.path.join(output_dir, _file_name(os.path.splitext(os.path.basename(db_file))[0]))
+
+    start = time.perf_counter()
+    with CatWeightDB(db_file) as db:
+        series = list(db.iter_weight_series(begin, end))
+    fetch_seconds = time.perf_counter() - start
+
+    jobs = []
+    for s in series:
+        if not len(s):
+            continue
+        cat_dir = os.path.join(db_dir, _file_name(s.cat))
+        if "overlay" in kinds:
+            jobs.append(ChartJob("overlay", db_file, s.cat, s.dates, s.weights, os.path.join(cat_dir, "overlay.png")))
+        if "history" in kinds:
+            jobs.append(ChartJob("history", db_file, s.cat, s.dates, s.weights, os.path.join(cat_dir, "history.png")))
+        if "year" in kinds:
+            for year in range(int(_years(s.dates[:1])[0]), int(_years(s.dates[-1:])[0]) + 1):
+                part = s.between(date(year, 1, 1), date(year, 12, 31))
+                if len(part):
+                    jobs.append(ChartJob("year", db_file, s.cat, part.dates, part.weights,
+                                         os.path.join(cat_dir, f"year-{year}.png"), year))
+    return jobs, fetch_seconds
+
+
+def _render_jobs(jobs: Iterable[ChartJob], workers: int) -> Iterator[ChartResult]:
+    """Renders jobs in a process pool, yielding the results as they complete."""
+    if workers <= 1:
+        for job in jobs:
+            yield render_chart(job)
+        return
+
+    pending = iter(jobs)
+    in_flight: set[Future] = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_matplotlib) as pool:
+        # 配列を抱えたジョブを溜め込みすぎないよう、投入する数を抑える
+        for job in pending:
+            in_flight.add(pool.submit(render_chart, job))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                job = next(pending, None)
+                if job is not None:
+                    in_flight.add(pool.submit(render_chart, job))
+
+
+def render_all(db_files: Iterable[str], output_dir: str, workers: int | None = None,
+               kinds: Iterable[str] = CHART_KINDS, first_year: int | None = None, last_year: int | None = None,
+               on_fetch: Callable[[str, int, float], None] | None = None,
+               on_chart: Callable[[ChartResult], None] | None = None,
+               on_error: Callable[[str, str], None] | None = None) -> list[ChartResult]:
+    """
+    Renders the chart set of every cat in every database, fanning the charts out to a process pool.
+
+    The databases are read one after another in the main process, while the workers
+    render the charts of the databases read before. A database that cannot be read is
+    reported through on_error and the others are still rendered.
+
+    Parameters:
+    - db_files (Iterable[str]): Database files.
+    - output_dir (str): Root directory of the charts.
+    - workers (int | None): Number of render processes. None uses the number of CPUs.
+    - kinds (Iterable[str]): Chart kinds to render.
+    - first_year (int | None): Only use records from this year on.
+    - last_year (int | None): Only use records up to this year.
+    - on_fetch (Callable[[str, int, float], None] | None): Called with (database, number of charts, seconds) after each read.
+    - on_chart (Callable[[ChartResult], None] | None): Called after each chart.
+    - on_error (Callable[[str, str], None] | None): Called with (database, error message) for each database
+      that could not be read.
+
+    Returns:
+    - list[ChartResult]: Results in completion order.
+
+    Raises:
+    - ValueError: If a chart kind is unknown.
+    """
+    kinds = _check_kinds(kinds)
+    workers = workers or os.cpu_count() or 1
+
+    def jobs() -> Iterator[ChartJob]:
+        for db_file in db_files:
+            try:
+                db_jobs, seconds = chart_jobs(db_file, output_dir, kinds, first_year, last_year)
+            except (OSError, sqlite3.Error) as e:
+                if on_error is not None:
+                    on_error(db_file, str(e))
+                continue
+            if on_fetch is not None:
+                on_fetch(db_file, len(db_jobs), seconds)
+            yield from db_jobs
+
+    results = []
+    for result in _render_jobs(jobs(), workers):
+        results.append(result)
+        if on_chart is not None:
+            on_chart(result)
+    return results
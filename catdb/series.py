@@ -0,0 +1,137 @@
+"""
+WeightSeries - an array-backed view of one cat's weight records.
+
+A WeightSeries holds the dates as a datetime64[D] array and the weights as a float32
+array, about 12 bytes per record, instead of a DataFrame with Timestamp, float64 and
+object columns. Notes are usually empty, so they are not read with the weights; they
+are loaded from the database on first access (or eagerly when requested).
+
+Slicing, by position or by date range, returns a new WeightSeries that shares the
+arrays of the original (NumPy views), so a range of a long history costs two binary
+searches and no copying.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import TYPE_CHECKING, Callable, Iterator
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 日付の配列を受け取り、それぞれの日のメモ (無ければ None) を返す関数
+NotesLoader = Callable[[np.ndarray], np.ndarray]
+
+
+class WeightSeries:
+    """Dates and weights of one cat in date order, backed by contiguous NumPy arrays."""
+
+    __slots__ = ("dates", "weights", "cat", "_notes", "_notes_loader")
+
+    def __init__(self, dates: np.ndarray, weights: np.ndarray, notes: np.ndarray | None = None,
+                 notes_loader: NotesLoader | None = None, cat: str | None = None) -> None:
+        """
+        Parameters:
+        - dates (np.ndarray): Dates in ascending order (converted to datetime64[D]).
+        - weights (np.ndarray): Weights in kg (converted to float32).
+        - notes (np.ndarray | None): Notes as an object array, if already loaded.
+        - notes_loader (NotesLoader | None): Loads the notes of the given dates on first access.
+        - cat (str | None): Name of the cat.
+        """
+        self.dates: np.ndarray = np.asarray(dates, dtype="datetime64[D]")
+        self.weights: np.ndarray = np.asarray(weights, dtype=np.float32)
+        if len(self.dates) != len(self.weights):
+            raise ValueError("dates and weights must have the same length")
+        self.cat: str | None = cat
+        self._notes: np.ndarray | None = notes
+        self._notes_loader: NotesLoader | None = notes_loader
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return f"WeightSeries(cat={self.cat!r}, empty)"
+        return f"WeightSeries(cat={self.cat!r}, {len(self)} records, {self.dates[0]} to {self.dates[-1]})"
+
+    def __iter__(self) -> Iterator[tuple[date, float]]:
+        """Iterates over (date, weight) pairs."""
+        return zip(self.dates.tolist(), self.weights.tolist())
+
+    def __getitem__(self, index: slice) -> WeightSeries:
+        """Returns the records at the given positions as a WeightSeries sharing the arrays."""
+        if not isinstance(index, slice):
+            raise TypeError("WeightSeries supports slices only; use .dates[i] and .weights[i] for single records")
+        notes = self._notes[index] if self._notes is not None else None
+        return WeightSeries(self.dates[index], self.weights[index], notes, self._notes_loader, self.cat)
+
+    def between(self, begin_date: date | None = None, end_date: date | None = None) -> WeightSeries:
+        """
+        Returns the records within a date range (inclusive) without copying, using binary search.
+
+        Parameters:
+        - begin_date (date | None): The start date of the range. None means no lower bound.
+        - end_date (date | None): The end date of the range. None means no upper bound.
+
+        Returns:
+        - WeightSeries: View of the records in the range.
+        """
+        start = 0 if begin_date is None else int(np.searchsorted(self.dates, np.datetime64(begin_date, "D"), "left"))
+        stop = len(self) if end_date is None else int(np.searchsorted(self.dates, np.datetime64(end_date, "D"), "right"))
+        return self[start:stop]
+
+    @property
+    def notes(self) -> np.ndarray:
+        """
+        Notes of the records as an object array (None where a record has no notes).
+        Loaded from the database on first access.
+
+        Raises:
+        - ValueError: If the notes were not loaded and cannot be loaded.
+        """
+        if self._notes is None:
+            if self._notes_loader is None:
+                raise ValueError("Notes were not loaded for this series")
+            self._notes = self._notes_loader(self.dates)
+        return self._notes
+
+    @property
+    def notes_loaded(self) -> bool:
+        """Whether the notes are already in memory."""
+        return self._notes is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the date and weight arrays (views report the size of their part)."""
+        return self.dates.nbytes + self.weights.nbytes
+
+    def to_pandas(self, notes: bool = False) -> pd.DataFrame:
+        """
+        Converts the series to a DataFrame with the columns of CatWeightDB.get_all_records.
+
+        Parameters:
+        - notes (bool): Include the notes column (loads the notes if necessary).
+
+        Returns:
+        - pd.DataFrame: DataFrame with 'date', 'weight' and, if requested, 'notes' columns.
+        """
+        import pandas as pd
+
+        columns = {"date": self.dates, "weight": self.weights}
+        if notes:
+            columns["notes"] = self.notes
+        return pd.DataFrame(columns, copy=False)
+
+    @classmethod
+    def concatenate(cls, parts: list[tuple[np.ndarray, np.ndarray]], cat: str | None = None,
+                    notes_loader: NotesLoader | None = None) -> WeightSeries:
+        """Builds a series from chunks of (dates, weights) arrays, copying each value once."""
+        if not parts:
+            return cls(np.array([], dtype="datetime64[D]"), np.array([], dtype=np.float32),
+                       notes_loader=notes_loader, cat=cat)
+        if len(parts) == 1:
+            return cls(parts[0][0], parts[0][1], notes_loader=notes_loader, cat=cat)
+        return cls(np.concatenate([d for d, _ in parts]), np.concatenate([w for _, w in parts]),
+                   notes_loader=notes_loader, cat=cat)
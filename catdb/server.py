@@ -0,0 +1,386 @@
+"""
+catdb.server - Local HTTP/JSON API over a catdb database.
+
+The server keeps its SQLite connections open for its whole lifetime (one writer and a
+pool of read-only readers, see ConnectionPool) and caches query results in memory
+(ResultCache). Writes made through the server invalidate exactly the cached results of
+the written cat and dates. Writes made by other processes are detected with
+PRAGMA data_version and clear the whole cache.
+
+Endpoints (all dates in 'YYYY-MM-DD' format; cat defaults to 'default'):
+    GET    /records?cat=&begin=&end=      records, optionally within a date range
+    GET    /records/<date>?cat=           one record (404 if missing)
+    GET    /stats?cat=&period=&begin=&end= per-period statistics from the rollups
+    GET    /cats                          registered cats and record counts
+    GET    /graph?cat=                    PNG of the yearly weight trends
+    GET    /cache                         result cache counters
+    POST   /records                       {"date", "weight", "notes", "cat"} -> 201, or 409 if it exists
+    PUT    /records/<date>                {"weight", "notes", "cat"} -> 200, or 404 if missing
+    DELETE /records/<date>?cat=           -> 200, or 404 if missing
+    POST   /batch                         [{"op", "date", "weight", "notes", "cat"}, ...]
+"""
+
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+from catdb.cache import ResultCache
+from catdb.db.database import BATCH_SQL, CatWeightDB, DEFAULT_CAT, open_connection
+from catdb.db.pool import ConnectionPool
+from catdb.db.rollups import PERIODS
+from catdb.utils.utils import parse_date
+
+# 期間の初日から期間内の最終日までの最大日数 (統計の結果に影響する記録の範囲を求めるため)
+_PERIOD_LAST_DAY = {"week": 6, "month": 30, "year": 365}
+
+# グラフに描く最初の年 (graph コマンドと同じ)
+GRAPH_FIRST_YEAR = 2021
+
+
+class HTTPError(Exception):
+    """Error answered with the given HTTP status and a JSON body."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status: int = status
+
+
+class CatDBServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the warm connections and the result cache."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], db_file: str, readers: int = 8,
+                 cache_entries: int = 1024, verbose: bool = False) -> None:
+        """
+        Initializes the server and opens the database.
+
+        Parameters:
+        - address (tuple[str, int]): (host, port) to listen on. Port 0 picks a free port.
+        - db_file (str): Path to the SQLite3 database file.
+        - readers (int): Number of read-only connections.
+        - cache_entries (int): Maximum number of cached results.
+        - verbose (bool): Log every request to STDERR.
+        """
+        self.db_file: str = db_file
+        self.pool = ConnectionPool(db_file, readers=readers, wal=True)
+        self.cache = ResultCache(cache_entries)
+        self.verbose: bool = verbose
+        # 他のプロセスの書き込みを検出するための接続
+        self._watch = open_connection(db_file, check_same_thread=False)
+        self._watch_lock = threading.Lock()
+        self._data_version: int = self._read_data_version()
+        self._render_lock = threading.Lock()
+        with self.pool.writer() as db:
+            db.initialize_table()
+        super().__init__(address, CatDBRequestHandler)
+
+    def _read_data_version(self) -> int:
+        return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def check_external_writes(self) -> None:
+        """Clears the cache if another process committed to the database since the last check."""
+        with self._watch_lock:
+            version = self._read_data_version()
+            if version != self._data_version:
+                self._data_version = version
+                self.cache.clear()
+
+    def cached(self, key: tuple, cat: str | None, first: str | None, last: str | None,
+               compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached result for key, computing and caching it on a miss.
+
+        Parameters:
+        - key (tuple): Cache key.
+        - cat (str | None): Cat the result belongs to (None: all cats).
+        - first (str | None), last (str | None): Range of record dates the result depends on.
+        - compute (Callable[[], Any]): Computes the result.
+
+        Returns:
+        - Any: The result.
+        """
+        self.check_external_writes()
+        value = self.cache.get(key)
+        if value is None:
+            token = self.cache.token()
+            value = compute()
+            self.cache.put(key, value, cat, first, last, token)
+        return value
+
+    def write(self, cat: str, written: dict[str, list[str]], apply: Callable[[CatWeightDB], Any]) -> Any:
+        """
+        Applies a write through the writer connection and invalidates the affected results.
+
+        Parameters:
+        - cat (str): Cat of the CatWeightDB instance passed to apply.
+        - written (dict[str, list[str]]): ISO dates written for each cat (used for invalidation).
+        - apply (Callable[[CatWeightDB], Any]): Performs the write.
+
+        Returns:
+        - Any: The return value of apply.
+        """
+        self.check_external_writes()
+        with self.pool.writer(cat) as db:
+            result = apply(db)
+            for written_cat, dates in written.items():
+                self.cache.invalidate(written_cat, min(dates), max(dates))
+            # 自分の書き込みで data_version が変わっても、キャッシュ全体は消さない
+            with self._watch_lock:
+                self._data_version = self._read_data_version()
+        return result
+
+    def render_graph(self, cat: str) -> bytes:
+        """Renders the yearly trend graph of a cat and returns the PNG bytes."""
+        import contextlib
+        import io
+        from catdb.commands.graph import fetch_year_lines, plot_year_lines
+
+        years = list(range(GRAPH_FIRST_YEAR, date.today().year + 1))
+        with self.pool.reader(cat) as db:
+            lines, bucket = fetch_year_lines(db, years)
+        # pyplot はスレッドセーフではないので描画は 1 つずつ行う
+        with self._render_lock, tempfile.TemporaryDirectory() as tmp:
+            graph_file = os.path.join(tmp, "graph.png")
+            with contextlib.redirect_stdout(io.StringIO()):
+                plot_year_lines(lines, years, graph_file, bucket)
+            with open(graph_file, "rb") as f:
+                return f.read()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.close()
+        self._watch.close()
+
+
+class CatDBRequestHandler(BaseHTTPRequestHandler):
+    """Routes the HTTP requests to CatDBServer."""
+
+    # keep-alive で接続を使い回せるようにする
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に送るため、Nagle と遅延 ACK で 40ms 待たされないようにする
+    disable_nagle_algorithm = True
+    server: CatDBServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, value: Any) -> None:
+        self._send(status, json.dumps(value).encode())
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}")
+
+    def _dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            handler = getattr(self, f"_{method}_{parts[0]}" if parts else "", None)
+            if handler is None:
+                raise HTTPError(404, f"Not found: {url.path}")
+            handler(parts[1:], query)
+        except HTTPError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self) -> None:
+        self._dispatch("get")
+
+    def do_POST(self) -> None:
+        self._dispatch("post")
+
+    def do_PUT(self) -> None:
+        self._dispatch("put")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("delete")
+
+    # ------------------------------------------------------------------
+    # 読み出し
+    # ------------------------------------------------------------------
+
+    def _get_records(self, args: list[str], query: dict[str, str]) -> None:
+        cat = query.get("cat", DEFAULT_CAT)
+        if args:
+            day = parse_date(args[0]).isoformat()
+
+            def find() -> bytes | None:
+                with self.server.pool.reader(cat) as db:
+                    record = db.find_weight_record(date.fromisoformat(day))
+                if record is None:
+                    return b""
+                return json.dumps({"date": day, "weight": record[1], "notes": record[2]}).encode()
+
+            body = self.server.cached(("record", cat, day), cat, day, day, find)
+            if not body:
+                raise HTTPError(404, f"No record found for date {day}")
+            self._send(200, body)
+            return
+
+        begin = parse_date(query["begin"]) if "begin" in query else None
+        end = parse_date(query["end"]) if "end" in query else None
+
+        def records() -> bytes:
+            with self.server.pool.reader(cat) as db:
+                rows = [{"date": d.isoformat(), "weight": w, "notes": n}
+                        for chunk in db.iter_record_chunks(begin, end, 5000) for d, w, n in chunk]
+            return json.dumps(rows).encode()
+
+        first = begin.isoformat() if begin else None
+        last = end.isoformat() if end else None
+        self._send(200, self.server.cached(("records", cat, first, last), cat, first, last, records))
+
+    def _get_stats(self, args: list[str], query: dict[str, str]) -> None:
+        cat = query.get("cat", DEFAULT_CAT)
+        period = query.get("period", "month")
+        if period not in PERIODS:
+            raise HTTPError(400, f"Unknown period: {period}")
+        begin = parse_date(query["begin"]) if "begin" in query else None
+        end = parse_date(query["end"]) if "end" in query else None
+
+        def stats() -> bytes:
+            with self.server.pool.reader(cat) as db:
+                rows = db.get_stats(period, begin, end)
+            return json.dumps([
+                {"period_start": start.isoformat(), "count": count, "min": low, "max": high, "mean": mean, "std": std}
+                for start, count, low, high, mean, std in rows
+            ]).encode()
+
+        # 期間の初日で絞り込むので、最後の期間の末日までの記録が結果に影響する
+        first = begin.isoformat() if begin else None
+        last = (end + timedelta(days=_PERIOD_LAST_DAY[period])).isoformat() if end else None
+        self._send(200, self.server.cached(("stats", cat, period, first, last), cat, first, last, stats))
+
+    def _get_cats(self, args: list[str], query: dict[str, str]) -> None:
+        def cats() -> bytes:
+            with self.server.pool.reader() as db:
+                rows = db.list_cats()
+            return json.dumps([{"cat_id": cat_id, "name": name, "records": count}
+                               for cat_id, name, count in rows]).encode()
+
+        self._send(200, self.server.cached(("cats",), None, None, None, cats))
+
+    def _get_graph(self, args: list[str], query: dict[str, str]) -> None:
+        cat = query.get("cat", DEFAULT_CAT)
+        first = f"{GRAPH_FIRST_YEAR}-01-01"
+        body = self.server.cached(("graph", cat, date.today().year), cat, first, None,
+                                  lambda: self.server.render_graph(cat))
+        self._send(200, body, "image/png")
+
+    def _get_cache(self, args: list[str], query: dict[str, str]) -> None:
+        self._send_json(200, self.server.cache.stats())
+
+    # ------------------------------------------------------------------
+    # 書き込み
+    # ------------------------------------------------------------------
+
+    def _post_records(self, args: list[str], query: dict[str, str]) -> None:
+        body = self._read_json()
+        if not isinstance(body, dict) or "date" not in body or "weight" not in body:
+            raise HTTPError(400, "Body must be an object with 'date' and 'weight'")
+        cat = body.get("cat") or query.get("cat", DEFAULT_CAT)
+        day = parse_date(str(body["date"]))
+        weight = float(body["weight"])
+        added = self.server.write(cat, {cat: [day.isoformat()]},
+                                  lambda db: db.add_weight_record(day, weight, body.get("notes")))
+        if not added:
+            raise HTTPError(409, f"A record for {day} already exists")
+        self._send_json(201, {"date": day.isoformat(), "weight": weight, "notes": body.get("notes")})
+
+    def _put_records(self, args: list[str], query: dict[str, str]) -> None:
+        if not args:
+            raise HTTPError(405, "PUT requires /records/<date>")
+        body = self._read_json()
+        if not isinstance(body, dict) or "weight" not in body:
+            raise HTTPError(400, "Body must be an object with 'weight'")
+        cat = body.get("cat") or query.get("cat", DEFAULT_CAT)
+        day = parse_date(args[0])
+        weight = float(body["weight"])
+        updated = self.server.write(cat, {cat: [day.isoformat()]},
+                                    lambda db: db.update_weight_record(day, weight, body.get("notes")))
+        if not updated:
+            raise HTTPError(404, f"No record found for date {day}")
+        self._send_json(200, {"date": day.isoformat(), "weight": weight, "notes": body.get("notes")})
+
+    def _delete_records(self, args: list[str], query: dict[str, str]) -> None:
+        if not args:
+            raise HTTPError(405, "DELETE requires /records/<date>")
+        cat = query.get("cat", DEFAULT_CAT)
+        day = parse_date(args[0])
+        if not self.server.write(cat, {cat: [day.isoformat()]}, lambda db: db.delete_weight_record(day)):
+            raise HTTPError(404, f"No record found for date {day}")
+        self._send_json(200, {"deleted": day.isoformat()})
+
+    def _post_batch(self, args: list[str], query: dict[str, str]) -> None:
+        body = self._read_json()
+        if not isinstance(body, list):
+            raise HTTPError(400, "Body must be a list of operations")
+        default_cat = query.get("cat", DEFAULT_CAT)
+        operations = []
+        written: dict[str, list[str]] = {}
+        for index, item in enumerate(body):
+            # 1 件でも不正なら何も書き込まずに、その位置を返す
+            if not isinstance(item, dict) or "date" not in item:
+                raise HTTPError(400, f"Operation {index}: must be an object with 'op' and 'date'")
+            op = item.get("op")
+            if op not in BATCH_SQL:
+                raise HTTPError(400, f"Operation {index}: unknown operation {op!r}")
+            try:
+                day = parse_date(str(item["date"]))
+                weight = float(item["weight"]) if item.get("weight") is not None else None
+            except (TypeError, ValueError) as e:
+                raise HTTPError(400, f"Operation {index}: {e}")
+            if op != "delete" and weight is None:
+                raise HTTPError(400, f"Operation {index}: {op} requires 'weight'")
+            cat = item.get("cat") or default_cat
+            if not isinstance(cat, str) or not isinstance(item.get("notes"), (str, type(None))):
+                raise HTTPError(400, f"Operation {index}: 'cat' and 'notes' must be strings")
+            operations.append((op, cat, day, weight, item.get("notes")))
+            written.setdefault(cat, []).append(day.isoformat())
+
+        # 1 つのトランザクションで適用し、書き込んだ猫ごとに無効化する
+        result = self.server.write(default_cat, written, lambda db: db.apply_operations(operations))
+        self._send_json(200, {op: {"ok": ok, "failed": failed} for op, (ok, failed) in result.items()})
+
+
+def serve(db_file: str, host: str = "127.0.0.1", port: int = 8080, readers: int = 8,
+          cache_entries: int = 1024, verbose: bool = False) -> None:
+    """
+    Runs the HTTP server until interrupted.
+
+    Parameters:
+    - db_file (str): Path to the SQLite3 database file.
+    - host (str): Address to listen on.
+    - port (int): Port to listen on. 0 picks a free port.
+    - readers (int): Number of read-only connections.
+    - cache_entries (int): Maximum number of cached results.
+    - verbose (bool): Log every request to STDERR.
+    """
+    server = CatDBServer((host, port), db_file, readers=readers, cache_entries=cache_entries, verbose=verbose)
+    print(f"Serving {db_file} on http://{server.server_address[0]}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,6 +1,10 @@
 import os
+import sys
 from datetime import datetime, date
-from typing import Optional
+from typing import Iterable, Optional
+
+# parse_date が受け付ける日付の書式 (先に一致したものを使う)
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%m-%d-%Y", "%m/%d/%Y")
 
 def parse_date(date_str: str) -> date:
     """
@@ -15,13 +19,45 @@ def parse_date(date_str: str) -> date:
     Raises:
     - ValueError: If the date format is not supported.
     """
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%m-%d-%Y", "%m/%d/%Y"):
+    # ほとんどの入力は YYYY-MM-DD なので strptime を試す前に処理する
+    if len(date_str) == 10 and date_str[4] == "-" and date_str[7] == "-":
+        try:
+            return date.fromisoformat(date_str)
+        except ValueError:
+            pass
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(date_str, fmt).date()
         except ValueError:
             continue
     raise ValueError(f"Invalid date format: {date_str}")
 
+def detect_date_format(samples: Iterable[str], formats: Iterable[str] = DATE_FORMATS) -> str | None:
+    """
+    Detects the date format of a column from a sample of its values.
+
+    The first format that parses every sample is chosen, so list unambiguous formats
+    before ones that could also match (e.g. '%m/%d/%Y' before '%d/%m/%Y').
+
+    Parameters:
+    - samples (Iterable[str]): Sample values. Empty strings are ignored.
+    - formats (Iterable[str]): Candidate strptime formats in order of preference.
+
+    Returns:
+    - str | None: The detected format, or None if no format parses all samples.
+    """
+    values = [value.strip() for value in samples if value and value.strip()]
+    if not values:
+        return None
+    for fmt in formats:
+        try:
+            for value in values:
+                datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return fmt
+    return None
+
 def get_database_file(args_db_file: Optional[str]) -> str:
     """
     Determines the database file path based on the --db-file argument or CAT_DB environment variable.
@@ -42,4 +78,20 @@ def get_database_file(args_db_file: Optional[str]) -> str:
     else:
         print("Error: Please provide a database file with --db-file or set the CAT_DB environment variable.")
         exit(1)
-    
\ No newline at end of file
+    
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the current process in megabytes.
+
+    Returns:
+    - float: Peak RSS in MB, or 0.0 if the platform does not provide it.
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS は bytes、Linux は KB 単位で返す
+    if sys.platform == "darwin":
+        return maxrss / (1024 * 1024)
+    return maxrss / 1024
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# リポジトリのルートから catdb を読み込む
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catdb.db.database import CatWeightDB  # noqa: E402
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    """Path of an initialized, empty database."""
+    path = str(tmp_path / "cats.db")
+    with CatWeightDB(path) as db:
+        db.initialize_table()
+    return path
+
+
+@pytest.fixture
+def db(db_file):
+    """Open CatWeightDB on an initialized, empty database."""
+    with CatWeightDB(db_file) as db:
+        yield db
@@ -0,0 +1,143 @@
+import random
+import statistics
+from datetime import date, timedelta
+
+import pytest
+
+from catdb.commands.graph import choose_bucket, fetch_year_lines
+from catdb.db.database import CatWeightDB
+from catdb.db.storage import STORAGES
+
+STATS = ["count", "min", "max", "mean", "std", "sum"]
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    if bucket == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def reference(records, bucket, begin=None, end=None) -> list[tuple]:
+    groups: dict[date, list[float]] = {}
+    for day, weight in records:
+        if (begin is None or day >= begin) and (end is None or day <= end):
+            groups.setdefault(bucket_start(day, bucket), []).append(weight)
+    return [(start, len(ws), min(ws), max(ws), statistics.fmean(ws),
+             statistics.stdev(ws) if len(ws) > 1 else None, sum(ws)) for start, ws in sorted(groups.items())]
+
+
+def assert_rows_equal(rows, expected):
+    assert [row[:2] for row in rows] == [row[:2] for row in expected]
+    for row, want in zip(rows, expected):
+        assert row[2:] == pytest.approx(want[2:], abs=1e-9)
+
+
+@pytest.fixture
+def boundary_db(db):
+    # 週は月曜始まり。日曜・月曜、月末・月初、閏日、年末・年始をまたぐ
+    records = [
+        (date(2023, 12, 31), 4.0),  # 日曜: 2023-12-25 の週
+        (date(2024, 1, 1), 4.1),    # 月曜
+        (date(2024, 1, 7), 4.2),    # 日曜: 2024-01-01 の週
+        (date(2024, 1, 8), 4.3),    # 月曜
+        (date(2024, 1, 31), 4.4),
+        (date(2024, 2, 1), 4.5),
+        (date(2024, 2, 29), 4.6),
+        (date(2024, 3, 1), 4.7),
+        (date(2024, 12, 30), 4.8),  # 月曜: 2025-01-01 と同じ週
+        (date(2025, 1, 1), 4.9),
+    ]
+    for record in records:
+        db.add_weight_record(*record)
+    return db, records
+
+
+def test_week_boundaries(boundary_db):
+    db, _ = boundary_db
+    assert db.get_aggregated(bucket="week", stats=["count"]) == [
+        (date(2023, 12, 25), 1), (date(2024, 1, 1), 2), (date(2024, 1, 8), 1), (date(2024, 1, 29), 2),
+        (date(2024, 2, 26), 2), (date(2024, 12, 30), 2),
+    ]
+
+
+def test_month_and_year_boundaries(boundary_db):
+    db, _ = boundary_db
+    assert db.get_aggregated(bucket="month", stats=["count", "max"]) == [
+        (date(2023, 12, 1), 1, 4.0), (date(2024, 1, 1), 4, 4.4), (date(2024, 2, 1), 2, 4.6),
+        (date(2024, 3, 1), 1, 4.7), (date(2024, 12, 1), 1, 4.8), (date(2025, 1, 1), 1, 4.9),
+    ]
+    assert db.get_aggregated(bucket="year", stats=["count"]) == [
+        (date(2023, 1, 1), 1), (date(2024, 1, 1), 8), (date(2025, 1, 1), 1)]
+
+
+def test_range_clips_the_first_and_last_buckets(boundary_db):
+    db, records = boundary_db
+    # 範囲は記録に掛かるので、バケットの開始日は範囲の外でもよい
+    assert db.get_aggregated(date(2024, 1, 7), date(2024, 2, 1), "month", ["count", "min"]) == [
+        (date(2024, 1, 1), 3, 4.2), (date(2024, 2, 1), 1, 4.5)]
+    assert db.get_aggregated(date(2025, 1, 1), None, "week", ["count", "mean"]) == [(date(2024, 12, 30), 1, 4.9)]
+    assert db.get_aggregated(date(2024, 1, 2), date(2024, 1, 6), "week") == []
+    for bucket in ("day", "week", "month", "year"):
+        assert_rows_equal(db.get_aggregated(date(2024, 1, 7), date(2024, 12, 30), bucket, STATS),
+                          reference(records, bucket, date(2024, 1, 7), date(2024, 12, 30)))
+
+
+def test_stats_order_and_single_records(boundary_db):
+    db, _ = boundary_db
+    assert db.get_aggregated(date(2023, 12, 31), date(2023, 12, 31), "year", ["std", "sum", "count"]) == [
+        (date(2023, 1, 1), None, 4.0, 1)]
+    assert db.get_aggregated(bucket="day", stats=[])[:2] == [(date(2023, 12, 31),), (date(2024, 1, 1),)]
+    with pytest.raises(ValueError):
+        db.get_aggregated(bucket="quarter")
+    with pytest.raises(ValueError):
+        db.get_aggregated(stats=["median"])
+
+
+@pytest.mark.parametrize("version", sorted(STORAGES))
+@pytest.mark.parametrize("bucket", ["day", "week", "month", "year"])
+def test_matches_python_grouping(tmp_path, version, bucket):
+    rng = random.Random(version)
+    day, records = date(2019, 12, 20), []
+    while day < date(2022, 1, 10):
+        records.append((day, round(rng.uniform(3.0, 6.0), 3)))
+        day += timedelta(days=rng.choice([1, 1, 2, 5, 13]))
+    with CatWeightDB(str(tmp_path / "cats.db"), cat="tama") as db:
+        db.initialize_table(version)
+        for record in records:
+            db.add_weight_record(*record)
+        db.use_cat("goro")
+        db.add_weight_record(date(2020, 6, 1), 9.0)
+        db.use_cat("tama")
+        assert_rows_equal(db.get_aggregated(bucket=bucket, stats=STATS), reference(records, bucket))
+        assert_rows_equal(db.get_aggregated(date(2020, 2, 29), date(2021, 3, 31), bucket, STATS),
+                          reference(records, bucket, date(2020, 2, 29), date(2021, 3, 31)))
+
+
+def test_choose_bucket():
+    assert choose_bucket(4000, [2020, 2021]) == "day"
+    assert choose_bucket(4001, [2020]) == "week"
+    assert choose_bucket(500, list(range(2000, 2010)), max_points=500) == "day"
+    assert choose_bucket(531, list(range(2000, 2010)), max_points=530) == "week"
+    assert choose_bucket(501, list(range(2000, 2010)), max_points=500) == "month"
+    assert choose_bucket(1000, list(range(2000, 2020)), max_points=500) == "month"
+    assert choose_bucket(1000, list(range(2000, 2020)), max_points=100) == "year"
+    assert choose_bucket(1000, list(range(2000, 2020)), max_points=10) == "year"
+
+
+def test_year_lines_start_at_the_first_day_of_the_year(boundary_db):
+    db, _ = boundary_db
+    lines, bucket = fetch_year_lines(db, [2025], max_points=0)
+    assert bucket == "year"
+    assert lines == {2025: ([1], [pytest.approx(4.9)])}
+
+    lines, bucket = fetch_year_lines(db, [2024, 2025], max_points=3)
+    assert bucket == "year"
+    assert lines == {2024: ([1], [pytest.approx(4.45)]), 2025: ([1], [pytest.approx(4.9)])}
+
+    lines, bucket = fetch_year_lines(db, [2024])
+    assert bucket == "day"
+    assert lines[2024][0] == [1, 7, 8, 31, 32, 60, 61, 365]
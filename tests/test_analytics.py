@@ -0,0 +1,102 @@
+import math
+
+import numpy as np
+import pytest
+
+from catdb.analytics import SeriesAnalyzer, to_days
+
+
+def reference(t, w, window_days, halflife_days, z_threshold, mad_threshold) -> dict[str, np.ndarray]:
+    """Computes the same statistics record by record, the slow and obvious way."""
+    n = len(t)
+    out = {name: np.full(n, np.nan) for name in ("rolling_mean", "rolling_std", "ewma", "rate", "slope", "zscore")}
+    tau = halflife_days / math.log(2)
+    for i in range(n):
+        window = [j for j in range(i + 1) if t[j] > t[i] - window_days]
+        ws, ts = w[window], t[window]
+        out["rolling_mean"][i] = ws.mean()
+        if len(ws) >= 2:
+            out["rolling_std"][i] = ws.std(ddof=1)
+            if ts[-1] > ts[0]:
+                out["rate"][i] = (ws[-1] - ws[0]) / (ts[-1] - ts[0])
+                out["slope"][i] = np.polyfit(ts, ws, 1)[0]
+        before = ws[:-1]
+        if len(before) >= 2 and before.std(ddof=1) > 0:
+            out["zscore"][i] = (w[i] - before.mean()) / before.std(ddof=1)
+        if i == 0:
+            out["ewma"][i] = w[0]
+        else:
+            a = 1 - math.exp(-(t[i] - t[i - 1]) / tau)
+            out["ewma"][i] = a * w[i] + (1 - a) * out["ewma"][i - 1]
+    out["z_anomaly"] = np.abs(np.nan_to_num(out["zscore"])) > z_threshold
+    residual = w - out["rolling_mean"]
+    mad = np.median(np.abs(residual - np.median(residual)))
+    out["mad_anomaly"] = (np.abs(0.6745 * (residual - np.median(residual)) / mad) > mad_threshold
+                          if mad > 0 else np.zeros(n, dtype=bool))
+    return out
+
+
+def series_with_gaps(n: int = 300, seed: int = 3) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    steps = rng.choice([1, 1, 1, 2, 3, 10], size=n - 1)
+    # 指数平滑の区間分割を通るよう、半減期に比べてずっと長い空白を入れる
+    steps[n // 2] = 2000
+    days = np.concatenate([[19000], 19000 + np.cumsum(steps)])
+    weights = 4.0 + 0.002 * (days - days[0]) % 1.5 + rng.normal(0, 0.05, n)
+    weights[[n // 8, n * 3 // 4]] += [1.5, -1.2]
+    return days.astype("datetime64[D]"), weights
+
+
+@pytest.mark.parametrize("window_days, halflife_days", [(7.0, 7.0), (30.0, 1.0), (1.0, 3.0)])
+def test_matches_reference_loop(window_days, halflife_days):
+    dates, weights = series_with_gaps()
+    analyzer = SeriesAnalyzer(window_days, halflife_days, z_threshold=2.5, mad_threshold=3.0)
+    result = analyzer.analyze(dates, weights)
+    expected = reference(to_days(dates), weights, window_days, halflife_days, 2.5, 3.0)
+    for name in ("rolling_mean", "rolling_std", "ewma", "rate", "slope", "zscore"):
+        np.testing.assert_allclose(result[name], expected[name], rtol=1e-7, atol=1e-9, err_msg=name)
+    np.testing.assert_array_equal(result["z_anomaly"], expected["z_anomaly"])
+    np.testing.assert_array_equal(result["mad_anomaly"], expected["mad_anomaly"])
+    if window_days > 1:
+        # 1 日の窓では移動平均が体重そのものになり、残差が無い
+        assert result["mad_anomaly"][300 // 8] and result["mad_anomaly"][300 * 3 // 4]
+
+
+def test_single_point_and_empty_series():
+    analyzer = SeriesAnalyzer()
+    result = analyzer.analyze(np.array(["2024-01-01"], dtype="datetime64[D]"), [4.2])
+    assert result["rolling_mean"].tolist() == [4.2]
+    assert result["ewma"].tolist() == [4.2]
+    for name in ("rolling_std", "rate", "slope", "zscore"):
+        assert np.isnan(result[name]).all()
+    assert not result["z_anomaly"].any() and not result["mad_anomaly"].any()
+
+    empty = analyzer.analyze(np.array([], dtype="datetime64[D]"), [])
+    assert all(len(values) == 0 for values in empty.values())
+
+
+def test_same_day_records_have_no_rate():
+    result = SeriesAnalyzer().analyze(["2024-01-01", "2024-01-01", "2024-01-02"], [4.0, 4.2, 4.1])
+    assert np.isnan(result["rate"][:2]).all()
+    assert result["rate"][2] == pytest.approx(0.1)
+
+
+def test_buffers_are_reused_unless_copied():
+    analyzer = SeriesAnalyzer()
+    dates, weights = series_with_gaps(50)
+    kept = analyzer.analyze(dates, weights, copy=True)
+    view = analyzer.analyze(dates, weights)
+    np.testing.assert_array_equal(kept["rolling_mean"], view["rolling_mean"])
+    analyzer.analyze(dates[:10], weights[:10] + 1.0)
+    # 次の呼び出しでビューは上書きされるが、コピーは変わらない
+    assert view["rolling_mean"][0] == pytest.approx(weights[0] + 1.0)
+    assert kept["rolling_mean"][0] == pytest.approx(weights[0])
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        SeriesAnalyzer(window_days=0)
+    with pytest.raises(ValueError):
+        SeriesAnalyzer().analyze(["2024-01-02", "2024-01-01"], [4.0, 4.1])
+    with pytest.raises(ValueError):
+        SeriesAnalyzer().analyze(["2024-01-01"], [4.0, 4.1])
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from catdb.db.async_db import AsyncCatWeightDB
+from catdb.db.database import CatWeightDB
+
+DAYS = [date(2024, 1, 1) + timedelta(days=i) for i in range(50)]
+
+
+def test_concurrent_writes_are_coalesced(db_file):
+    async def main():
+        async with AsyncCatWeightDB(db_file, batch_delay=0.05) as db:
+            added = await asyncio.gather(*(db.add_weight_record(day, 4.0 + i / 100) for i, day in enumerate(DAYS)))
+            duplicate = await db.add_weight_record(DAYS[0], 9.9)
+            record = await db.find_weight_record(DAYS[10])
+            return added, duplicate, record, db.writes, db.transactions
+
+    added, duplicate, record, writes, transactions = asyncio.run(main())
+    assert all(added)
+    assert duplicate is False
+    assert record[1] == pytest.approx(4.1)
+    assert writes == len(DAYS) + 1
+    assert transactions < writes
+    with CatWeightDB(db_file) as db:
+        assert db.list_cats()[0][2] == len(DAYS)
+        assert db.check_rollups() == []
+
+
+def test_failing_write_does_not_affect_its_batch(db_file):
+    async def main():
+        async with AsyncCatWeightDB(db_file, batch_delay=0.05) as db:
+            return await asyncio.gather(
+                db.add_weight_record(DAYS[0], 4.0),
+                db.upsert_weight_records(pd.DataFrame({"weight": [4.5]})),
+                db.update_weight_record(DAYS[5], 4.0),
+                db.add_weight_record(DAYS[1], 4.1),
+                return_exceptions=True,
+            )
+
+    first, bad_upsert, missing_update, second = asyncio.run(main())
+    assert first is True and second is True
+    assert isinstance(bad_upsert, Exception)
+    assert missing_update is False
+    with CatWeightDB(db_file) as db:
+        assert db.find_weight_record(DAYS[0]) is not None
+        assert db.find_weight_record(DAYS[1]) is not None
+        assert db.check_rollups() == []
+
+
+def test_failing_standalone_write_rolls_back(db_file, tmp_path):
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("date,weight\n2024-01-01,4.0\n2024-01-02,heavy\n")
+
+    async def main():
+        async with AsyncCatWeightDB(db_file) as db:
+            with pytest.raises(ValueError):
+                await db.import_csv(str(csv_file), chunk_size=1)
+            # 書き込みスレッドは失敗の後も動き続ける
+            return await db.add_weight_record(DAYS[3], 4.2)
+
+    assert asyncio.run(main()) is True
+    with CatWeightDB(db_file) as db:
+        assert db.find_weight_record(date(2024, 1, 1)) is None
+        assert db.find_weight_record(DAYS[3]) is not None
+        assert db.check_rollups() == []
+
+
+def test_close_waits_for_queued_writes(db_file):
+    async def main():
+        db = AsyncCatWeightDB(db_file, max_pending=4)
+        pending = [asyncio.ensure_future(db.add_weight_record(day, 4.0)) for day in DAYS[:20]]
+        await asyncio.sleep(0)
+        await asyncio.gather(*pending)
+        await db.close()
+        with pytest.raises(RuntimeError):
+            await db.add_weight_record(DAYS[30], 4.0)
+
+    asyncio.run(main())
+    with CatWeightDB(db_file) as db:
+        assert db.list_cats()[0][2] == 20
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        AsyncCatWeightDB("unused.db", max_pending=0)
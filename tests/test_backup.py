@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tarfile
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from catdb.commands.backup import backup_database, default_backup_file
+from catdb.db import backup as backup_module
+from catdb.db.backup import online_backup, verify_database
+from catdb.db.database import CatWeightDB
+from catdb.db.storage import get_schema_version
+
+
+@pytest.fixture
+def big_db(db_file):
+    """Database spanning a few dozen pages, so that the copy takes several steps."""
+    with CatWeightDB(db_file) as db:
+        db.bulk_upsert([pd.DataFrame({
+            "date": [date(2000, 1, 1) + timedelta(days=i) for i in range(3000)],
+            "weight": [4.0 + i % 100 / 100 for i in range(3000)],
+            "notes": ["x" * 40] * 3000,
+        })])
+    return db_file
+
+
+def records(db_file: str) -> list:
+    with CatWeightDB(db_file) as db:
+        return list(db.iter_records())
+
+
+def leftovers(directory) -> list[str]:
+    return [name for name in os.listdir(directory) if name.startswith(".catdb-backup-")]
+
+
+def test_backup_copies_the_database_in_steps(big_db, tmp_path):
+    dest = str(tmp_path / "copy.db")
+    with CatWeightDB(big_db) as db:
+        report = db.backup(dest, pages=4, pause=0, probe_interval=None)
+    assert report.bytes == report.output_bytes == os.path.getsize(dest)
+    assert report.steps >= report.pages // 4
+    assert report.restarts == 0 and report.integrity == []
+    assert records(dest) == records(big_db)
+    assert verify_database(dest) == []
+    assert leftovers(tmp_path) == []
+
+
+def test_writes_during_the_copy_restart_it(big_db, tmp_path, monkeypatch):
+    writer = sqlite3.connect(big_db)
+    sleep = backup_module.time.sleep
+    written = []
+
+    def write_once(seconds):
+        # ステップの間に別の接続から書き込む
+        if not written:
+            writer.execute("UPDATE cat_weight_records SET notes = 'changed' WHERE date = '2000-01-01'")
+            writer.commit()
+            written.append(True)
+        sleep(seconds)
+
+    monkeypatch.setattr(backup_module.time, "sleep", write_once)
+    dest = str(tmp_path / "copy.db")
+    try:
+        with CatWeightDB(big_db) as db:
+            report = db.backup(dest, pages=4, pause=0.001, probe_interval=None)
+    finally:
+        writer.close()
+    assert written and report.restarts >= 1
+    # やり直した複製には途中の書き込みが含まれる
+    assert records(dest) == records(big_db)
+    assert records(dest)[0][2] == "changed"
+
+
+def test_writer_probe_measures_waits(big_db, tmp_path):
+    with CatWeightDB(big_db) as db:
+        report = db.backup(str(tmp_path / "copy.db"), pages=1, pause=0.005, probe_interval=0.01)
+    assert report.writer_probes > 0
+    assert 0 <= report.writer_wait_max <= report.writer_wait_total
+
+
+@pytest.mark.parametrize("compression", backup_module.ARCHIVE_COMPRESSIONS)
+def test_compressed_archive(big_db, tmp_path, compression):
+    dest = str(tmp_path / f"copy.tar.{compression}")
+    with CatWeightDB(big_db) as db:
+        report = db.backup(dest, compression=compression, probe_interval=None)
+        schema_version = get_schema_version(db.conn)
+    assert report.output_bytes == os.path.getsize(dest) < report.bytes
+    with tarfile.open(dest, f"r:{compression}") as tar:
+        assert sorted(tar.getnames()) == ["cats.db", "manifest.json"]
+        manifest = json.load(tar.extractfile("manifest.json"))
+        data = tar.extractfile("cats.db").read()
+    assert manifest["sha256"] == hashlib.sha256(data).hexdigest()
+    assert manifest["database"] == "cats.db"
+    assert manifest["source"] == os.path.abspath(big_db)
+    assert (manifest["schema_version"], manifest["bytes"], manifest["integrity_check"]) == (schema_version, report.bytes, "ok")
+    restored = tmp_path / "restored.db"
+    restored.write_bytes(data)
+    assert records(str(restored)) == records(big_db)
+    assert leftovers(tmp_path) == []
+
+
+def broken_database(path) -> str:
+    """Creates a database whose index no longer matches its table."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x)")
+    conn.execute("CREATE INDEX t_x ON t (x)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(2000)])
+    conn.commit()
+    pages, page_size = conn.execute("PRAGMA page_count").fetchone()[0], conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.close()
+    # 最後のページ (インデックスの葉) のセルを壊す
+    with open(path, "r+b") as f:
+        f.seek((pages - 1) * page_size + page_size - 1000)
+        f.write(b"\x07" * 1000)
+    return str(path)
+
+
+def test_failed_integrity_check_keeps_the_old_backup(tmp_path):
+    src_file = broken_database(tmp_path / "broken.db")
+    assert any("missing from index" in problem for problem in verify_database(src_file))
+    dest = tmp_path / "copy.db"
+    dest.write_bytes(b"previous backup")
+    src = sqlite3.connect(src_file)
+    try:
+        with pytest.raises(ValueError, match="integrity check"):
+            online_backup(src, src_file, str(dest), probe_interval=None)
+        assert dest.read_bytes() == b"previous backup"
+        # 検査しなければそのまま置き換える
+        report = online_backup(src, src_file, str(dest), verify=False, probe_interval=None)
+    finally:
+        src.close()
+    assert report.integrity == [] and verify_database(str(dest)) != []
+    assert leftovers(tmp_path) == []
+
+
+def test_invalid_arguments(db, tmp_path):
+    with pytest.raises(ValueError):
+        online_backup(db.conn, db.db_file, str(tmp_path / "copy.tar"), compression="zip")
+    with pytest.raises(ValueError):
+        online_backup(db.conn, db.db_file, str(tmp_path / "copy.db"), pages=0)
+    assert leftovers(tmp_path) == []
+
+
+def test_backup_command(big_db, tmp_path, capsys):
+    dest = str(tmp_path / "copy.tar.gz")
+    backup_database(big_db, dest, compression="gz")
+    out = capsys.readouterr().out
+    assert f"Backed up {big_db} to {dest}." in out
+    assert "0 restarts" in out and "Integrity check: ok" in out and "Archive:" in out
+    assert default_backup_file(big_db, None).startswith(str(tmp_path / "cats-"))
+    assert default_backup_file(big_db, "xz").endswith(".tar.xz")
+    with pytest.raises(ValueError):
+        backup_database(big_db, big_db)
+    with pytest.raises(ValueError):
+        backup_database(str(tmp_path / "missing.db"))
+    assert not os.path.exists(tmp_path / "missing.db")
@@ -0,0 +1,145 @@
+import io
+import os
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+from catdb.commands.batch import _parse_operations, batch_weight_records
+from catdb.db.database import CatWeightDB
+
+CATDB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catdb.py")
+
+
+def test_malformed_json_line_rejects_only_that_line():
+    stream = io.StringIO(
+        'not json\n'
+        '{"op": "add", "date": "2024-01-01", "weight": 4.0}\n'
+        '[1, 2]\n'
+        '\n'
+        '{"op": "add", "date": "2024-01-02", "weight": 4.1, "notes": "ok"}\n'
+    )
+    errors: list[str] = []
+    operations = list(_parse_operations(stream, "jsonl", errors))
+    assert operations == [
+        ("add", None, date(2024, 1, 1), 4.0, None),
+        ("add", None, date(2024, 1, 2), 4.1, "ok"),
+    ]
+    assert len(errors) == 2
+    assert errors[0].startswith("line 1: invalid JSON")
+    assert errors[1].startswith("line 3:")
+
+
+def test_invalid_fields_are_rejected():
+    stream = io.StringIO(
+        "op,date,weight,notes\n"
+        "add,2024-01-01,4.0,\n"
+        "jump,2024-01-02,4.0,\n"
+        "add,2024-13-01,4.0,\n"
+        "update,2024-01-01,,\n"
+        "add,2024-01-03,heavy,\n"
+        "delete,2024-01-01,,\n"
+    )
+    errors: list[str] = []
+    operations = list(_parse_operations(stream, "csv", errors))
+    assert [op for op, *_ in operations] == ["add", "delete"]
+    assert len(errors) == 4
+
+
+def test_non_finite_and_non_positive_weights_are_rejected(db_file, tmp_path, capsys):
+    input_file = tmp_path / "ops.csv"
+    input_file.write_text(
+        "op,date,weight\n"
+        "add,2024-04-01,nan\n"
+        "add,2024-04-02,inf\n"
+        "add,2024-04-03,-4.0\n"
+        "add,2024-04-04,0\n"
+        "add,2024-04-05,4.0\n"
+        "update,2024-04-05,NaN\n"
+    )
+    # NaN が NULL として書き込まれてバッチ全体が IntegrityError で止まることはない
+    assert batch_weight_records(db_file, str(input_file)) == 5
+    out = capsys.readouterr().out
+    assert "line 2: weight must be a positive number" in out
+    assert "line 7:" in out
+    with CatWeightDB(db_file) as db:
+        assert [record[1] for record in db.iter_records()] == [4.0]
+
+
+def test_batch_applies_valid_rows_and_reports_rejected(db_file, tmp_path, capsys):
+    input_file = tmp_path / "ops.jsonl"
+    input_file.write_text(
+        '{"op": "add", "date": "2024-01-01", "weight": 4.0}\n'
+        '{broken\n'
+        '{"op": "add", "date": "2024-01-02", "weight": 4.1}\n'
+        '{"op": "update", "date": "2024-01-01", "weight": 4.2}\n'
+        '{"op": "delete", "date": "2024-05-05"}\n'
+    )
+    rejected = batch_weight_records(db_file, str(input_file))
+    assert rejected == 1
+    with CatWeightDB(db_file) as db:
+        assert db.find_weight_record(date(2024, 1, 1))[1] == 4.2
+        assert db.find_weight_record(date(2024, 1, 2))[1] == 4.1
+    out = capsys.readouterr().out
+    assert "line 2: invalid JSON" in out
+
+
+def test_cli_exits_non_zero_when_rows_are_rejected(db_file):
+    rows = 'not json\n{"op": "add", "date": "2024-01-01", "weight": 4.0}\n'
+    result = subprocess.run([sys.executable, CATDB, "--db-file", db_file, "batch", "-", "--format", "jsonl"],
+                            input=rows, capture_output=True, text=True)
+    assert result.returncode == 1
+    with CatWeightDB(db_file) as db:
+        assert db.find_weight_record(date(2024, 1, 1)) is not None
+
+    rows = '{"op": "add", "date": "2024-01-02", "weight": 4.0}\n'
+    result = subprocess.run([sys.executable, CATDB, "--db-file", db_file, "batch", "-", "--format", "jsonl"],
+                            input=rows, capture_output=True, text=True)
+    assert result.returncode == 0
+
+
+def test_apply_operations_counts_failures(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    stats = db.apply_operations([
+        ("add", None, date(2024, 1, 1), 5.0, None),
+        ("add", None, date(2024, 1, 2), 4.1, None),
+        ("update", None, date(2024, 3, 3), 4.1, None),
+        ("delete", None, date(2024, 1, 1), None, None),
+        ("add", "goro", date(2024, 1, 1), 5.5, None),
+    ])
+    assert stats == {"add": [2, 1], "update": [0, 1], "delete": [1, 0]}
+    assert db.find_weight_record(date(2024, 1, 1)) is None
+    db.use_cat("goro")
+    assert db.find_weight_record(date(2024, 1, 1))[1] == 5.5
+
+
+def test_apply_operations_rolls_back_on_error(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+
+    def operations():
+        yield ("add", None, date(2024, 1, 2), 4.1, None)
+        yield ("update", None, date(2024, 1, 1), 9.9, None)
+        raise RuntimeError("input failed")
+
+    with pytest.raises(RuntimeError):
+        db.apply_operations(operations())
+    assert db.find_weight_record(date(2024, 1, 2)) is None
+    assert db.find_weight_record(date(2024, 1, 1))[1] == 4.0
+    assert db.check_rollups() == []
+
+    with pytest.raises(ValueError):
+        db.apply_operations([("add", None, date(2024, 1, 3), 4.1, None), ("jump", None, date(2024, 1, 4), 1.0, None)])
+    assert db.find_weight_record(date(2024, 1, 3)) is None
+
+
+def test_apply_operations_commit_every_keeps_committed_part(db):
+    def operations():
+        for day in range(1, 6):
+            yield ("add", None, date(2024, 1, day), 4.0, None)
+        raise RuntimeError("input failed")
+
+    with pytest.raises(RuntimeError):
+        db.apply_operations(operations(), commit_every=2)
+    # 2 件ごとにコミットしているので、最初の 4 件は残る
+    assert [db.find_weight_record(date(2024, 1, day)) is not None for day in range(1, 6)] == [True] * 4 + [False]
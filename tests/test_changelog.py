@@ -0,0 +1,107 @@
+import io
+import json
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from catdb.commands.changes import print_changes
+from catdb.db.database import CatWeightDB
+
+
+def ops(changes) -> list[tuple[str, date, str, float | None]]:
+    return [(name, record_date, op, weight) for _, name, record_date, op, weight, _, _ in changes]
+
+
+def test_writes_are_logged_in_order(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0, "first")
+    db.update_weight_record(date(2024, 1, 1), 4.2)
+    db.delete_weight_record(date(2024, 1, 1))
+    db.use_cat("goro")
+    db.add_weight_record(date(2024, 1, 1), 5.0)
+
+    changes = db.get_changes()
+    assert ops(changes) == [
+        ("default", date(2024, 1, 1), "insert", 4.0),
+        ("default", date(2024, 1, 1), "update", 4.2),
+        ("default", date(2024, 1, 1), "delete", None),
+        ("goro", date(2024, 1, 1), "insert", 5.0),
+    ]
+    assert [seq for seq, *_ in changes] == sorted(seq for seq, *_ in changes)
+    assert changes[0][5] == "first"
+    assert changes[-1][0] == db.latest_change_seq()
+    assert ops(db.get_changes(all_cats=False)) == [("goro", date(2024, 1, 1), "insert", 5.0)]
+    assert ops(db.get_changes(since=changes[1][0], limit=1)) == [("default", date(2024, 1, 1), "delete", None)]
+
+
+def test_no_op_writes_are_not_logged(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    seq = db.latest_change_seq()
+    db.upsert_weight_records(pd.DataFrame({"date": ["2024-01-01"], "weight": [4.0]}))
+    assert db.latest_change_seq() == seq
+
+
+def test_rolled_back_writes_are_not_logged(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    seq = db.latest_change_seq()
+    with pytest.raises(ValueError):
+        db.bulk_upsert([pd.DataFrame({"date": ["2024-01-02", "2024-01-03"], "weight": [4.1, "heavy"]})])
+    db.conn.execute("UPDATE cat_weight_records SET weight = 5.0")
+    db.conn.rollback()
+    assert db.latest_change_seq() == seq
+    assert len(db.get_changes()) == 1
+
+
+def test_compact_removes_superseded_and_expired_changes(db):
+    for weight in (4.0, 4.1, 4.2):
+        db.upsert_weight_records(pd.DataFrame({"date": ["2024-01-01"], "weight": [weight]}))
+    db.add_weight_record(date(2024, 1, 2), 4.3)
+    latest = db.latest_change_seq()
+
+    assert db.compact_changes() == (2, 0)
+    assert ops(db.get_changes()) == [
+        ("default", date(2024, 1, 1), "update", 4.2),
+        ("default", date(2024, 1, 2), "insert", 4.3),
+    ]
+
+    # 2 日前の変更にして、保持期間を過ぎたものとして消す
+    first = db.get_changes()[0][0]
+    with db.conn:
+        db.conn.execute("UPDATE record_changes SET changed_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now', '-2 days') "
+                        "WHERE seq = ?", (first,))
+    assert db.compact_changes(retain_days=1) == (0, 1)
+    assert db.latest_change_seq() == latest
+    assert len(db.get_changes(since=first)) == 1
+    with pytest.raises(ValueError):
+        db.get_changes(since=first - 1)
+
+    # 番号は消した後も使い回されない
+    db.delete_weight_record(date(2024, 1, 2))
+    assert db.latest_change_seq() == latest + 1
+
+
+def test_changes_command(db_file, capsys):
+    with CatWeightDB(db_file) as db:
+        db.add_weight_record(date(2024, 1, 1), 4.0, "tab\there")
+        db.add_weight_record(date(2024, 1, 2), 4.1)
+        db.use_cat("goro")
+        db.add_weight_record(date(2024, 1, 3), 5.0)
+
+    stream = io.StringIO()
+    print_changes(db_file, since=1, stream=stream)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(line["seq"], line["cat"], line["date"]) for line in lines] == [(2, "default", "2024-01-02"),
+                                                                          (3, "goro", "2024-01-03")]
+    assert "Next: --since 3" in capsys.readouterr().err
+
+    stream = io.StringIO()
+    print_changes(db_file, limit=1, fmt="tsv", cat="default", stream=stream)
+    header, row = stream.getvalue().splitlines()
+    assert header.split("\t")[:4] == ["seq", "cat", "date", "op"]
+    assert row.split("\t")[:5] == ["1", "default", "2024-01-01", "insert", "4.0"]
+    assert "More may follow. Next: --since 1" in capsys.readouterr().err
+
+    with pytest.raises(ValueError):
+        print_changes(db_file, fmt="xml")
+    with pytest.raises(ValueError):
+        print_changes(db_file, limit=0)
@@ -0,0 +1,134 @@
+import csv
+import json
+import tracemalloc
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from catdb.commands.export import export_weight_records
+from catdb.commands.initialize import initialize_database
+from catdb.db.database import CatWeightDB
+
+RECORDS = [(date(2024, 1, 1), 4.0, "vet"), (date(2024, 1, 2), 4.125, None),
+           (date(2024, 1, 3), 4.25, "クリニック, \"checkup\""), (date(2024, 2, 1), 4.5, None)]
+
+
+@pytest.fixture
+def export_db(db_file):
+    with CatWeightDB(db_file, cat="tama") as db:
+        for record in RECORDS:
+            db.add_weight_record(*record)
+        db.use_cat("goro")
+        db.add_weight_record(date(2024, 1, 1), 5.0)
+    return db_file
+
+
+def fill(db_file: str, count: int) -> None:
+    with CatWeightDB(db_file) as db:
+        db.bulk_upsert([pd.DataFrame({
+            "date": [date(1900, 1, 1) + timedelta(days=i) for i in range(count)],
+            "weight": [4.0 + i % 100 / 100 for i in range(count)],
+            "notes": ["note %d" % i if i % 3 == 0 else None for i in range(count)],
+        })])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 10000])
+def test_csv_round_trips_through_init(export_db, tmp_path, capsys, chunk_size):
+    output = str(tmp_path / "tama.csv")
+    export_weight_records(export_db, output, cat="tama", chunk_size=chunk_size)
+    assert f"Exported 4 records to {output}." in capsys.readouterr().out
+    with open(output, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["date", "weight", "notes"]
+    assert rows[3] == ["2024-01-03", "4.25", "クリニック, \"checkup\""]
+
+    # 書き出した CSV は init --csv でそのまま読み込める
+    copy_file = str(tmp_path / "copy.db")
+    initialize_database(copy_file, output)
+    with CatWeightDB(copy_file) as db:
+        assert list(db.iter_records()) == RECORDS
+
+
+def test_jsonl(export_db, tmp_path):
+    output = tmp_path / "tama.jsonl"
+    export_weight_records(export_db, str(output), cat="tama", chunk_size=2)
+    lines = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert lines == [{"date": d.isoformat(), "weight": w, "notes": n} for d, w, n in RECORDS]
+    # 日本語はエスケープしない
+    assert "クリニック" in output.read_text(encoding="utf-8")
+
+
+def test_parquet(export_db, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    output = str(tmp_path / "tama.parquet")
+    export_weight_records(export_db, output, cat="tama", chunk_size=3)
+    table = pq.read_table(output)
+    assert table.column_names == ["date", "weight", "notes"]
+    assert [tuple(row.values()) for row in table.to_pylist()] == RECORDS
+    # チャンクごとに row group を書く
+    assert pq.ParquetFile(output).metadata.num_row_groups == 2
+
+
+def test_date_range_and_format_options(export_db, tmp_path, capsys):
+    export_weight_records(export_db, "-", fmt="jsonl", begin_date=date(2024, 1, 2), end_date=date(2024, 1, 3),
+                          cat="tama")
+    out = capsys.readouterr().out
+    assert [json.loads(line)["date"] for line in out.splitlines()] == ["2024-01-02", "2024-01-03"]
+    assert "Exported" not in out
+
+    export_weight_records(export_db, "-", begin_date=date(2024, 1, 1), end_date=date(2024, 1, 1), cat="goro")
+    assert capsys.readouterr().out.splitlines() == ["date,weight,notes", "2024-01-01,5.0,"]
+
+    # 拡張子が無くても --format で形式を選べる
+    output = tmp_path / "records.out"
+    export_weight_records(export_db, str(output), fmt="jsonl", cat="tama")
+    assert len(output.read_text().splitlines()) == 4
+    export_weight_records(export_db, str(tmp_path / "none.csv"), cat="nobody")
+    assert (tmp_path / "none.csv").read_text().splitlines() == ["date,weight,notes"]
+
+
+def test_invalid_formats(export_db, tmp_path):
+    with pytest.raises(ValueError):
+        export_weight_records(export_db, str(tmp_path / "out.xml"), fmt="xml")
+    with pytest.raises(ValueError):
+        export_weight_records(export_db, "-", fmt="parquet")
+
+
+def test_parquet_without_pyarrow(export_db, tmp_path, monkeypatch):
+    monkeypatch.setitem(__import__("sys").modules, "pyarrow", None)
+    with pytest.raises(ValueError, match="pyarrow"):
+        export_weight_records(export_db, str(tmp_path / "out.parquet"))
+
+
+def test_export_reads_in_chunks(db_file, tmp_path, monkeypatch):
+    fill(db_file, 2500)
+    chunks = []
+    iter_record_chunks = CatWeightDB.iter_record_chunks
+
+    def spy(self, *args, **kwargs):
+        for chunk in iter_record_chunks(self, *args, **kwargs):
+            chunks.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(CatWeightDB, "iter_record_chunks", spy)
+    export_weight_records(db_file, str(tmp_path / "out.csv"), chunk_size=1000)
+    assert chunks == [1000, 1000, 500]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_memory_does_not_grow_with_the_number_of_records(tmp_path, fmt):
+    peaks = []
+    for count in (2000, 20000):
+        db_file = str(tmp_path / f"{count}.db")
+        with CatWeightDB(db_file) as db:
+            db.initialize_table()
+        fill(db_file, count)
+        tracemalloc.start()
+        try:
+            export_weight_records(db_file, str(tmp_path / f"{count}.{fmt}"), chunk_size=500)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    # 10 倍の記録でも、使うメモリはチャンクの大きさで決まる
+    assert peaks[1] < peaks[0] * 1.5
@@ -0,0 +1,100 @@
+from datetime import date
+
+import pandas as pd
+
+from catdb.cache import RenderCache
+from catdb.commands.graph import graph_weight_records
+from catdb.db import versions
+from catdb.db.database import CatWeightDB
+
+
+def test_fingerprint_changes_when_weights_are_swapped(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    db.add_weight_record(date(2024, 6, 1), 6.0)
+    before = db.content_fingerprint()
+    db.update_weight_record(date(2024, 1, 1), 6.0)
+    db.update_weight_record(date(2024, 6, 1), 4.0)
+    # 年ごとの集計 (件数・最小・最大・合計) は同じでも、指紋は変わる
+    assert db.get_stats("year")[0][1:4] == (2, 4.0, 6.0)
+    assert db.content_fingerprint() != before
+
+
+def test_fingerprint_changes_when_a_weight_moves_to_another_date(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    before = db.content_fingerprint()
+    db.delete_weight_record(date(2024, 1, 1))
+    db.add_weight_record(date(2024, 1, 2), 4.0)
+    assert db.content_fingerprint() != before
+
+
+def test_fingerprint_ignores_no_op_writes_and_other_cats(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    before = db.content_fingerprint()
+    db.update_weight_record(date(2024, 1, 1), 4.0, notes="same weight")
+    assert db.content_fingerprint() == before
+
+    db.use_cat("goro")
+    db.add_weight_record(date(2024, 1, 1), 5.0)
+    db.use_cat("default")
+    assert db.content_fingerprint() == before
+
+
+def test_fingerprint_survives_rollback(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    before = db.content_fingerprint()
+    db.conn.execute("UPDATE cat_weight_records SET weight = 5.0")
+    db.conn.rollback()
+    assert db.content_fingerprint() == before
+
+
+def test_bulk_load_bumps_version_once(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    before = db.content_fingerprint()
+    version = db.conn.execute("SELECT version FROM cat_versions").fetchone()[0]
+    db.bulk_upsert([pd.DataFrame({"date": ["2024-01-02", "2024-01-03"], "weight": [4.1, 4.2]})])
+    assert db.conn.execute("SELECT version FROM cat_versions").fetchone()[0] == version + 1
+    assert db.content_fingerprint() != before
+    assert {name for (name,) in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")} >= set(versions.TRIGGERS)
+
+
+def test_fingerprint_without_versions_table(db_file):
+    with CatWeightDB(db_file) as db:
+        db.conn.execute("DROP TABLE cat_versions")
+        versions.drop_triggers(db.conn)
+        db.conn.commit()
+        db.add_weight_record(date(2024, 1, 1), 4.0)
+        db.add_weight_record(date(2024, 6, 1), 6.0)
+        before = db.content_fingerprint()
+        db.update_weight_record(date(2024, 1, 1), 6.0)
+        db.update_weight_record(date(2024, 6, 1), 4.0)
+        assert db.content_fingerprint() != before
+
+        # init で版数のテーブルが追加される
+        db.initialize_table()
+        assert versions.versions_exist(db.conn)
+
+
+def test_graph_cache_misses_after_update(db_file, tmp_path, capsys):
+    with CatWeightDB(db_file) as db:
+        db.add_weight_record(date(2024, 1, 1), 4.0)
+        db.add_weight_record(date(2024, 6, 1), 6.0)
+    cache_dir = str(tmp_path / "cache")
+    first, second, third = (str(tmp_path / f"{name}.png") for name in ("first", "second", "third"))
+
+    graph_weight_records(db_file, first, cache_dir=cache_dir)
+    graph_weight_records(db_file, second, cache_dir=cache_dir)
+    assert capsys.readouterr().out.count("(cached)") == 1
+
+    with CatWeightDB(db_file) as db:
+        db.update_weight_record(date(2024, 1, 1), 6.0)
+        db.update_weight_record(date(2024, 6, 1), 4.0)
+    graph_weight_records(db_file, third, cache_dir=cache_dir)
+    assert "(cached)" not in capsys.readouterr().out
+    with open(first, "rb") as a, open(third, "rb") as b:
+        assert a.read() != b.read()
+
+
+def test_render_cache_key_depends_on_parameters():
+    assert RenderCache.make_key("abc", plot="x", years=[2024]) == RenderCache.make_key("abc", years=[2024], plot="x")
+    assert RenderCache.make_key("abc", plot="x") != RenderCache.make_key("abd", plot="x")
+    assert RenderCache.make_key("abc", plot="x") != RenderCache.make_key("abc", plot="y")
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+from datetime import date
+
+import pytest
+
+from catdb import fleet as fleet_module
+from catdb.db.database import CatWeightDB
+from catdb.fleet import CatWeightFleet
+
+
+@pytest.fixture
+def fleet_dir(tmp_path):
+    with CatWeightDB(str(tmp_path / "a.db")) as db:
+        db.initialize_table()
+        db.use_cat("tama")
+        db.add_weight_record(date(2023, 1, 1), 4.0)
+        db.add_weight_record(date(2023, 6, 1), 4.2)
+        db.use_cat("goro")
+        db.add_weight_record(date(2023, 3, 1), 5.0)
+    with CatWeightDB(str(tmp_path / "b.db")) as db:
+        db.initialize_table(3)
+        db.use_cat("mike")
+        db.add_weight_record(date(2024, 2, 1), 3.5, "gram storage")
+    # 複数猫のスキーマになる前の単一猫のファイル
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    conn.execute("CREATE TABLE cat_weight_records (date TEXT PRIMARY KEY, weight REAL NOT NULL, notes TEXT)")
+    conn.execute("INSERT INTO cat_weight_records VALUES ('2022-05-05', 3.0, 'kitten')")
+    conn.commit()
+    conn.close()
+    return tmp_path
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Records the files the fleet opens."""
+    paths = []
+    query_file = fleet_module._query_file
+    monkeypatch.setattr(fleet_module, "_query_file",
+                        lambda path, *args: paths.append(os.path.basename(path)) or query_file(path, *args))
+    return paths
+
+
+def test_files_lists_cats_including_legacy_files(fleet_dir):
+    fleet = CatWeightFleet([str(fleet_dir)], workers=1)
+    files = {os.path.basename(path): meta for path, meta in fleet.files()}
+    assert files == {
+        "a.db": [("goro", date(2023, 3, 1), date(2023, 3, 1), 1), ("tama", date(2023, 1, 1), date(2023, 6, 1), 2)],
+        "b.db": [("mike", date(2024, 2, 1), date(2024, 2, 1), 1)],
+        "old.db": [("old", date(2022, 5, 5), date(2022, 5, 5), 1)],
+    }
+    assert fleet.files_scanned == 3
+    list(fleet.files())
+    assert (fleet.files_scanned, fleet.files_skipped) == (0, 3)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_queries_skip_files_by_metadata(fleet_dir, opened, workers):
+    fleet = CatWeightFleet([str(fleet_dir / "*.db")], workers=workers)
+    records = sorted((os.path.basename(path), cat, day, weight) for path, cat, day, weight, _ in fleet.iter_records())
+    assert records == [
+        ("a.db", "goro", date(2023, 3, 1), 5.0), ("a.db", "tama", date(2023, 1, 1), 4.0),
+        ("a.db", "tama", date(2023, 6, 1), 4.2), ("b.db", "mike", date(2024, 2, 1), 3.5),
+        ("old.db", "old", date(2022, 5, 5), 3.0),
+    ]
+    assert sorted(opened) == ["a.db", "b.db", "old.db"]
+
+    # メタデータが分かっているので、範囲に記録の無いファイルは開かない
+    opened.clear()
+    rows = list(fleet.summary(begin_date=date(2024, 1, 1)))
+    assert opened == ["b.db"]
+    assert [(row[1], row[2]) for row in rows] == [("mike", 1)]
+    assert (fleet.files_queried, fleet.files_skipped) == (1, 2)
+
+    opened.clear()
+    assert [row[1] for row in fleet.summary(cats=["tama"])] == ["tama"]
+    assert opened == ["a.db"]
+
+
+def test_changed_files_are_rescanned(fleet_dir, opened):
+    fleet = CatWeightFleet([str(fleet_dir)], workers=1)
+    list(fleet.files())
+    with CatWeightDB(str(fleet_dir / "b.db"), cat="mike") as db:
+        db.add_weight_record(date(2025, 1, 1), 3.6)
+    opened.clear()
+    assert [row[1] for row in fleet.summary(begin_date=date(2025, 1, 1))] == ["mike"]
+    assert opened == ["b.db"]
+    assert fleet.files_scanned == 1
+
+
+def test_wal_changes_invalidate_the_metadata(fleet_dir, opened):
+    writer = CatWeightDB(str(fleet_dir / "a.db"), wal=True, cat="tama")
+    writer.connect()
+    try:
+        fleet = CatWeightFleet([str(fleet_dir)], workers=1)
+        list(fleet.files())
+        main_file = os.stat(fleet_dir / "a.db")
+        # 接続が開いている間は WAL に書かれ、データベースファイル自体は変わらない
+        writer.add_weight_record(date(2025, 1, 1), 4.4)
+        assert os.stat(fleet_dir / "a.db").st_mtime_ns == main_file.st_mtime_ns
+        opened.clear()
+        rows = list(fleet.summary(begin_date=date(2025, 1, 1)))
+        assert opened == ["a.db"]
+        assert [(row[1], row[5]) for row in rows] == [("tama", date(2025, 1, 1))]
+    finally:
+        writer.close()
+
+
+def test_metadata_cache_carries_over(fleet_dir, tmp_path, opened):
+    cache_dir = str(tmp_path / "cache")
+    list(CatWeightFleet([str(fleet_dir)], cache_dir=cache_dir).files())
+    assert os.path.exists(os.path.join(cache_dir, fleet_module.METADATA_FILE))
+
+    opened.clear()
+    fleet = CatWeightFleet([str(fleet_dir)], cache_dir=cache_dir)
+    assert list(fleet.summary(begin_date=date(2030, 1, 1))) == []
+    assert opened == []
+    assert fleet.files_skipped == 3
+
+
+def test_per_file_errors(fleet_dir):
+    (fleet_dir / "junk.db").write_text("not a database")
+    fleet = CatWeightFleet([str(fleet_dir)], workers=2)
+    os.remove(fleet_dir / "old.db")
+    cats = sorted(row[1] for row in fleet.summary())
+    assert cats == ["goro", "mike", "tama"]
+    assert sorted(os.path.basename(path) for path, _ in fleet.errors) == ["junk.db", "old.db"]
+    assert not os.path.exists(fleet_dir / "old.db")
+
+
+def test_invalid_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        CatWeightFleet([str(tmp_path)])
+    with pytest.raises(ValueError):
+        CatWeightFleet([str(tmp_path / "*.db")])
+    (tmp_path / "a.db").write_text("")
+    with pytest.raises(ValueError):
+        CatWeightFleet([str(tmp_path)], workers=0)
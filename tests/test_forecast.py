@@ -0,0 +1,84 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from catdb.forecast import LINEAR_DAYS, ForecastResult, fit_linear
+
+DAYS = [date(2024, 3, 1) + timedelta(days=i) for i in range(30)]
+
+
+def fill(db, cat: str = "default", slope: float = 1 / 64) -> None:
+    # 2 進数で割り切れる重さにして、入れ替えても年ごとの合計が丸め誤差で変わらないようにする
+    db.use_cat(cat)
+    for i, day in enumerate(DAYS):
+        db.add_weight_record(day, 4.0 + slope * i + (1 / 16 if i % 3 == 0 else 0.0))
+    db.use_cat("default")
+
+
+def test_fit_linear_matches_polyfit():
+    rng = np.random.default_rng(1)
+    values = np.full((2, LINEAR_DAYS), np.nan)
+    t = np.arange(1 - LINEAR_DAYS, 1)
+    picked = np.sort(rng.choice(LINEAR_DAYS, 40, replace=False))
+    values[0, picked] = 4.0 + 0.02 * t[picked] + rng.normal(0, 0.05, len(picked))
+    values[1, -2:] = [4.0, 4.1]
+    out = ForecastResult("linear", 2, 7)
+    fit_linear(values, 7, 0.95, out, slice(0, 2))
+
+    slope, intercept = np.polyfit(t[picked], values[0, picked], 1)
+    assert out.mean[0] == pytest.approx(intercept + slope * np.arange(1, 8))
+    assert out.observations[0] == len(picked)
+    assert (out.lower[0] < out.mean[0]).all() and (out.mean[0] < out.upper[0]).all()
+    # 記録が 2 件では当てはめない
+    assert out.valid.tolist() == [True, False]
+
+
+def test_forecasts_are_refitted_only_when_records_change(db):
+    fill(db)
+    fill(db, "goro", slope=-1 / 64)
+    assert db.update_forecasts(["linear"], horizon=7) == (2, 0)
+    forecast = db.get_forecasts("linear")
+    assert [row[2] for row in forecast] == [DAYS[-1] + timedelta(days=i) for i in range(1, 8)]
+    assert {row[0] for row in db.get_forecasts(all_cats=True)} == {"default", "goro"}
+
+    assert db.update_forecasts(["linear"], horizon=7) == (0, 2)
+    assert db.update_forecasts(["linear"], horizon=7, force=True) == (2, 0)
+    # 設定が変われば当てはめ直す
+    assert db.update_forecasts(["linear"], horizon=14) == (2, 0)
+
+    db.use_cat("goro")
+    db.add_weight_record(DAYS[-1] + timedelta(days=1), 3.5)
+    assert db.update_forecasts(["linear"], horizon=14) == (1, 1)
+    assert db.get_forecasts("linear")[0][2] == DAYS[-1] + timedelta(days=2)
+
+
+def test_swapped_weights_are_refitted(db):
+    fill(db)
+    db.update_forecasts(["linear"], horizon=7)
+    before = db.get_forecasts("linear")
+    first, last = db.find_weight_record(DAYS[0])[1], db.find_weight_record(DAYS[-1])[1]
+    db.update_weight_record(DAYS[0], last)
+    db.update_weight_record(DAYS[-1], first)
+
+    # 年ごとの集計は変わらないが、記録が変わったので当てはめ直す
+    assert db.update_forecasts(["linear"], horizon=7) == (1, 0)
+    assert db.get_forecasts("linear")[0][3] < before[0][3]
+
+
+def test_cats_with_too_few_records(db):
+    db.add_weight_record(DAYS[0], 4.0)
+    assert db.update_forecasts(["linear"], horizon=7) == (1, 0)
+    assert db.get_forecasts() == []
+    # 当てはめられなかった結果も記録し、記録が変わるまで飛ばす
+    assert db.update_forecasts(["linear"], horizon=7) == (0, 1)
+
+    db.delete_weight_record(DAYS[0])
+    assert db.update_forecasts(["linear"], horizon=7) == (0, 0)
+    assert db.conn.execute("SELECT COUNT(*) FROM forecast_runs").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize("kwargs", [{"models": ["arima"]}, {"horizon": 0}, {"level": 1.0}])
+def test_invalid_settings(db, kwargs):
+    with pytest.raises(ValueError):
+        db.update_forecasts(**kwargs)
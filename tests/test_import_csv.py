@@ -0,0 +1,103 @@
+from datetime import date
+
+import pytest
+
+from catdb.commands.initialize import initialize_database
+from catdb.db.database import CatWeightDB
+from catdb.db.storage import STORAGES
+
+ROWS = [
+    ("2024-01-01", 4.0, "first"),
+    ("2024-01-02", 4.125, ""),
+    ("2024-01-03", 4.25, "third"),
+    ("2024-01-02", 4.5, "again"),
+    ("2024-01-05", 4.375, ""),
+]
+
+
+def write_csv(path, rows=ROWS) -> str:
+    path.write_text("date,weight,notes\n" + "".join(f"{d},{w},{n}\n" for d, w, n in rows))
+    return str(path)
+
+
+def pragmas(db) -> tuple[str, int]:
+    return (db.conn.execute("PRAGMA journal_mode").fetchone()[0], db.conn.execute("PRAGMA synchronous").fetchone()[0])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 1000])
+def test_chunk_boundaries(db, tmp_path, chunk_size):
+    # 同じ日付が別のチャンクにあっても、後の行が残る
+    assert db.import_csv(write_csv(tmp_path / "records.csv"), chunk_size=chunk_size) == 5
+    assert list(db.iter_records()) == [
+        (date(2024, 1, 1), 4.0, "first"),
+        (date(2024, 1, 2), 4.5, "again"),
+        (date(2024, 1, 3), 4.25, "third"),
+        (date(2024, 1, 5), 4.375, None),
+    ]
+    assert db.check_rollups() == []
+
+
+def test_only_changed_rows_are_counted(db, tmp_path):
+    csv_file = write_csv(tmp_path / "records.csv")
+    db.import_csv(csv_file, chunk_size=2)
+    # 同じ内容の行は数えない。2024-01-02 は CSV の中で 2 回書き換わる
+    assert db.import_csv(csv_file, chunk_size=2) == 2
+    write_csv(tmp_path / "records.csv", [("2024-01-02", 4.5, "again"), ("2024-01-03", 4.3, "third")])
+    assert db.import_csv(csv_file) == 1
+
+
+def test_pragmas_are_kept_by_default(db, tmp_path, monkeypatch):
+    before = pragmas(db)
+    seen = []
+    bulk_upsert = db.bulk_upsert
+    monkeypatch.setattr(db, "bulk_upsert", lambda batches: seen.append(pragmas(db)) or bulk_upsert(batches))
+    db.import_csv(write_csv(tmp_path / "records.csv"))
+    assert seen == [before]
+    assert pragmas(db) == before
+
+
+def test_fast_pragmas_are_opt_in_and_restored(db, tmp_path, monkeypatch):
+    before = pragmas(db)
+    seen = []
+    bulk_upsert = db.bulk_upsert
+    monkeypatch.setattr(db, "bulk_upsert", lambda batches: seen.append(pragmas(db)) or bulk_upsert(batches))
+    db.import_csv(write_csv(tmp_path / "records.csv"), journal_mode="MEMORY", synchronous="OFF")
+    assert seen == [("memory", 0)]
+    assert pragmas(db) == before
+
+
+def test_bad_chunk_rolls_back_the_whole_load(db, tmp_path):
+    db.add_weight_record(date(2023, 12, 31), 3.9)
+    before = pragmas(db)
+    rows = ROWS[:4] + [("2024-01-05", "heavy", "")]
+    with pytest.raises(ValueError):
+        db.import_csv(write_csv(tmp_path / "records.csv", rows), chunk_size=2, journal_mode="MEMORY", synchronous="OFF")
+    assert list(db.iter_records()) == [(date(2023, 12, 31), 3.9, None)]
+    assert pragmas(db) == before
+    db.add_weight_record(date(2024, 2, 1), 4.0)
+    assert db.check_rollups() == []
+
+
+@pytest.mark.parametrize("version", sorted(STORAGES))
+def test_storage_formats(tmp_path, version):
+    storage = STORAGES[version]
+    with CatWeightDB(str(tmp_path / "cats.db")) as db:
+        db.initialize_table(version)
+        db.import_csv(write_csv(tmp_path / "records.csv"), chunk_size=2)
+        stored = db.conn.execute("SELECT date, weight FROM cat_weight_records ORDER BY date").fetchall()
+        assert stored == [(storage.encode_date(d), storage.encode_weight(w)) for d, w, _ in db.iter_records()]
+        assert stored[-1] == (storage.encode_date(date(2024, 1, 5)), storage.encode_weight(4.375))
+        assert db.get_stats("year")[0][1:4] == (4, 4.0, 4.5)
+        assert db.check_rollups() == []
+
+
+def test_init_reports_rows_written(tmp_path, capsys):
+    db_file = str(tmp_path / "cats.db")
+    csv_file = write_csv(tmp_path / "records.csv")
+    initialize_database(db_file, csv_file)
+    assert "Wrote 5 rows" in capsys.readouterr().out
+    write_csv(tmp_path / "records.csv", ROWS[:3])
+    initialize_database(db_file, csv_file)
+    assert "Wrote 1 rows" in capsys.readouterr().out
+    with CatWeightDB(db_file) as db:
+        assert pragmas(db)[0] == "delete"
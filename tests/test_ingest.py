@@ -0,0 +1,102 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from catdb.commands.ingest import expand_paths
+from catdb.db import rollups, versions
+from catdb.ingest import ingest_files, parse_file
+
+TRIGGERS = {"weight_rollups_insert", "weight_rollups_delete", "weight_rollups_update"} | set(versions.TRIGGERS)
+
+
+def triggers(db) -> set[str]:
+    return {name for (name,) in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+
+def write(path, text: str) -> str:
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_parse_file_detects_format_and_rejects_bad_rows(tmp_path):
+    path = write(tmp_path / "scale.csv",
+                 "Date;Weight;Notes\n31.01.2024;4,25;ok\n01.02.2024;-1;\n32.01.2024;4,3;\n02.02.2024;;\n03.02.2024;4,5;\n")
+    result = parse_file(path)
+    assert result.error is None
+    assert result.delimiter == ";"
+    assert result.date_format == "%d.%m.%Y"
+    assert (result.rows, result.rejected) == (2, 3)
+    assert len(result.messages) == 3
+    assert result.messages[0].startswith("line 3:")
+    assert list(result.records["weight"]) == [4.25, 4.5]
+    assert result.records["notes"].iloc[0] == "ok"
+    assert pd.isna(result.records["notes"].iloc[1])
+
+
+def test_parse_file_reports_unreadable_files(tmp_path):
+    assert parse_file(write(tmp_path / "no_date.csv", "day,weight\n2024-01-01,4\n")).error is not None
+    assert parse_file(write(tmp_path / "no_weight.csv", "date,kg\n2024-01-01,4\n")).error is not None
+    assert parse_file(str(tmp_path / "missing.csv")).error is not None
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ingest_files(db, tmp_path, workers):
+    paths = [
+        write(tmp_path / "a.csv", "date,weight\n2024-01-01,4.0\n2024-01-02,4.1\n"),
+        write(tmp_path / "b.csv", "date,weight,notes\n01/03/2024,4.2,us\n01/04/2024,oops,\n"),
+        write(tmp_path / "c.csv", "nothing useful\n"),
+    ]
+    seen = []
+    results = ingest_files(db, paths, workers=workers, on_file=lambda result: seen.append(result.path))
+    assert sorted(seen) == sorted(paths)
+    by_path = {result.path: result for result in results}
+    assert by_path[paths[0]].rows == 2
+    assert (by_path[paths[1]].rows, by_path[paths[1]].rejected) == (1, 1)
+    assert by_path[paths[2]].error is not None
+    assert db.find_weight_record(date(2024, 1, 3)) == (date(2024, 1, 3), 4.2, "us")
+    assert db.check_rollups() == []
+    assert triggers(db) >= TRIGGERS
+
+
+def test_failing_batch_rolls_back_and_keeps_triggers(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    # cat_id をキャッシュさせ、トリガーの削除より前に DML が走らない状態にする
+    db.find_weight_record(date(2024, 1, 1))
+    version = db.conn.execute("SELECT version FROM cat_versions").fetchone()[0]
+
+    def batches():
+        yield pd.DataFrame({"date": ["2024-01-02", "2024-01-03"], "weight": [4.1, 4.2]})
+        raise RuntimeError("parser crashed")
+
+    with pytest.raises(RuntimeError):
+        db.bulk_upsert(batches())
+
+    assert triggers(db) >= TRIGGERS
+    assert db.find_weight_record(date(2024, 1, 2)) is None
+    assert db.conn.execute("SELECT version FROM cat_versions").fetchone()[0] == version
+    db.add_weight_record(date(2024, 1, 4), 4.3)
+    db.update_weight_record(date(2024, 1, 1), 3.9)
+    assert db.check_rollups() == []
+
+
+def test_failing_callback_rolls_back_the_ingest(db, tmp_path):
+    path = write(tmp_path / "a.csv", "date,weight\n2024-01-01,4.0\n")
+
+    def fail(result):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        ingest_files(db, [path], workers=1, on_file=fail)
+    assert db.find_weight_record(date(2024, 1, 1)) is None
+    assert triggers(db) >= TRIGGERS
+    assert rollups.check_rollups(db.conn) == []
+
+
+def test_expand_paths(tmp_path):
+    first = write(tmp_path / "a.csv", "")
+    second = write(tmp_path / "b.csv", "")
+    (tmp_path / "dir.csv").mkdir()
+    assert expand_paths([str(tmp_path / "*.csv"), first]) == [first, second]
+    with pytest.raises(ValueError):
+        expand_paths([str(tmp_path / "*.tsv")])
@@ -0,0 +1,114 @@
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+from catdb.commands.get import print_weight_records
+from catdb.db.database import CatWeightDB
+
+CATDB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catdb.py")
+
+DAYS = [date(2024, 1, 1) + timedelta(days=i * 2) for i in range(10)]
+
+
+@pytest.fixture
+def list_db(db_file):
+    with CatWeightDB(db_file) as db:
+        for i, day in enumerate(DAYS):
+            db.add_weight_record(day, 4.0 + i / 10, "tab\there" if i == 3 else None)
+        db.use_cat("goro")
+        db.add_weight_record(DAYS[0], 5.0)
+    return db_file
+
+
+def page(db_file, capsys, **kwargs) -> tuple[list[str], date | None]:
+    """Prints one page as TSV and returns its dates and the --after value of the next page."""
+    print_weight_records(db_file, fmt="tsv", **kwargs)
+    captured = capsys.readouterr()
+    dates = [line.split("\t")[0] for line in captured.out.splitlines()[1:]]
+    found = re.search(r"--after (\S+)", captured.err)
+    return dates, date.fromisoformat(found.group(1)) if found else None
+
+
+@pytest.mark.parametrize("newest_first", [False, True])
+@pytest.mark.parametrize("limit", [1, 3, 5, 10, 20])
+def test_paging_visits_every_record_once(list_db, capsys, newest_first, limit):
+    seen, after, pages = [], None, 0
+    while True:
+        dates, after = page(list_db, capsys, limit=limit, after=after, newest_first=newest_first)
+        assert 0 < len(dates) <= limit
+        seen += dates
+        pages += 1
+        if after is None:
+            break
+        assert after.isoformat() == dates[-1]
+    expected = [day.isoformat() for day in (reversed(DAYS) if newest_first else DAYS)]
+    assert seen == expected
+    # 件数がページの大きさで割り切れても、空のページを案内しない
+    assert pages == -(-len(DAYS) // limit)
+
+
+def test_after_need_not_be_a_record_date(list_db, capsys):
+    assert page(list_db, capsys, limit=2, after=date(2024, 1, 4)) == (["2024-01-05", "2024-01-07"], date(2024, 1, 7))
+    assert page(list_db, capsys, limit=2, after=date(2024, 1, 4), newest_first=True) == (["2024-01-03", "2024-01-01"], None)
+    assert page(list_db, capsys, after=DAYS[-1]) == ([], None)
+
+
+def test_paging_within_a_date_range(list_db, capsys):
+    assert page(list_db, capsys, begin_date=DAYS[2], end_date=DAYS[6], limit=3, newest_first=True) == (
+        [DAYS[6].isoformat(), DAYS[5].isoformat(), DAYS[4].isoformat()], DAYS[4])
+    assert page(list_db, capsys, begin_date=DAYS[2], end_date=DAYS[6], limit=3, after=DAYS[4], newest_first=True) == (
+        [DAYS[3].isoformat(), DAYS[2].isoformat()], None)
+    # limit を付けると begin_date だけでも 1 件の検索ではなく下限になる
+    assert page(list_db, capsys, begin_date=DAYS[8], limit=5)[0] == [DAYS[8].isoformat(), DAYS[9].isoformat()]
+    assert page(list_db, capsys, begin_date=DAYS[8])[0] == [DAYS[8].isoformat()]
+
+
+@pytest.mark.parametrize("newest_first", [False, True])
+def test_pages_are_primary_key_seeks(db, newest_first):
+    plan = " ".join(row[3] for row in db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT date, weight, notes FROM cat_weight_records WHERE cat_id = ? AND date "
+        + ("< ? ORDER BY date DESC" if newest_first else "> ? ORDER BY date") + " LIMIT ?", (1, "2024-01-01", 10)))
+    assert re.search(r"USING PRIMARY KEY \(cat_id=\? AND date[<>]\?\)", plan)
+    assert "TEMP B-TREE" not in plan
+
+
+def test_formats(list_db):
+    stream = io.StringIO()
+    print_weight_records(list_db, fmt="json", limit=2, after=DAYS[2], stream=stream)
+    assert json.loads(stream.getvalue()) == [
+        {"date": "2024-01-07", "weight": 4.3, "notes": "tab\there"}, {"date": "2024-01-09", "weight": 4.4, "notes": None}]
+
+    stream = io.StringIO()
+    print_weight_records(list_db, fmt="tsv", begin_date=DAYS[3], stream=stream)
+    assert stream.getvalue() == "date\tweight\tnotes\n2024-01-07\t4.3\ttab\\there\n"
+
+    stream = io.StringIO()
+    print_weight_records(list_db, cat="goro", stream=stream)
+    assert stream.getvalue().splitlines() == ["date        weight  notes", "2024-01-01     5.0  "]
+
+    for fmt, empty in [("table", "No records found.\n"), ("json", "[]\n"), ("tsv", "date\tweight\tnotes\n")]:
+        stream = io.StringIO()
+        print_weight_records(list_db, fmt=fmt, cat="nobody", stream=stream)
+        assert stream.getvalue() == empty
+
+
+def test_invalid_arguments(list_db):
+    with pytest.raises(ValueError):
+        print_weight_records(list_db, fmt="xml")
+    with pytest.raises(ValueError):
+        print_weight_records(list_db, limit=0)
+
+
+def test_cli_paging(list_db):
+    result = subprocess.run([sys.executable, CATDB, "--db-file", list_db, "list", "--limit", "4", "--order", "newest",
+                             "--after", "2024-01-17", "--format", "tsv"], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert [line.split("\t")[0] for line in result.stdout.splitlines()[1:]] == [
+        "2024-01-15", "2024-01-13", "2024-01-11", "2024-01-09"]
+    assert "Next page: --after 2024-01-09" in result.stderr
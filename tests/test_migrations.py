@@ -0,0 +1,141 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from catdb.db import migrations
+from catdb.db.database import CatWeightDB
+from catdb.db.storage import LATEST_VERSION, STORAGES, get_schema_version
+
+RECORDS = [
+    (date(1969, 12, 31), 3.25, None),
+    (date(2024, 1, 1), 4.0, "new year"),
+    (date(2024, 2, 29), 4.125, "leap day"),
+    (date(2024, 3, 1), 4.1, None),
+]
+
+
+def fill(db: CatWeightDB) -> None:
+    for record_date, weight, notes in RECORDS:
+        db.add_weight_record(record_date, weight, notes)
+    db.use_cat("goro")
+    db.add_weight_record(date(2024, 1, 1), 5.5, "goro")
+    db.use_cat("default")
+
+
+@pytest.mark.parametrize("version", sorted(STORAGES))
+def test_storage_round_trip(version):
+    storage = STORAGES[version]
+    for record_date, weight, _ in RECORDS:
+        assert storage.decode_date(storage.encode_date(record_date)) == record_date
+    assert storage.encode_weight(None) is None
+
+
+@pytest.mark.parametrize("version", sorted(STORAGES))
+def test_non_finite_weights_are_rejected(version):
+    storage = STORAGES[version]
+    for value in (float("nan"), float("inf"), float("-inf")):
+        with pytest.raises(ValueError):
+            storage.encode_weight(value)
+        with pytest.raises(ValueError):
+            storage.encode_weights(np.array([4.0, value]))
+    assert storage.encode_weights(np.array([4.25])) == [storage.encode_weight(4.25)]
+
+
+@pytest.mark.parametrize("weight", ["", "nan"])
+def test_csv_with_missing_weights_is_rejected(tmp_path, weight):
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text(f"date,weight\n2024-01-01,4.0\n2024-01-02,{weight}\n")
+    with CatWeightDB(str(tmp_path / "cats.db")) as db:
+        db.initialize_table(3)
+        with pytest.raises(ValueError):
+            db.import_csv(str(csv_file))
+        # グラム単位の整数に変換されて INT64_MIN として保存されることはない
+        assert db.conn.execute("SELECT COUNT(*) FROM cat_weight_records").fetchone()[0] == 0
+        assert db.check_rollups() == []
+
+
+@pytest.mark.parametrize("target", [2, 3])
+def test_migration_keeps_records(db_file, target):
+    with CatWeightDB(db_file) as db:
+        fill(db)
+        before = list(db.iter_records())
+        latest_seq = db.latest_change_seq()
+        fingerprint = db.content_fingerprint()
+
+        assert db.migrate(target) == list(range(2, target + 1))
+        assert get_schema_version(db.conn) == target
+        assert db.storage is STORAGES[target]
+        assert list(db.iter_records()) == before
+        assert db.check_rollups() == []
+        # 変換のための書き込みは変更履歴に残らず、内容の指紋も変わらない
+        assert db.latest_change_seq() == latest_seq
+        assert db.content_fingerprint() == fingerprint
+        assert [hit[1] for hit in db.search_notes("leap")] == [date(2024, 2, 29)]
+
+        # 変換後も書き込みと集計のトリガーが新しい形式で動く
+        db.add_weight_record(date(2024, 3, 2), 4.2)
+        db.update_weight_record(date(2024, 1, 1), 4.05)
+        assert db.find_weight_record(date(2024, 3, 2))[1] == 4.2
+        assert db.check_rollups() == []
+        db.use_cat("goro")
+        assert db.find_weight_record(date(2024, 1, 1))[1] == 5.5
+
+
+def test_stepwise_migration_matches_direct(tmp_path):
+    results = []
+    for steps in ([2, 3], [3]):
+        path = str(tmp_path / f"{len(steps)}.db")
+        with CatWeightDB(path) as db:
+            db.initialize_table()
+            fill(db)
+            for step in steps:
+                db.migrate(step)
+            results.append(list(db.iter_records()))
+    assert results[0] == results[1]
+
+
+def test_new_database_with_latest_version(tmp_path):
+    with CatWeightDB(str(tmp_path / "new.db")) as db:
+        db.initialize_table(LATEST_VERSION)
+        fill(db)
+        assert db.migrate() == []
+        assert list(db.iter_records()) == [(d, w, n) for d, w, n in RECORDS]
+
+
+def test_failed_migration_leaves_the_database_unchanged(db_file, monkeypatch):
+    def broken(conn):
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setitem(migrations.MIGRATIONS, 3, broken)
+    with CatWeightDB(db_file) as db:
+        fill(db)
+        before = list(db.iter_records())
+        with pytest.raises(RuntimeError):
+            db.migrate(3)
+    with CatWeightDB(db_file) as db:
+        assert get_schema_version(db.conn) == 1
+        assert list(db.iter_records()) == before
+        assert db.check_rollups() == []
+
+
+def test_invalid_targets(db_file):
+    with CatWeightDB(db_file) as db:
+        with pytest.raises(ValueError):
+            db.migrate(99)
+        db.migrate(2)
+        with pytest.raises(ValueError):
+            db.migrate(1)
+
+
+def test_legacy_layout_must_be_upgraded_first(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    with CatWeightDB(path) as db:
+        db.conn.execute("CREATE TABLE cat_weight_records (date TEXT PRIMARY KEY, weight REAL NOT NULL, notes TEXT)")
+        db.conn.execute("INSERT INTO cat_weight_records VALUES ('2024-01-01', 4.0, 'old')")
+        db.conn.commit()
+        with pytest.raises(ValueError):
+            db.migrate()
+        db.initialize_table()
+        assert db.migrate() == [2, 3]
+        assert list(db.iter_records()) == [(date(2024, 1, 1), 4.0, "old")]
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+from catdb.commands.fold import fold_databases
+from catdb.db import database as database_module
+from catdb.db.database import CatWeightDB
+
+CATDB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catdb.py")
+
+
+def legacy_database(path, rows=(("2022-05-05", 3.0, "kitten"), ("2022-06-05", 3.4, None))) -> str:
+    """Creates a database in the single-cat layout (keyed by date only)."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE cat_weight_records (date TEXT PRIMARY KEY, weight REAL NOT NULL, notes TEXT)")
+    conn.executemany("INSERT INTO cat_weight_records VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def multi_cat_database(path, schema_version: int = 1, records=None) -> str:
+    records = records or {"tama": [(date(2023, 1, 1), 4.0, "vet")], "goro": [(date(2023, 1, 1), 5.0, None)]}
+    with CatWeightDB(str(path)) as db:
+        db.initialize_table(schema_version)
+        for cat, rows in records.items():
+            db.use_cat(cat)
+            for row in rows:
+                db.add_weight_record(*row)
+    return str(path)
+
+
+def test_cats_keep_separate_records(db):
+    db.use_cat("tama")
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    db.add_weight_record(date(2024, 1, 2), 4.1)
+    db.use_cat("goro")
+    # 同じ日付でも猫が違えば別の記録になる
+    assert db.add_weight_record(date(2024, 1, 1), 5.0)
+    assert [name for _, name, _ in db.list_cats()] == ["goro", "tama"]
+    assert {name: records for _, name, records in db.list_cats()} == {"goro": 1, "tama": 2}
+    assert list(db.iter_records()) == [(date(2024, 1, 1), 5.0, None)]
+    db.use_cat("tama")
+    assert db.get_records_by_date_range(date(2024, 1, 1), date(2024, 1, 1))["weight"].tolist() == [4.0]
+    db.use_cat("nobody")
+    assert len(db.get_all_records()) == 0
+    assert [name for _, name, _ in db.list_cats()] == ["goro", "tama"]
+
+
+@pytest.mark.parametrize("version", [1, 2, 3])
+def test_per_cat_queries_are_primary_key_range_scans(tmp_path, version):
+    with CatWeightDB(str(tmp_path / "cats.db")) as db:
+        db.initialize_table(version)
+        plan = " ".join(row[3] for row in db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT date, weight, notes FROM cat_weight_records "
+            "WHERE cat_id = ? AND date BETWEEN ? AND ? ORDER BY date", (1, 0, 0)))
+    # WITHOUT ROWID の主キーを範囲で走査し、並べ替えも本体の参照も要らない
+    assert "USING PRIMARY KEY (cat_id=? AND date>? AND date<?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_legacy_file_is_upgraded_in_place(tmp_path):
+    db_file = legacy_database(tmp_path / "old.db")
+    with CatWeightDB(db_file, cat="tama") as db:
+        assert db.is_legacy_schema()
+        with pytest.raises(ValueError, match="single-cat layout"):
+            db.add_weight_record(date(2024, 1, 1), 4.0)
+        with pytest.raises(ValueError, match="single-cat layout"):
+            db.migrate()
+        assert db.initialize_table() is False
+        assert not db.is_legacy_schema()
+        assert list(db.iter_records()) == [(date(2022, 5, 5), 3.0, "kitten"), (date(2022, 6, 5), 3.4, None)]
+        assert db.list_cats() == [(1, "tama", 2)]
+        # 集計や索引も取り込んだ記録から作られる
+        assert db.check_rollups() == []
+        assert db.get_stats("year")[0][1:4] == (2, 3.0, 3.4)
+        tables = {row[0] for row in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "cat_weight_records_legacy" not in tables
+        db.add_weight_record(date(2022, 5, 5), 9.9)
+        assert db.find_weight_record(date(2022, 5, 5))[1] == 3.0
+
+
+def test_failed_upgrade_leaves_the_legacy_table(tmp_path, monkeypatch):
+    db_file = legacy_database(tmp_path / "old.db")
+
+    def fail(conn, storage):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(database_module.rollups, "create_rollups", fail)
+    with CatWeightDB(db_file) as db:
+        with pytest.raises(sqlite3.OperationalError):
+            db.upgrade_legacy_table()
+        assert db.is_legacy_schema()
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT COUNT(*) FROM cat_weight_records").fetchone()[0] == 2
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name IN ('cats', 'cat_weight_records_legacy')").fetchall() == []
+    conn.close()
+
+
+def test_fold_legacy_files_by_file_name(db, tmp_path):
+    assert db.fold_database(legacy_database(tmp_path / "mike.db")) == 2
+    assert db.fold_database(legacy_database(tmp_path / "x.db", [("2022-05-05", 2.0, None)]), cat="kuro") == 1
+    assert {name: records for _, name, records in db.list_cats()} == {"mike": 2, "kuro": 1}
+    db.use_cat("mike")
+    assert list(db.iter_records()) == [(date(2022, 5, 5), 3.0, "kitten"), (date(2022, 6, 5), 3.4, None)]
+    # 同じ猫・日付の記録は上書きする
+    assert db.fold_database(legacy_database(tmp_path / "mike2.db", [("2022-05-05", 3.1, "again")]), cat="mike") == 1
+    assert db.find_weight_record(date(2022, 5, 5)) == (date(2022, 5, 5), 3.1, "again")
+    assert db.check_rollups() == []
+
+
+@pytest.mark.parametrize("src_version, dest_version", [(1, 3), (3, 1), (2, 2)])
+def test_fold_multi_cat_files_across_storage_formats(tmp_path, src_version, dest_version):
+    src_file = multi_cat_database(tmp_path / "src.db", src_version, {
+        "tama": [(date(2023, 1, 1), 4.125, "vet"), (date(2023, 2, 1), 4.25, None)],
+        "goro": [(date(2023, 1, 1), 5.5, None)],
+    })
+    with CatWeightDB(str(tmp_path / "dest.db")) as db:
+        db.initialize_table(dest_version)
+        db.use_cat("zora")
+        db.add_weight_record(date(2020, 1, 1), 3.0)
+        db.use_cat("tama")
+        db.add_weight_record(date(2023, 1, 1), 9.0)
+        assert db.fold_database(src_file) == 3
+        assert {name: records for _, name, records in db.list_cats()} == {"goro": 1, "tama": 2, "zora": 1}
+        assert list(db.iter_records()) == [(date(2023, 1, 1), 4.125, "vet"), (date(2023, 2, 1), 4.25, None)]
+        db.use_cat("goro")
+        assert list(db.iter_records()) == [(date(2023, 1, 1), 5.5, None)]
+        assert db.check_rollups() == []
+
+
+def test_fold_selects_one_cat_of_a_multi_cat_file(db, tmp_path):
+    src_file = multi_cat_database(tmp_path / "src.db")
+    assert db.fold_database(src_file, cat="goro") == 1
+    assert db.fold_database(src_file, cat="nobody") == 0
+    assert [name for _, name, _ in db.list_cats()] == ["goro"]
+
+
+def test_fold_rejects_files_without_records(db, tmp_path):
+    empty = tmp_path / "empty.db"
+    sqlite3.connect(empty).close()
+    with pytest.raises(ValueError):
+        db.fold_database(str(empty))
+    # 失敗しても ATTACH したデータベースは外されている
+    assert db.fold_database(legacy_database(tmp_path / "mike.db")) == 2
+    assert [row[1] for row in db.conn.execute("PRAGMA database_list")] == ["main"]
+
+
+def test_fold_command(db_file, tmp_path, capsys):
+    empty = tmp_path / "empty.db"
+    sqlite3.connect(empty).close()
+    fold_databases(db_file, [legacy_database(tmp_path / "mike.db"), db_file, str(empty),
+                             multi_cat_database(tmp_path / "multi.db")])
+    out = capsys.readouterr().out
+    assert f"Folded 2 records from {tmp_path / 'mike.db'}." in out
+    assert f"Folded 2 records from {tmp_path / 'multi.db'}." in out
+    assert f"Skipped {db_file}: same file as the destination." in out
+    assert f"Skipped {empty}:" in out
+    with CatWeightDB(db_file) as db:
+        assert {name: records for _, name, records in db.list_cats()} == {"goro": 1, "mike": 2, "tama": 1}
+    with pytest.raises(ValueError):
+        fold_databases(db_file, [str(empty), str(empty)], cat="tama")
+
+
+def test_cli_cat_option(tmp_path):
+    db_file = str(tmp_path / "cats.db")
+
+    def catdb(*args):
+        result = subprocess.run([sys.executable, CATDB, "--db-file", db_file, *args], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+
+    catdb("init")
+    catdb("--cat", "tama", "add", "2024-01-01", "4.0")
+    # --cat はサブコマンドの後ろにも書ける
+    catdb("add", "2024-01-01", "5.0", "--cat", "goro")
+    out = catdb("cats")
+    assert "tama" in out and "goro" in out
+    with CatWeightDB(db_file, cat="goro") as db:
+        assert list(db.iter_records()) == [(date(2024, 1, 1), 5.0, None)]
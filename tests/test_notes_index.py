@@ -0,0 +1,33 @@
+from datetime import date
+
+import pytest
+
+from catdb.db import notes_index
+
+
+def test_search_follows_writes(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0, "vet visit")
+    db.add_weight_record(date(2024, 1, 2), 4.1, "new food")
+    assert [hit[1] for hit in db.search_notes("vet")] == [date(2024, 1, 1)]
+    db.update_weight_record(date(2024, 1, 1), 4.0, notes="checkup")
+    assert db.search_notes("vet") == []
+    assert db.rebuild_notes_index("trigram") == 2
+    assert [hit[1] for hit in db.search_notes("foo")] == [date(2024, 1, 2)]
+
+
+def test_failed_tokenizer_switch_keeps_the_index(db, monkeypatch):
+    db.add_weight_record(date(2024, 1, 1), 4.0, "vet visit")
+    # 索引が使われている状態にしてから作り直しを失敗させる
+    db.search_notes("vet")
+
+    def broken(conn, storage, tokenizer):
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(notes_index, "create_notes_index", broken)
+    with pytest.raises(RuntimeError):
+        db.rebuild_notes_index("trigram")
+    monkeypatch.undo()
+
+    assert notes_index.index_exists(db.conn)
+    db.add_weight_record(date(2024, 1, 2), 4.1, "vet again")
+    assert [hit[1] for hit in db.search_notes("vet")] == [date(2024, 1, 1), date(2024, 1, 2)]
@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from catdb.db.database import CatWeightDB, open_connection
+from catdb.db.pool import ConnectionPool
+
+CATDB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catdb.py")
+
+
+def journal_mode(db_file: str) -> str:
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_open_connection_options(db_file):
+    conn = open_connection(db_file, busy_timeout=0.25)
+    try:
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 250
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    finally:
+        conn.close()
+
+    conn = open_connection(db_file, wal=True)
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    finally:
+        conn.close()
+    # WAL はファイルに残る
+    assert journal_mode(db_file) == "wal"
+
+
+def test_busy_timeout_waits_for_the_lock(db_file):
+    holder = sqlite3.connect(db_file, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        with CatWeightDB(db_file, busy_timeout=0.1) as db:
+            start = time.monotonic()
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                db.add_weight_record(date(2024, 1, 1), 4.0)
+            assert time.monotonic() - start >= 0.09
+
+        # ロックが待ち時間のうちに外れれば書き込める
+        threading.Timer(0.2, holder.execute, args=("COMMIT",)).start()
+        with CatWeightDB(db_file, busy_timeout=5.0) as db:
+            assert db.add_weight_record(date(2024, 1, 1), 4.0)
+    finally:
+        if holder.in_transaction:
+            holder.execute("ROLLBACK")
+        holder.close()
+
+
+def test_cli_defaults(db_file):
+    result = subprocess.run([sys.executable, CATDB, "--db-file", db_file, "--wal", "--busy-timeout", "1",
+                             "add", "2024-01-01", "4.0"], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert journal_mode(db_file) == "wal"
+
+
+def test_readers_see_committed_writes(db_file):
+    with ConnectionPool(db_file, readers=2) as pool:
+        with pool.writer(cat="tama") as db:
+            db.add_weight_record(date(2024, 1, 1), 4.0)
+        with pool.reader(cat="tama") as db:
+            assert db.find_weight_record(date(2024, 1, 1)) == (date(2024, 1, 1), 4.0, None)
+            with pytest.raises(sqlite3.OperationalError, match="readonly"):
+                db.conn.execute("DELETE FROM cat_weight_records")
+        assert journal_mode(db_file) == "wal"
+
+
+def test_connections_are_reused(db_file):
+    with ConnectionPool(db_file, readers=2) as pool:
+        with pool.writer() as db:
+            writer = db.conn
+        with pool.writer() as db:
+            assert db.conn is writer
+        with pool.reader() as first:
+            with pool.reader() as second:
+                assert first.conn is not second.conn
+                readers = {first.conn, second.conn}
+        with pool.reader() as db:
+            assert db.conn in readers
+        # 借りた側の close で接続は閉じない
+        db.close()
+        with pool.reader() as db:
+            assert db.conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_readers_are_limited(db_file):
+    with ConnectionPool(db_file, readers=1) as pool:
+        with pool.reader():
+            with pytest.raises(TimeoutError):
+                with pool.reader(timeout=0.05):
+                    pass
+        with pool.reader(timeout=0.05) as db:
+            assert db.list_cats() == []
+    with pytest.raises(ValueError):
+        ConnectionPool(db_file, readers=0)
+
+
+def test_reader_waits_for_a_free_connection(db_file):
+    with ConnectionPool(db_file, readers=1) as pool:
+        borrowed = []
+
+        def borrow():
+            with pool.reader() as db:
+                borrowed.append(db.conn)
+
+        with pool.reader() as db:
+            waiting = threading.Thread(target=borrow)
+            waiting.start()
+            waiting.join(0.1)
+            # timeout を指定しなければ、空くまで待つ
+            assert waiting.is_alive() and borrowed == []
+            held = db.conn
+        waiting.join(5)
+        assert borrowed == [held]
+
+
+def test_failed_writes_are_rolled_back(db_file):
+    with ConnectionPool(db_file) as pool:
+        with pytest.raises(RuntimeError):
+            with pool.writer() as db:
+                db.conn.execute("INSERT INTO cats (name) VALUES ('tama')")
+                assert db.conn.in_transaction
+                raise RuntimeError("interrupted")
+        with pool.writer() as db:
+            assert not db.conn.in_transaction
+            assert db.list_cats() == []
+
+
+def test_readers_are_not_blocked_by_the_writer(db_file):
+    with ConnectionPool(db_file, readers=2, busy_timeout=0.1) as pool:
+        with pool.writer() as db:
+            db.add_weight_record(date(2024, 1, 1), 4.0)
+            db.conn.execute("UPDATE cat_weight_records SET weight = 9.0")
+            assert db.conn.in_transaction
+            # WAL では書き込み中のトランザクションがあっても、コミット済みの内容を待たずに読める
+            with pool.reader() as reader:
+                assert reader.find_weight_record(date(2024, 1, 1))[1] == 4.0
+
+
+def test_writer_is_used_by_one_thread_at_a_time(db_file):
+    active, overlaps, errors = [], [], []
+
+    def write(i):
+        try:
+            with pool.writer(cat=f"cat{i}") as db:
+                active.append(i)
+                overlaps.append(len(active))
+                db.add_weight_record(date(2024, 1, 1), 4.0 + i / 10)
+                time.sleep(0.005)
+                active.remove(i)
+        except Exception as error:
+            errors.append(error)
+
+    def read():
+        try:
+            for _ in range(20):
+                with pool.reader() as db:
+                    db.list_cats()
+        except Exception as error:
+            errors.append(error)
+
+    with ConnectionPool(db_file, readers=2) as pool:
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+        threads += [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert max(overlaps) == 1
+        assert len(pool._all_readers) <= 2
+        with pool.reader() as db:
+            assert len(db.list_cats()) == 8
+
+
+def test_closed_pool(db_file):
+    pool = ConnectionPool(db_file)
+    with pool.writer() as db:
+        writer = db.conn
+    with pool.reader() as db:
+        reader = db.conn
+    pool.close()
+    for conn in (writer, reader):
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    with pytest.raises(RuntimeError):
+        with pool.writer():
+            pass
+    with pytest.raises(RuntimeError):
+        with pool.reader():
+            pass
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+from catdb import profiling
+from catdb.db.database import CatWeightDB
+from catdb.profiling import Profiler, profiled_connect
+
+CATDB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catdb.py")
+
+
+@pytest.fixture
+def conn(tmp_path):
+    profiler = Profiler()
+    conn = profiled_connect(profiler, str(tmp_path / "plain.db"))
+    conn.execute("CREATE TABLE t (x INTEGER PRIMARY KEY, y)")
+    conn.execute("CREATE TABLE log (x)")
+    conn.execute("CREATE TRIGGER t_log AFTER INSERT ON t BEGIN INSERT INTO log VALUES (NEW.x); END")
+    profiler.statements.clear()
+    yield conn
+    conn.close()
+
+
+def test_statements_record_rows_and_steps(conn):
+    statements = conn.profiler.statements
+    with conn:
+        conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, i * 2) for i in range(5)])
+    insert = statements[0]
+    assert insert.sql == "INSERT INTO t VALUES (?, ?)"
+    assert insert.rows == 5
+    # 暗黙の BEGIN、行ごとの INSERT とトリガーの文が手順として数えられる
+    assert insert.steps >= 10
+    assert [record.sql for record in statements[1:]] == ["COMMIT"]
+
+    cursor = conn.execute("SELECT x FROM t WHERE x >= ?", (1,))
+    assert cursor.fetchone() == (1,)
+    assert cursor.fetchmany(2) == [(2,), (3,)]
+    assert list(cursor) == [(4,)]
+    select = statements[-1]
+    assert (select.rows, select.steps) == (4, 1)
+    assert select.seconds > 0
+
+    conn.execute("UPDATE t SET y = 0 WHERE x < 3")
+    assert statements[-1].rows == 3
+    # トランザクションの外では ROLLBACK / COMMIT を記録しない
+    conn.commit()
+    conn.rollback()
+    assert statements[-1].sql == "COMMIT"
+    assert sum(record.sql == "COMMIT" for record in statements) == 2
+
+
+def test_phases_nest_and_tag_statements():
+    profiler = Profiler()
+    with profiler.phase("load") as outer:
+        with profiler.phase("parse"):
+            pass
+        with profiler.phase("write"):
+            profiler._new_statement("INSERT  INTO t\n  VALUES (1)")
+    profiler._new_statement("SELECT 1")
+    assert [(p.name, p.path, p.depth) for p in profiler.phases] == [
+        ("load", "load", 0), ("parse", "load/parse", 1), ("write", "load/write", 1)]
+    assert outer.wall >= profiler.phases[1].wall + profiler.phases[2].wall
+    assert [(s.sql, s.phase) for s in profiler.statements] == [("INSERT INTO t VALUES (1)", "load/write"), ("SELECT 1", None)]
+
+    with pytest.raises(RuntimeError):
+        with profiler.phase("failing"):
+            raise RuntimeError
+    assert profiler.phases[-1].name == "failing" and profiler._stack == []
+
+
+def test_hooks(conn):
+    events = []
+    conn.profiler.add_hook(lambda kind, record: events.append((kind, getattr(record, "sql", None) or record.name)))
+    with conn.profiler.phase("read"):
+        conn.execute("SELECT * FROM t").fetchall()
+    assert events == [("statement", "SELECT * FROM t"), ("phase", "read")]
+
+
+def test_summary_json_and_table(conn):
+    for i in range(3):
+        conn.execute("INSERT INTO t VALUES (?, ?)", (i, i))
+    conn.commit()
+    conn.execute("SELECT * FROM t").fetchall()
+    profiler = conn.profiler
+    with profiler.phase("render"):
+        with profiler.phase("savefig"):
+            pass
+
+    summary = {group["sql"]: group for group in profiler.summary()}
+    assert summary["INSERT INTO t VALUES (?, ?)"]["calls"] == 3
+    assert summary["INSERT INTO t VALUES (?, ?)"]["rows"] == 3
+    assert summary["SELECT * FROM t"]["rows"] == 3
+    totals = [group["total_ms"] for group in profiler.summary()]
+    assert totals == sorted(totals, reverse=True)
+
+    report = json.loads(profiler.to_json())
+    assert sorted(report) == ["phases", "sql_total_ms", "statements"]
+    assert [p["path"] for p in report["phases"]] == ["render", "render/savefig"]
+    assert set(report["phases"][0]) == {"name", "path", "depth", "start_ms", "wall_ms", "cpu_ms"}
+    assert report["sql_total_ms"] == pytest.approx(sum(group["total_ms"] for group in report["statements"]))
+
+    table = profiler.format_table(sql_width=20).splitlines()
+    assert table[0].split() == ["phase", "wall", "ms", "cpu", "ms"]
+    assert table[1].startswith("render ") and table[2].startswith("  savefig ")
+    assert table[4].split() == ["sql", "calls", "steps", "rows", "total", "ms", "max", "ms"]
+    insert = next(line for line in table if line.startswith("INSERT INTO t VAL..."))
+    calls, steps, rows = insert.split()[4:7]
+    assert (calls, rows) == ("3", "3") and int(steps) > 3
+    assert table[-1].startswith("SQL total: ")
+
+
+def test_statements_outside_cursors_have_no_time(conn):
+    conn._trace("PRAGMA optimize")
+    record = conn.profiler.statements[-1]
+    assert (record.sql, record.seconds, record.steps) == ("PRAGMA optimize", None, 1)
+    summary = conn.profiler.summary()
+    assert summary[-1]["total_ms"] == 0.0
+    assert json.loads(conn.profiler.to_json())["statements"][-1]["sql"] == "PRAGMA optimize"
+
+
+def test_disabled_profiling_uses_plain_connections(db_file):
+    assert profiling.active_profiler() is None
+    assert profiling.phase("x") is profiling.phase("y")
+    with CatWeightDB(db_file) as db:
+        assert type(db.conn) is sqlite3.Connection
+        assert db.profiler is None
+
+
+def test_active_profiler_is_used_and_restored(db_file):
+    with Profiler() as outer:
+        with Profiler() as inner:
+            assert profiling.active_profiler() is inner
+            with CatWeightDB(db_file) as db:
+                db.add_weight_record(date(2024, 1, 1), 4.0)
+                db.get_all_records()
+        assert profiling.active_profiler() is outer
+    assert profiling.active_profiler() is None
+    assert outer.statements == []
+    assert any("INSERT" in record.sql for record in inner.statements)
+    assert {"read_sql", "to_datetime"} <= {p.name for p in inner.phases}
+    read = next(record for record in inner.statements if record.phase == "read_sql")
+    assert read.sql.startswith("SELECT") and read.rows == 1
+
+
+def test_cli_profile_output(db_file, tmp_path):
+    def catdb(*args):
+        return subprocess.run([sys.executable, CATDB, "--db-file", db_file, *args], capture_output=True, text=True)
+
+    result = catdb("--profile", "add", "2024-01-01", "4.0")
+    assert result.returncode == 0
+    assert result.stderr.splitlines()[0].split()[:3] == ["phase", "wall", "ms"]
+    assert "INSERT INTO cat_weight_records" in result.stderr
+    assert "SQL total:" in result.stderr
+
+    profile_file = tmp_path / "profile.json"
+    result = catdb("--profile-format", "json", "--profile-file", str(profile_file), "list")
+    assert result.stderr == ""
+    report = json.loads(profile_file.read_text())
+    assert any(group["sql"].startswith("SELECT date") and group["rows"] == 1 for group in report["statements"])
+
+    # エラーで終わったコマンドでも書き出す
+    result = catdb("--profile", "--profile-format", "json", "list", "--limit", "0")
+    assert "Error:" in result.stdout
+    assert "statements" in json.loads(result.stderr)
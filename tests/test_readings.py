@@ -0,0 +1,145 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from catdb.commands.readings import import_readings
+from catdb.db.database import CatWeightDB
+from catdb.db.readings import ReadingBuffer
+
+CATDB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catdb.py")
+
+START = datetime(2024, 5, 1, 7, 0)
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def reading(i: int) -> tuple[datetime, float]:
+    return START + timedelta(minutes=i), 4.0 + i / 100
+
+
+def test_flush_when_max_rows_are_pending(db_file):
+    with ReadingBuffer(db_file, max_rows=3, max_delay=60) as buffer:
+        for i in range(3):
+            buffer.add(*reading(i))
+        assert wait_for(lambda: buffer.readings_written == 3)
+        buffer.add(*reading(3))
+        time.sleep(0.1)
+        # max_delay が長いので、4 件目は閉じるまで書き込まれない
+        assert (buffer.flushes, buffer.readings_written) == (1, 3)
+    assert (buffer.flushes, buffer.readings_written) == (2, 4)
+    with CatWeightDB(db_file) as db:
+        assert len(db.get_readings()) == 4
+        assert db.find_weight_record(date(2024, 5, 1))[1] == pytest.approx(4.015)
+
+
+def test_flush_after_max_delay(db_file):
+    with ReadingBuffer(db_file, max_rows=1000, max_delay=0.05) as buffer:
+        buffer.add(*reading(0))
+        # 他の接続からも見えるようにコミットされる
+        with CatWeightDB(db_file) as db:
+            assert wait_for(lambda: len(db.get_readings()) == 1)
+        buffer.add(*reading(1), device="scale-2")
+        buffer.flush()
+        assert buffer.readings_written == 2
+
+
+def test_add_waits_for_the_writer(db_file, monkeypatch):
+    release = threading.Event()
+    add_readings = CatWeightDB.add_readings
+
+    def slow_add_readings(self, batch, daily="median"):
+        release.wait(5)
+        return add_readings(self, batch, daily)
+
+    monkeypatch.setattr(CatWeightDB, "add_readings", slow_add_readings)
+    buffer = ReadingBuffer(db_file, max_rows=2, max_delay=60, max_pending=2)
+    for i in range(2):
+        buffer.add(*reading(i))
+    # 書き込み中の 2 件の後に 2 件まで溜められ、その次の add は書き込みが終わるまで待つ
+    assert wait_for(lambda: not buffer._pending)
+    buffer.add(*reading(2))
+    buffer.add(*reading(3))
+    blocked = threading.Thread(target=buffer.add, args=reading(4))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(5)
+    assert not blocked.is_alive()
+    buffer.close()
+    assert buffer.readings_written == 5
+
+
+def test_write_errors_are_raised_by_the_next_call(db_file, monkeypatch):
+    def failing_add_readings(self, batch, daily="median"):
+        raise OSError("disk full")
+
+    with ReadingBuffer(db_file, max_rows=1, max_delay=60) as buffer:
+        monkeypatch.setattr(CatWeightDB, "add_readings", failing_add_readings)
+        buffer.add(*reading(0))
+        assert wait_for(lambda: buffer._error is not None)
+        with pytest.raises(RuntimeError, match="1 readings could not be written"):
+            buffer.add(*reading(1))
+        # エラーは 1 回だけ報告され、その後は書き込みを続ける
+        monkeypatch.undo()
+        buffer.add(*reading(2))
+        buffer.flush()
+        assert buffer.readings_written == 1
+
+    buffer = ReadingBuffer(db_file, max_rows=100, max_delay=60)
+    monkeypatch.setattr(CatWeightDB, "add_readings", failing_add_readings)
+    buffer.add(*reading(3))
+    with pytest.raises(RuntimeError) as error:
+        buffer.close()
+    assert isinstance(error.value.__cause__, OSError)
+    with pytest.raises(ValueError):
+        buffer.add(*reading(4))
+
+
+def test_invalid_readings_and_settings(db_file):
+    with pytest.raises(ValueError):
+        ReadingBuffer(db_file, daily="mean")
+    with pytest.raises(ValueError):
+        ReadingBuffer(db_file, max_rows=0)
+    with ReadingBuffer(db_file) as buffer:
+        for weight in (0.0, -1.0, float("nan"), float("inf")):
+            with pytest.raises(ValueError):
+                buffer.add(START, weight)
+        with pytest.raises(ValueError):
+            buffer.add("2024-05-01T07:00", 4.0)
+    assert buffer.readings_written == 0
+
+
+def test_import_readings_reports_rejected_rows(db_file, tmp_path, capsys):
+    input_file = tmp_path / "readings.csv"
+    input_file.write_text(
+        "timestamp,weight,device\n"
+        "2024-05-01T07:00:00,4.0,a\n"
+        "yesterday,4.1,a\n"
+        "2024-05-01T19:00:00,inf,a\n"
+        "1714600800,4.2,b\n"
+    )
+    assert import_readings(db_file, str(input_file), flush_interval=0.05) == 2
+    out = capsys.readouterr().out
+    assert "Stored 2 readings" in out
+    assert "line 3:" in out and "line 4:" in out
+
+    result = subprocess.run([sys.executable, CATDB, "--db-file", db_file, "import-readings", str(input_file)],
+                            capture_output=True, text=True)
+    assert result.returncode == 1
+    input_file.write_text("timestamp,weight\n2024-05-03T07:00:00,4.0\n")
+    result = subprocess.run([sys.executable, CATDB, "--db-file", db_file, "import-readings", str(input_file)],
+                            capture_output=True, text=True)
+    assert result.returncode == 0
@@ -0,0 +1,93 @@
+import os
+from datetime import date
+
+import numpy as np
+import pytest
+
+from catdb.commands.graph import graph_all
+from catdb.db.database import CatWeightDB
+from catdb.render import ChartJob, chart_jobs, render_all, render_chart
+
+
+@pytest.fixture
+def cats_db(tmp_path):
+    db_file = str(tmp_path / "home.db")
+    with CatWeightDB(db_file) as db:
+        db.initialize_table()
+        # 2023 年は記録が無い
+        for record_date, weight in [(date(2022, 1, 1), 4.0), (date(2022, 6, 1), 4.2), (date(2024, 3, 1), 4.4)]:
+            db.add_weight_record(record_date, weight)
+        db.use_cat("goro/2")
+        db.add_weight_record(date(2024, 1, 1), 5.0)
+        db.use_cat("empty")
+    return db_file
+
+
+def test_chart_jobs_read_each_database_once(cats_db, tmp_path, monkeypatch):
+    reads = []
+    iter_weight_series = CatWeightDB.iter_weight_series
+    monkeypatch.setattr(CatWeightDB, "iter_weight_series",
+                        lambda self, *args, **kwargs: reads.append(self.db_file) or iter_weight_series(self, *args, **kwargs))
+
+    jobs, seconds = chart_jobs(cats_db, str(tmp_path / "out"))
+    assert reads == [cats_db]
+    assert seconds >= 0
+    paths = {os.path.relpath(job.path, tmp_path / "out") for job in jobs}
+    assert paths == {
+        "home/default/overlay.png", "home/default/history.png", "home/default/year-2022.png",
+        "home/default/year-2024.png", "home/goro_2/overlay.png", "home/goro_2/history.png", "home/goro_2/year-2024.png",
+    }
+    year = next(job for job in jobs if job.kind == "year" and job.year == 2022)
+    assert year.weights.tolist() == pytest.approx([4.0, 4.2])
+    # 年ごとのグラフは読み込んだ配列の一部をそのまま使う
+    history = next(job for job in jobs if job.kind == "history" and job.cat == "default")
+    assert np.shares_memory(year.weights, history.weights)
+
+
+def test_chart_jobs_filters(cats_db, tmp_path):
+    jobs, _ = chart_jobs(cats_db, str(tmp_path), kinds=["year"], first_year=2024)
+    assert sorted((job.cat, job.year) for job in jobs) == [("default", 2024), ("goro/2", 2024)]
+    with pytest.raises(ValueError):
+        chart_jobs(cats_db, str(tmp_path), kinds=["pie"])
+
+
+def test_missing_database_is_not_created(tmp_path):
+    missing = str(tmp_path / "missing.db")
+    with pytest.raises(FileNotFoundError):
+        chart_jobs(missing, str(tmp_path))
+    assert not os.path.exists(missing)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_render_all_reports_unreadable_databases(cats_db, tmp_path, workers):
+    junk = tmp_path / "junk.db"
+    junk.write_text("not a database")
+    missing = str(tmp_path / "missing.db")
+    fetched, errors = [], []
+    results = render_all([missing, str(junk), cats_db], str(tmp_path / "out"), workers=workers, kinds=["history"],
+                         on_fetch=lambda db_file, charts, seconds: fetched.append((db_file, charts)),
+                         on_error=lambda db_file, error: errors.append(db_file))
+    assert errors == [missing, str(junk)]
+    assert fetched == [(cats_db, 2)]
+    assert sorted(result.cat for result in results) == ["default", "goro/2"]
+    assert all(result.error is None and os.path.getsize(result.path) > 0 for result in results)
+    assert not os.path.exists(missing)
+    with pytest.raises(ValueError):
+        render_all([cats_db], str(tmp_path), kinds=["pie"])
+
+
+def test_render_chart_reports_write_errors(tmp_path):
+    (tmp_path / "file").write_text("")
+    days = np.array(["2024-01-01", "2024-01-02"], dtype="datetime64[D]")
+    result = render_chart(ChartJob("history", "x.db", "tama", days, np.array([4.0, 4.1]),
+                                   str(tmp_path / "file" / "history.png")))
+    assert result.error is not None
+    assert result.points == 2
+
+
+def test_graph_all_keeps_rendering_after_a_missing_database(cats_db, tmp_path, capsys):
+    graph_all([str(tmp_path / "missing.db"), cats_db], str(tmp_path / "out"), workers=1, kinds=["overlay"])
+    out = capsys.readouterr().out
+    assert "Could not read" in out
+    assert "Rendered 2 charts from 1 databases" in out
+    assert "1 databases could not be read" in out
@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from catdb.db.database import CatWeightDB
+
+TRIGGERS = ("weight_rollups_insert", "weight_rollups_delete", "weight_rollups_update")
+
+
+def rollup_triggers(db: CatWeightDB) -> set[str]:
+    return {name for (name,) in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")} & set(TRIGGERS)
+
+
+def test_triggers_keep_rollups_in_sync(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    db.add_weight_record(date(2024, 1, 2), 5.0)
+    db.add_weight_record(date(2024, 2, 1), 4.5)
+    db.update_weight_record(date(2024, 1, 2), 6.0)
+    db.delete_weight_record(date(2024, 2, 1))
+    assert db.check_rollups() == []
+
+    month = db.get_stats("month")
+    assert [(start, count, low, high) for start, count, low, high, _, _ in month] == [(date(2024, 1, 1), 2, 4.0, 6.0)]
+    assert month[0][4] == pytest.approx(5.0)
+    year = db.get_stats("year")
+    assert year[0][1] == 2
+
+
+def test_rebuild_rollups_repairs_drift(db):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    db.conn.execute("UPDATE weight_rollups SET count = 7")
+    db.conn.commit()
+    assert db.check_rollups() != []
+    stale, written = db.rebuild_rollups()
+    assert len(stale) == 3
+    assert written == 3
+    assert db.check_rollups() == []
+
+
+def test_import_csv_builds_rollups(db, tmp_path):
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("date,weight,notes\n2024-01-01,4.0,\n2024-01-02,4.2,fine\n2024-03-01,4.4,\n")
+    assert db.import_csv(str(csv_file), chunk_size=2) == 3
+    assert db.check_rollups() == []
+    assert rollup_triggers(db) == set(TRIGGERS)
+    assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+
+def test_failed_import_rolls_back_and_keeps_triggers(db, tmp_path):
+    db.add_weight_record(date(2024, 1, 1), 4.0)
+    # cat_id をキャッシュさせる (読み込みの前に DML が走らない状態にする)
+    assert db.find_weight_record(date(2024, 1, 1)) is not None
+
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("date,weight\n2024-01-02,4.1\n2024-01-03,4.2\n2024-01-04,not a number\n")
+    with pytest.raises(ValueError):
+        db.import_csv(str(csv_file), chunk_size=2)
+
+    assert db.find_weight_record(date(2024, 1, 2)) is None
+    assert rollup_triggers(db) == set(TRIGGERS)
+    db.add_weight_record(date(2024, 1, 5), 4.3)
+    assert db.check_rollups() == []
+
+
+def test_import_csv_requires_columns(db, tmp_path):
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("day,kg\n2024-01-02,4.1\n")
+    with pytest.raises(ValueError):
+        db.import_csv(str(csv_file))
+    assert rollup_triggers(db) == set(TRIGGERS)
@@ -0,0 +1,133 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from catdb.db.database import CatWeightDB
+from catdb.series import WeightSeries
+
+DATES = np.array(["2024-01-01", "2024-01-03", "2024-01-04", "2024-01-08", "2024-02-01"], dtype="datetime64[D]")
+WEIGHTS = [4.0, 4.1, 4.2, 4.3, 4.4]
+
+
+class NotesLoader:
+    """Returns a note for every date and records the dates it was asked for."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, dates):
+        self.calls.append(dates.tolist())
+        return np.array([f"note {day}" for day in dates.tolist()], dtype=object)
+
+
+def test_between_returns_views_with_inclusive_bounds():
+    series = WeightSeries(DATES, WEIGHTS, cat="tama")
+    part = series.between(date(2024, 1, 3), date(2024, 1, 8))
+    assert part.dates.tolist() == [date(2024, 1, 3), date(2024, 1, 4), date(2024, 1, 8)]
+    assert part.weights.tolist() == pytest.approx([4.1, 4.2, 4.3])
+    assert part.cat == "tama"
+    # 元の配列を共有し、コピーしない
+    assert np.shares_memory(part.dates, series.dates) and np.shares_memory(part.weights, series.weights)
+    assert part.nbytes == 3 * (8 + 4)
+
+    # 記録の無い日を境界にしても、その間の記録が返る
+    assert series.between(date(2024, 1, 2), date(2024, 1, 7)).dates.tolist() == [date(2024, 1, 3), date(2024, 1, 4)]
+    assert len(series.between(None, None)) == 5
+    assert series.between(begin_date=date(2024, 1, 8)).dates.tolist() == [date(2024, 1, 8), date(2024, 2, 1)]
+    assert series.between(end_date=date(2024, 1, 1)).dates.tolist() == [date(2024, 1, 1)]
+    assert len(series.between(date(2024, 1, 5), date(2024, 1, 7))) == 0
+    assert len(series.between(date(2024, 3, 1))) == 0
+
+
+def test_slices_load_only_their_own_notes():
+    loader = NotesLoader()
+    series = WeightSeries(DATES, WEIGHTS, notes_loader=loader)
+    part = series.between(date(2024, 1, 3), date(2024, 1, 4))
+    assert loader.calls == [] and not part.notes_loaded
+    assert part.notes.tolist() == ["note 2024-01-03", "note 2024-01-04"]
+    assert loader.calls == [[date(2024, 1, 3), date(2024, 1, 4)]]
+    part.notes
+    assert len(loader.calls) == 1
+    # 切り出しの読み込みは元の系列には残らない
+    assert not series.notes_loaded
+
+
+def test_loaded_notes_are_sliced_without_loading():
+    loader = NotesLoader()
+    series = WeightSeries(DATES, WEIGHTS, notes_loader=loader)
+    series.notes
+    part = series[1:3]
+    assert part.notes_loaded
+    assert part.notes.tolist() == ["note 2024-01-03", "note 2024-01-04"]
+    assert np.shares_memory(part.notes, series.notes)
+    assert len(loader.calls) == 1
+
+
+def test_notes_without_loader():
+    series = WeightSeries(DATES, WEIGHTS)
+    with pytest.raises(ValueError):
+        series.notes
+    with pytest.raises(ValueError):
+        series.to_pandas(notes=True)
+
+
+def test_only_slices_are_supported():
+    series = WeightSeries(DATES, WEIGHTS)
+    with pytest.raises(TypeError):
+        series[0]
+    with pytest.raises(ValueError):
+        WeightSeries(DATES, WEIGHTS[:2])
+
+
+def test_to_pandas():
+    series = WeightSeries(DATES, WEIGHTS, notes=np.array(["a", None, None, "d", None], dtype=object))
+    frame = series.to_pandas()
+    assert list(frame.columns) == ["date", "weight"]
+    assert frame["date"].dtype.kind == "M"
+    assert frame["weight"].dtype == np.float32
+    assert frame["date"].dt.date.tolist() == DATES.tolist()
+    assert frame["weight"].tolist() == pytest.approx(WEIGHTS)
+
+    frame = series[3:].to_pandas(notes=True)
+    assert list(frame.columns) == ["date", "weight", "notes"]
+    assert frame["notes"].iloc[0] == "d" and frame["notes"].isna().tolist() == [False, True]
+    assert len(WeightSeries(DATES[:0], []).to_pandas()) == 0
+
+
+def test_concatenate_and_iteration():
+    parts = [(DATES[:2], np.array(WEIGHTS[:2], dtype=np.float32)), (DATES[2:], np.array(WEIGHTS[2:], dtype=np.float32))]
+    series = WeightSeries.concatenate(parts, cat="tama")
+    assert [day for day, _ in series] == DATES.tolist()
+    assert [weight for _, weight in series] == pytest.approx(WEIGHTS)
+    assert series.weights.dtype == np.float32
+    assert len(WeightSeries.concatenate([], cat="tama")) == 0
+    assert "empty" in repr(WeightSeries.concatenate([]))
+
+
+def test_series_from_database_loads_notes_lazily(db):
+    for day, weight, notes in [(date(2024, 1, 1), 4.0, "vet"), (date(2024, 1, 2), 4.1, None),
+                               (date(2024, 1, 3), 4.2, "new food"), (date(2024, 1, 4), 4.3, None)]:
+        db.add_weight_record(day, weight, notes)
+    series = db.get_weight_series(chunk_size=3)
+    assert not series.notes_loaded
+    assert series.dates.tolist() == [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3), date(2024, 1, 4)]
+    assert series.between(date(2024, 1, 2), date(2024, 1, 3)).notes.tolist() == [None, "new food"]
+    assert series[::2].notes.tolist() == ["vet", "new food"]
+    assert not series.notes_loaded
+
+    assert db.get_weight_series(date(2024, 1, 2), notes=True).notes.tolist() == [None, "new food", None]
+    frame = db.get_weight_series().to_pandas(notes=True)
+    expected = db.get_all_records()
+    assert frame["notes"].fillna("").tolist() == expected["notes"].fillna("").tolist() == ["vet", "", "new food", ""]
+    assert frame["weight"].tolist() == pytest.approx(expected["weight"].tolist())
+
+
+def test_notes_cannot_be_loaded_after_close(db_file):
+    with CatWeightDB(db_file) as db:
+        db.add_weight_record(date(2024, 1, 1), 4.0, "vet")
+        lazy = db.get_weight_series()
+        eager = db.get_weight_series(notes=True)
+    assert eager.notes.tolist() == ["vet"]
+    with pytest.raises(ValueError):
+        lazy.notes
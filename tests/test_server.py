@@ -0,0 +1,99 @@
+import http.client
+import json
+import threading
+from datetime import date
+
+import pytest
+
+from catdb.db.database import CatWeightDB
+from catdb.server import CatDBRequestHandler, CatDBServer
+
+
+@pytest.fixture
+def server(db_file):
+    server = CatDBServer(("127.0.0.1", 0), db_file, readers=2, cache_entries=64)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(server, method, path, body=None):
+    conn = http.client.HTTPConnection(*server.server_address)
+    try:
+        payload = json.dumps(body).encode() if body is not None else None
+        conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, (json.loads(data) if data else None)
+    finally:
+        conn.close()
+
+
+def test_record_round_trip(server):
+    assert request(server, "POST", "/records", {"date": "2024-01-01", "weight": 4.0})[0] == 201
+    assert request(server, "POST", "/records", {"date": "2024-01-01", "weight": 4.0})[0] == 409
+    assert request(server, "GET", "/records/2024-01-01") == (200, {"date": "2024-01-01", "weight": 4.0, "notes": None})
+    assert request(server, "PUT", "/records/2024-01-01", {"weight": 4.2})[0] == 200
+    assert request(server, "PUT", "/records/2024-02-01", {"weight": 4.2})[0] == 404
+    assert request(server, "DELETE", "/records/2024-01-01")[0] == 200
+    assert request(server, "GET", "/records/2024-01-01")[0] == 404
+
+
+def test_cached_results_are_invalidated_by_writes(server):
+    request(server, "POST", "/records", {"date": "2024-01-01", "weight": 4.0})
+    assert request(server, "GET", "/records?begin=2024-01-01&end=2024-01-31")[1][0]["weight"] == 4.0
+    assert request(server, "GET", "/records?begin=2024-01-01&end=2024-01-31")[1][0]["weight"] == 4.0
+    assert request(server, "GET", "/cache")[1]["hits"] >= 1
+
+    request(server, "PUT", "/records/2024-01-01", {"weight": 4.5})
+    assert request(server, "GET", "/records?begin=2024-01-01&end=2024-01-31")[1][0]["weight"] == 4.5
+    assert request(server, "GET", "/stats?period=month")[1][0]["max"] == 4.5
+
+
+def test_external_writes_clear_the_cache(server, db_file):
+    request(server, "POST", "/records", {"date": "2024-01-01", "weight": 4.0})
+    assert request(server, "GET", "/records")[1][0]["weight"] == 4.0
+    with CatWeightDB(db_file) as db:
+        db.update_weight_record(date(2024, 1, 1), 3.9)
+    assert request(server, "GET", "/records")[1][0]["weight"] == 3.9
+
+
+def test_batch_applies_operations(server):
+    status, body = request(server, "POST", "/batch", [
+        {"op": "add", "date": "2024-01-01", "weight": 4.0},
+        {"op": "add", "date": "2024-01-02", "weight": 4.1, "cat": "goro"},
+        {"op": "delete", "date": "2024-03-01"},
+    ])
+    assert status == 200
+    assert body["add"] == {"ok": 2, "failed": 0}
+    assert body["delete"] == {"ok": 0, "failed": 1}
+    assert request(server, "GET", "/records/2024-01-02?cat=goro")[0] == 200
+
+
+@pytest.mark.parametrize("item, message", [
+    ("not an object", "Operation 1"),
+    ({"op": "add", "weight": 4.0}, "Operation 1"),
+    ({"op": "jump", "date": "2024-01-05"}, "unknown operation"),
+    ({"op": "add", "date": "2024-13-45", "weight": 4.0}, "Operation 1"),
+    ({"op": "add", "date": "2024-01-05", "weight": "heavy"}, "Operation 1"),
+    ({"op": "update", "date": "2024-01-05"}, "requires 'weight'"),
+    ({"op": "add", "date": "2024-01-05", "weight": 4.0, "notes": ["x"]}, "Operation 1"),
+])
+def test_invalid_batch_items_are_rejected_with_their_index(server, item, message):
+    status, body = request(server, "POST", "/batch", [{"op": "add", "date": "2024-01-04", "weight": 4.0}, item])
+    assert status == 400
+    assert message in body["error"]
+    # 不正な操作を含むバッチは何も書き込まない
+    assert request(server, "GET", "/records/2024-01-04")[0] == 404
+
+
+def test_bad_requests(server):
+    assert request(server, "POST", "/batch", {"op": "add"})[0] == 400
+    assert request(server, "POST", "/records", {"weight": 4.0})[0] == 400
+    assert request(server, "GET", "/stats?period=decade")[0] == 400
+    assert request(server, "GET", "/records/yesterday")[0] == 400
+    assert request(server, "GET", "/nowhere")[0] == 404
+    assert CatDBRequestHandler.protocol_version == "HTTP/1.1"